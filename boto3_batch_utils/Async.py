@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from itertools import islice
+from time import perf_counter
+
+from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.Cloudwatch import CloudwatchBatchDispatcher
+from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+from boto3_batch_utils.SQS import SQSBatchDispatcher, SQSFifoBatchDispatcher
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+class AsyncBaseDispatcher(BaseDispatcher):
+    """
+    Asyncio counterpart of the BaseDispatcher. Payloads are validated, de-duplicated and batched exactly as they are by
+    the synchronous dispatcher it is combined with, but full batches are set aside rather than sent immediately. They
+    are then sent from the event loop's executor, so the boto3 calls do not block the event loop and several batches
+    (up to max_concurrency) are sent at the same time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ready_batches = []
+        self._in_flight = set()
+        self._async_send_order_lock = None
+        self._async_send_order_lock_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def submit_payload(self, *args, **kwargs):
+        """ Submit a payload ready to be batched up and sent to the subject """
+        await self._wait_for_buffer_space_async()
+        super().submit_payload(*args, **kwargs)
+        await self._send_ready_batches()
+
+    async def submit_payloads(self, payloads, **kwargs: dict):
+        """
+        Submit each payload from an iterable, exactly as submit_payload would be awaited for each, with the same keyword
+        arguments. The iterable is consumed lazily, a batch at a time (a payload at a time if the buffer is limited, so
+        each waits for buffer space), so it may be a generator of any length
+        """
+        payloads = iter(payloads)
+        chunk_size = 1 if self._is_buffer_limited else self.max_batch_size
+        chunk = list(islice(payloads, chunk_size))
+        while chunk:
+            await self._wait_for_buffer_space_async()
+            super().submit_payloads(chunk, **kwargs)
+            await self._send_ready_batches()
+            chunk = list(islice(payloads, chunk_size))
+
+    async def _wait_for_buffer_space_async(self):
+        """ Wait, if the buffer_full_policy is 'block', until batches being sent have made space in the buffer """
+        while self.buffer_full_policy == 'block' and self._is_buffer_full(0) and self._in_flight:
+            logger.debug("The %s dispatcher buffer is full, waiting for batches to be sent", self.aws_service_name)
+            await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+    def _wait_for_buffer_space(self) -> bool:
+        """
+        Never block the event loop, submissions wait for buffer space before they take the lock. The byte limit may
+        therefore be exceeded by the size of one payload
+        """
+        return False
+
+    async def flush_payloads(self) -> list:
+        """ Push all payloads in the payload list (and any spilled to the write-ahead log) to the subject """
+        logger.debug("%s payload list has %d entries", self.aws_service_name, len(self._batch_payload))
+        self._set_aside_batches_to_flush()
+        if not self._ready_batches:
+            logger.info(f"No payloads to flush to {self.aws_service_name}")
+        while self._ready_batches:
+            await self._send_ready_batches()
+            if self._spilled_ranges:
+                self._set_aside_batches_to_flush()
+        self._export_stats()
+        return self._get_flush_result()
+
+    def _set_aside_batches_to_flush(self):
+        """ Read back any spilled payloads which there is space for, then set aside all pending batches """
+        with self._lock:
+            self._refill_from_spill()
+            self._ready_batches.extend(self._take_pending_batches())
+
+    async def close(self) -> list:
+        """ Stop the background linger thread (if it is running) and push all remaining payloads to the subject """
+        await asyncio.get_running_loop().run_in_executor(None, self._stop_linger_thread)
+        unprocessed_items = await self.flush_payloads()
+        if self.write_ahead_log:
+            self.write_ahead_log.close()
+        return unprocessed_items
+
+    def _handle_full_batch(self, keep_partial_batch: bool = True):
+        """ Set aside the pending payloads, they are sent once the current submission is complete """
+        self._ready_batches.extend(self._take_pending_batches(keep_partial_batch=keep_partial_batch))
+
+    async def _send_ready_batches(self):
+        """
+        Send all batches which have been set aside, up to max_concurrency (or more, near the deadline) at a time. A
+        dispatcher which preserves payload order takes and sends them while holding its send order lock, so that no
+        other coroutine sends a newer batch while an older one is being sent
+        """
+        if not self._preserve_payload_order:
+            await self._take_and_send_ready_batches()
+            return
+        async with self._get_async_send_order_lock():
+            await self._take_and_send_ready_batches()
+
+    def _get_async_send_order_lock(self) -> asyncio.Lock:
+        """ Return the dispatcher's send order lock, a new one if the dispatcher is used by a different event loop """
+        loop = asyncio.get_running_loop()
+        if self._async_send_order_lock_loop is not loop:
+            self._async_send_order_lock, self._async_send_order_lock_loop = asyncio.Lock(), loop
+        return self._async_send_order_lock
+
+    async def _take_and_send_ready_batches(self):
+        """ Take all batches which have been set aside and send them """
+        batch_list, self._ready_batches = self._ready_batches, []
+        if not batch_list:
+            return
+        loop = asyncio.get_running_loop()
+        #  The batches are in flight (and waited on by blocked submissions) while the client is being initialised
+        initialised = loop.run_in_executor(None, self._initialise_aws_client)
+        semaphore = asyncio.Semaphore(self._get_send_concurrency(len(batch_list)))
+
+        async def send(batch):
+            failed_count = None
+            try:
+                await initialised
+                async with semaphore:
+                    if self.rate_limiter:
+                        await self.rate_limiter.acquire_async(len(batch), self._get_batch_byte_size(batch))
+                    unprocessed_items, record_ids = await loop.run_in_executor(None, self._send_batch_in_thread, batch)
+                failed_count = len(unprocessed_items)
+                return unprocessed_items, record_ids
+            finally:
+                self._batch_finished(batch, failed_count)
+
+        logger.debug("Sending %d batches to %s", len(batch_list), self.aws_service_name)
+        start = perf_counter()
+        tasks = [asyncio.ensure_future(send(batch)) for batch in batch_list]
+        self._in_flight.update(tasks)
+        try:
+            #  gather returns the results in the order the batches were given, so unprocessed items are deterministic
+            for unprocessed_items, record_ids in await asyncio.gather(*tasks):
+                self._deliver_failures(unprocessed_items, record_ids)
+        finally:
+            self._in_flight.difference_update(tasks)
+            self._stats.record_flush(perf_counter() - start)
+
+
+class AsyncCloudwatchBatchDispatcher(AsyncBaseDispatcher, CloudwatchBatchDispatcher):
+    """
+    Manage the batch 'put' of Cloudwatch metrics, using asyncio
+    """
+
+    async def submit_metric(self, *args, **kwargs):
+        """ Submit a metric ready to be batched up and sent to Cloudwatch """
+        await self._wait_for_buffer_space_async()
+        super().submit_metric(*args, **kwargs)
+        await self._send_ready_batches()
+
+    async def submit_metrics(self, metrics):
+        """ Submit each metric from an iterable, as submit_metric would be awaited for each """
+        await self.submit_payloads(self._construct_metric(**metric) for metric in metrics)
+
+
+class AsyncDynamoBatchDispatcher(AsyncBaseDispatcher, DynamoBatchDispatcher):
+    """
+    Control the submission of writes to DynamoDB, using asyncio
+    """
+
+
+class AsyncKinesisBatchDispatcher(AsyncBaseDispatcher, KinesisBatchDispatcher):
+    """
+    Manage the batch 'put' of Kinesis records, using asyncio
+    """
+
+
+class AsyncSQSBatchDispatcher(AsyncBaseDispatcher, SQSBatchDispatcher):
+    """
+    Manage the batch 'send' of SQS messages, using asyncio
+    """
+
+
+class AsyncSQSFifoBatchDispatcher(AsyncBaseDispatcher, SQSFifoBatchDispatcher):
+    """
+    Manage the batch 'send' of SQS FIFO messages, using asyncio
+    """
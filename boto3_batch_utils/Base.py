@@ -1,11 +1,30 @@
 import logging
-import boto3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from importlib import import_module
+from itertools import islice
+from random import random
+from time import monotonic, perf_counter, sleep
 from botocore.exceptions import ClientError
 
-from boto3_batch_utils.utils import chunks, get_byte_size_of_dict_or_list
+from boto3_batch_utils import constants
+from boto3_batch_utils.adaptive import AdaptiveController
+from boto3_batch_utils.circuit_breaker import CircuitBreaker, CircuitOpenError, OPEN
+from boto3_batch_utils.client_cache import get_aws_service
+from boto3_batch_utils.deadline import Deadline, get_deadline
+from boto3_batch_utils.rate_limiter import RateLimiter
+from boto3_batch_utils.retry import RetryPolicy
+from boto3_batch_utils.stats import DispatcherStats
+from boto3_batch_utils.utils import chunks, get_byte_size_of_dict_or_list, BatchRecord, pack_in_order, \
+    pack_unordered
+from boto3_batch_utils.wal import WriteAheadLog, PAYLOAD_RECORD, FAILED_RECORD
 
 logger = logging.getLogger('boto3-batch-utils')
 
+#  boto3 is slow to import, it is not imported until a client/resource is first required (see _initialise_aws_client)
+boto3 = None
 
 _boto3_interface_type_mapper = {
     'dynamodb': 'resource',
@@ -15,10 +34,24 @@ _boto3_interface_type_mapper = {
 }
 
 
+class BufferFullError(Exception):
+    """ Raised by submit_payload when the dispatcher's buffer is full and its buffer_full_policy is 'raise' """
+
+
 class BaseDispatcher:
+    #  Whether payloads must be sent in the order they were submitted, which limits how batches can be packed and
+    #  prevents more than one batch being sent at a time
+    _preserve_payload_order = False
 
     def __init__(self, aws_service: str, batch_dispatch_method: str, individual_dispatch_method: str = None,
-                 max_batch_size: int = 1, **kwargs: dict):
+                 max_batch_size: int = 1, max_concurrency: int = None, linger_ms: int = None,
+                 retry_policy: RetryPolicy = None, adaptive_controller: AdaptiveController = None,
+                 rate_limiter: RateLimiter = None, max_buffered_payloads: int = None, max_buffered_bytes: int = None,
+                 buffer_full_policy: str = 'block', write_ahead_log: WriteAheadLog = None,
+                 failure_callback: callable = None, retain_unprocessed_items: bool = True,
+                 stats_exporter: callable = None, trace_sample_rate: float = None, batch_packing: bool = False,
+                 deadline: (Deadline, object, float) = None, circuit_breaker: CircuitBreaker = None,
+                 **kwargs: dict):
         """
         :param aws_service: object - the boto3 client which shall be called to dispatch each payload
         :param batch_dispatch_method: method - the method to be called when attempting to dispatch multiple items in a
@@ -26,10 +59,60 @@ class BaseDispatcher:
         :param individual_dispatch_method: method - the method to be called when attempting to dispatch an individual
         item to the subject
         :param max_batch_size: int - Maximum size of a payload batch to be sent to the target
+        :param max_concurrency: int - Maximum number of batches which may be sent to the target at the same time when
+        flushing payloads (default None, batches are sent one after another)
+        :param linger_ms: int - Maximum time (in milliseconds) a payload may wait in the payload list before it is sent
+        by a background thread, even if its batch is not yet full (default None, payloads wait for a full batch or a
+        flush_payloads call)
+        :param retry_policy: RetryPolicy - Decides whether and when failed calls to the AWS service are retried (default
+        RetryPolicy(), up to 5 attempts with capped exponential backoff and jitter)
+        :param adaptive_controller: AdaptiveController - Reduces the batch size and send rate when the AWS service
+        throttles requests, and restores them as requests succeed (default None, batches are always max_batch_size)
+        :param rate_limiter: RateLimiter - Limits the records and bytes sent per second, sending waits until the limit
+        allows the batch. May be shared by several dispatchers (default None, no limit)
+        :param max_buffered_payloads: int - Maximum number of payloads held by the dispatcher, waiting to be sent or
+        being sent, at any one time (default None, no limit). Must allow at least max_batch_size * max_concurrency
+        :param max_buffered_bytes: int - Maximum total byte size of the payloads held by the dispatcher (default None,
+        no limit). Must allow at least max_concurrency full batches
+        :param buffer_full_policy: str - What submit_payload does when a buffer limit has been reached: 'block' waits
+        until batches being sent by other threads have finished, 'raise' raises a BufferFullError and 'drop_oldest'
+        drops the oldest payloads waiting to be sent (or, if there are none, the new payload), counting them in
+        dropped_payload_count. 'spill' (which requires a write_ahead_log) keeps further payloads on disk only, they are
+        read back from the log, in order, once there is space
+        :param write_ahead_log: WriteAheadLog - Records each payload on disk until it has been sent, and each failed
+        payload until it has been returned by flush_payloads. Payloads and failures which were never acknowledged by
+        a previous dispatcher using the log are sent, or returned, again (default None, payloads are only held in
+        memory)
+        :param failure_callback: callable - Called with a list of the items which could not be sent, as soon as they
+        fail, instead of the items being added to unprocessed_items (default None, failures are held in
+        unprocessed_items)
+        :param retain_unprocessed_items: bool - Keep every failure in unprocessed_items, so each flush_payloads call
+        returns all failures so far (default True). If False, each flush_payloads call returns only the failures since
+        the previous call, and they are removed from unprocessed_items
+        :param stats_exporter: callable - Called with the dispatcher's stats() after each flush_payloads call, e.g. to
+        publish them to a metrics system (default None)
+        :param trace_sample_rate: float - Fraction (between 0 and 1) of payloads, batches and responses whose contents
+        are written to the debug log (default None, only their counts and sizes are logged)
+        :param batch_packing: bool - Pack the pending payloads into as few requests as the service's count and byte
+        limits allow, rather than sending a batch as soon as the next payload would take it over the byte limit
+        (default False). The payload list holds one batch more than it otherwise would, and a part filled batch is
+        carried over to be packed with later payloads. Dispatchers which must keep payloads in order (SQS FIFO queues
+        and Kinesis) keep it, others pack the largest payloads first
+        :param deadline: Deadline, Lambda context, datetime or float - The time by which sending must finish, e.g. the
+        context of the Lambda invocation, or a time.time() timestamp (default None, no deadline). Once it is near, the
+        pending payloads are sent without waiting for a full batch and more batches are sent at the same time (unless
+        payloads must be sent in order), once it has passed nothing more is sent or retried and the unsent payloads are
+        returned as unprocessed items. Pass a Deadline to set its margins (see boto3_batch_utils.deadline), or call
+        set_deadline for each invocation
+        :param circuit_breaker: CircuitBreaker - Stops calls to the AWS service after consecutive failures, so the
+        payloads fail at once rather than after every retry, until a trial call succeeds. Its state is included in
+        stats() (default None, every call is made)
         :param flush_payload_on_max_batch_size: bool - should payload be automatically sent once the payload size is
         equal to that of the maximum permissible batch (True), or should the manager wait for a flush payload call
         (False)
-        :param kwargs: dict - keyword arguments passed to aws_service during its creation
+        :param kwargs: dict - keyword arguments passed to aws_service during its creation (e.g. region_name, or config
+        for a botocore.config.Config). Dispatchers created with the same arguments share one client (but not a resource,
+        e.g. for DynamoDB, as boto3 resources are not thread safe)
         """
         self.aws_service_name = aws_service
         self.aws_service_args = kwargs or {}
@@ -39,14 +122,53 @@ class BaseDispatcher:
         self.individual_dispatch_method = individual_dispatch_method
         self._individual_dispatch_method = None
         self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self.linger_ms = linger_ms
+        self._linger_condition = threading.Condition(self._lock)
+        self._linger_thread = None
+        self._linger_stopped = False
+        self._oldest_payload_time = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.adaptive_controller = adaptive_controller
+        if adaptive_controller:
+            adaptive_controller.reset(max_batch_size)
+        self.rate_limiter = rate_limiter
+        self.max_buffered_payloads = max_buffered_payloads
+        self.max_buffered_bytes = max_buffered_bytes
+        self.buffer_full_policy = buffer_full_policy
+        self._buffer_condition = threading.Condition(self._lock)
+        self._buffered_payload_count = 0
+        self._buffered_byte_size = 0
+        self._pending_payloads_dropped = False
+        self.dropped_payload_count = 0
+        self.write_ahead_log = write_ahead_log
+        self._spilled_ranges = deque()
+        self._refilling = False
+        #  Write-ahead log record ids of the failures in unprocessed_items which are not yet acknowledged, these are
+        #  always the last items in unprocessed_items
+        self._failure_record_ids = []
+        self.failure_callback = failure_callback
+        self.retain_unprocessed_items = retain_unprocessed_items
+        self.stats_exporter = stats_exporter
+        self._stats = DispatcherStats()
+        self.trace_sample_rate = trace_sample_rate
+        self.batch_packing = batch_packing
+        self.deadline = get_deadline(deadline)
+        self._deadline_near = False
+        self.circuit_breaker = circuit_breaker
         self._aws_service_batch_max_payloads = None
         self._aws_service_message_max_bytes = None
         self._aws_service_batch_max_bytes = None
         self._batch_payload_wrapper = {}
         self._batch_payload = None
+        self._batch_payload_byte_size = 0
         self._batch_payload_wrapper_byte_size = get_byte_size_of_dict_or_list(self._batch_payload_wrapper) - 2
         #  Remove 2 bytes for the `[]` which exists in the wrapper and the batch itself, therefore duplicated
         self.unprocessed_items = []
+        if write_ahead_log:
+            self._replay_write_ahead_log()
         logger.debug(f"Batch dispatch initialised: {self.aws_service_name}")
 
     def _validate_initialisation(self):
@@ -56,32 +178,371 @@ class BaseDispatcher:
         if self._aws_service_batch_max_payloads and self.max_batch_size > self._aws_service_batch_max_payloads:
             raise ValueError(f"Requested max_batch_size '{self.max_batch_size}' exceeds the {self.aws_service_name} "
                              f"maximum")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError(f"Requested max_concurrency '{self.max_concurrency}' must be at least 1")
+        if self._preserve_payload_order and self.max_concurrency is not None and self.max_concurrency > 1:
+            raise ValueError(f"Requested max_concurrency '{self.max_concurrency}' must be 1 for {self}, which sends "
+                             f"payloads in the order they were submitted (see MultiprocessDispatcher to send "
+                             f"message groups or partition keys in parallel)")
+        if self.linger_ms is not None and self.linger_ms <= 0:
+            raise ValueError(f"Requested linger_ms '{self.linger_ms}' must be greater than 0")
+        if self.trace_sample_rate is not None and not 0 < self.trace_sample_rate <= 1:
+            raise ValueError(f"Requested trace_sample_rate '{self.trace_sample_rate}' must be greater than 0 and at "
+                             f"most 1")
+        self._validate_buffer_limits()
+
+    def _validate_buffer_limits(self):
+        """ Ensure that the buffer limits allow the dispatcher to fill every batch it may send at the same time """
+        if self.buffer_full_policy not in constants.BUFFER_FULL_POLICIES:
+            raise ValueError(f"Requested buffer_full_policy '{self.buffer_full_policy}' must be one of "
+                             f"{', '.join(constants.BUFFER_FULL_POLICIES)}")
+        if self.buffer_full_policy == 'spill' and not self.write_ahead_log:
+            raise ValueError("Requested buffer_full_policy 'spill' requires a write_ahead_log")
+        held_batches = self._get_batches_held()
+        packing = ' (+ 1 with batch_packing)' if self.batch_packing else ''
+        min_payloads = self.max_batch_size * held_batches
+        if self.max_buffered_payloads is not None and self.max_buffered_payloads < min_payloads:
+            raise ValueError(f"Requested max_buffered_payloads '{self.max_buffered_payloads}' must be at least "
+                             f"max_batch_size * max_concurrency{packing} ({min_payloads})")
+        min_bytes = (self._aws_service_batch_max_bytes or 0) * held_batches
+        if self.max_buffered_bytes is not None and self.max_buffered_bytes < min_bytes:
+            raise ValueError(f"Requested max_buffered_bytes '{self.max_buffered_bytes}' must be at least the "
+                             f"{self.aws_service_name} batch byte limit * max_concurrency{packing} ({min_bytes})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def set_deadline(self, deadline: (Deadline, object, float) = None):
+        """
+        Set the time by which sending must finish, or clear it with None, e.g. at the start of each invocation of a
+        Lambda function which keeps its dispatcher between invocations
+        :param deadline: Deadline, Lambda context, datetime or float - see the deadline parameter of the dispatcher
+        """
+        self.deadline = get_deadline(deadline)
+        self._deadline_near = False
+
+    @property
+    def effective_limits(self) -> dict:
+        """ The batch size and send rate (requests per second, None if unlimited) currently in use """
+        if not self.adaptive_controller:
+            return {'batch_size': self.max_batch_size, 'send_rate': None}
+        send_delay = self.adaptive_controller.send_delay
+        return {'batch_size': self.adaptive_controller.batch_size, 'send_rate': 1 / send_delay if send_delay else None}
+
+    def stats(self) -> dict:
+        """
+        Return cumulative statistics of the dispatcher: counts of payloads, batches, bytes, requests, retries,
+        individual sends and failures, the batch fill ratio, and histograms of the latency of each request to the AWS
+        service and of each flush. payloads_sent, bytes_sent and batches_sent count only what the AWS service accepted,
+        failed payloads are counted by failed_payloads
+        """
+        stats = self._stats.to_dict(self.max_batch_size)
+        stats['payloads_dropped'] = self.dropped_payload_count
+        stats['payloads_pending'] = len(self._batch_payload or [])
+        if self.circuit_breaker:
+            stats['circuit_breaker'] = self.circuit_breaker.to_dict()
+        return stats
+
+    def _export_stats(self):
+        """ Pass the statistics to the stats_exporter, if there is one """
+        if self.stats_exporter:
+            self.stats_exporter(self.stats())
+
+    def _trace(self, message: str, *args):
+        """
+        Write the contents of a payload, batch or response to the debug log, for the fraction of calls given by
+        trace_sample_rate. The message is only formatted if it is written
+        """
+        if self.trace_sample_rate and random() < self.trace_sample_rate and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(message, *args)
+
+    @property
+    def batch_in_progress(self):
+        """ The batch currently being sent by this thread """
+        return getattr(self._local, 'batch_in_progress', None)
+
+    @batch_in_progress.setter
+    def batch_in_progress(self, batch):
+        self._local.batch_in_progress = batch
 
     def submit_payload(self, payload: dict):
         """ Submit a metric ready to be batched up and sent to Cloudwatch """
-        self._validate_payload_byte_size(payload)
-        self._prevent_batch_bytes_overload(payload)
+        if not isinstance(payload, BatchRecord):
+            payload = BatchRecord(payload)
+        self._validate_payload_byte_size(payload, payload.byte_size)
+        with self._lock:
+            self._submit_record(payload)
+
+    def submit_payloads(self, payloads, **kwargs: dict):
+        """
+        Submit each payload from an iterable, exactly as submit_payload would be called for each, with the same keyword
+        arguments. The iterable is consumed lazily, a batch at a time, so it may be a generator of any length
+        :param payloads: iterable - The payloads to be submitted
+        :param kwargs: dict - Keyword arguments of submit_payload, applied to every payload
+        """
+        payloads = iter(payloads)
+        chunk = list(islice(payloads, self.max_batch_size))
+        while chunk:
+            logger.debug("%d payloads submitted to the %s dispatcher", len(chunk), self.aws_service_name)
+            with self._lock:
+                for payload in chunk:
+                    record = self._construct_payload(payload, **kwargs)
+                    if record is not None:
+                        self._validate_payload_byte_size(record, record.byte_size)
+                        self._submit_record(record)
+            chunk = list(islice(payloads, self.max_batch_size))
+
+    def _construct_shared_payload(self, payload, encodings: dict, **kwargs: dict) -> BatchRecord:
+        """
+        Construct and validate, but do not submit, the record for a payload which is also submitted to other
+        dispatchers (see FanOutDispatcher), reusing the encodings of it already made by them and adding any new
+        encoding to encodings. Returns None if it is a duplicate (the lock must be held)
+        """
+        record = self._construct_payload(payload, encodings=encodings, **kwargs)
+        if record is not None:
+            self._validate_payload_byte_size(record, record.byte_size)
+        return record
+
+    def _construct_payload(self, payload: dict, **kwargs: dict) -> BatchRecord:
+        """
+        Construct the record to be sent for a submitted payload, or return None if it is a duplicate of a payload
+        already waiting to be sent (the lock must be held)
+        """
+        return payload if isinstance(payload, BatchRecord) else BatchRecord(payload)
+
+    def _submit_record(self, payload: BatchRecord):
+        """ Add a constructed, valid record to the dispatcher (the lock must be held) """
+        if self.write_ahead_log:
+            self._refill_from_spill()
+            if self._spilled_ranges or self._should_spill(payload.byte_size):
+                #  Spilled payloads are sent in order, so once one payload is spilled all newer payloads are too
+                self._spill(self._write_ahead(payload))
+                return
+        if self._is_buffer_limited and not self._make_buffer_space(payload.byte_size):
+            return
+        if self.write_ahead_log:
+            self._write_ahead(payload)
+        self._buffer_payload(payload)
+
+    def _buffer_payload(self, payload: BatchRecord):
+        """ Add the payload to the payload list (the lock must be held), flushing the payload list if it is full """
+        self._stats.payloads_submitted += 1
+        if self._is_buffer_limited:
+            self._buffered_payload_count += 1
+            self._buffered_byte_size += payload.byte_size
+        self._prevent_batch_bytes_overload(payload, payload.byte_size)
         self._append_payload_to_current_batch(payload)
-        logger.debug(f"Payload has been added to the {self.aws_service_name} dispatcher payload list: {payload}")
+        self._batch_payload_byte_size += payload.byte_size
+        self._trace("Payload has been added to the %s dispatcher payload list: %s", self.aws_service_name, payload)
+        if self.linger_ms:
+            self._start_linger_clock()
         self._flush_payload_selector()
 
-    def _validate_payload_byte_size(self, payload):
+    def _write_ahead(self, payload: BatchRecord) -> int:
+        """ Record the payload in the write-ahead log, returning its record id """
+        payload.record_id = self.write_ahead_log.append((dict(payload), payload.source, payload.encoded_key))
+        return payload.record_id
+
+    def _should_spill(self, payload_byte_size: int) -> bool:
+        if self.buffer_full_policy != 'spill' or not self._is_buffer_limited:
+            return False
+        return self._is_buffer_full(payload_byte_size)
+
+    def _spill(self, record_id: int):
+        """ Leave a payload, which is in the write-ahead log, on disk only, it is read back once there is space """
+        if self._spilled_ranges and self._spilled_ranges[-1][1] == record_id:
+            self._spilled_ranges[-1][1] += 1
+        else:
+            self._spilled_ranges.append([record_id, record_id + 1])
+
+    def _read_spilled_payloads(self):
+        """ Yield the spilled payloads, oldest first, each is no longer spilled once it has been yielded """
+        while self._spilled_ranges:
+            record_range = self._spilled_ranges[0]
+            for record_id, (payload, source, encoded_key) in self.write_ahead_log.read(*record_range):
+                record_range[0] = record_id + 1
+                yield BatchRecord(payload, source, encoded_key, record_id=record_id)
+            self._spilled_ranges.popleft()
+
+    def _refill_from_spill(self) -> bool:
+        """
+        Move spilled payloads back into the payload list (the lock must be held), oldest first, while there is space in
+        the buffer. At most one flush of payloads is moved at a time, so the payloads held in memory remain bounded.
+        Returns True if any payloads were moved
+        """
+        if self._refilling or not self._spilled_ranges:
+            return False
+        self._refilling = True
+        refilled = False
+        try:
+            for payload in islice(self._read_spilled_payloads(), self.max_batch_size * (self.max_concurrency or 1)):
+                if self._is_buffer_limited and self._is_buffer_full(payload.byte_size):
+                    self._spilled_ranges[0][0] = payload.record_id
+                    break
+                self._buffer_payload(payload)
+                refilled = True
+        finally:
+            self._refilling = False
+        return refilled
+
+    def _replay_write_ahead_log(self):
+        """ Spill the payloads which were not acknowledged, to be sent again, and restore the unreturned failures """
+        failures, record_ids = [], []
+        for record_id, kind, data in self.write_ahead_log.replay():
+            if kind == PAYLOAD_RECORD:
+                self._spill(record_id)
+            elif kind == FAILED_RECORD:
+                failures.append(data)
+                record_ids.append(record_id)
+        if self._spilled_ranges or failures:
+            logger.info(f"Replaying the {self.aws_service_name} write-ahead log, {len(failures)} unprocessed items "
+                        f"have been restored and unsent payloads will be sent again")
+        self._deliver_failures(failures, record_ids)
+
+    def _acknowledge_failures(self):
+        """ Acknowledge, in the write-ahead log, the failures which have been returned to the caller """
+        with self._lock:
+            record_ids, self._failure_record_ids = self._failure_record_ids, []
+        if record_ids:
+            self.write_ahead_log.ack(record_ids)
+
+    @property
+    def _is_buffer_limited(self) -> bool:
+        return self.max_buffered_payloads is not None or self.max_buffered_bytes is not None
+
+    def _is_buffer_full(self, payload_byte_size: int) -> bool:
+        """ Decide whether adding a payload of the given size would exceed either of the buffer limits """
+        if self.max_buffered_payloads is not None and self._buffered_payload_count >= self.max_buffered_payloads:
+            return True
+        return (self.max_buffered_bytes is not None and
+                self._buffered_byte_size + payload_byte_size > self.max_buffered_bytes)
+
+    def _make_buffer_space(self, payload_byte_size: int) -> bool:
+        """
+        Apply the buffer_full_policy (the lock must be held) until a payload of the given size fits in the buffer.
+        Returns False if it is the new payload which has been dropped
+        """
+        while self._is_buffer_full(payload_byte_size):
+            if self.buffer_full_policy == 'raise':
+                raise BufferFullError(f"The {self.aws_service_name} dispatcher buffer is full, holding "
+                                      f"{self._buffered_payload_count} payloads ({self._buffered_byte_size} bytes)")
+            if self.buffer_full_policy == 'drop_oldest':
+                if not self._drop_oldest_pending_payload():
+                    self.dropped_payload_count += 1
+                    logger.debug("The %s dispatcher buffer is full, the submitted payload has been dropped",
+                                 self.aws_service_name)
+                    return False
+            elif not self._wait_for_buffer_space():
+                break
+        return True
+
+    def _wait_for_buffer_space(self) -> bool:
+        """
+        Wait (the lock must be held) for batches being sent by other threads to finish. Returns False, without waiting,
+        if no batches are being sent, as the buffer will not be emptied by waiting
+        """
+        if self._buffered_payload_count <= len(self._batch_payload):
+            return False
+        logger.debug("The %s dispatcher buffer is full, waiting for batches to be sent", self.aws_service_name)
+        self._buffer_condition.wait()
+        return True
+
+    def _drop_oldest_pending_payload(self) -> bool:
+        """ Drop the oldest payload waiting to be sent, returns False if there are none """
+        if not self._batch_payload:
+            return False
+        dropped = self._batch_payload.pop(0)
+        if self.write_ahead_log:
+            self.write_ahead_log.ack([dropped.record_id])
+        self.dropped_payload_count += 1
+        self._buffered_payload_count -= 1
+        self._buffered_byte_size -= dropped.byte_size
+        logger.debug("The %s dispatcher buffer is full, dropped the oldest payload", self.aws_service_name)
+        self._trace("Dropped payload: %s", dropped)
+        if self.batch_packing:
+            #  The byte size is of the whole payload list, which is split into batches as it is sent
+            self._batch_payload_byte_size -= dropped.byte_size
+            return True
+        #  Every batch in the payload list now starts one payload later, re-total the batch currently being filled
+        current_batch = self._batch_payload[len(self._batch_payload) - self._get_current_batch_payload_count():]
+        self._batch_payload_byte_size = sum(payload.byte_size for payload in current_batch)
+        if len(self._batch_payload) >= self.max_batch_size:
+            #  Payloads have moved between batches, which may take a batch over the batch byte limit
+            self._pending_payloads_dropped = True
+        return True
+
+    def _batch_finished(self, batch: list, failed_count: int = None):
+        """
+        Record a sent (or failed) batch in the statistics, acknowledge it in the write-ahead log, and release its buffer
+        space. failed_count of the batch's payloads were not accepted by the AWS service (all of them if None)
+        """
+        self._record_batch_sent(batch, len(batch) if failed_count is None else failed_count)
+        if self.write_ahead_log:
+            self.write_ahead_log.ack([payload.record_id for payload in batch if payload.record_id is not None])
+        self._release_buffer_space(batch)
+
+    def _record_batch_sent(self, batch: list, failed_count: int):
+        """
+        Record the payloads of a batch which the AWS service accepted in the statistics. Which payloads failed is not
+        known here, so the bytes of each are counted at the batch's mean payload byte size
+        """
+        sent_count = len(batch) - min(failed_count, len(batch))
+        if sent_count:
+            self._stats.record_batch(sent_count, self._get_batch_byte_size(batch) * sent_count // len(batch))
+
+    def _release_buffer_space(self, batch: list):
+        """ Remove a batch which has been sent (or has failed) from the buffer, waking any blocked submissions """
+        if not self._is_buffer_limited:
+            return
+        with self._lock:
+            self._buffered_payload_count -= len(batch)
+            self._buffered_byte_size -= self._get_batch_byte_size(batch)
+            self._buffer_condition.notify_all()
+
+    def _validate_payload_byte_size(self, payload, payload_byte_size: int = None):
         """ Validate that the payload is within the byte size limit for the AWS service """
-        payload_byte_size = get_byte_size_of_dict_or_list(payload)
+        if payload_byte_size is None:
+            payload_byte_size = get_byte_size_of_dict_or_list(payload)
         if payload_byte_size > self._aws_service_message_max_bytes:
             raise ValueError(f"Submitted payload ({payload_byte_size} bytes) exceeds the maximum payload size "
                              f"({self._aws_service_message_max_bytes} bytes) for {self.aws_service_name}")
 
-    def _prevent_batch_bytes_overload(self, payload: dict):
-        """ Check that adding appending the payload to the exiting batch does not overload the batch byte limit """
-        current_batch_payload_byte_size = get_byte_size_of_dict_or_list(self._batch_payload)
+    def _prevent_batch_bytes_overload(self, payload: dict, payload_byte_size: int = None):
+        """
+        Check that adding appending the payload to the exiting batch does not overload the batch byte limit. With
+        batch_packing the payload list is only split into batches as it is sent, so there is nothing to check
+        """
+        if self.batch_packing:
+            return
+        if self._get_current_batch_payload_count() >= self.max_batch_size:
+            #  The payload will begin a new batch (payloads are held for several batches when max_concurrency is set)
+            self._batch_payload_byte_size = 0
+            return
+        current_batch_payload_byte_size = self._get_batch_payload_byte_size()
         current_batch_payload_byte_size += self._batch_payload_wrapper_byte_size
-        payload_byte_size = get_byte_size_of_dict_or_list(payload)
+        if payload_byte_size is None:
+            payload_byte_size = get_byte_size_of_dict_or_list(payload)
         if (current_batch_payload_byte_size + payload_byte_size) > self._aws_service_batch_max_bytes:
-            logger.debug(f"Adding payload ({payload_byte_size} bytes) to the existing batch "
-                         f"({current_batch_payload_byte_size} bytes) would exceed the batch limit for "
-                         f"{self.aws_service_name}, calling flush_payloads")
-            self.flush_payloads()
+            logger.debug("Adding payload (%d bytes) to the existing batch (%d bytes) would exceed the batch limit for "
+                         "%s, calling flush_payloads", payload_byte_size, current_batch_payload_byte_size,
+                         self.aws_service_name)
+            self._handle_full_batch()
+
+    def _get_batch_payload_byte_size(self) -> int:
+        """
+        Return the byte size of the current batch as it would be JSON encoded, without encoding it. The running total
+        holds the payloads themselves, the list brackets and `, ` separators between payloads are added here
+        """
+        payload_count = self._get_current_batch_payload_count()
+        return self._batch_payload_byte_size + 2 + 2 * max(payload_count - 1, 0)
+
+    def _get_current_batch_payload_count(self) -> int:
+        """ Return the number of payloads in the batch currently being filled, the last batch in the payload list """
+        payload_count = len(self._batch_payload or [])
+        return payload_count - (max(payload_count - 1, 0) // self.max_batch_size) * self.max_batch_size
 
     def _append_payload_to_current_batch(self, payload):
         """ Append the payload to the service specific batch structure """
@@ -89,37 +550,385 @@ class BaseDispatcher:
 
     def _flush_payload_selector(self):
         """ Decide whether or not to flush the payload (usually used following a payload submission) """
-        logger.debug(f"Payload list now contains '{len(self._batch_payload)}' payloads, "
-                     f"max batch size is '{self.max_batch_size}'")
-        if len(self._batch_payload) >= self.max_batch_size:
-            logger.debug("Max batch size has been reached, flushing the payload list contents")
-            self.flush_payloads()
-        else:
-            logger.debug(f"Max batch size of {self.max_batch_size} for {self.aws_service_name} "
-                         "has not yet been reached, continuing")
+        if self.deadline and self._has_deadline_become_near():
+            logger.debug("The deadline is near, flushing the %d entries of the payload list", len(self._batch_payload))
+            self._handle_full_batch(keep_partial_batch=False)
+            return
+        if self.batch_packing:
+            if self._is_packing_full():
+                logger.debug("Payload list of %d entries (%d bytes) fills a batch per thread, flushing full batches",
+                             len(self._batch_payload), self._batch_payload_byte_size)
+                self._handle_full_batch()
+            return
+        #  When batches may be sent concurrently, wait until there are enough payloads to fill each thread
+        if len(self._batch_payload) >= self.max_batch_size * (self.max_concurrency or 1):
+            logger.debug("Max batch size has been reached with %d payloads, flushing the payload list contents",
+                         len(self._batch_payload))
+            self._handle_full_batch()
+
+    def _is_packing_full(self) -> bool:
+        """
+        Decide whether the payload list, with batch_packing, holds enough payloads or bytes to fill a batch for each
+        thread and one more. Packing more than will be sent leaves payloads to fill the gaps in the batches which are
+        """
+        packed_batches = self._get_batches_held()
+        if len(self._batch_payload) >= self.max_batch_size * packed_batches:
+            return True
+        #  Each payload is followed by a separator, except the last in each batch
+        payload_list_bytes = self._batch_payload_byte_size + 2 * len(self._batch_payload)
+        return payload_list_bytes >= (self._get_max_batch_payload_bytes() + 2) * packed_batches
+
+    def _has_deadline_become_near(self) -> bool:
+        """
+        Decide whether the deadline has become near since the last payload was submitted. The pending payloads are
+        flushed once when it does, later payloads fill batches as usual and the rest are sent by flush_payloads
+        """
+        deadline_was_near, self._deadline_near = self._deadline_near, self._is_deadline_near()
+        return self._deadline_near and not deadline_was_near
+
+    def _is_deadline_near(self) -> bool:
+        """ Decide whether the deadline is near enough for the pending payloads to be sent without waiting """
+        pending_batches = -(-len(self._batch_payload) // self.max_batch_size)
+        return self.deadline.is_near(pending_batches, self._stats.get_request_latency(90))
+
+    def _is_past_deadline(self) -> bool:
+        return self.deadline is not None and self.deadline.expired
+
+    def _get_send_concurrency(self, batch_count: int) -> int:
+        """
+        Return the number of batches to send at the same time, raised as the deadline (if there is one) nears. Batches
+        of a dispatcher which sends payloads in order are always sent one at a time
+        """
+        if self._preserve_payload_order:
+            return 1
+        concurrency = self.max_concurrency or 1
+        if self.deadline and batch_count > 1:
+            concurrency = self.deadline.get_concurrency(batch_count, self._stats.get_request_latency(90), concurrency)
+        return min(concurrency, batch_count)
+
+    def _get_batches_held(self) -> int:
+        """ Return the number of batches the payload list may hold before it is flushed """
+        return (self.max_concurrency or 1) + (1 if self.batch_packing else 0)
 
     def flush_payloads(self) -> list:
-        """ Push all payloads in the payload list to the subject """
-        logger.debug(f"{self.aws_service_name} payload list has {len(self._batch_payload)} entries")
-        self._initialise_aws_client()
-        if self._batch_payload:
-            logger.debug(f"Preparing to send {len(self._batch_payload)} records to {self.aws_service_name}")
-            batch_list = list(chunks(self._batch_payload, self.max_batch_size))
-            logger.debug(f"Payload list split into {len(batch_list)} batches")
-            for batch in batch_list:
-                self._batch_send_payloads(batch)
-            self._batch_payload = []
-        else:
-            logger.info(f"No payloads to flush to {self.aws_service_name}")
+        """ Push all payloads in the payload list (and any spilled to the write-ahead log) to the subject """
+        self._send_pending_payloads()
+        self._export_stats()
+        return self._get_flush_result()
+
+    def _get_flush_result(self) -> list:
+        """ Return the failures for flush_payloads to return, which are then acknowledged in the write-ahead log """
+        if not self.retain_unprocessed_items:
+            return list(self.drain_unprocessed_items())
+        if self.write_ahead_log:
+            self._acknowledge_failures()
         return self.unprocessed_items
 
+    def drain_unprocessed_items(self):
+        """
+        Yield the items which could not be sent, oldest first, removing each from unprocessed_items as it is yielded.
+        Failures which occur while draining are yielded too
+        """
+        while True:
+            with self._lock:
+                items, self.unprocessed_items = self.unprocessed_items, []
+                record_ids, self._failure_record_ids = self._failure_record_ids, []
+            if not items:
+                return
+            #  The record ids belong to the last items, any before them have already been acknowledged
+            acknowledged_count = len(items) - len(record_ids)
+            drained_count = 0
+            try:
+                for item in items:
+                    drained_count += 1
+                    yield item
+            finally:
+                drained_record_count = max(drained_count - acknowledged_count, 0)
+                with self._lock:
+                    #  Put back anything left undrained (if the caller stopped early), ahead of any newer failures
+                    self.unprocessed_items[:0] = items[drained_count:]
+                    self._failure_record_ids[:0] = record_ids[drained_record_count:]
+                if self.write_ahead_log and drained_record_count:
+                    self.write_ahead_log.ack(record_ids[:drained_record_count])
+
+    def _send_pending_payloads(self, keep_partial_batch: bool = False):
+        """
+        Send all payloads in the payload list, reading back any spilled payloads as there is space for them. See
+        _take_pending_batches for keep_partial_batch
+        """
+        logger.debug("%s payload list has %d entries", self.aws_service_name, len(self._batch_payload))
+        with self._get_send_order_lock():
+            batch_list = self._take_batches_to_flush(keep_partial_batch)
+            if not batch_list:
+                logger.info(f"No payloads to flush to {self.aws_service_name}")
+            while batch_list:
+                self._send_batches(batch_list)
+                batch_list = self._take_batches_to_flush(keep_partial_batch) if self._spilled_ranges else []
+
+    def _get_send_order_lock(self):
+        """
+        Return the lock to hold while taking batches and sending them. A dispatcher which preserves payload order sends
+        while holding its lock, so that no thread (e.g. a submitting thread and the linger thread) can send a newer
+        batch while an older one is being sent
+        """
+        return self._lock if self._preserve_payload_order else nullcontext()
+
+    def _take_batches_to_flush(self, keep_partial_batch: bool = False) -> list:
+        """ Read back any spilled payloads which there is space for, then take all pending batches """
+        with self._lock:
+            self._initialise_aws_client()
+            #  Payloads read back are sent straight away if they fill a flush, so keep reading until some are left
+            while self._spilled_ranges and not self._batch_payload:
+                if not self._refill_from_spill() and not self._wait_for_buffer_space():
+                    break
+            return self._take_pending_batches(keep_partial_batch)
+
+    def _handle_full_batch(self, keep_partial_batch: bool = True):
+        """ Send the pending payloads, as no more can be added to the current batch """
+        self._send_pending_payloads(keep_partial_batch=keep_partial_batch)
+
+    def _take_pending_batches(self, keep_partial_batch: bool = False) -> list:
+        """
+        Remove all payloads from the payload list, returning them split into batches. With batch_packing and
+        keep_partial_batch, the last batch is left in the payload list, unless it is full, to be packed with the
+        payloads submitted after it
+        """
+        if not self._batch_payload:
+            return []
+        logger.debug("Preparing to send %d records to %s", len(self._batch_payload), self.aws_service_name)
+        if self.batch_packing:
+            return self._take_packed_batches(keep_partial_batch)
+        batch_list = list(chunks(self._batch_payload, self.max_batch_size))
+        if self._pending_payloads_dropped:
+            batch_list = [smaller_batch for batch in batch_list for smaller_batch in self._split_by_byte_limit(batch)]
+            self._pending_payloads_dropped = False
+        batch_size = self.effective_limits['batch_size']
+        if batch_size < self.max_batch_size:
+            #  Split the full size batches, so each smaller batch remains within the batch byte limit
+            batch_list = [smaller_batch for batch in batch_list for smaller_batch in chunks(batch, batch_size)]
+        logger.debug("Payload list split into %d batches", len(batch_list))
+        self._batch_payload = []
+        self._batch_payload_byte_size = 0
+        self._oldest_payload_time = None
+        return batch_list
+
+    def _take_packed_batches(self, keep_partial_batch: bool) -> list:
+        """ Remove the payloads from the payload list, packed into as few batches as the service's limits allow """
+        batch_size = self.effective_limits['batch_size']
+        pack = pack_in_order if self._preserve_payload_order else pack_unordered
+        batch_list = pack(self._batch_payload, batch_size, self._get_max_batch_payload_bytes())
+        remainder = []
+        if keep_partial_batch and len(batch_list) > 1 and len(batch_list[-1]) < batch_size:
+            remainder = batch_list.pop()
+        logger.debug("Payload list packed into %d batches, %d payloads are left for the next batch", len(batch_list),
+                     len(remainder))
+        self._batch_payload = remainder
+        self._batch_payload_byte_size = sum(payload.byte_size for payload in remainder)
+        self._pending_payloads_dropped = False
+        if not remainder:
+            self._oldest_payload_time = None
+        return batch_list
+
+    def _get_max_batch_payload_bytes(self) -> int:
+        """ Return the byte size which the payloads of a batch, and the separators between them, must be within """
+        return self._aws_service_batch_max_bytes - self._batch_payload_wrapper_byte_size - 2
+
+    def _split_by_byte_limit(self, batch: list) -> list:
+        """ Split a batch, keeping its order, into as few batches as possible which are within the batch byte limit """
+        return pack_in_order(batch, len(batch), self._get_max_batch_payload_bytes())
+
+    def close(self) -> list:
+        """ Stop the background linger thread (if it is running) and push all remaining payloads to the subject """
+        self._stop_linger_thread()
+        unprocessed_items = self.flush_payloads()
+        if self.write_ahead_log:
+            self.write_ahead_log.close()
+        return unprocessed_items
+
+    def _start_linger_clock(self):
+        """ Record when the oldest payload in the payload list was added, starting the linger thread if required """
+        if self._oldest_payload_time is None:
+            self._oldest_payload_time = monotonic()
+            self._linger_condition.notify()
+        if not self._linger_thread:
+            self._linger_stopped = False
+            self._linger_thread = threading.Thread(target=self._linger, name=f"{self}-linger", daemon=True)
+            self._linger_thread.start()
+            logger.debug(f"Linger thread started for {self.aws_service_name}, linger is {self.linger_ms}ms")
+
+    def _stop_linger_thread(self):
+        """ Stop the background linger thread and wait for it to finish sending any batches it has taken """
+        with self._lock:
+            linger_thread, self._linger_thread = self._linger_thread, None
+            self._linger_stopped = True
+            self._linger_condition.notify_all()
+        if linger_thread:
+            linger_thread.join()
+            logger.debug(f"Linger thread stopped for {self.aws_service_name}")
+
+    def _linger(self):
+        """ Background thread, send the pending payloads each time the oldest has waited for linger_ms """
+        while True:
+            with self._lock:
+                batch_list = self._wait_for_lingering_payloads()
+                if batch_list is None:
+                    return
+                self._initialise_aws_client()
+                if self._preserve_payload_order:
+                    #  Sent while holding the lock, so a submitting thread cannot send a newer batch at the same time
+                    self._send_lingering_batches(batch_list)
+                    continue
+            self._send_lingering_batches(batch_list)
+
+    def _send_lingering_batches(self, batch_list: list):
+        """ Send the batches taken by the linger thread, logging (rather than raising) any exception """
+        logger.debug("Linger of %dms reached, sending %d batches", self.linger_ms, len(batch_list))
+        try:
+            self._send_batches(batch_list)
+        except Exception as e:
+            logger.exception(f"Linger thread failed to send batches to {self.aws_service_name}: {e}")
+
+    def _wait_for_lingering_payloads(self):
+        """
+        Wait (the lock must be held) until the oldest pending payload has lingered for linger_ms, then take all pending
+        batches. Returns None if the linger thread has been stopped
+        """
+        while not self._linger_stopped:
+            if self._oldest_payload_time is None:
+                self._linger_condition.wait()
+                continue
+            remaining = self._oldest_payload_time + self.linger_ms / 1000 - monotonic()
+            if remaining <= 0:
+                return self._take_pending_batches()
+            self._linger_condition.wait(remaining)
+        return None
+
+    def _send_batches(self, batch_list: list):
+        """ Send each batch to the subject, several at a time if permitted by max_concurrency """
+        start = perf_counter()
+        try:
+            self._send_batches_in_order(batch_list)
+        finally:
+            self._stats.record_flush(perf_counter() - start)
+
+    def _send_batches_in_order(self, batch_list: list):
+        """
+        Send each batch, one at a time or, if permitted by max_concurrency (or required by the deadline), from a pool of
+        threads
+        """
+        max_workers = self._get_send_concurrency(len(batch_list))
+        if max_workers == 1:
+            for batch in self._rate_limited(batch_list):
+                failed_count = None
+                try:
+                    unprocessed_items, record_ids = self._send_batch_in_thread(batch)
+                    failed_count = len(unprocessed_items)
+                    self._deliver_failures(unprocessed_items, record_ids)
+                finally:
+                    self._batch_finished(batch, failed_count)
+            return
+        logger.debug("Sending %d batches to %s using %d threads", len(batch_list), self.aws_service_name, max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            #  Results are collected in the order the batches were submitted, so unprocessed items are deterministic.
+            #  Each batch is handed to a worker as soon as the rate limiter allows it, not once every batch is allowed
+            sent_count = 0
+            try:
+                for unprocessed_items, record_ids in executor.map(self._send_batch_in_thread,
+                                                                  self._rate_limited(batch_list)):
+                    self._deliver_failures(unprocessed_items, record_ids)
+                    #  Buffer space is released by this thread, as the workers must not wait for the lock it may hold
+                    self._batch_finished(batch_list[sent_count], len(unprocessed_items))
+                    sent_count += 1
+            finally:
+                for batch in batch_list[sent_count:]:
+                    self._batch_finished(batch)
+
+    def _rate_limited(self, batch_list: list):
+        """ Yield each batch once the rate limiter (if there is one) allows it to be sent """
+        for batch in batch_list:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(len(batch), self._get_batch_byte_size(batch))
+            yield batch
+
+    @staticmethod
+    def _get_batch_byte_size(batch: list) -> int:
+        """ Return the total byte size of the payloads in a batch, as already calculated on submission """
+        return sum(payload.byte_size if isinstance(payload, BatchRecord) else get_byte_size_of_dict_or_list(payload)
+                   for payload in batch)
+
+    def _send_batch_in_thread(self, batch: list) -> tuple:
+        """
+        Send a single batch from a worker thread, returning the items which could not be sent, and their write-ahead log
+        record ids, to be delivered by the calling thread
+        """
+        self._local.unprocessed_items = []
+        self._local.failure_record_ids = []
+        try:
+            self._batch_send_payloads(batch)
+            return self._local.unprocessed_items, self._local.failure_record_ids
+        finally:
+            self._local.unprocessed_items = None
+            self._local.failure_record_ids = None
+
+    def _add_unprocessed_items(self, items: list):
+        """ Record items which could not be sent to the subject """
+        self._stats.record_failures(len(items))
+        record_ids = []
+        if self.write_ahead_log and not self.failure_callback:
+            #  A failure handed straight to the callback is never held, so it does not need to be logged
+            record_ids = [self.write_ahead_log.append(item, FAILED_RECORD) for item in items]
+        thread_unprocessed_items = getattr(self._local, 'unprocessed_items', None)
+        if thread_unprocessed_items is not None:
+            thread_unprocessed_items.extend(items)
+            self._local.failure_record_ids.extend(record_ids)
+        else:
+            self._deliver_failures(items, record_ids)
+
+    def _deliver_failures(self, items: list, record_ids: list):
+        """ Pass failed items to the failure_callback, or hold them in unprocessed_items """
+        if not items:
+            return
+        if self.failure_callback:
+            self.failure_callback(items)
+            if record_ids:
+                self.write_ahead_log.ack(record_ids)
+            return
+        with self._lock:
+            self.unprocessed_items.extend(items)
+            self._failure_record_ids.extend(record_ids)
+
+    def _get_aws_service_args(self) -> dict:
+        """
+        Return the arguments for the boto3 client/resource, with a connection pool sized for max_concurrency (or the
+        deadline's max_concurrency, if that is larger)
+        """
+        aws_service_args = dict(self.aws_service_args)
+        max_concurrency = max(self.max_concurrency or 0, self.deadline.max_concurrency if self.deadline else 0)
+        if max_concurrency:
+            from botocore.config import Config
+            config = aws_service_args.get('config') or Config()
+            if config.max_pool_connections < max_concurrency:
+                aws_service_args['config'] = config.merge(Config(max_pool_connections=max_concurrency))
+        return aws_service_args
+
+    def _create_aws_service(self):
+        """
+        Return the boto3 client (shared with every dispatcher created with the same arguments) or resource for the AWS
+        service. boto3 resources are not thread safe, so each dispatcher creates its own
+        """
+        boto3_module = boto3 or import_module('boto3')
+        interface_type = _boto3_interface_type_mapper[self.aws_service_name]
+        factory = getattr(boto3_module, interface_type)
+        if interface_type == 'resource':
+            return factory(self.aws_service_name, **self._get_aws_service_args())
+        return get_aws_service(factory, self.aws_service_name, **self._get_aws_service_args())
+
     def _initialise_aws_client(self):
         """
         Initialise client/resource for the AWS service
         """
         if not self._aws_service:
-            self._aws_service = getattr(boto3, _boto3_interface_type_mapper[self.aws_service_name])(
-                self.aws_service_name, **self.aws_service_args)
+            self._aws_service = self._create_aws_service()
             self._batch_dispatch_method = getattr(self._aws_service, str(self.batch_dispatch_method))
             if self.individual_dispatch_method:
                 self._individual_dispatch_method = getattr(self._aws_service, self.individual_dispatch_method)
@@ -127,25 +936,114 @@ class BaseDispatcher:
                 self._individual_dispatch_method = None
             logger.debug("AWS/Boto3 Client is now initialised")
 
-    def _batch_send_payloads(self, batch: (list, dict), retry: int = 4):
+    def _call_with_retries(self, method, *args, **kwargs):
+        """
+        Call a dispatch method, retrying any ClientError for as long as the retry policy allows. The error from the
+        final attempt is raised if the call does not succeed
+        """
+        start = monotonic()
+        attempt = 1
+        while True:
+            self._wait_to_call(method)
+            request_start = perf_counter()
+            try:
+                response = method(*args, **kwargs)
+                self._stats.record_request(perf_counter() - request_start)
+                if self.circuit_breaker:
+                    self._record_call_response(response)
+                return response
+            except ClientError as e:
+                self._stats.record_request(perf_counter() - request_start)
+                throttled = self._record_call_error(e)
+                delay = self._get_retry_delay(e, attempt, monotonic() - start)
+                if delay is None:
+                    raise
+                self._stats.record_retry(throttled)
+                logger.warning(f"{self.aws_service_name} call has caused an error on attempt {attempt}, retrying "
+                               f"in {delay:.3f}s: {str(e)}")
+                sleep(delay)
+                attempt += 1
+
+    def _wait_to_call(self, method):
+        """
+        Wait for the adaptive controller's delay between requests, or raise a CircuitOpenError if the circuit breaker
+        does not allow a call to be made
+        """
+        if self.circuit_breaker and not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(getattr(method, '__name__', self.aws_service_name))
+        if self.adaptive_controller and self.adaptive_controller.send_delay:
+            sleep(self.adaptive_controller.send_delay)
+
+    def _record_call_response(self, response):
+        """ Record a call which returned a response with the circuit breaker, as a failure if nothing was sent """
+        if self._is_response_failed(response):
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    def _is_response_failed(self, response) -> bool:
+        """ Decide whether a response shows that none of the payloads of the call were accepted """
+        return False
+
+    def _record_call_error(self, error: ClientError) -> bool:
+        """ Record a failed call in the adaptive controller and circuit breaker, returning whether it was throttled """
+        throttled = self.retry_policy.is_throttling(error)
+        if self.adaptive_controller and throttled:
+            self.adaptive_controller.record_throttle()
+        if self.circuit_breaker:
+            #  An error which is not retried (e.g. a validation error) shows the service is up, the payload is at fault
+            if self.retry_policy.is_retryable(error):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+        return throttled
+
+    def _get_retry_delay(self, error: ClientError, attempt: int, elapsed: float):
+        """ Return the delay before the next attempt, from the retry policy, or None if it should not be retried """
+        if self.circuit_breaker and self.circuit_breaker.state == OPEN:
+            logger.debug("Not retrying, the circuit breaker is open")
+            return None
+        delay = self.retry_policy.get_retry_delay(error, attempt, elapsed)
+        if delay is not None and self.deadline and delay >= self.deadline.remaining():
+            logger.debug("Not retrying, the deadline would be passed")
+            return None
+        return delay
+
+    def _batch_send_payloads(self, batch: (list, dict)):
         """ Attempt to send a single batch of payloads to the subject """
-        logger.debug(f"Sending batch type {type(batch)} payloads to {self.aws_service_name}")
+        if self._is_past_deadline():
+            logger.warning(f"The deadline has passed, the {self.aws_service_name} batch has not been sent")
+            self._unpack_failed_batch_to_unprocessed_items(batch)
+            return
+        logger.debug("Sending batch type %s payloads to %s", type(batch), self.aws_service_name)
         try:
             if isinstance(batch, dict):
-                response = self._batch_dispatch_method(**batch)
-                self._process_batch_send_response(response)
+                response = self._call_with_retries(self._batch_dispatch_method, **batch)
             else:
-                response = self._batch_dispatch_method(batch)
-                self._process_batch_send_response(response)
-            logger.debug(f"Batch send response: {response}")
+                response = self._call_with_retries(self._batch_dispatch_method, batch)
         except ClientError as e:
-            if retry > 0:
-                logger.warning(f"{self.aws_service_name} batch send has caused an error, "
-                               f"retrying send ({retry} retries remaining): {str(e)}")
-                logger.debug(f"Failed batch: (type: {type(batch)}) {batch}")
-                self._batch_send_payloads(batch, retry=retry-1)
+            logger.error(f"{self.aws_service_name} batch send has failed, no more retries remaining: {str(e)}")
+            self._trace("Failed batch: (type: %s) %s", type(batch), batch)
+            self._unpack_failed_batch_to_unprocessed_items(batch)
+            return
+        self._trace("Batch send response: %s", response)
+        self._record_batch_response_throttling(response)
+        self._process_batch_send_response(response)
+
+    def _record_batch_response_throttling(self, response):
+        """ Record whether the AWS service throttled some of the batch, in the stats and the adaptive controller """
+        throttled = self._is_batch_response_throttled(response)
+        if throttled:
+            self._stats.record_throttled_response()
+        if self.adaptive_controller:
+            if throttled:
+                self.adaptive_controller.record_throttle()
             else:
-                self._unpack_failed_batch_to_unprocessed_items(batch)
+                self.adaptive_controller.record_success()
+
+    def _is_batch_response_throttled(self, response) -> bool:
+        """ Decide whether the response to a batch request shows that the AWS service throttled some of the batch """
+        return False
 
     def _process_batch_send_response(self, response):
         """ Process the response data from a batch put request """
@@ -155,23 +1053,24 @@ class BaseDispatcher:
         """ Process a failed batch and unpack the items into the unprocessed items list """
         pass
 
-    def _send_individual_payload(self, payload: (dict, str), retry: int = 4):
+    def _send_individual_payload(self, payload: (dict, str)):
         """ Send an individual payload to the subject """
-        logger.debug(f"Attempting to send individual payload ({retry} retries left): {payload}")
+        if self._is_past_deadline():
+            logger.warning("The deadline has passed, the individual payload has not been sent")
+            self._add_unprocessed_items([self._unpack_individual_failed_payload(payload)])
+            return
+        self._trace("Attempting to send individual payload: %s", payload)
+        self._stats.record_individual_send()
         try:
             if isinstance(payload, dict):
                 logger.debug("Submitting payload as keyword args")
-                self._individual_dispatch_method(**payload)
+                self._call_with_retries(self._individual_dispatch_method, **payload)
             else:
                 logger.debug("Submitting payload as arg")
-                self._individual_dispatch_method(payload)
+                self._call_with_retries(self._individual_dispatch_method, payload)
         except ClientError as e:
-            if retry:
-                logger.debug("Individual send attempt has failed, retrying")
-                self._send_individual_payload(payload, retry-1)
-            else:
-                logger.error(f"Individual send attempt has failed, no more retries remaining: {e}")
-                self.unprocessed_items.append(self._unpack_individual_failed_payload(payload))
+            logger.error(f"Individual send attempt has failed, no more retries remaining: {e}")
+            self._add_unprocessed_items([self._unpack_individual_failed_payload(payload)])
 
     def _unpack_individual_failed_payload(self, payload):
         """ Extract the record from a constructed payload """
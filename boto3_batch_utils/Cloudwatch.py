@@ -34,20 +34,37 @@ class CloudwatchBatchDispatcher(BaseDispatcher):
     def submit_metric(self, metric_name: str, value: int, timestamp: datetime = None,
                       dimensions: (dict, list) = None, unit: str = 'Count'):
         """ Submit a metric ready to be batched up and sent to Cloudwatch """
+        payload = self._construct_metric(metric_name, value, timestamp, dimensions, unit)
+        self._trace("Payload submitted to %s dispatcher: %s", self.aws_service_name, payload)
+        super().submit_payload(payload)
+
+    def submit_metrics(self, metrics):
+        """
+        Submit each metric from an iterable, as submit_metric would be called for each. The iterable is consumed
+        lazily, a batch at a time, so it may be a generator of any length
+        :param metrics: iterable - The metrics to be submitted, each a dict of submit_metric's arguments (metric_name,
+        value and optionally timestamp, dimensions and unit)
+        """
+        super().submit_payloads(self._construct_metric(**metric) for metric in metrics)
+
+    @staticmethod
+    def _construct_metric(metric_name: str, value: int, timestamp: datetime = None, dimensions: (dict, list) = None,
+                          unit: str = 'Count') -> dict:
+        """ Construct the metric datum for a metric """
         payload = {
                 'MetricName': metric_name,
                 'Timestamp': timestamp or datetime.now(),
                 'Value': value,
                 'Unit': unit
             }
-        logger.debug(f"Payload submitted to {self.aws_service_name} dispatcher: {payload}")
         if dimensions:
             payload['Dimensions'] = dimensions if isinstance(dimensions, list) else [dimensions]
-        super().submit_payload(payload)
+        return payload
 
-    def _batch_send_payloads(self, batch: dict = None, **kwargs):
+    def _batch_send_payloads(self, batch: list = None):
         """ Attempt to send a single batch of metrics to Cloudwatch """
-        if 'retry' in kwargs:
-            super()._batch_send_payloads(batch, kwargs['retry'])
-        else:
-            super()._batch_send_payloads({'Namespace': self.namespace, 'MetricData': batch})
+        super()._batch_send_payloads({'Namespace': self.namespace, 'MetricData': batch})
+
+    def _unpack_failed_batch_to_unprocessed_items(self, batch: dict):
+        """ Extract all metrics from the attempted batch payload """
+        self._add_unprocessed_items([self._unpack_individual_failed_payload(pl) for pl in batch['MetricData']])
@@ -1,8 +1,10 @@
 import logging
+from functools import partial
+
 from botocore.exceptions import ClientError
 
 from boto3_batch_utils.Base import BaseDispatcher
-from boto3_batch_utils.utils import convert_floats_in_dict_to_decimals
+from boto3_batch_utils.utils import convert_floats_in_dict_to_decimals, BatchRecord
 from boto3_batch_utils import constants
 
 
@@ -20,7 +22,6 @@ class DynamoBatchDispatcher(BaseDispatcher):
         self.partition_key = partition_key
         self.sort_key = sort_key
         self.partition_key_data_type = partition_key_data_type
-        self._dynamo_table = None
         super().__init__('dynamodb', batch_dispatch_method='batch_write_item', max_batch_size=max_batch_size, **kwargs)
         self._aws_service_batch_max_payloads = constants.DYNAMODB_BATCH_MAX_PAYLOADS
         self._aws_service_message_max_bytes = constants.DYNAMODB_MESSAGE_MAX_BYTES
@@ -36,18 +37,29 @@ class DynamoBatchDispatcher(BaseDispatcher):
         """
         Submit a record ready for batch sending to DynamoDB
         """
-        logger.debug(f"Payload submitted to {self.aws_service_name} dispatcher: {payload}")
+        self._trace("Payload submitted to %s dispatcher: %s", self.aws_service_name, payload)
+        with self._lock:
+            constructed_payload = self._construct_payload(payload, partition_key_location)
+            if constructed_payload is not None:
+                super().submit_payload(constructed_payload)
+
+    def _construct_payload(self, payload: dict, partition_key_location: str = None,
+                           encodings: dict = None) -> BatchRecord:
+        """
+        Construct a put request for a payload, or return None if a payload with the same key is waiting to be sent.
+        Items are not JSON encoded, so there are no encodings to reuse
+        """
         if partition_key_location:
             payload[self.partition_key] = self.partition_key_data_type(payload[partition_key_location])
-        if self._check_payload_is_unique(payload):
-            super().submit_payload({
-                "PutRequest": {
-                    "Item": convert_floats_in_dict_to_decimals(payload)
-                }
-            })
-        else:
+        if not self._check_payload_is_unique(payload):
             logger.warning("The candidate payload has a primary_partition_key which already exists in the "
                            f"payload_list: {payload}")
+            return None
+        return BatchRecord({
+            "PutRequest": {
+                "Item": convert_floats_in_dict_to_decimals(payload)
+            }
+        })
 
     def _check_payload_is_unique(self, payload: dict) -> bool:
         """
@@ -92,21 +104,22 @@ class DynamoBatchDispatcher(BaseDispatcher):
 
     def _initialise_aws_client(self):
         """
-        Initialise client/resource for the AWS service
+        Initialise the resource for DynamoDB. Writes are made through the resource's client, which (unlike the resource
+        and its Tables) is thread safe, so batches may be sent from several threads. The resource converts the items to
+        and from DynamoDB's types for its client
         """
-        super()._initialise_aws_client()
-        if not self._dynamo_table:
-            self._dynamo_table = self._aws_service.Table(self.dynamo_table_name)
+        if not self._aws_service:
+            super()._initialise_aws_client()
+            client = self._aws_service.meta.client
+            self._batch_dispatch_method = client.batch_write_item
+            self._individual_dispatch_method = partial(client.put_item, TableName=self.dynamo_table_name)
             logger.debug(f"DynamoDB Table Client '{self.dynamo_table_name}' is now initialised")
 
-    def _batch_send_payloads(self, batch: dict = None, **kwargs):
+    def _batch_send_payloads(self, batch: list = None):
         """
         Submit the batch to DynamoDB
         """
-        if 'retry' in kwargs:
-            super()._batch_send_payloads(batch, kwargs['retry'])
-        else:
-            super()._batch_send_payloads({'RequestItems': {self.dynamo_table_name: batch}})
+        super()._batch_send_payloads({'RequestItems': {self.dynamo_table_name: batch}})
 
     def _process_batch_send_response(self, response: dict):
         """
@@ -123,24 +136,29 @@ class DynamoBatchDispatcher(BaseDispatcher):
                 else:
                     raise TypeError("Individual write type is not supported")
 
+    def _is_batch_response_throttled(self, response: dict) -> bool:
+        """ DynamoDB returns UnprocessedItems when a table's provisioned throughput is exceeded """
+        return bool(response.get('UnprocessedItems'))
+
     def _unpack_failed_batch_to_unprocessed_items(self, batch: dict):
         """ Extract all records from the attempted batch payload """
         extracted_payloads = [pl['PutRequest']['Item'] for pl in batch['RequestItems'][self.dynamo_table_name]]
-        self.unprocessed_items = self.unprocessed_items + extracted_payloads
+        self._add_unprocessed_items(extracted_payloads)
 
-    def _send_individual_payload(self, payload: dict, retry: int = 4):
+    def _send_individual_payload(self, payload: dict):
         """
         Write an individual record to Dynamo
         :param payload: JSON representation of a new record to write to the Dynamo table
         """
-        logger.debug(f"Attempting to send individual payload ({retry} retries left): {payload}")
+        if self._is_past_deadline():
+            logger.warning("The deadline has passed, the individual payload has not been sent")
+            self._add_unprocessed_items([payload])
+            return
+        self._trace("Attempting to send individual payload: %s", payload)
+        self._stats.record_individual_send()
         try:
-            self._dynamo_table.put_item(Item=payload)
+            self._call_with_retries(self._individual_dispatch_method, Item=payload)
         except ClientError as e:
-            if retry:
-                logger.debug(f"Individual send attempt has failed, retrying: {str(e)}")
-                self._send_individual_payload(payload, retry - 1)
-            else:
-                logger.error(f"Individual send attempt has failed, no more retries remaining: {str(e)}")
-                logger.debug(f"Failed payload: {payload}")
-                self.unprocessed_items.append(payload)
+            logger.error(f"Individual send attempt has failed, no more retries remaining: {str(e)}")
+            self._trace("Failed payload: %s", payload)
+            self._add_unprocessed_items([payload])
@@ -0,0 +1,131 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from copy import deepcopy
+from inspect import iscoroutinefunction
+
+from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+from boto3_batch_utils.SQS import SQSBaseBatchDispatcher
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+_fan_out_target_types = (SQSBaseBatchDispatcher, KinesisBatchDispatcher, DynamoBatchDispatcher)
+
+
+class FanOutDispatcher:
+    """
+    Submit each payload to several dispatchers, any mix of SQS (standard or FIFO), Kinesis and DynamoDB dispatchers,
+    e.g. to publish the same event to a queue, a stream and an audit table.
+
+    A payload is JSON encoded (and compressed) once for each json_codec and compression in use by the targets, rather
+    than once for each target, e.g. a queue and a stream with the same json_codec send the same JSON document.
+    DynamoDB items are not JSON encoded, they are built from the payload itself. The targets are flushed at the same
+    time, each from its own thread, and their unprocessed items are returned by target.
+    """
+
+    def __init__(self, targets: (dict, list)):
+        """
+        :param targets: dict or list - The dispatchers to submit each payload to, by name. The dispatchers of a list are
+        named by str(dispatcher), e.g. 'SQSBatchDispatcher::my_queue'
+        """
+        if isinstance(targets, dict):
+            self.targets = dict(targets)
+        else:
+            self.targets = {str(target): target for target in targets}
+            if len(self.targets) < len(targets):
+                raise ValueError("Requested targets must be different dispatchers, give them names with a dict")
+        self._validate_initialisation()
+
+    def __str__(self):
+        return f"FanOutDispatcher::{','.join(self.targets)}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if not self.targets:
+            raise ValueError("Requested targets must include at least one dispatcher")
+        for name, target in self.targets.items():
+            if not isinstance(target, _fan_out_target_types) or iscoroutinefunction(target.flush_payloads):
+                raise ValueError(f"Requested target '{name}' must be an SQS, Kinesis or DynamoDB dispatcher (not an "
+                                 f"asyncio dispatcher)")
+
+    @property
+    def unprocessed_items(self) -> dict:
+        """ The unprocessed items of each target, by name """
+        return {name: target.unprocessed_items for name, target in self.targets.items()}
+
+    def submit_payload(self, payload: dict, target_kwargs: dict = None):
+        """
+        Submit a payload to every target
+        :param payload: dict - The payload, it is encoded once for each format the targets send it in
+        :param target_kwargs: dict - Keyword arguments of each target's submit_payload, by target name, e.g.
+        {'queue': {'message_group_id': 'orders'}, 'audit': {'partition_key_location': 'order_id'}}
+        """
+        target_kwargs = target_kwargs or {}
+        encodings = {}
+        #  The locks are taken in the same order by every fan-out dispatcher, so those sharing targets cannot deadlock
+        targets = sorted(self.targets.items(), key=lambda item: id(item[1]))
+        with ExitStack() as stack:
+            target_locks = {}
+            for name, target in targets:
+                target_locks[name] = stack.enter_context(ExitStack())
+                target_locks[name].enter_context(target._lock)
+            #  Every record is constructed and validated before any is submitted, so that a payload which is invalid
+            #  for one target (e.g. too large) is submitted to none of them
+            records = {
+                name: target._construct_shared_payload(self._get_target_payload(target, payload), encodings,
+                                                       **target_kwargs.get(name, {}))
+                for name, target in targets
+            }
+            for name, target in targets:
+                if records[name] is not None:
+                    target._submit_record(records[name])
+                #  Released once submitted, so a target sending a full batch only holds up the targets after it
+                target_locks[name].close()
+
+    @staticmethod
+    def _get_target_payload(target, payload: dict) -> dict:
+        """
+        Return the payload for a target. DynamoDB dispatchers change the payload they are given (e.g. converting floats
+        to Decimals), so they are given a copy, leaving the payload the other targets encode as it was submitted
+        """
+        return deepcopy(payload) if isinstance(target, DynamoBatchDispatcher) else payload
+
+    def submit_payloads(self, payloads, target_kwargs: dict = None):
+        """
+        Submit each payload from an iterable, exactly as submit_payload would be called for each, with the same
+        target_kwargs. The iterable is consumed lazily, so it may be a generator of any length
+        """
+        for payload in payloads:
+            self.submit_payload(payload, target_kwargs)
+
+    def flush_payloads(self) -> dict:
+        """ Push all payloads of every target to its subject, the targets at the same time """
+        return self._call_targets('flush_payloads')
+
+    def close(self) -> dict:
+        """ Close every target (see BaseDispatcher.close), the targets at the same time """
+        return self._call_targets('close')
+
+    def _call_targets(self, method: str) -> dict:
+        """
+        Call a method of every target, each from its own thread, returning the result of each by target name. If any
+        target raises an exception, the first is raised once every target has finished
+        """
+        logger.debug("Calling %s of %d targets of %s", method, len(self.targets), self)
+        with ThreadPoolExecutor(max_workers=len(self.targets)) as executor:
+            futures = {name: executor.submit(getattr(target, method)) for name, target in self.targets.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def stats(self) -> dict:
+        """ Return the statistics (see BaseDispatcher.stats) of each target, by name """
+        return {name: target.stats() for name, target in self.targets.items()}
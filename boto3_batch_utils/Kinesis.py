@@ -1,10 +1,14 @@
 import logging
-from json import dumps, loads
 from copy import deepcopy
+from time import monotonic, sleep
 from uuid import uuid4
 
+from botocore.exceptions import ClientError
+
 from boto3_batch_utils.Base import BaseDispatcher
-from boto3_batch_utils.utils import DecimalEncoder
+from boto3_batch_utils.codec import JSONCodec, get_json_codec
+from boto3_batch_utils.compression import Compressor, get_compressor, encode_payload
+from boto3_batch_utils.utils import BatchRecord, get_source_of_record
 from boto3_batch_utils import constants
 
 
@@ -17,12 +21,20 @@ class KinesisBatchDispatcher(BaseDispatcher):
     """
 
     def __init__(self, stream_name: str, partition_key_identifier: str = None, max_batch_size: int = 250,
-                 **kwargs: dict):
+                 json_codec: (str, JSONCodec) = None, compression: (str, Compressor) = None, **kwargs: dict):
+        """
+        :param json_codec: str or JSONCodec - Codec used to encode each record's data as JSON, 'json' (the standard
+        library, the default) or 'orjson' (see boto3_batch_utils.codec)
+        :param compression: str or Compressor - Compress each record's data, 'gzip', 'zlib' or 'zstd' (see
+        boto3_batch_utils.compression). Consumers decode compressed records with decode_payload
+        """
         self.stream_name = stream_name
         self.partition_key_identifier = partition_key_identifier
-        self.batch_in_progress = []
+        self.json_codec = get_json_codec(json_codec)
+        self.compressor = get_compressor(compression)
         super().__init__('kinesis', batch_dispatch_method='put_records', individual_dispatch_method='put_record',
                          max_batch_size=max_batch_size, **kwargs)
+        self.batch_in_progress = []
         self._aws_service_batch_max_payloads = constants.KINESIS_BATCH_MAX_PAYLOADS
         self._aws_service_message_max_bytes = constants.KINESIS_MESSAGE_MAX_BYTES
         self._aws_service_batch_max_bytes = constants.KINESIS_BATCH_MAX_BYTES
@@ -33,31 +45,62 @@ class KinesisBatchDispatcher(BaseDispatcher):
     def __str__(self):
         return f"KinesisBatchDispatcher::{self.stream_name}"
 
+    @property
+    def _preserve_payload_order(self) -> bool:
+        """ Records are in order by partition key, without a partition_key_identifier each has a random key """
+        return self.partition_key_identifier is not None
+
     def submit_payload(self, payload: dict):
         """ Submit a metric ready to be batched up and sent to Kinesis """
-        logger.debug(f"Payload submitted to {self.aws_service_name} dispatcher: {payload}")
-        constructed_payload = {
-            'Data': dumps(payload, cls=DecimalEncoder),
+        self._trace("Payload submitted to %s dispatcher: %s", self.aws_service_name, payload)
+        super().submit_payload(self._construct_payload(payload))
+
+    def _construct_payload(self, payload: dict, encodings: dict = None) -> BatchRecord:
+        """ Construct a Kinesis record from a payload """
+        return BatchRecord({
+            'Data': self._encode_data(payload, encodings),
             'PartitionKey': f'{payload[self.partition_key_identifier] if self.partition_key_identifier else uuid4()}'
-        }
-        super().submit_payload(constructed_payload)
-
-    def _batch_send_payloads(self, batch: (list, dict) = None, **kwargs):
-        """ Attempt to send a single batch of metrics to Kinesis """
-        self.batch_in_progress = batch
-        if isinstance(batch, list):
-            batch = {'StreamName': self.stream_name, 'Records': batch}
-        if 'retry' in kwargs:
-            super()._batch_send_payloads(batch, kwargs['retry'])
-        else:
-            super()._batch_send_payloads(batch)
+        }, source=payload, encoded_key='Data')
+
+    def _encode_data(self, payload, encodings: dict = None) -> (str, bytes):
+        """
+        Encode a payload as JSON, compressed if compression is enabled, reusing any encoding in encodings (see
+        compression.encode_payload)
+        """
+        return encode_payload(payload, self.json_codec, self.compressor, encodings)
+
+    def _batch_send_payloads(self, batch: (list, dict) = None):
+        """
+        Attempt to send a single batch of records to Kinesis. Records which Kinesis rejects (e.g. when a shard's
+        throughput is exceeded) are sent again, with the retry policy's backoff, until its max_attempts have been made
+        """
+        records = batch['Records'] if isinstance(batch, dict) else batch
+        start = monotonic()
+        attempt = 1
+        while True:
+            self.batch_in_progress = records
+            self._local.failed_records = None
+            super()._batch_send_payloads({'StreamName': self.stream_name, 'Records': records})
+            records, error = self._local.failed_records or (None, None)
+            if not records:
+                return
+            delay = self._get_retry_delay(error, attempt, monotonic() - start)
+            if delay is None:
+                logger.error(f"{len(records)} records were rejected by Kinesis, no more retries remaining: {error}")
+                self._unpack_failed_batch_to_unprocessed_items({'Records': records})
+                return
+            self._stats.record_retry(self.retry_policy.is_throttling(error))
+            logger.warning(f"{len(records)} records were rejected by Kinesis on attempt {attempt}, retrying in "
+                           f"{delay:.3f}s: {error}")
+            sleep(delay)
+            attempt += 1
 
     def _process_batch_send_response(self, response: dict):
         """
         Method to send a set of messages on to the Kinesis stream
         :param response: Response from the AWS service
         """
-        logger.debug(f"Processing response: {response}")
+        self._trace("Processing response: %s", response)
         if "Records" in response:
             if response["FailedRecordCount"] == 0:
                 logger.info(f"{len(self.batch_in_progress)} records successfully batch "
@@ -68,11 +111,22 @@ class KinesisBatchDispatcher(BaseDispatcher):
                 logger.info(f"Failed payloads detected ({response['FailedRecordCount']}), processing errors...")
                 self._process_failed_payloads(response)
 
-    def _process_failed_payloads(self, response: dict, retry=3):
-        """ Process the contents of a Put Records response when it contains failed records """
+    def _is_batch_response_throttled(self, response: dict) -> bool:
+        """ Kinesis rejects records (counted in FailedRecordCount) when a shard's throughput is exceeded """
+        return response.get("FailedRecordCount", 0) > 0
+
+    def _is_response_failed(self, response: dict) -> bool:
+        """ A put_records response in which every record failed, counted as a failure by the circuit breaker """
+        return isinstance(response, dict) and 0 < len(response.get("Records", [])) == response.get("FailedRecordCount")
+
+    def _process_failed_payloads(self, response: dict):
+        """
+        Process the contents of a Put Records response when it contains failed records. Up to two failed records are
+        sent individually, more are left for _batch_send_payloads to send again as a batch
+        """
         failed_records = self._get_index_of_failed_record(response)
         if failed_records:
-            logger.debug(f"Failed Records: {response['FailedRecordCount']}")
+            logger.debug("Failed Records: %d", response['FailedRecordCount'])
             batch_of_problematic_records = []
             for r in failed_records:
                 batch_of_problematic_records.append(self.batch_in_progress[r])
@@ -80,9 +134,16 @@ class KinesisBatchDispatcher(BaseDispatcher):
                 for payload in batch_of_problematic_records:
                     self._send_individual_payload(deepcopy(payload))
             else:
-                self._batch_send_payloads(batch_of_problematic_records, retry=retry)
+                self._local.failed_records = (batch_of_problematic_records,
+                                              self._get_failed_record_error(response['Records'][failed_records[0]]))
         self.batch_in_progress = None
 
+    @staticmethod
+    def _get_failed_record_error(record_response: dict) -> ClientError:
+        """ Return the error of a failed record, as a ClientError for the retry policy to decide whether to retry """
+        return ClientError({'Error': {'Code': record_response.get('ErrorCode'),
+                                      'Message': record_response.get('ErrorMessage', '')}}, 'PutRecords')
+
     @staticmethod
     def _get_index_of_failed_record(response: dict) -> list:
         """ Parse the response object and identify which records failed and return an array of their index positions
@@ -90,7 +151,7 @@ class KinesisBatchDispatcher(BaseDispatcher):
         i = 0
         failed_records = []
         for r in response["Records"]:
-            logger.debug(f"Response: {r}")
+            logger.debug("Response: %s", r)
             if "ErrorCode" in r:
                 logger.warning(f"Payload failed to be sent to Kinesis. Message content: {r}")
                 failed_records.append(i)
@@ -100,14 +161,19 @@ class KinesisBatchDispatcher(BaseDispatcher):
     def _unpack_failed_batch_to_unprocessed_items(self, batch: dict):
         """ Extract all records from the attempted batch payload """
         extracted_payloads = [self._unpack_individual_failed_payload(pl) for pl in batch['Records']]
-        self.unprocessed_items = self.unprocessed_items + extracted_payloads
+        self._add_unprocessed_items(extracted_payloads)
 
-    def _send_individual_payload(self, payload: dict, retry: int = 4):
+    def _send_individual_payload(self, payload: dict):
         """ Send an individual payload to Kinesis """
         _payload = payload
         _payload['StreamName'] = self.stream_name
-        super()._send_individual_payload(_payload, retry)
+        super()._send_individual_payload(_payload)
 
     def _unpack_individual_failed_payload(self, payload):
         """ Extract the record from a constructed payload """
-        return loads(payload['Data'])
+        source = get_source_of_record(payload)
+        if source is not None:
+            return source
+        if self.compressor:
+            return self.json_codec.decode(self.compressor.decompress(payload['Data']))
+        return self.json_codec.decode(payload['Data'])
@@ -0,0 +1,223 @@
+import logging
+import multiprocessing
+import pickle
+from queue import Empty
+from zlib import crc32
+
+from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+from boto3_batch_utils.SQS import SQSFifoBatchDispatcher
+from boto3_batch_utils.stats import merge_stats
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+def _run_worker(dispatcher_class: type, args: tuple, kwargs: dict, tasks, results, index: int):
+    """
+    Run a dispatcher in a worker process. Each task is either a list of submissions, ('flush', None) or
+    ('close', None). The unprocessed items, stats and any exception raised by a submission are put on the results queue
+    after each flush or close
+    """
+    dispatcher = dispatcher_class(*args, **kwargs)
+    error = None
+    while True:
+        task, submissions = tasks.get()
+        if task == 'submit':
+            error = error or _submit_in_worker(dispatcher, submissions, index)
+            continue
+        flushed_items = dispatcher.close() if task == 'close' else dispatcher.flush_payloads()
+        if dispatcher.retain_unprocessed_items:
+            #  Each item is returned to the parent once, the parent keeps them all
+            flushed_items = list(dispatcher.drain_unprocessed_items())
+        results.put((index, flushed_items, dispatcher.stats(), error))
+        error = None
+        if task == 'close':
+            return
+
+
+def _submit_in_worker(dispatcher, submissions: list, index: int) -> Exception:
+    """ Make each submission to the worker's dispatcher, returning the first exception raised (if any) """
+    error = None
+    for method, submission_args, submission_kwargs in submissions:
+        try:
+            getattr(dispatcher, method)(*submission_args, **submission_kwargs)
+        except Exception as e:
+            logger.error(f"Worker {index} failed to submit a payload: {e}")
+            error = error or _get_picklable_exception(e)
+    return error
+
+
+def _get_picklable_exception(e: Exception) -> Exception:
+    """ Return the exception, or if it cannot be sent to the parent process, a RuntimeError describing it """
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+class MultiprocessDispatcher:
+    """
+    Distribute the submission of payloads across a pool of worker processes, each with its own dispatcher (and
+    boto3 client), so that the work of constructing, encoding and batching payloads is not limited to one core by the
+    GIL. Payloads with the same routing key (by default the message group of a FIFO queue, or the partition key of a
+    Kinesis stream or DynamoDB table) are always sent by the same worker, in the order they were submitted
+    """
+
+    def __init__(self, dispatcher_class: type, *args, processes: int = None, routing_key: callable = None,
+                 chunk_size: int = 100, max_queued_chunks: int = 16, start_method: str = None, **kwargs: dict):
+        """
+        :param dispatcher_class: type - The dispatcher each worker runs, e.g. KinesisBatchDispatcher
+        :param args: tuple - Arguments for the dispatcher, e.g. the stream name
+        :param processes: int - Number of worker processes (default is the number of CPUs)
+        :param routing_key: callable - Function of a submission's arguments and keyword arguments, returning the key on
+        which payloads are routed to workers. Default is the key which the dispatcher_class orders payloads by, or
+        None to spread payloads evenly
+        :param chunk_size: int - Number of payloads passed to a worker at a time
+        :param max_queued_chunks: int - Number of chunks which may wait for each worker, before a submission waits for
+        the worker to catch up
+        :param start_method: str - multiprocessing start method, e.g. 'spawn' (default is the platform's default). With
+        'spawn' or 'forkserver' the dispatcher_class and its arguments must be picklable
+        :param kwargs: dict - Keyword arguments for the dispatcher, e.g. max_batch_size or region_name
+        """
+        self.dispatcher_class = dispatcher_class
+        self.processes = processes or multiprocessing.cpu_count()
+        self.routing_key = routing_key or self._get_default_routing_key(dispatcher_class, args, kwargs)
+        self.chunk_size = chunk_size
+        self.unprocessed_items = []
+        self._validate_initialisation()
+        context = multiprocessing.get_context(start_method)
+        self._results = context.Queue()
+        self._tasks = [context.Queue(max_queued_chunks) for _ in range(self.processes)]
+        self._chunks = [[] for _ in range(self.processes)]
+        self._current_worker = 0
+        self._stats = [None] * self.processes
+        self._workers = [context.Process(target=_run_worker, daemon=True,
+                                         args=(dispatcher_class, args, kwargs, tasks, self._results, index))
+                         for index, tasks in enumerate(self._tasks)]
+        for worker in self._workers:
+            worker.start()
+        self._closed = False
+
+    def __str__(self):
+        return f"MultiprocessDispatcher::{self.dispatcher_class.__name__}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self.processes < 1:
+            raise ValueError(f"Requested processes '{self.processes}' must be at least 1")
+        if self.chunk_size < 1:
+            raise ValueError(f"Requested chunk_size '{self.chunk_size}' must be at least 1")
+
+    @staticmethod
+    def _get_default_routing_key(dispatcher_class: type, args: tuple, kwargs: dict):
+        """ Return a routing key function which keeps together the payloads the dispatcher_class sends in order """
+        if issubclass(dispatcher_class, SQSFifoBatchDispatcher):
+            return lambda payload_args, payload_kwargs: payload_kwargs.get('message_group_id', 'unset')
+        if issubclass(dispatcher_class, KinesisBatchDispatcher):
+            identifier = args[1] if len(args) > 1 else kwargs.get('partition_key_identifier')
+            if identifier:
+                return lambda payload_args, payload_kwargs: payload_args[0][identifier]
+        if issubclass(dispatcher_class, DynamoBatchDispatcher):
+            partition_key = args[1] if len(args) > 1 else kwargs['partition_key']
+            return lambda payload_args, payload_kwargs: \
+                payload_args[0][payload_kwargs.get('partition_key_location') or partition_key]
+        return None
+
+    def _get_worker_index(self, args: tuple, kwargs: dict) -> int:
+        """ Return the worker for a submission, by its routing key, or the worker whose chunk is being filled """
+        if self.routing_key:
+            return crc32(str(self.routing_key(args, kwargs)).encode('utf-8')) % self.processes
+        return self._current_worker
+
+    def _submit(self, method: str, args: tuple, kwargs: dict):
+        if self._closed:
+            raise RuntimeError(f"{self} has been closed")
+        index = self._get_worker_index(args, kwargs)
+        chunk = self._chunks[index]
+        chunk.append((method, args, kwargs))
+        if len(chunk) >= self.chunk_size:
+            self._send_chunk(index)
+            if not self.routing_key:
+                self._current_worker = (self._current_worker + 1) % self.processes
+
+    def _send_chunk(self, index: int):
+        if self._chunks[index]:
+            self._tasks[index].put(('submit', self._chunks[index]))
+            self._chunks[index] = []
+
+    def submit_payload(self, *args, **kwargs):
+        """ Submit a payload to a worker, with the arguments of the dispatcher_class's submit_payload """
+        self._submit('submit_payload', args, kwargs)
+
+    def submit_payloads(self, payloads, **kwargs: dict):
+        """ Submit each payload from an iterable, exactly as submit_payload would be called for each """
+        for payload in payloads:
+            self._submit('submit_payload', (payload,), kwargs)
+
+    def submit_metric(self, *args, **kwargs):
+        """ Submit a metric to a worker, when the dispatcher_class is the CloudwatchBatchDispatcher """
+        self._submit('submit_metric', args, kwargs)
+
+    def flush_payloads(self) -> list:
+        """
+        Have every worker push all its payloads to the subject, then return the unprocessed items of all of them. If a
+        submission raised an exception in a worker, the first such exception is raised once all workers have flushed
+        """
+        return self._send_to_workers('flush')
+
+    def close(self) -> list:
+        """ Push all remaining payloads to the subject and stop the worker processes """
+        if self._closed:
+            return self.unprocessed_items
+        unprocessed_items = self._send_to_workers('close')
+        self._closed = True
+        for worker in self._workers:
+            worker.join()
+        return unprocessed_items
+
+    def _send_to_workers(self, task: str) -> list:
+        for index in range(self.processes):
+            self._send_chunk(index)
+            self._tasks[index].put((task, None))
+        errors = []
+        reported = set()
+        for _ in range(self.processes):
+            index, unprocessed_items, stats, error = self._get_result(reported)
+            reported.add(index)
+            self.unprocessed_items.extend(unprocessed_items)
+            self._stats[index] = stats
+            if error:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+        return self.unprocessed_items
+
+    def _get_result(self, reported: set) -> tuple:
+        """
+        Wait for the next worker's result, failing if a worker has exited without sending one, or has failed. Workers
+        which have already reported (their index is in reported) may have exited normally, e.g. once closed
+        """
+        while True:
+            try:
+                return self._results.get(timeout=1)
+            except Empty:
+                for index, worker in enumerate(self._workers):
+                    if not worker.is_alive() and (index not in reported or worker.exitcode):
+                        raise RuntimeError(f"{self} worker {index} exited unexpectedly (exit code {worker.exitcode})")
+
+    def stats(self) -> dict:
+        """
+        Return the statistics (see BaseDispatcher.stats) of all the workers combined, as of each worker's most recent
+        flush
+        """
+        return merge_stats([stats for stats in self._stats if stats is not None])
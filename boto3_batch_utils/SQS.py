@@ -1,9 +1,11 @@
 import logging
+from base64 import b64encode
 from uuid import uuid4
-from json import dumps, loads
 
 from boto3_batch_utils.Base import BaseDispatcher
-from boto3_batch_utils.utils import DecimalEncoder
+from boto3_batch_utils.codec import JSONCodec, get_json_codec
+from boto3_batch_utils.compression import Compressor, get_compressor, decode_payload, encode_payload
+from boto3_batch_utils.utils import BatchRecord, get_source_of_record
 from boto3_batch_utils import constants
 
 logger = logging.getLogger('boto3-batch-utils')
@@ -11,13 +13,22 @@ logger = logging.getLogger('boto3-batch-utils')
 
 class SQSBaseBatchDispatcher(BaseDispatcher):
 
-    def __init__(self, queue_name, max_batch_size=10, **kwargs: dict):
+    def __init__(self, queue_name, max_batch_size=10, json_codec: (str, JSONCodec) = None,
+                 compression: (str, Compressor) = None, **kwargs: dict):
+        """
+        :param json_codec: str or JSONCodec - Codec used to encode each message body as JSON, 'json' (the standard
+        library, the default) or 'orjson' (see boto3_batch_utils.codec)
+        :param compression: str or Compressor - Compress each message body, 'gzip', 'zlib' or 'zstd' (see
+        boto3_batch_utils.compression). Compressed bodies are base64 encoded, consumers decode them with decode_payload
+        """
         self.queue_name = queue_name
         self.queue_url = None
-        self.batch_in_progress = None
         self.fifo_queue = False
+        self.json_codec = get_json_codec(json_codec)
+        self.compressor = get_compressor(compression)
         super().__init__('sqs', batch_dispatch_method='send_message_batch', individual_dispatch_method='send_message',
                          max_batch_size=max_batch_size, **kwargs)
+        self.batch_in_progress = None
         self._aws_service_batch_max_payloads = constants.SQS_MAX_BATCH_PAYLOADS
         self._aws_service_message_max_bytes = constants.SQS_MESSAGE_MAX_BYTES
         self._aws_service_batch_max_bytes = constants.SQS_BATCH_MAX_BYTES
@@ -25,23 +36,20 @@ class SQSBaseBatchDispatcher(BaseDispatcher):
         self._batch_payload = []
         self._validate_initialisation()
 
-    def _batch_send_payloads(self, batch: (dict, list) = None, **kwargs):
+    def _batch_send_payloads(self, batch: list = None):
         """ Attempt to send a single batch of records to SQS """
         if not self.queue_url:
             self.queue_url = self._aws_service.get_queue_url(QueueName=self.queue_name)['QueueUrl']
         self.batch_in_progress = batch
-        if 'retry' in kwargs:
-            super()._batch_send_payloads(batch, kwargs['retry'])
-        else:
-            super()._batch_send_payloads({'Entries': batch, 'QueueUrl': self.queue_url})
+        super()._batch_send_payloads({'Entries': batch, 'QueueUrl': self.queue_url})
 
     def _process_batch_send_response(self, response: dict):
         """ Process the response data from a batch put request """
-        logger.debug(f"Processing response: {response}")
+        self._trace("Processing response: %s", response)
         if "Failed" in response:
             logger.info(f"Failed payloads detected ({len(response['Failed'])}), processing errors...")
             for failed_payload_response in response['Failed']:
-                logger.debug(f"Message failed with following error: {failed_payload_response['Message']}")
+                logger.debug("Message failed with following error: %s", failed_payload_response['Message'])
                 if failed_payload_response['SenderFault']:
                     logger.warning(f"Message failed to send due to user error "
                                    f"({failed_payload_response['SenderFault']}): {failed_payload_response['Message']}")
@@ -53,11 +61,26 @@ class SQSBaseBatchDispatcher(BaseDispatcher):
     def _unpack_failed_batch_to_unprocessed_items(self, batch: dict):
         """ Extract all records from the attempted batch payload """
         extracted_payloads = [self._unpack_individual_failed_payload(pl) for pl in batch['Entries']]
-        self.unprocessed_items = self.unprocessed_items + extracted_payloads
-
-    def _unpack_individual_failed_payload(self, payload: dict, retry: int = 4):
-        """ Send an individual payload to Kinesis """
-        return loads(payload['MessageBody'])
+        self._add_unprocessed_items(extracted_payloads)
+
+    def _unpack_individual_failed_payload(self, payload: dict):
+        """ Extract the record from a constructed payload """
+        source = get_source_of_record(payload)
+        if source is not None:
+            return source
+        if self.compressor:
+            return decode_payload(payload['MessageBody'], self.json_codec)
+        return self.json_codec.decode(payload['MessageBody'])
+
+    def _encode_message_body(self, payload, encodings: dict = None) -> str:
+        """
+        Encode a payload as JSON, compressed and base64 encoded if compression is enabled, reusing any encoding in
+        encodings (see compression.encode_payload)
+        """
+        body = encode_payload(payload, self.json_codec, self.compressor, encodings)
+        if self.compressor:
+            return b64encode(body).decode('ascii')
+        return body
 
 
 class SQSBatchDispatcher(SQSBaseBatchDispatcher):
@@ -74,29 +97,38 @@ class SQSBatchDispatcher(SQSBaseBatchDispatcher):
 
     def submit_payload(self, payload: dict, message_id: str = None, delay_seconds: int = None):
         """ Submit a record ready to be batched up and sent to SQS """
-        logger.debug(f"Payload submitted to SQS dispatcher: {payload}")
-        message_id = message_id or uuid4().hex
-        if not any(d["Id"] == message_id for d in self._batch_payload):
-            constructed_payload = {
-                'Id': message_id,
-                'MessageBody': dumps(payload, cls=DecimalEncoder)
-                }
-            if isinstance(delay_seconds, int):
-                constructed_payload['DelaySeconds'] = delay_seconds
-            logger.debug(f"SQS payload constructed: {constructed_payload}")
-            super().submit_payload(constructed_payload)
-        else:
+        self._trace("Payload submitted to SQS dispatcher: %s", payload)
+        with self._lock:
+            constructed_payload = self._construct_payload(payload, message_id, delay_seconds)
+            if constructed_payload is not None:
+                self._trace("SQS payload constructed: %s", constructed_payload)
+                super().submit_payload(constructed_payload)
+
+    def _construct_payload(self, payload: dict, message_id: str = None, delay_seconds: int = None,
+                           encodings: dict = None) -> BatchRecord:
+        """ Construct an SQS message, or return None if a message with the same message_id is waiting to be sent """
+        #  A generated message_id is unique, only a given message_id needs to be checked against the batch
+        if message_id and any(d["Id"] == message_id for d in self._batch_payload):
             logger.warning(f"Message with message_id ({message_id}) already exists in the batch, skipping...")
+            return None
+        constructed_payload = BatchRecord({
+            'Id': message_id or uuid4().hex,
+            'MessageBody': self._encode_message_body(payload, encodings)
+            }, source=payload, encoded_key='MessageBody')
+        if isinstance(delay_seconds, int):
+            constructed_payload['DelaySeconds'] = delay_seconds
+        return constructed_payload
 
-    def _send_individual_payload(self, payload: dict, retry: int = 4):
+    def _send_individual_payload(self, payload: dict):
         """ Send an individual record to SQS """
         kwargs = {'QueueUrl': self.queue_url, 'MessageBody': payload['MessageBody']}
         if payload.get('DelaySeconds'):
             kwargs['DelaySeconds'] = payload['DelaySeconds']
-        super()._send_individual_payload(kwargs, retry)
+        super()._send_individual_payload(BatchRecord(kwargs, source=get_source_of_record(payload)))
 
 
 class SQSFifoBatchDispatcher(SQSBaseBatchDispatcher):
+    _preserve_payload_order = True
 
     def __init__(self, queue_name, max_batch_size=10, **kwargs):
         super().__init__(queue_name, max_batch_size, **kwargs)
@@ -108,28 +140,41 @@ class SQSFifoBatchDispatcher(SQSBaseBatchDispatcher):
     def submit_payload(self, payload: dict, message_id: str = None, message_group_id: str = 'unset',
                        message_deduplication_id: str = None):
         """ Submit a record ready to be batched up and sent to SQS """
-        logger.debug(f"Payload submitted to SQS FIFO dispatcher: {payload}")
-        constructed_payload = {
-            'Id': message_id or uuid4().hex,
-            'MessageBody': dumps(payload, cls=DecimalEncoder),
-            'MessageGroupId': message_group_id
-        }
-        message_is_duplicate = any(
+        self._trace("Payload submitted to SQS FIFO dispatcher: %s", payload)
+        with self._lock:
+            constructed_payload = self._construct_payload(payload, message_id, message_group_id,
+                                                          message_deduplication_id)
+            if constructed_payload is not None:
+                self._trace("SQS FIFO payload constructed: %s", constructed_payload)
+                super().submit_payload(constructed_payload)
+
+    def _construct_payload(self, payload: dict, message_id: str = None, message_group_id: str = 'unset',
+                           message_deduplication_id: str = None, encodings: dict = None) -> BatchRecord:
+        """
+        Construct an SQS FIFO message, or return None if a message with the same message_id or deduplication id is
+        waiting to be sent
+        """
+        #  Without a message_id or message_deduplication_id there is nothing a message waiting to be sent could match
+        message_is_duplicate = (message_id or message_deduplication_id) and any(
             d.get('MessageDeduplicationId', "not_used") == message_deduplication_id or d["Id"] == message_id
             for d in self._batch_payload
         )
         if message_is_duplicate:
             logger.warning(f"Message with message_id ({message_id}) already exists in the batch, skipping...")
-            return
+            return None
+        constructed_payload = BatchRecord({
+            'Id': message_id or uuid4().hex,
+            'MessageBody': self._encode_message_body(payload, encodings),
+            'MessageGroupId': message_group_id
+        }, source=payload, encoded_key='MessageBody')
         if message_deduplication_id:
             constructed_payload['MessageDeduplicationId'] = message_deduplication_id
-        logger.debug(f"SQS FIFO payload constructed: {constructed_payload}")
-        super().submit_payload(constructed_payload)
+        return constructed_payload
 
-    def _send_individual_payload(self, payload: dict, retry: int = 4):
-        """ Send an individual record to SQS """
+    def _send_individual_payload(self, payload: dict):
+        """ Send an individual record to SQS, send_message does not accept the batch entry's Id """
         kwargs = {
             'QueueUrl': self.queue_url,
-            **payload
+            **{k: v for k, v in payload.items() if k != 'Id'}
         }
-        super()._send_individual_payload(kwargs, retry)
+        super()._send_individual_payload(BatchRecord(kwargs, source=get_source_of_record(payload)))
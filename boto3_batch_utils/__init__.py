@@ -1,15 +1,68 @@
-from boto3_batch_utils.Cloudwatch import CloudwatchBatchDispatcher, cloudwatch_dimension
-from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
-from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
-from boto3_batch_utils.SQS import SQSBatchDispatcher, SQSFifoBatchDispatcher
+from importlib import import_module
+
+#  Each public attribute is imported from its module the first time it is used, rather than when the package is
+#  imported, so that only the dispatchers which are used add to the import time (e.g. of a Lambda cold start)
+_lazy_attributes = {
+    'AdaptiveController': 'boto3_batch_utils.adaptive',
+    'AsyncCloudwatchBatchDispatcher': 'boto3_batch_utils.Async',
+    'AsyncDynamoBatchDispatcher': 'boto3_batch_utils.Async',
+    'AsyncKinesisBatchDispatcher': 'boto3_batch_utils.Async',
+    'AsyncSQSBatchDispatcher': 'boto3_batch_utils.Async',
+    'AsyncSQSFifoBatchDispatcher': 'boto3_batch_utils.Async',
+    'BufferFullError': 'boto3_batch_utils.Base',
+    'CircuitBreaker': 'boto3_batch_utils.circuit_breaker',
+    'clear_aws_service_cache': 'boto3_batch_utils.client_cache',
+    'CloudwatchBatchDispatcher': 'boto3_batch_utils.Cloudwatch',
+    'cloudwatch_dimension': 'boto3_batch_utils.Cloudwatch',
+    'Deadline': 'boto3_batch_utils.deadline',
+    'decode_payload': 'boto3_batch_utils.compression',
+    'DynamoBatchDispatcher': 'boto3_batch_utils.Dynamodb',
+    'FanOutDispatcher': 'boto3_batch_utils.FanOut',
+    'KinesisBatchDispatcher': 'boto3_batch_utils.Kinesis',
+    'MultiprocessDispatcher': 'boto3_batch_utils.Multiprocess',
+    'RateLimiter': 'boto3_batch_utils.rate_limiter',
+    'RetryPolicy': 'boto3_batch_utils.retry',
+    'SQSBatchDispatcher': 'boto3_batch_utils.SQS',
+    'SQSFifoBatchDispatcher': 'boto3_batch_utils.SQS',
+    'WriteAheadLog': 'boto3_batch_utils.wal'
+}
 
 __all__ = [
+    'AdaptiveController',
+    'AsyncCloudwatchBatchDispatcher',
+    'AsyncDynamoBatchDispatcher',
+    'AsyncKinesisBatchDispatcher',
+    'AsyncSQSBatchDispatcher',
+    'AsyncSQSFifoBatchDispatcher',
+    'BufferFullError',
+    'CircuitBreaker',
+    'clear_aws_service_cache',
     'CloudwatchBatchDispatcher',
     'cloudwatch_dimension',
+    'Deadline',
+    'decode_payload',
     'DynamoBatchDispatcher',
+    'FanOutDispatcher',
     'KinesisBatchDispatcher',
+    'MultiprocessDispatcher',
+    'RateLimiter',
+    'RetryPolicy',
     'SQSBatchDispatcher',
-    'SQSFifoBatchDispatcher'
+    'SQSFifoBatchDispatcher',
+    'WriteAheadLog'
 ]
 
 __version__ = '5.1.0'
+
+
+def __getattr__(name: str):
+    """ Import a public attribute from its module on first use """
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(import_module(_lazy_attributes[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,89 @@
+import logging
+import threading
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+class AdaptiveController:
+    """
+    Adapt the batch size and send rate of a dispatcher to throttling feedback from the AWS service, using additive
+    increase / multiplicative decrease (AIMD).
+
+    Each time the target throttles (a throttling error, Kinesis `FailedRecordCount` or DynamoDB `UnprocessedItems`) the
+    batch size is multiplied by decrease_factor and the delay between requests is doubled (starting at
+    base_send_delay). Each request which succeeds without throttling grows the batch size by increase_step and reduces
+    the delay by base_send_delay, until the dispatcher is back to full size and full speed.
+
+    A controller holds the state of a single dispatcher, it should not be shared.
+    """
+
+    def __init__(self, min_batch_size: int = 1, decrease_factor: float = 0.5, increase_step: int = 1,
+                 base_send_delay: float = 0.05, max_send_delay: float = 5.0):
+        """
+        :param min_batch_size: int - The batch size will not be reduced below this size
+        :param decrease_factor: float - Multiplier applied to the batch size each time the target throttles
+        :param increase_step: int - Number of payloads added to the batch size each time a request succeeds
+        :param base_send_delay: float - Delay (in seconds) between requests after the target first throttles, and the
+        amount by which the delay is reduced each time a request succeeds
+        :param max_send_delay: float - Maximum delay (in seconds) between requests
+        """
+        self.min_batch_size = min_batch_size
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.base_send_delay = base_send_delay
+        self.max_send_delay = max_send_delay
+        self.max_batch_size = None
+        self.batch_size = None
+        self._send_delay_steps = 0
+        self.throttle_count = 0
+        self._lock = threading.Lock()
+        self._validate_initialisation()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self.min_batch_size < 1:
+            raise ValueError(f"Requested min_batch_size '{self.min_batch_size}' must be at least 1")
+        if not 0 < self.decrease_factor < 1:
+            raise ValueError(f"Requested decrease_factor '{self.decrease_factor}' must be between 0 and 1")
+        if self.increase_step < 1:
+            raise ValueError(f"Requested increase_step '{self.increase_step}' must be at least 1")
+        if self.base_send_delay <= 0 or self.max_send_delay < self.base_send_delay:
+            raise ValueError(f"Requested base_send_delay '{self.base_send_delay}' must be greater than 0 and no "
+                             f"more than max_send_delay '{self.max_send_delay}'")
+
+    @property
+    def send_delay(self) -> float:
+        """ The current delay (in seconds) between requests """
+        #  The delay is held as a whole number of base_send_delay steps, so that it returns exactly to 0
+        return self._send_delay_steps * self.base_send_delay
+
+    def reset(self, max_batch_size: int):
+        """ Return to full size and full speed, for a dispatcher with the given maximum batch size """
+        with self._lock:
+            self.max_batch_size = max_batch_size
+            self.batch_size = max_batch_size
+            self._send_delay_steps = 0
+
+    def record_throttle(self):
+        """ The target has throttled a request: reduce the batch size and slow down """
+        with self._lock:
+            self.throttle_count += 1
+            min_batch_size = min(self.min_batch_size, self.max_batch_size)
+            self.batch_size = max(min_batch_size, int(self.batch_size * self.decrease_factor))
+            self._send_delay_steps = min(int(self.max_send_delay / self.base_send_delay),
+                                         max(1, self._send_delay_steps * 2))
+            logger.info(f"Throttling detected, batch size reduced to {self.batch_size} and delay between requests "
+                        f"increased to {self.send_delay:.3f}s")
+
+    def record_success(self):
+        """ A request has succeeded without being throttled: grow the batch size and speed up """
+        with self._lock:
+            if self.batch_size == self.max_batch_size and not self._send_delay_steps:
+                return
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.increase_step)
+            self._send_delay_steps = max(0, self._send_delay_steps - 1)
+            logger.debug(f"Request succeeded, batch size increased to {self.batch_size} and delay between requests "
+                         f"reduced to {self.send_delay:.3f}s")
@@ -0,0 +1,125 @@
+import logging
+import threading
+from time import monotonic
+from botocore.exceptions import ClientError
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ClientError):
+    """
+    Raised in place of a call to the AWS service while the circuit breaker is open. It is a ClientError, so the
+    payloads of the call are handled exactly as those of any other failed call
+    """
+
+    def __init__(self, operation_name: str):
+        super().__init__({'Error': {'Code': 'CircuitOpen', 'Message': "The circuit breaker is open"}}, operation_name)
+
+
+class CircuitBreaker:
+    """
+    Stop calling an AWS service which is failing, so that the payloads of each call fail at once rather than after
+    every retry (and every individual send) has failed too.
+
+    The breaker is closed while calls succeed. It opens after failure_threshold consecutive failed calls, counting only
+    errors which the dispatcher's retry policy would retry (e.g. server errors and throttling, but not validation
+    errors). While open no calls are made, the payloads go straight to the dispatcher's unprocessed items (or
+    failure_callback, or write-ahead log). After reset_timeout a single trial call is allowed (half open), if it
+    succeeds the breaker closes, if it fails the breaker opens again for another reset_timeout.
+
+    A CircuitBreaker is thread safe. Pass the same instance to every dispatcher sending to a target to share its state.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, on_state_change: callable = None):
+        """
+        :param failure_threshold: int - Number of consecutive failed calls which open the breaker
+        :param reset_timeout: float - Time (in seconds) the breaker stays open before a trial call is allowed, and
+        before another trial is allowed if a trial has not finished
+        :param on_state_change: callable - Called with the previous and new state ('closed', 'open' or 'half_open')
+        each time the state changes, e.g. to publish it to a monitoring system (default None)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self._state = CLOSED
+        self._opened_at = None
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+        #  Re-entrant, so that on_state_change may read the breaker's state
+        self._lock = threading.RLock()
+        self._validate_initialisation()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self.failure_threshold < 1:
+            raise ValueError(f"Requested failure_threshold '{self.failure_threshold}' must be at least 1")
+        if self.reset_timeout <= 0:
+            raise ValueError(f"Requested reset_timeout '{self.reset_timeout}' must be greater than 0")
+
+    @property
+    def state(self) -> str:
+        """ The current state, 'closed', 'open' or 'half_open' """
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Decide whether a call may be made. Once the breaker has been open for reset_timeout the call is allowed as a
+        trial, and the breaker is half open until its result is recorded
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if monotonic() - self._opened_at >= self.reset_timeout:
+                #  Restart the timer, so another trial is allowed if this one never finishes
+                self._opened_at = monotonic()
+                if self._state == OPEN:
+                    self._set_state(HALF_OPEN)
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self):
+        """ A call has reached the AWS service: close the breaker """
+        with self._lock:
+            self.consecutive_failures = 0
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        """ A call has failed: open the breaker if this is the trial call, or failure_threshold calls have failed """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and
+                                            self.consecutive_failures >= self.failure_threshold):
+                self._opened_at = monotonic()
+                self.times_opened += 1
+                self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        """ Change the state (the lock must be held), notifying on_state_change """
+        previous_state, self._state = self._state, state
+        if state == OPEN:
+            logger.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive failures, no calls "
+                           f"will be made for {self.reset_timeout}s")
+        else:
+            logger.info(f"Circuit breaker is now {state}")
+        if self.on_state_change:
+            self.on_state_change(previous_state, state)
+
+    def to_dict(self) -> dict:
+        """ Return a snapshot of the breaker's state and counters, for monitoring """
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self.consecutive_failures,
+                'times_opened': self.times_opened,
+                'rejected_calls': self.rejected_calls
+            }
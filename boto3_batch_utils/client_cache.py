@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+_aws_service_cache = {}
+_aws_service_cache_lock = threading.Lock()
+
+
+def _get_hashable_arg(value):
+    """ Return a hashable representation of a boto3 client argument """
+    if hasattr(value, '_user_provided_options'):
+        #  botocore Config objects do not compare by value, use the options they were created with
+        return 'Config', repr(sorted(value._user_provided_options.items()))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def _get_cache_key(factory, aws_service_name: str, kwargs: dict) -> tuple:
+    """
+    Return the cache key for a client: the factory and service, then every argument it is created with
+    (e.g. region_name, endpoint_url, credentials and config)
+    """
+    return (factory, aws_service_name) + tuple(
+        (name, _get_hashable_arg(value)) for name, value in sorted(kwargs.items())
+    )
+
+
+def get_aws_service(factory, aws_service_name: str, **kwargs: dict):
+    """
+    Return a boto3 client for the AWS service, created by the factory (e.g. boto3.client) if one with the same
+    arguments has not already been created in this process. Clients are thread safe, boto3 resources are not, so
+    resources must not be cached
+    :param factory: callable - function used to create the client, e.g. boto3.client
+    :param aws_service_name: str - name of the AWS service, e.g. 'sqs'
+    :param kwargs: dict - keyword arguments for the factory, e.g. region_name or config (a botocore.config.Config)
+    """
+    key = _get_cache_key(factory, aws_service_name, kwargs)
+    with _aws_service_cache_lock:
+        if key not in _aws_service_cache:
+            logger.debug(f"Creating a new {aws_service_name} client")
+            _aws_service_cache[key] = factory(aws_service_name, **kwargs)
+        else:
+            logger.debug(f"Re-using the existing {aws_service_name} client")
+        return _aws_service_cache[key]
+
+
+def clear_aws_service_cache():
+    """ Remove all clients from the cache, new ones will be created when they are next required """
+    with _aws_service_cache_lock:
+        _aws_service_cache.clear()
+
+
+def _clear_aws_service_cache_after_fork():
+    """
+    A forked process (e.g. a MultiprocessDispatcher worker) starts with a copy of its parent's cache, whose clients
+    hold the parent's pooled connections. Give the child process its own clients, and a lock no parent thread holds
+    """
+    global _aws_service_cache_lock
+    _aws_service_cache_lock = threading.Lock()
+    _aws_service_cache.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_clear_aws_service_cache_after_fork)
@@ -0,0 +1,100 @@
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from importlib import import_module
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+def encode_default(o):
+    """
+    Convert the objects JSON has no representation for, the same way for every codec: Decimals to an int (if whole)
+    or a float, and dates and datetimes to ISO 8601 strings
+    """
+    if isinstance(o, Decimal):
+        if o % 1 > 0:
+            return float(o)
+        else:
+            return int(o)
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class JSONCodec:
+    """
+    Encodes the payloads sent by the SQS and Kinesis dispatchers as JSON, and decodes them again when they fail to be
+    sent
+    """
+    name = None
+
+    def encode(self, obj) -> str:
+        raise NotImplementedError
+
+    def decode(self, s: str):
+        raise NotImplementedError
+
+
+class StdlibJSONCodec(JSONCodec):
+    """ The standard library's json module, its output is exactly that of json.dumps """
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(default=encode_default)
+
+    def encode(self, obj) -> str:
+        return self._encoder.encode(obj)
+
+    def decode(self, s: str):
+        return json.loads(s)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    orjson (https://github.com/ijl/orjson), several times faster than the standard library. Its output decodes to the
+    same values as that of StdlibJSONCodec, but has no whitespace between items and does not escape non-ASCII
+    characters. NaN and infinite floats are encoded as null
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        orjson = import_module('orjson')
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+        #  Leave dates and datetimes to encode_default (orjson's format differs) and allow keys which are not strings
+        self._option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def encode(self, obj) -> str:
+        return self._dumps(obj, default=encode_default, option=self._option).decode('utf-8')
+
+    def decode(self, s: str):
+        return self._loads(s)
+
+
+JSON_CODECS = {
+    'json': StdlibJSONCodec,
+    'orjson': OrjsonCodec
+}
+_codecs = {}
+
+
+def get_json_codec(json_codec: (str, JSONCodec) = None) -> JSONCodec:
+    """
+    Return the codec with the given name ('json' or 'orjson'), the standard library's if None. If 'orjson' is requested
+    but it is not installed the standard library's codec is returned instead
+    :param json_codec: str or JSONCodec - The name of a codec, or a codec which is returned as it is
+    """
+    if isinstance(json_codec, JSONCodec):
+        return json_codec
+    name = json_codec or 'json'
+    if name not in JSON_CODECS:
+        raise ValueError(f"Requested json_codec '{name}' must be one of {', '.join(JSON_CODECS)}")
+    if name not in _codecs:
+        try:
+            _codecs[name] = JSON_CODECS[name]()
+        except ImportError:
+            logger.warning(f"The {name} package is not installed, the standard library json module is being used")
+            return get_json_codec('json')
+    return _codecs[name]
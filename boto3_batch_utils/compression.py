@@ -0,0 +1,172 @@
+import binascii
+import gzip
+import logging
+import threading
+import zlib
+from base64 import b64decode
+from io import BytesIO
+from importlib import import_module
+
+from boto3_batch_utils.codec import JSONCodec, get_json_codec
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+class Compressor:
+    """
+    Compresses the JSON encoded payloads sent by the SQS and Kinesis dispatchers. Each format starts with a distinct
+    magic number, so compressed payloads can be recognised by decompress (and decode_payload) without being told the
+    format
+    """
+    name = None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    @staticmethod
+    def is_compressed(data: bytes) -> bool:
+        raise NotImplementedError
+
+
+class GzipCompressor(Compressor):
+    """ gzip (RFC 1952), the modification time in the header is zero so equal payloads compress to equal bytes """
+    name = 'gzip'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        #  gzip.compress only accepts mtime from Python 3.8
+        buffer = BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=self.level, mtime=0) as gzip_file:
+            gzip_file.write(data)
+        return buffer.getvalue()
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+    @staticmethod
+    def is_compressed(data: bytes) -> bool:
+        return data[:2] == b'\x1f\x8b'
+
+
+class ZlibCompressor(Compressor):
+    """ zlib (RFC 1950), the smallest of the standard library formats """
+    name = 'zlib'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+    @staticmethod
+    def is_compressed(data: bytes) -> bool:
+        #  The header of a deflate stream with a 32K window, whose first two bytes are a multiple of 31
+        return len(data) > 1 and data[0] == 0x78 and (data[0] << 8 | data[1]) % 31 == 0
+
+
+class ZstdCompressor(Compressor):
+    """ Zstandard (https://facebook.github.io/zstd/), requires the zstandard package """
+    name = 'zstd'
+
+    def __init__(self, level: int = 3):
+        self._zstandard = import_module('zstandard')
+        self.level = level
+        #  zstandard's compressors must not be used by more than one thread at a time
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if not hasattr(self._local, 'compressor'):
+            self._local.compressor = self._zstandard.ZstdCompressor(level=self.level)
+        return self._local.compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        #  The frame's content size is always written by compress, but may be missing from other producers' frames
+        return self._zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    @staticmethod
+    def is_compressed(data: bytes) -> bool:
+        return data[:4] == b'\x28\xb5\x2f\xfd'
+
+
+COMPRESSORS = {
+    'gzip': GzipCompressor,
+    'zlib': ZlibCompressor,
+    'zstd': ZstdCompressor
+}
+_compressors = {}
+
+
+def get_compressor(compression: (str, Compressor) = None) -> Compressor:
+    """
+    Return the compressor for the given format ('gzip', 'zlib' or 'zstd'), or None (no compression) if None. If 'zstd'
+    is requested but the zstandard package is not installed, gzip is used instead. Dispatchers given the same format
+    share a compressor, so they can share the payloads it compresses (see encode_payload)
+    :param compression: str or Compressor - The name of a format, or a compressor which is returned as it is
+    """
+    if compression is None or isinstance(compression, Compressor):
+        return compression
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Requested compression '{compression}' must be one of {', '.join(COMPRESSORS)}")
+    if compression not in _compressors:
+        try:
+            _compressors[compression] = COMPRESSORS[compression]()
+        except ImportError:
+            logger.warning(f"The package required for {compression} compression is not installed, gzip is being used")
+            return get_compressor('gzip')
+    return _compressors[compression]
+
+
+def encode_payload(payload, json_codec: JSONCodec, compressor: Compressor = None,
+                   encodings: dict = None) -> (str, bytes):
+    """
+    Encode a payload as JSON, and compress it if a compressor is given
+    :param encodings: dict - The encodings already made of this payload, by codec and compressor (e.g. by the other
+    dispatchers of a FanOutDispatcher). An encoding made with the same codec and compressor is reused, and a new
+    encoding is added
+    :return: str or bytes - The JSON document, or the compressed document
+    """
+    key = (json_codec, compressor)
+    if encodings is not None and key in encodings:
+        return encodings[key]
+    if compressor:
+        encoded = compressor.compress(encode_payload(payload, json_codec, None, encodings).encode('utf-8'))
+    else:
+        encoded = json_codec.encode(payload)
+    if encodings is not None:
+        encodings[key] = encoded
+    return encoded
+
+
+def decompress(data: bytes) -> bytes:
+    """ Decompress data in any of the supported formats, data which is not compressed is returned unchanged """
+    for compressor_class in COMPRESSORS.values():
+        if compressor_class.is_compressed(data):
+            return compressor_class().decompress(data)
+    return data
+
+
+def decode_payload(data: (str, bytes), json_codec: (str, JSONCodec) = None):
+    """
+    Decode a payload sent by an SQS or Kinesis dispatcher, compressed or not, for consumers of the queue or stream. The
+    data may be an SQS message body, the Data of a Kinesis record (as returned by get_records) or the base64 encoded
+    data of a Kinesis record in a Lambda event. Payloads must be JSON objects or arrays
+    :param data: str or bytes - The message body or record data
+    :param json_codec: str or JSONCodec - Codec used to decode the JSON (see boto3_batch_utils.codec)
+    :return: The payload, as it was submitted to the dispatcher (Decimals, dates and datetimes as they were encoded)
+    """
+    if isinstance(data, str):
+        try:
+            #  Compressed message bodies and Lambda event data are base64, JSON objects and arrays never are
+            data = b64decode(data, validate=True)
+        except binascii.Error:
+            return get_json_codec(json_codec).decode(data)
+    return get_json_codec(json_codec).decode(decompress(data))
@@ -21,3 +21,38 @@ boto3_interface_type_mapper = {
     'sqs': 'client',
     'cloudwatch': 'client'
 }
+
+THROTTLING_ERROR_CODES = frozenset({
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'LimitExceededException',
+    'SlowDown',
+    'AWS.SimpleQueueService.RequestThrottled'
+})
+
+NON_RETRYABLE_ERROR_CODES = frozenset({
+    'ValidationError',
+    'ValidationException',
+    'SerializationException',
+    'InvalidArgumentException',
+    'InvalidParameterValue',
+    'InvalidParameterCombination',
+    'MissingParameter',
+    'ResourceNotFoundException',
+    'AWS.SimpleQueueService.NonExistentQueue',
+    'QueueDoesNotExist',
+    'AccessDenied',
+    'AccessDeniedException',
+    'KMSAccessDeniedException',
+    'UnrecognizedClientException',
+    'InvalidClientTokenId',
+    'ExpiredTokenException'
+})
+
+BUFFER_FULL_POLICIES = ('block', 'raise', 'drop_oldest', 'spill')
@@ -0,0 +1,102 @@
+from datetime import datetime
+from math import ceil
+from time import time
+
+#  The time (in seconds) a request is assumed to take, until the dispatcher has timed one
+DEFAULT_REQUEST_SECONDS = 0.1
+
+
+class Deadline:
+    """
+    The time by which a dispatcher must have finished sending, e.g. before an AWS Lambda function times out.
+
+    When the deadline becomes near the dispatcher sends the pending payloads, rather than waiting for a full batch, and
+    sends more batches at the same time (unless it sends payloads in order). Once less than margin_ms remains it makes
+    no further requests or retries, the payloads which have not been sent are returned as unprocessed items instead.
+
+    A deadline is either read from a Lambda context, whose get_remaining_time_in_millis is called each time, or is an
+    absolute time (a datetime or a time.time() timestamp).
+    """
+
+    def __init__(self, deadline, margin_ms: int = 1000, flush_ms: int = 2000, max_concurrency: int = 10):
+        """
+        :param deadline: object - A Lambda context, or a datetime or time.time() timestamp
+        :param margin_ms: int - Time (in milliseconds) left before the deadline at which sending stops, leaving time
+        for the unsent payloads to be handled
+        :param flush_ms: int - Time (in milliseconds) left before margin_ms at which the pending payloads are sent
+        without waiting for a full batch. They are sent sooner if the pending batches could take longer than this to
+        send
+        :param max_concurrency: int - Maximum number of batches sent at the same time as the deadline approaches.
+        Clients have a connection pool of 10 unless they are given a botocore Config with more max_pool_connections
+        """
+        self.deadline = deadline
+        self.margin_ms = margin_ms
+        self.flush_ms = flush_ms
+        self.max_concurrency = max_concurrency
+        self._context = None
+        self._timestamp = None
+        if hasattr(deadline, 'get_remaining_time_in_millis'):
+            self._context = deadline
+        elif isinstance(deadline, datetime):
+            self._timestamp = deadline.timestamp()
+        elif isinstance(deadline, (int, float)) and not isinstance(deadline, bool):
+            self._timestamp = deadline
+        self._validate_initialisation()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self._context is None and self._timestamp is None:
+            raise ValueError(f"Requested deadline '{self.deadline}' must be a Lambda context, a datetime or a "
+                             f"timestamp")
+        if self.margin_ms < 0 or self.flush_ms < 0:
+            raise ValueError(f"Requested margin_ms '{self.margin_ms}' and flush_ms '{self.flush_ms}' must not be "
+                             f"negative")
+        if self.max_concurrency < 1:
+            raise ValueError(f"Requested max_concurrency '{self.max_concurrency}' must be at least 1")
+
+    def remaining(self) -> float:
+        """ Return the time (in seconds) left until sending must stop, negative once it has passed """
+        if self._context is not None:
+            remaining = self._context.get_remaining_time_in_millis() / 1000
+        else:
+            remaining = self._timestamp - time()
+        return remaining - self.margin_ms / 1000
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def is_near(self, batch_count: int, request_seconds: float = None) -> bool:
+        """
+        Decide whether pending payloads should be sent now: less than flush_ms remains, or sending batch_count batches
+        (max_concurrency at a time, each taking request_seconds) could take half of the remaining time
+        """
+        remaining = self.remaining()
+        if remaining < self.flush_ms / 1000:
+            return True
+        send_seconds = ceil(batch_count / self.max_concurrency) * (request_seconds or DEFAULT_REQUEST_SECONDS)
+        return remaining < 2 * send_seconds
+
+    def get_concurrency(self, batch_count: int, request_seconds: float = None, concurrency: int = 1) -> int:
+        """
+        Return the number of batches to send at the same time so that batch_count batches, each taking request_seconds,
+        are sent within half of the remaining time. It is at least concurrency and at most max_concurrency (or
+        concurrency, if that is larger)
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            return max(concurrency, self.max_concurrency)
+        required = ceil(2 * batch_count * (request_seconds or DEFAULT_REQUEST_SECONDS) / remaining)
+        return max(concurrency, min(required, self.max_concurrency))
+
+
+def get_deadline(deadline=None) -> Deadline:
+    """
+    Return a Deadline for a Lambda context, datetime or timestamp, with the default margins. None (no deadline) and
+    Deadline instances are returned as they are
+    """
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
@@ -0,0 +1,117 @@
+import logging
+import threading
+from time import monotonic, sleep
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+class TokenBucket:
+    """
+    A bucket which fills with tokens at a fixed rate, up to its capacity. It is not thread safe on its own, the
+    RateLimiter holding it takes care of locking
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: float - Number of tokens added to the bucket each second
+        :param capacity: float - Maximum number of tokens the bucket can hold (default, one second of tokens)
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self._last_refill = monotonic()
+
+    def refill(self, now: float):
+        """ Add the tokens which have accumulated since the last refill """
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def get_wait_time(self, amount: float) -> float:
+        """
+        Return the time (in seconds) until the amount can be taken. An amount larger than the capacity can be taken as
+        soon as the bucket is full, leaving the bucket in debt
+        """
+        shortfall = min(amount, self.capacity) - self.tokens
+        return max(shortfall, 0) / self.rate
+
+    def take(self, amount: float):
+        """ Remove the amount from the bucket """
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Limit the rate at which records, and bytes, are sent to an AWS service, using a token bucket for each.
+
+    A RateLimiter is thread safe. Pass the same instance to every dispatcher sending to a target to give them a
+    shared limit.
+    """
+
+    def __init__(self, records_per_second: float = None, bytes_per_second: float = None, burst_seconds: float = 1.0):
+        """
+        :param records_per_second: float - Maximum average number of records sent per second (default None, no limit)
+        :param bytes_per_second: float - Maximum average number of payload bytes sent per second (default None, no
+        limit)
+        :param burst_seconds: float - Number of seconds of unused allowance which may be saved up and sent in a burst
+        """
+        self.records_per_second = records_per_second
+        self.bytes_per_second = bytes_per_second
+        self.burst_seconds = burst_seconds
+        self._validate_initialisation()
+        self._buckets = []
+        if records_per_second:
+            self._records_bucket = TokenBucket(records_per_second, records_per_second * burst_seconds)
+            self._buckets.append(self._records_bucket)
+        if bytes_per_second:
+            self._bytes_bucket = TokenBucket(bytes_per_second, bytes_per_second * burst_seconds)
+            self._buckets.append(self._bytes_bucket)
+        self._lock = threading.Lock()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if not self.records_per_second and not self.bytes_per_second:
+            raise ValueError("At least one of records_per_second and bytes_per_second must be given")
+        for name in ('records_per_second', 'bytes_per_second', 'burst_seconds'):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"Requested {name} '{value}' must be greater than 0")
+
+    def try_acquire(self, records: int, byte_size: int) -> float:
+        """
+        Take the allowance for sending the records if it is available now, and return 0. Otherwise take nothing and
+        return the time (in seconds) to wait before trying again
+        """
+        amounts = []
+        if self.records_per_second:
+            amounts.append((self._records_bucket, records))
+        if self.bytes_per_second:
+            amounts.append((self._bytes_bucket, byte_size))
+        with self._lock:
+            now = monotonic()
+            for bucket, _ in amounts:
+                bucket.refill(now)
+            wait_time = max(bucket.get_wait_time(amount) for bucket, amount in amounts)
+            if wait_time == 0:
+                for bucket, amount in amounts:
+                    bucket.take(amount)
+            return wait_time
+
+    def acquire(self, records: int, byte_size: int):
+        """ Block until the records can be sent """
+        wait_time = self.try_acquire(records, byte_size)
+        while wait_time:
+            logger.debug(f"Rate limit reached, waiting {wait_time:.3f}s to send {records} records ({byte_size} bytes)")
+            sleep(wait_time)
+            wait_time = self.try_acquire(records, byte_size)
+
+    async def acquire_async(self, records: int, byte_size: int):
+        """ Yield to the event loop until the records can be sent """
+        import asyncio
+        wait_time = self.try_acquire(records, byte_size)
+        while wait_time:
+            logger.debug(f"Rate limit reached, waiting {wait_time:.3f}s to send {records} records ({byte_size} bytes)")
+            await asyncio.sleep(wait_time)
+            wait_time = self.try_acquire(records, byte_size)
@@ -0,0 +1,93 @@
+import logging
+import random
+from botocore.exceptions import ClientError
+
+from boto3_batch_utils import constants
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+
+def get_error_code(error: ClientError) -> str:
+    """ Return the AWS error code of a ClientError, or an empty string if it does not have one """
+    return str(getattr(error, 'response', {}).get('Error', {}).get('Code', ''))
+
+
+class RetryPolicy:
+    """
+    Decide whether, and after how long, a failed call to an AWS service should be retried.
+
+    Delays use capped exponential backoff with full jitter: before retry n the dispatcher sleeps for a random time
+    between 0 and min(max_delay, base_delay * 2 ** (n - 1)) seconds. Errors with a non-retryable error code (e.g.
+    validation errors) are not retried at all, and no retry is made which would start after the deadline.
+
+    Subclass and override `get_retry_delay` to implement a different policy.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.05, max_delay: float = 2.0,
+                 deadline: float = None, retryable_error_codes: (set, frozenset) = None,
+                 non_retryable_error_codes: (set, frozenset) = constants.NON_RETRYABLE_ERROR_CODES):
+        """
+        :param max_attempts: int - Maximum number of attempts to make for each call, including the first
+        :param base_delay: float - Delay (in seconds) before the first retry, doubled for each subsequent retry
+        :param max_delay: float - Maximum delay (in seconds) before any retry
+        :param deadline: float - Maximum time (in seconds) from the first attempt after which no further retries will
+        be started (default None, no deadline)
+        :param retryable_error_codes: set - If given, only errors with one of these codes are retried
+        :param non_retryable_error_codes: set - Errors with one of these codes are never retried
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable_error_codes = retryable_error_codes
+        self.non_retryable_error_codes = non_retryable_error_codes or frozenset()
+        self._validate_initialisation()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self.max_attempts < 1:
+            raise ValueError(f"Requested max_attempts '{self.max_attempts}' must be at least 1")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError(f"Requested base_delay '{self.base_delay}' and max_delay '{self.max_delay}' must not be "
+                             f"negative")
+        if self.deadline is not None and self.deadline <= 0:
+            raise ValueError(f"Requested deadline '{self.deadline}' must be greater than 0")
+
+    def is_retryable(self, error: ClientError) -> bool:
+        """ Decide, from its error code, whether a failed call should be retried """
+        error_code = get_error_code(error)
+        if error_code in self.non_retryable_error_codes:
+            return False
+        return self.retryable_error_codes is None or error_code in self.retryable_error_codes
+
+    @staticmethod
+    def is_throttling(error: ClientError) -> bool:
+        """ Decide, from its error code, whether a call failed because the AWS service is throttling requests """
+        return get_error_code(error) in constants.THROTTLING_ERROR_CODES
+
+    def get_backoff(self, attempt: int) -> float:
+        """ Return the delay (in seconds) to wait after the given attempt (counted from 1) has failed """
+        #  Cap the exponent, the delay is capped anyway and a large power of 2 cannot be converted to a float
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** min(attempt - 1, 64)))
+
+    def get_retry_delay(self, error: ClientError, attempt: int, elapsed: float):
+        """
+        Return the delay (in seconds) before the next attempt, or None if the call should not be retried
+        :param error: ClientError - the error raised by the failed attempt
+        :param attempt: int - the number of attempts made so far, including the failed attempt
+        :param elapsed: float - time (in seconds) since the first attempt was started
+        """
+        if attempt >= self.max_attempts:
+            logger.debug(f"Not retrying, {attempt} attempts have been made")
+            return None
+        if not self.is_retryable(error):
+            logger.debug(f"Not retrying, error code '{get_error_code(error)}' is not retryable")
+            return None
+        delay = self.get_backoff(attempt)
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            logger.debug(f"Not retrying, the retry deadline of {self.deadline}s would be exceeded")
+            return None
+        return delay
@@ -0,0 +1,193 @@
+import threading
+from bisect import bisect_left
+
+
+#  Upper bounds (in seconds) of the latency histogram buckets, the last bucket holds anything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class LatencyHistogram:
+    """
+    A count of latencies by bucket, with their total, minimum and maximum. It is not thread safe on its own, the
+    DispatcherStats holding it takes care of locking
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        """
+        :param buckets: tuple - Upper bound (in seconds) of each bucket, in increasing order, ending with infinity
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'LatencyHistogram':
+        """ Recreate a histogram from its to_dict representation """
+        histogram = cls(tuple(bound for bound, _ in d['buckets']))
+        histogram.counts = [count for _, count in d['buckets']]
+        histogram.count = d['count']
+        histogram.total = d['sum']
+        histogram.min = d['min']
+        histogram.max = d['max']
+        return histogram
+
+    def merge(self, other: 'LatencyHistogram'):
+        """ Add the latencies recorded by another histogram, with the same buckets, to this one """
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        Return an upper bound of the given percentile (0-100), the bound of the bucket it falls in (or the maximum, if
+        that is lower). None if nothing has been recorded
+        """
+        if not self.count:
+            return None
+        rank = self.count * percentile / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.get_percentile(50),
+            'p90': self.get_percentile(90),
+            'p99': self.get_percentile(99),
+            'buckets': [(bound, count) for bound, count in zip(self.buckets, self.counts)]
+        }
+
+
+class DispatcherStats:
+    """
+    Cumulative counters and latency histograms for a dispatcher. Each method takes a lock, so they are only called once
+    per flush, request or batch. The count of submitted payloads is the exception, it is incremented directly by the
+    dispatcher while holding its own lock
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.payloads_submitted = 0
+        self.flushes = 0
+        self.batches_sent = 0
+        self.payloads_sent = 0
+        self.bytes_sent = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled_retries = 0
+        self.throttled_responses = 0
+        self.individual_sends = 0
+        self.failed_payloads = 0
+        self.request_latency = LatencyHistogram()
+        self.flush_latency = LatencyHistogram()
+
+    def record_flush(self, seconds: float):
+        """ Record the sending of a set of batches, taking the given time """
+        with self._lock:
+            self.flushes += 1
+            self.flush_latency.record(seconds)
+
+    def record_batch(self, payload_count: int, byte_size: int):
+        """ Record a batch of which payload_count payloads, of byte_size bytes, were accepted by the AWS service """
+        with self._lock:
+            self.batches_sent += 1
+            self.payloads_sent += payload_count
+            self.bytes_sent += byte_size
+
+    def record_request(self, seconds: float):
+        """ Record a single call to the AWS service, taking the given time """
+        with self._lock:
+            self.requests += 1
+            self.request_latency.record(seconds)
+
+    def get_request_latency(self, percentile: float) -> float:
+        """ Return an upper bound of the given percentile (0-100) of request latency, None if none has been recorded """
+        with self._lock:
+            return self.request_latency.get_percentile(percentile)
+
+    def record_retry(self, throttled: bool):
+        with self._lock:
+            self.retries += 1
+            self.throttled_retries += throttled
+
+    def record_throttled_response(self):
+        """ Record a batch response in which the AWS service throttled some of the batch """
+        with self._lock:
+            self.throttled_responses += 1
+
+    def record_individual_send(self):
+        with self._lock:
+            self.individual_sends += 1
+
+    def record_failures(self, count: int):
+        with self._lock:
+            self.failed_payloads += count
+
+    def to_dict(self, max_batch_size: int) -> dict:
+        """ Return a snapshot of the statistics, with ratios derived from the counters """
+        with self._lock:
+            return {
+                'payloads_submitted': self.payloads_submitted,
+                'flushes': self.flushes,
+                'batches_sent': self.batches_sent,
+                'payloads_sent': self.payloads_sent,
+                'bytes_sent': self.bytes_sent,
+                'requests': self.requests,
+                'batches_per_flush': self.batches_sent / self.flushes if self.flushes else None,
+                'batch_fill_ratio': (self.payloads_sent / (self.batches_sent * max_batch_size)
+                                     if self.batches_sent else None),
+                'retries': self.retries,
+                'throttled_retries': self.throttled_retries,
+                'throttled_responses': self.throttled_responses,
+                'individual_sends': self.individual_sends,
+                'failed_payloads': self.failed_payloads,
+                'request_latency': self.request_latency.to_dict(),
+                'flush_latency': self.flush_latency.to_dict()
+            }
+
+
+def merge_stats(snapshots: list) -> dict:
+    """
+    Combine the statistics of several dispatchers (each from stats()) into the statistics of them all, e.g. those of
+    the workers of a MultiprocessDispatcher. The dispatchers must have the same max_batch_size
+    """
+    merged = {}
+    for key in ('flushes', 'batches_sent', 'payloads_sent'):
+        merged[key] = sum(snapshot[key] for snapshot in snapshots)
+    for key, value in (snapshots[0].items() if snapshots else ()):
+        if isinstance(value, int) and key not in merged:
+            merged[key] = sum(snapshot[key] for snapshot in snapshots)
+    merged['batches_per_flush'] = merged['batches_sent'] / merged['flushes'] if merged.get('flushes') else None
+    merged['batch_fill_ratio'] = (sum(snapshot['batch_fill_ratio'] * snapshot['batches_sent']
+                                      for snapshot in snapshots if snapshot['batches_sent']) / merged['batches_sent']
+                                  if merged.get('batches_sent') else None)
+    for key in ('request_latency', 'flush_latency'):
+        histogram = LatencyHistogram()
+        for snapshot in snapshots:
+            histogram.merge(LatencyHistogram.from_dict(snapshot[key]))
+        merged[key] = histogram.to_dict()
+    return merged
@@ -3,6 +3,8 @@ from json import JSONEncoder
 import logging
 import json
 from datetime import date, datetime
+from heapq import heappop, heappush
+from math import ceil
 
 
 logger = logging.getLogger('boto3-batch-utils')
@@ -19,9 +21,103 @@ def chunks(array, chunk_size):
         yield array[i:i + chunk_size]
 
 
+def pack_in_order(payloads: list, max_count: int, max_bytes: int) -> list:
+    """
+    Split payloads, keeping their order, into as few batches as possible of at most max_count payloads and max_bytes
+    (the byte sizes of the payloads, with 2 bytes for the `, ` separating each from the next)
+    :param payloads: list - BatchRecords (or any payloads with a byte_size)
+    :param max_count: int - Maximum number of payloads in a batch
+    :param max_bytes: int - Maximum byte size of a batch
+    :return: list - List of batches
+    """
+    batch_list = [[]]
+    byte_size = 0
+    for payload in payloads:
+        if batch_list[-1] and (len(batch_list[-1]) >= max_count or byte_size + 2 + payload.byte_size > max_bytes):
+            batch_list.append([])
+            byte_size = 0
+        byte_size += payload.byte_size + (2 if batch_list[-1] else 0)
+        batch_list[-1].append(payload)
+    return batch_list
+
+
+def pack_first_fit_decreasing(payloads: list, max_count: int, max_bytes: int) -> list:
+    """
+    Pack payloads, in any order, into few batches of at most max_count payloads and max_bytes (as for pack_in_order).
+    Each payload, largest first, goes into the first batch it fits in, so the smaller payloads fill the space the larger
+    ones leave. This makes the fewest batches when the byte limit, rather than the count limit, fills them
+    :param payloads: list - BatchRecords (or any payloads with a byte_size)
+    :param max_count: int - Maximum number of payloads in a batch
+    :param max_bytes: int - Maximum byte size of a batch
+    :return: list - List of batches, fullest first, each in the order its payloads were given
+    """
+    #  Each payload costs its size and a separator, and the first payload of a batch has no separator
+    capacity = max_bytes + 2
+    batch_list, batch_bytes = [], []
+    for index, payload in sorted(enumerate(payloads), key=lambda p: p[1].byte_size, reverse=True):
+        cost = payload.byte_size + 2
+        for i, batch in enumerate(batch_list):
+            if len(batch) < max_count and batch_bytes[i] + cost <= capacity:
+                batch.append((index, payload))
+                batch_bytes[i] += cost
+                break
+        else:
+            batch_list.append([(index, payload)])
+            batch_bytes.append(cost)
+    return _order_packed_batches(batch_list, batch_bytes)
+
+
+def pack_worst_fit_decreasing(payloads: list, max_count: int, max_bytes: int) -> list:
+    """
+    Pack payloads, in any order, into few batches of at most max_count payloads and max_bytes (as for pack_in_order).
+    As many batches as the limits require at least are filled at once, each payload, largest first, going into the
+    emptiest batch, so the large payloads are spread across the batches rather than filling the first few. This makes
+    the fewest batches when the count limit, rather than the byte limit, fills them
+    :param payloads: list - BatchRecords (or any payloads with a byte_size)
+    :param max_count: int - Maximum number of payloads in a batch
+    :param max_bytes: int - Maximum byte size of a batch
+    :return: list - List of batches, fullest first, each in the order its payloads were given
+    """
+    capacity = max_bytes + 2
+    total_cost = sum(payload.byte_size for payload in payloads) + 2 * len(payloads)
+    batch_count = max(ceil(len(payloads) / max_count), ceil(total_cost / capacity), 1)
+    batch_list, batch_bytes = [[] for _ in range(batch_count)], [0] * batch_count
+    #  The batches with space for another payload, emptiest first
+    open_batches = [(0, i) for i in range(batch_count)]
+    for index, payload in sorted(enumerate(payloads), key=lambda p: p[1].byte_size, reverse=True):
+        cost = payload.byte_size + 2
+        if open_batches and open_batches[0][0] + cost <= capacity:
+            i = heappop(open_batches)[1]
+        else:
+            i = len(batch_list)
+            batch_list.append([])
+            batch_bytes.append(0)
+        batch_list[i].append((index, payload))
+        batch_bytes[i] += cost
+        if len(batch_list[i]) < max_count:
+            heappush(open_batches, (batch_bytes[i], i))
+    return _order_packed_batches(batch_list, batch_bytes)
+
+
+def pack_unordered(payloads: list, max_count: int, max_bytes: int) -> list:
+    """
+    Pack payloads, in any order, into as few batches of at most max_count payloads and max_bytes (as for pack_in_order)
+    as either pack_first_fit_decreasing or pack_worst_fit_decreasing makes
+    """
+    first_fit = pack_first_fit_decreasing(payloads, max_count, max_bytes)
+    worst_fit = pack_worst_fit_decreasing(payloads, max_count, max_bytes)
+    return worst_fit if len(worst_fit) < len(first_fit) else first_fit
+
+
+def _order_packed_batches(batch_list: list, batch_bytes: list) -> list:
+    """ Return the non-empty packed batches, fullest first, each in the order its payloads were given """
+    batches = sorted(((byte_size, batch) for byte_size, batch in zip(batch_bytes, batch_list) if batch),
+                     key=lambda b: b[0], reverse=True)
+    return [[payload for _, payload in sorted(batch, key=lambda p: p[0])] for _, batch in batches]
+
+
 def convert_floats_in_list_to_decimals(array, level=0):
     for i in array:
-        logger.debug(f"Parsing list item for decimals (level: {level}): {i}")
         if isinstance(i, float):
             array[array.index(i)] = Decimal(str(i))
         elif isinstance(i, dict):
@@ -37,19 +133,15 @@ def convert_floats_in_dict_to_decimals(record, level=0):
     :param record:
     """
     new_record = {}
-    logger.debug(f"Processing dict (level: {level}): {record}")
     for k, v in record.items():
-        logger.debug(f"Parsing attribute '{k}' for decimals: {v} ({type(v)})")
         if isinstance(v, float):
             new_record[k] = Decimal(str(v))
         elif isinstance(v, dict):
             new_record[k] = convert_floats_in_dict_to_decimals(v, level=level+1)
-            logger.debug(f"New dict returned: {new_record[k]}")
         elif isinstance(v, list):
             new_record[k] = convert_floats_in_list_to_decimals(v, level=level+1)
         else:
             new_record[k] = v
-        logger.debug(f"New dict: {new_record}")
     return new_record
 
 
@@ -78,8 +170,71 @@ def get_byte_size_of_string(string: str) -> int:
     return len(string.encode('utf-8'))
 
 
+_byte_size_encoder = JSONEncoder(default=default)
+
+
 def get_byte_size_of_dict_or_list(d: dict) -> int:
     """
     Return the number of bytes of a string
     """
-    return get_byte_size_of_string(json.dumps(d, default=default))
+    return get_byte_size_of_string(_byte_size_encoder.encode(d))
+
+
+def get_byte_size_of_encoded_json_value(encoded_json: str) -> int:
+    """
+    Return the number of bytes a JSON document occupies when it is nested, as a string value, within another JSON
+    document. JSON encoded with `ensure_ascii` (the default) contains no control or non-ASCII characters, so only quotes
+    and backslashes are escaped and the size can be counted without encoding the document again
+    """
+    if not encoded_json.isascii():
+        return get_byte_size_of_string(json.dumps(encoded_json))
+    return len(encoded_json) + encoded_json.count('"') + encoded_json.count('\\') + 2
+
+
+def get_byte_size_of_dict_with_encoded_json(d: dict, key: str) -> int:
+    """
+    Return the number of bytes of a dict, as JSON, where the value of `key` is itself a JSON encoded document. Only the
+    remainder of the dict is encoded, the size of the nested document is counted. If the value is binary (e.g. a
+    compressed document) its length is counted, as the AWS services count it, rather than that of its base64 encoding
+    """
+    envelope = dict(d)
+    envelope[key] = ''
+    if isinstance(d[key], bytes):
+        return get_byte_size_of_dict_or_list(envelope) + len(d[key])
+    return get_byte_size_of_dict_or_list(envelope) - 2 + get_byte_size_of_encoded_json_value(d[key])
+
+
+class BatchRecord(dict):
+    """
+    A constructed payload, exactly as it will be sent to the AWS service. Alongside the payload the record carries the
+    original submission it was built from (`source`), the key holding the JSON encoded `source` (`encoded_key`, if
+    any), its encoded byte size, which is calculated only once, the first time it is required, and its id in the
+    dispatcher's write-ahead log (`record_id`, if it has one).
+    """
+    __slots__ = ('source', 'encoded_key', '_byte_size', 'record_id')
+
+    def __init__(self, payload: dict, source=None, encoded_key: str = None, byte_size: int = None,
+                 record_id: int = None):
+        super().__init__(payload)
+        self.source = source
+        self.encoded_key = encoded_key
+        self._byte_size = byte_size
+        self.record_id = record_id
+
+    @property
+    def byte_size(self) -> int:
+        """ Return the number of bytes of the record, as JSON """
+        if self._byte_size is None:
+            if self.encoded_key:
+                self._byte_size = get_byte_size_of_dict_with_encoded_json(self, self.encoded_key)
+            else:
+                self._byte_size = get_byte_size_of_dict_or_list(self)
+        return self._byte_size
+
+
+def get_source_of_record(record: dict):
+    """
+    Return the original submission a record was built from, or None if the record does not carry one (e.g. it was
+    constructed outside of the dispatcher)
+    """
+    return getattr(record, 'source', None)
@@ -0,0 +1,239 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+
+
+logger = logging.getLogger('boto3-batch-utils')
+
+PAYLOAD_RECORD = 1
+FAILED_RECORD = 2
+ACK_RECORD = 3
+
+#  crc32, body length, record kind, record id
+_RECORD_HEADER = struct.Struct('<IIBQ')
+_SEGMENT_SUFFIX = '.wal'
+
+
+class LogSegment:
+    """
+    A single file of the write-ahead log, memory-mapped and filled with records from the start. The file is created at
+    its full size, so the unused space at the end reads as zeros, which marks the end of the records
+    """
+
+    def __init__(self, path: str, start_id: int, size: int = None):
+        """
+        :param path: str - Path of the segment file
+        :param start_id: int - Lowest record id which may be held by the segment
+        :param size: int - Size (in bytes) of a new segment file (default None, open an existing file)
+        """
+        self.path = path
+        self.start_id = start_id
+        self._file = open(path, 'r+b' if size is None else 'w+b')
+        if size is not None:
+            self._file.truncate(size)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), self.size)
+        self.position = 0
+        self.outstanding = 0
+
+    def scan(self, position: int = 0):
+        """ Yield (kind, record_id, body, end position) for each complete record, starting from the given position """
+        while position + _RECORD_HEADER.size <= self.size:
+            crc, length, kind, record_id = _RECORD_HEADER.unpack_from(self._mmap, position)
+            body_start = position + _RECORD_HEADER.size
+            if not kind or body_start + length > self.size:
+                return
+            body = self._mmap[body_start:body_start + length]
+            if zlib.crc32(body, zlib.crc32(self._mmap[position + 4:body_start])) != crc:
+                logger.warning(f"Write-ahead log segment {self.path} has an incomplete record at byte {position}, "
+                               f"it and anything after it are ignored")
+                return
+            position = body_start + length
+            yield kind, record_id, body, position
+
+    def has_space(self, length: int) -> bool:
+        return self.position + _RECORD_HEADER.size + length <= self.size
+
+    def write(self, kind: int, record_id: int, body: bytes, sync: bool):
+        """ Write a record at the write position, the caller must check there is space for it """
+        header = _RECORD_HEADER.pack(0, len(body), kind, record_id)
+        crc = zlib.crc32(body, zlib.crc32(header[4:]))
+        end = self.position + len(header) + len(body)
+        self._mmap[self.position:end] = _RECORD_HEADER.pack(crc, len(body), kind, record_id) + body
+        self.position = end
+        if sync:
+            self._mmap.flush()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class WriteAheadLog:
+    """
+    An append-only log, on disk, of the payloads held by a dispatcher and of the payloads which it failed to send.
+
+    Each payload is written to the log when it is submitted and acknowledged once its batch has been sent, a failed
+    payload is written again as a failure and acknowledged once it has been handed back to the caller. A dispatcher
+    created with a log which holds records which were never acknowledged (e.g. after a crash or a Lambda timeout)
+    sends those payloads again, and returns those failures again.
+
+    The log is a directory of segment files which are memory-mapped, so appending a record is a copy into memory. The
+    operating system writes the pages to disk, so records survive the process being killed but, unless sync is set,
+    not the machine failing. A segment file is deleted once all of its records, and all of those before it, have been
+    acknowledged.
+
+    A log must only be used by one dispatcher at a time. Records are stored using pickle, only open a log which was
+    written by a trusted process.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 16 * 1024 * 1024, sync: bool = False):
+        """
+        :param directory: str - Directory holding the segment files, created if it does not exist
+        :param segment_size: int - Size (in bytes) of each segment file, larger records are given a segment of their own
+        :param sync: bool - Flush each record to disk before continuing (default False, the operating system decides
+        when to write to disk)
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        self._validate_initialisation()
+        self._lock = threading.Lock()
+        self._segments = []
+        self._next_id = 1
+        self._segment_sequence = 0
+        self._replay_ids = {}
+        self._read_cursor = None
+        os.makedirs(directory, exist_ok=True)
+        self._open_segments()
+
+    def _validate_initialisation(self):
+        """
+        Ensure that all the initialised values and attributes are valid
+        """
+        if self.segment_size < 4096:
+            raise ValueError(f"Requested segment_size '{self.segment_size}' must be at least 4096 bytes")
+
+    def _open_segments(self):
+        """ Read the existing segment files, finding the records which have not been acknowledged """
+        segment_files = sorted(name for name in os.listdir(self.directory) if name.endswith(_SEGMENT_SUFFIX))
+        acknowledged = set()
+        for name in segment_files:
+            #  Segment files are named by the lowest record id they may hold, then a sequence number
+            start_id, self._segment_sequence = (int(part) for part in name[:-len(_SEGMENT_SUFFIX)].split('-'))
+            segment = LogSegment(os.path.join(self.directory, name), start_id)
+            self._segments.append(segment)
+            #  A segment holding only acknowledgements has no record ids, but no earlier id may be reused
+            self._next_id = max(self._next_id, start_id)
+            for kind, record_id, body, segment.position in segment.scan():
+                if kind == ACK_RECORD:
+                    acknowledged.update(array('Q', body))
+                else:
+                    self._replay_ids[record_id] = kind
+                    self._next_id = max(self._next_id, record_id + 1)
+        for record_id in acknowledged:
+            self._replay_ids.pop(record_id, None)
+        start_ids = self._get_start_ids()
+        for record_id in self._replay_ids:
+            self._get_segment(record_id, start_ids).outstanding += 1
+        if self._replay_ids:
+            logger.info(f"Write-ahead log {self.directory} holds {len(self._replay_ids)} unacknowledged records")
+        self._delete_acknowledged_segments()
+
+    def _get_start_ids(self) -> list:
+        return [segment.start_id for segment in self._segments]
+
+    def _get_segment(self, record_id: int, start_ids: list) -> LogSegment:
+        """ Return the segment holding a record, given the start ids of the segments """
+        return self._segments[bisect_right(start_ids, record_id) - 1]
+
+    def _write(self, kind: int, record_id: int, body: bytes):
+        """ Write a record to the newest segment, starting a new one if it is full (the lock must be held) """
+        if not self._segments or not self._segments[-1].has_space(len(body)):
+            size = max(self.segment_size, _RECORD_HEADER.size + len(body))
+            self._segment_sequence += 1
+            path = os.path.join(self.directory, f"{self._next_id:020d}-{self._segment_sequence:010d}{_SEGMENT_SUFFIX}")
+            self._segments.append(LogSegment(path, self._next_id, size))
+            logger.debug(f"Write-ahead log segment started: {path}")
+        self._segments[-1].write(kind, record_id, body, self.sync)
+
+    def append(self, data, kind: int = PAYLOAD_RECORD) -> int:
+        """ Write a record to the log, returning its record id """
+        body = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            record_id = self._next_id
+            self._write(kind, record_id, body)
+            self._next_id += 1
+            self._segments[-1].outstanding += 1
+            return record_id
+
+    def ack(self, record_ids: list):
+        """ Acknowledge records, they will not be replayed. Each record must be acknowledged only once """
+        if not record_ids:
+            return
+        with self._lock:
+            self._write(ACK_RECORD, 0, array('Q', record_ids).tobytes())
+            start_ids = self._get_start_ids()
+            for record_id in record_ids:
+                self._replay_ids.pop(record_id, None)
+                self._get_segment(record_id, start_ids).outstanding -= 1
+            self._delete_acknowledged_segments()
+
+    def _delete_acknowledged_segments(self):
+        """
+        Delete the oldest segments while all of their records are acknowledged. The newest segment is kept for writing,
+        and a segment is never deleted before an older one, as it may hold acknowledgements of the older one's records
+        """
+        while len(self._segments) > 1 and not self._segments[0].outstanding:
+            segment = self._segments.pop(0)
+            segment.close()
+            os.remove(segment.path)
+            logger.debug(f"Write-ahead log segment deleted: {segment.path}")
+
+    def replay(self):
+        """ Yield (record_id, kind, data) for each record which was not acknowledged when the log was opened """
+        for record_id, kind, body in self._read(min(self._replay_ids, default=self._next_id), self._next_id):
+            if record_id in self._replay_ids:
+                yield record_id, kind, pickle.loads(body)
+
+    def read(self, start_id: int, end_id: int):
+        """ Yield (record_id, data) for each payload record with an id from start_id up to (not including) end_id """
+        for record_id, kind, body in self._read(start_id, end_id):
+            if kind == PAYLOAD_RECORD:
+                yield record_id, pickle.loads(body)
+
+    def _read(self, start_id: int, end_id: int):
+        """
+        Yield (record_id, kind, body) for the records in the id range, in the order they were written. Reading carries
+        on from where the previous read stopped if it can, so reading through the log a range at a time does not
+        rescan the records before each range
+        """
+        with self._lock:
+            segments = [segment for segment in self._segments if segment.start_id < end_id]
+        first, position = max(0, bisect_right([segment.start_id for segment in segments], start_id) - 1), 0
+        if self._read_cursor and self._read_cursor[0] <= start_id and self._read_cursor[1] in segments[first:]:
+            _, segment, position = self._read_cursor
+            first = segments.index(segment)
+        for segment in segments[first:]:
+            for kind, record_id, body, end in segment.scan(position):
+                if kind == ACK_RECORD or record_id < start_id:
+                    continue
+                if record_id >= end_id:
+                    return
+                self._read_cursor = (record_id + 1, segment, end)
+                yield record_id, kind, body
+            position = 0
+
+    def close(self):
+        """ Close the segment files, records which have not been acknowledged remain on disk """
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            self._read_cursor = None
@@ -32,4 +32,5 @@ setup(name='boto3_batch_utils',
       long_description=readme(),
       long_description_content_type='text/markdown',
       include_package_data=True,
-      install_requires=requires)
+      install_requires=requires,
+      extras_require={'orjson': ['orjson'], 'zstd': ['zstandard']})
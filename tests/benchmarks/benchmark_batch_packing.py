@@ -0,0 +1,77 @@
+"""
+Benchmark the number of requests made to send payloads of mixed sizes, with and without `batch_packing`.
+
+Reports, for each dispatcher and mix of payload sizes, the batch requests made with and without packing and the fewest
+possible (the larger of the payload count and the total byte size divided by the service's batch limits). SQS standard
+queues are packed in any order, SQS FIFO queues and Kinesis streams keep their payloads in order. Run from the root of
+the repository with:
+`python -m tests.benchmarks.benchmark_batch_packing`
+"""
+from math import ceil
+from random import Random
+
+from boto3_batch_utils import KinesisBatchDispatcher, SQSBatchDispatcher, SQSFifoBatchDispatcher
+
+from .benchmark_payload_serialization import StubClient
+
+RECORD_COUNT = 1000
+SEED = 7
+
+
+def create_long_tail_payloads(max_size: int) -> list:
+    """ Payloads of mixed sizes, mostly small with a long tail of large payloads, up to max_size bytes """
+    random = Random(SEED)
+    return [{'id': str(i), 'body': 'x' * min(int(random.paretovariate(1.2) * max_size / 40), max_size)}
+            for i in range(RECORD_COUNT)]
+
+
+def create_large_payloads(max_size: int) -> list:
+    """ Payloads of sizes spread evenly up to max_size bytes, so the byte limit fills each batch """
+    random = Random(SEED)
+    return [{'id': str(i), 'body': 'x' * random.randint(max_size // 20, max_size)} for i in range(RECORD_COUNT)]
+
+
+PAYLOAD_MIXES = {
+    'long tail': create_long_tail_payloads,
+    'large': create_large_payloads
+}
+
+
+def create_dispatcher(name: str, batch_packing: bool):
+    if name == 'SQSBatchDispatcher':
+        dispatcher = SQSBatchDispatcher('benchmark_queue', batch_packing=batch_packing)
+    elif name == 'SQSFifoBatchDispatcher':
+        dispatcher = SQSFifoBatchDispatcher('benchmark_queue.fifo', batch_packing=batch_packing)
+    else:
+        dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=500,
+                                            batch_packing=batch_packing)
+    dispatcher._aws_service = StubClient()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, dispatcher.batch_dispatch_method)
+    return dispatcher
+
+
+def benchmark(name: str, payloads: list, batch_packing: bool) -> tuple:
+    """ Return the number of batch requests made and the fewest possible """
+    dispatcher = create_dispatcher(name, batch_packing)
+    for payload in payloads:
+        dispatcher.submit_payload(payload)
+    dispatcher.flush_payloads()
+    stats = dispatcher.stats()
+    fewest = max(ceil(stats['payloads_sent'] / dispatcher.max_batch_size),
+                 ceil(stats['bytes_sent'] / dispatcher._get_max_batch_payload_bytes()))
+    return stats['batches_sent'], fewest
+
+
+def main():
+    print("dispatcher             | payloads  | requests without packing | requests with packing | fewest possible")
+    for name, max_size in [('SQSBatchDispatcher', 200000), ('SQSFifoBatchDispatcher', 200000),
+                           ('KinesisBatchDispatcher', 400000)]:
+        for mix, create_payloads in PAYLOAD_MIXES.items():
+            payloads = create_payloads(max_size)
+            unpacked, fewest = benchmark(name, payloads, False)
+            packed, _ = benchmark(name, payloads, True)
+            print(f"{name:<22} | {mix:<9} | {unpacked:>24} | {packed:>20} | {fewest:>15}")
+
+
+if __name__ == '__main__':
+    main()
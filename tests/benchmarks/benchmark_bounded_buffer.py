@@ -0,0 +1,89 @@
+"""
+Load test the buffer limits of a dispatcher under sustained overload.
+
+Payloads arrive (each submitted from its own task, as they would be by a busy async service) several times faster than
+a slow stub Kinesis stream can accept them. Without buffer limits the batches waiting to be sent, and the memory they
+use, grow for as long as the overload lasts. With max_buffered_payloads and the 'drop_oldest' policy both stay flat,
+and the excess is counted in dropped_payload_count. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_bounded_buffer`
+"""
+import asyncio
+import tracemalloc
+from time import monotonic, sleep
+
+from boto3_batch_utils import AsyncKinesisBatchDispatcher
+
+
+SEND_TIME = 0.05
+MAX_BATCH_SIZE = 10
+ARRIVAL_RATE = 2000
+DURATION = 5.0
+SAMPLE_INTERVAL = 0.5
+
+
+class SlowStubKinesisClient:
+
+    def put_records(self, StreamName, Records):
+        sleep(SEND_TIME)
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def put_record(self, **kwargs):
+        sleep(SEND_TIME)
+        return {}
+
+
+def create_dispatcher(**kwargs) -> AsyncKinesisBatchDispatcher:
+    #  Without a partition_key_identifier each record has a random partition key, so batches may be sent concurrently
+    dispatcher = AsyncKinesisBatchDispatcher('benchmark_stream', max_batch_size=MAX_BATCH_SIZE, max_concurrency=4,
+                                             **kwargs)
+    dispatcher._aws_service = SlowStubKinesisClient()
+    dispatcher._batch_dispatch_method = dispatcher._aws_service.put_records
+    dispatcher._individual_dispatch_method = dispatcher._aws_service.put_record
+    return dispatcher
+
+
+async def overload(dispatcher: AsyncKinesisBatchDispatcher) -> list:
+    """ Submit payloads at ARRIVAL_RATE for DURATION seconds, returning (elapsed, submissions, memory) samples """
+    tasks = set()
+    samples = []
+    start = monotonic()
+    next_sample = SAMPLE_INTERVAL
+    submitted = 0
+    while monotonic() - start < DURATION:
+        due = int((monotonic() - start) * ARRIVAL_RATE)
+        for i in range(submitted, due):
+            task = asyncio.ensure_future(dispatcher.submit_payload({'id': str(i), 'body': 'x' * 500}))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        submitted = due
+        if monotonic() - start >= next_sample:
+            samples.append((next_sample, len(tasks), tracemalloc.get_traced_memory()[0]))
+            next_sample += SAMPLE_INTERVAL
+        await asyncio.sleep(0.001)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return samples
+
+
+def run(label: str, **kwargs):
+    dispatcher = create_dispatcher(**kwargs)
+    tracemalloc.start()
+    samples = asyncio.run(overload(dispatcher))
+    tracemalloc.stop()
+    print(f"\n{label}")
+    print("elapsed (s) | submissions waiting | traced memory (MB)")
+    for elapsed, waiting, memory in samples:
+        print(f"{elapsed:>11.1f} | {waiting:>19} | {memory / 1000000:>18.2f}")
+    print(f"dropped payloads: {dispatcher.dropped_payload_count}")
+
+
+def main():
+    print(f"Arrival rate {ARRIVAL_RATE} payloads/s, each batch of {MAX_BATCH_SIZE} takes the stub {SEND_TIME}s to send")
+    run("No buffer limits")
+    run("max_buffered_payloads=1000, buffer_full_policy='drop_oldest'", max_buffered_payloads=1000,
+        buffer_full_policy='drop_oldest')
+
+
+if __name__ == '__main__':
+    main()
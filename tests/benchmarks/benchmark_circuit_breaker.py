@@ -0,0 +1,69 @@
+"""
+Benchmark sending to a target which is down, with and without a `CircuitBreaker`.
+
+Reports, for each dispatcher, the calls made to the target and the time taken to flush records which all fail, using the
+default retry policy. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_circuit_breaker`
+"""
+import logging
+from time import perf_counter, sleep
+
+from botocore.exceptions import ClientError
+
+from boto3_batch_utils import CircuitBreaker, KinesisBatchDispatcher, SQSBatchDispatcher
+
+RECORD_COUNT = 500
+REQUEST_SECONDS = 0.005
+
+
+class UnavailableClient:
+    """ A target which is down, each call fails after REQUEST_SECONDS """
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_queue_url(self, QueueName):
+        return {'QueueUrl': f'https://queue.local/{QueueName}'}
+
+    def fail(self, **kwargs):
+        self.calls += 1
+        sleep(REQUEST_SECONDS)
+        raise ClientError({'Error': {'Code': 'ServiceUnavailable', 'Message': 'unavailable'}}, 'benchmark')
+
+    send_message_batch = put_records = fail
+
+
+def create_dispatcher(name: str, circuit_breaker: CircuitBreaker):
+    if name == 'SQSBatchDispatcher':
+        dispatcher = SQSBatchDispatcher('benchmark_queue', circuit_breaker=circuit_breaker)
+    else:
+        dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=100,
+                                            circuit_breaker=circuit_breaker)
+    dispatcher._aws_service = UnavailableClient()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, dispatcher.batch_dispatch_method)
+    return dispatcher
+
+
+def benchmark(name: str, circuit_breaker: CircuitBreaker = None) -> tuple:
+    """ Return the number of calls made, the number of records returned unprocessed and the time taken """
+    dispatcher = create_dispatcher(name, circuit_breaker)
+    start = perf_counter()
+    for i in range(RECORD_COUNT):
+        dispatcher.submit_payload({'id': str(i), 'body': 'x' * 100})
+    unprocessed = dispatcher.flush_payloads()
+    return dispatcher._aws_service.calls, len(unprocessed), perf_counter() - start
+
+
+def main():
+    #  Every batch fails, which is logged as an error
+    logging.getLogger('boto3-batch-utils').setLevel(logging.CRITICAL)
+    print("dispatcher             | circuit breaker | calls | unprocessed | seconds")
+    for name in ['SQSBatchDispatcher', 'KinesisBatchDispatcher']:
+        for circuit_breaker in [None, CircuitBreaker()]:
+            calls, unprocessed, duration = benchmark(name, circuit_breaker)
+            print(f"{name:<22} | {str(circuit_breaker is not None):<15} | {calls:>5} | {unprocessed:>11} | "
+                  f"{duration:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
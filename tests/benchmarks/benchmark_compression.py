@@ -0,0 +1,64 @@
+"""
+Benchmark the compression of SQS message bodies and Kinesis record data (see `boto3_batch_utils.compression`).
+
+Reports, for each dispatcher and compression format, the number of batch requests and bytes needed to send verbose JSON
+records, the mean compressed size of a record and the submit throughput (against a stub client). Run from the root of
+the repository with:
+`python -m tests.benchmarks.benchmark_compression`
+"""
+from importlib.util import find_spec
+from time import perf_counter
+
+from boto3_batch_utils import KinesisBatchDispatcher, SQSBatchDispatcher
+
+from .benchmark_payload_serialization import StubClient
+
+RECORD_COUNT = 1000
+COMPRESSIONS = [None, 'gzip', 'zlib'] + (['zstd'] if find_spec('zstandard') else [])
+
+
+def create_record(i: int) -> dict:
+    return {
+        'id': str(i),
+        'event_type': 'order_line_updated',
+        'customer': {'customer_id': f'customer-{i % 97}', 'segment': 'retail', 'country': 'GB'},
+        'lines': [{'sku': f'sku-{n:05d}', 'description': f'product number {n} of the catalogue', 'quantity': n % 3 + 1,
+                   'unit_price': round(1.99 + n, 2), 'currency': 'GBP'} for n in range(250)],
+        'notes': 'customer requested delivery to the side door, ' * 5
+    }
+
+
+def create_dispatcher(name: str, compression: str):
+    if name == 'SQSBatchDispatcher':
+        dispatcher = SQSBatchDispatcher('benchmark_queue', compression=compression)
+    else:
+        dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=500,
+                                            compression=compression)
+    dispatcher._aws_service = StubClient()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, dispatcher.batch_dispatch_method)
+    return dispatcher
+
+
+def benchmark(dispatcher, records: list) -> tuple:
+    """ Return the number of batch requests, bytes sent, and records submitted and flushed per second """
+    start = perf_counter()
+    for record in records:
+        dispatcher.submit_payload(record)
+    dispatcher.flush_payloads()
+    duration = perf_counter() - start
+    stats = dispatcher.stats()
+    return stats['batches_sent'], stats['bytes_sent'], len(records) / duration
+
+
+def main():
+    records = [create_record(i) for i in range(RECORD_COUNT)]
+    print("dispatcher             | compression | batch requests | bytes sent | bytes per record | records/s")
+    for dispatcher_name in ['SQSBatchDispatcher', 'KinesisBatchDispatcher']:
+        for compression in COMPRESSIONS:
+            requests, bytes_sent, rate = benchmark(create_dispatcher(dispatcher_name, compression), records)
+            print(f"{dispatcher_name:<22} | {str(compression):<11} | {requests:>14} | {bytes_sent:>10} | "
+                  f"{bytes_sent / len(records):>16.0f} | {rate:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
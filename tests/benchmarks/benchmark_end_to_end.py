@@ -0,0 +1,73 @@
+"""
+Load test every dispatcher end to end, through botocore and HTTP, against the local AWS stand-in.
+
+The stand-in answers each request after a fixed latency, and throttles or partially fails a share of them, so the
+results include the cost of serialisation, signing, HTTP, response parsing, retries and individual re-sends that the
+in-process stubs of the other benchmarks skip. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_end_to_end`
+"""
+import logging
+from time import perf_counter
+
+from botocore.config import Config
+
+from boto3_batch_utils import CloudwatchBatchDispatcher, DynamoBatchDispatcher, KinesisBatchDispatcher, \
+    SQSBatchDispatcher, SQSFifoBatchDispatcher
+from boto3_batch_utils.Cloudwatch import cloudwatch_dimension
+from boto3_batch_utils.retry import RetryPolicy
+from tests.integration_tests.aws_stand_in import AWSStandIn
+
+
+RECORD_COUNT = 5000
+LATENCY = 0.005
+THROTTLE_RATE = 0.01
+FAILURE_RATE = 0.01
+MAX_CONCURRENCY = 4
+
+DISPATCHERS = {
+    'SQSBatchDispatcher': lambda **kwargs: SQSBatchDispatcher('queue', **kwargs),
+    'SQSFifoBatchDispatcher': lambda **kwargs: SQSFifoBatchDispatcher('queue.fifo', **kwargs),
+    'KinesisBatchDispatcher': lambda **kwargs: KinesisBatchDispatcher('stream', partition_key_identifier='id',
+                                                                      **kwargs),
+    'DynamoBatchDispatcher': lambda **kwargs: DynamoBatchDispatcher('table', 'id', **kwargs),
+    'CloudwatchBatchDispatcher': lambda **kwargs: CloudwatchBatchDispatcher('namespace', **kwargs),
+}
+#  These send payloads in the order they were submitted, so they cannot send batches concurrently
+ORDERED_DISPATCHERS = {'SQSFifoBatchDispatcher', 'KinesisBatchDispatcher'}
+
+
+def submit_all(dispatcher):
+    if isinstance(dispatcher, CloudwatchBatchDispatcher):
+        dimension = cloudwatch_dimension('benchmark', 'end_to_end')
+        for i in range(RECORD_COUNT):
+            dispatcher.submit_metric('benchmark', i, dimensions=dimension)
+    else:
+        for i in range(RECORD_COUNT):
+            dispatcher.submit_payload({'id': str(i), 'value': i * 1.5, 'body': 'x' * 500})
+    return dispatcher.flush_payloads()
+
+
+def main():
+    #  Each throttled request is logged as a warning, which is expected here
+    logging.getLogger('boto3-batch-utils').setLevel(logging.ERROR)
+    with AWSStandIn(latency=LATENCY, throttle_rate=THROTTLE_RATE, failure_rate=FAILURE_RATE, seed=1) as stand_in:
+        aws_service_args = dict(stand_in.aws_service_args(), config=Config(retries={'total_max_attempts': 1}),
+                                retry_policy=RetryPolicy(max_attempts=10, base_delay=0.01))
+        print(f"{RECORD_COUNT} records, {LATENCY * 1000:.0f}ms latency, {THROTTLE_RATE:.0%} of requests throttled, "
+              f"{FAILURE_RATE:.0%} of batch entries failed")
+        print("dispatcher                 | concurrency | records/s | requests | retries | request p50 (ms) | "
+              "unprocessed")
+        for name, create in DISPATCHERS.items():
+            for max_concurrency in (None,) if name in ORDERED_DISPATCHERS else (None, MAX_CONCURRENCY):
+                dispatcher = create(max_concurrency=max_concurrency, **aws_service_args)
+                start = perf_counter()
+                unprocessed_items = submit_all(dispatcher)
+                records_per_second = RECORD_COUNT / (perf_counter() - start)
+                stats = dispatcher.stats()
+                print(f"{name:<26} | {max_concurrency or 1:>11} | {records_per_second:>9.0f} | "
+                      f"{stats['requests']:>8} | {stats['retries']:>7} | "
+                      f"{stats['request_latency']['p50'] * 1000:>16.1f} | {len(unprocessed_items):>11}")
+
+
+if __name__ == '__main__':
+    main()
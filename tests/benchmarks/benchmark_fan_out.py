@@ -0,0 +1,71 @@
+"""
+Benchmark submitting each payload to an SQS queue and two Kinesis streams, with and without a `FanOutDispatcher`.
+
+Reports the number of times each payload is JSON encoded and compressed, and the mean time taken per payload, from
+submission through to the batches being handed to the (stubbed) AWS clients. Without a fan-out dispatcher each target
+encodes and compresses the payload itself. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_fan_out`
+"""
+from time import perf_counter
+from unittest.mock import patch
+
+from boto3_batch_utils import FanOutDispatcher, KinesisBatchDispatcher, SQSBatchDispatcher
+from boto3_batch_utils.codec import get_json_codec
+from boto3_batch_utils.compression import GzipCompressor
+
+from .benchmark_payload_serialization import StubClient, create_payload
+
+RECORD_COUNT = 5000
+
+
+def create_targets() -> list:
+    targets = [
+        SQSBatchDispatcher('benchmark_queue', compression='gzip'),
+        KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=500,
+                               compression='gzip'),
+        KinesisBatchDispatcher('benchmark_archive_stream', partition_key_identifier='id', max_batch_size=500,
+                               compression='gzip')
+    ]
+    for target in targets:
+        target._aws_service = StubClient()
+        target._batch_dispatch_method = getattr(target._aws_service, target.batch_dispatch_method)
+    return targets
+
+
+def submit_to_each_target(targets: list, payloads: list):
+    for payload in payloads:
+        for target in targets:
+            target.submit_payload(payload)
+    for target in targets:
+        target.flush_payloads()
+
+
+def submit_with_fan_out(targets: list, payloads: list):
+    fan_out = FanOutDispatcher(targets)
+    fan_out.submit_payloads(payloads)
+    fan_out.flush_payloads()
+
+
+def benchmark(submit: callable, payloads: list) -> tuple:
+    """ Return the number of encodings and compressions per payload, and the mean time (in microseconds) per payload """
+    json_codec = get_json_codec()
+    with patch.object(json_codec, 'encode', wraps=json_codec.encode) as mock_encode, \
+            patch.object(GzipCompressor, 'compress', autospec=True, side_effect=GzipCompressor.compress) as mock_compress:
+        submit(create_targets(), payloads)
+    targets = create_targets()
+    start = perf_counter()
+    submit(targets, payloads)
+    duration = (perf_counter() - start) / len(payloads) * 1000000
+    return mock_encode.call_count / len(payloads), mock_compress.call_count / len(payloads), duration
+
+
+def main():
+    payloads = [create_payload(i) for i in range(RECORD_COUNT)]
+    print("submission       | encodings per payload | compressions per payload | mean time per payload (us)")
+    for name, submit in [('to each target', submit_to_each_target), ('fan-out', submit_with_fan_out)]:
+        encodings, compressions, duration = benchmark(submit, payloads)
+        print(f"{name:<16} | {encodings:>21.0f} | {compressions:>24.0f} | {duration:>26.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark the JSON codecs (see `boto3_batch_utils.codec`) on the shapes of record typically sent to SQS and Kinesis.
+
+Reports the encode and decode throughput of each codec for each record shape, then the submit throughput of the SQS and
+Kinesis dispatchers (against a stub client) with each codec. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_json_codec`
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from boto3_batch_utils import KinesisBatchDispatcher, SQSBatchDispatcher
+from boto3_batch_utils.codec import get_json_codec
+
+from .benchmark_payload_serialization import StubClient
+
+RECORD_COUNT = 5000
+CODECS = ['json', 'orjson']
+
+
+def create_small_record(i: int) -> dict:
+    return {'id': str(i), 'type': 'event', 'count': i, 'enabled': i % 2 == 0}
+
+
+def create_nested_record(i: int) -> dict:
+    return {
+        'id': str(i),
+        'created': datetime(2020, 1, 1) + timedelta(seconds=i),
+        'price': Decimal(f'{i}.99'),
+        'quantity': Decimal(i),
+        'readings': [{'at': datetime(2020, 1, 1) + timedelta(minutes=n), 'value': n * 0.1 + i} for n in range(10)],
+        'location': {'lat': 51.5 + i / 1000, 'lon': -0.12, 'tags': ['a', 'b', 'c']}
+    }
+
+
+def create_text_record(i: int) -> dict:
+    return {'id': str(i), 'body': f'line {i} of a "quoted" log message, with some text\n' * 200}
+
+
+RECORD_SHAPES = {
+    'small flat': create_small_record,
+    'nested decimals/datetimes': create_nested_record,
+    'large text': create_text_record
+}
+
+
+def benchmark_codec(json_codec, records: list) -> tuple:
+    """ Return the number of records encoded, and decoded, per second """
+    start = perf_counter()
+    encoded = [json_codec.encode(record) for record in records]
+    encode_duration = perf_counter() - start
+    start = perf_counter()
+    for record in encoded:
+        json_codec.decode(record)
+    decode_duration = perf_counter() - start
+    return len(records) / encode_duration, len(records) / decode_duration
+
+
+def create_dispatcher(name: str, json_codec: str):
+    if name == 'SQSBatchDispatcher':
+        dispatcher = SQSBatchDispatcher('benchmark_queue', json_codec=json_codec)
+    else:
+        dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=500,
+                                            json_codec=json_codec)
+    dispatcher._aws_service = StubClient()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, dispatcher.batch_dispatch_method)
+    return dispatcher
+
+
+def benchmark_dispatcher(dispatcher, records: list) -> float:
+    """ Return the number of records submitted and flushed per second """
+    start = perf_counter()
+    for record in records:
+        dispatcher.submit_payload(record)
+    dispatcher.flush_payloads()
+    return len(records) / (perf_counter() - start)
+
+
+def main():
+    print("record shape              | codec  | encoded records/s | decoded records/s")
+    for shape, create_record in RECORD_SHAPES.items():
+        records = [create_record(i) for i in range(RECORD_COUNT)]
+        for name in CODECS:
+            encode_rate, decode_rate = benchmark_codec(get_json_codec(name), records)
+            print(f"{shape:<25} | {name:<6} | {encode_rate:>17.0f} | {decode_rate:>17.0f}")
+    print()
+    print("dispatcher             | record shape              | codec  | submitted records/s")
+    for dispatcher_name in ['SQSBatchDispatcher', 'KinesisBatchDispatcher']:
+        for shape, create_record in RECORD_SHAPES.items():
+            records = [create_record(i) for i in range(RECORD_COUNT)]
+            for name in CODECS:
+                rate = benchmark_dispatcher(create_dispatcher(dispatcher_name, name), records)
+                print(f"{dispatcher_name:<22} | {shape:<25} | {name:<6} | {rate:>19.0f}")
+
+
+if __name__ == '__main__':
+    main()
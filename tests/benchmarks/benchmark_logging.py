@@ -0,0 +1,77 @@
+"""
+Benchmark the cost of debug logging on the submit/flush hot path.
+
+Records are submitted to each dispatcher (through stub AWS services) with the 'boto3-batch-utils' logger at INFO, where
+no debug message should be formatted, then at DEBUG with and without payload tracing (trace_sample_rate), with the
+debug output discarded. Run from the root of the repository with: `python -m tests.benchmarks.benchmark_logging`
+"""
+import logging
+from time import perf_counter
+from unittest.mock import Mock
+
+from boto3_batch_utils import DynamoBatchDispatcher, KinesisBatchDispatcher, SQSBatchDispatcher
+
+
+RECORD_COUNT = 20000
+
+
+class StubAWSService:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        return {'UnprocessedItems': {}}
+
+
+DISPATCHERS = {
+    'KinesisBatchDispatcher': (lambda **kwargs: KinesisBatchDispatcher('stream', partition_key_identifier='id',
+                                                                       **kwargs), 'put_records'),
+    'SQSBatchDispatcher': (lambda **kwargs: SQSBatchDispatcher('queue', **kwargs), 'send_message_batch'),
+    'DynamoBatchDispatcher': (lambda **kwargs: DynamoBatchDispatcher('table', 'id', **kwargs), 'batch_write_item'),
+}
+
+
+def create_dispatcher(name: str, **kwargs):
+    create, batch_dispatch_method = DISPATCHERS[name]
+    dispatcher = create(**kwargs)
+    dispatcher._aws_service = StubAWSService()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, batch_dispatch_method)
+    dispatcher._individual_dispatch_method = Mock()
+    #  Initialising the client is not being measured, and DynamoDB's table resource is not needed by the stub
+    dispatcher._initialise_aws_client = lambda: None
+    dispatcher.queue_url = 'stub_queue_url'
+    return dispatcher
+
+
+def time_records_per_second(name: str, **kwargs) -> float:
+    dispatcher = create_dispatcher(name, **kwargs)
+    payloads = [{'id': str(i), 'value': i * 1.5, 'tags': {'a': 1.5, 'b': [1.5, 'x']}, 'body': 'x' * 200}
+                for i in range(RECORD_COUNT)]
+    start = perf_counter()
+    for payload in payloads:
+        dispatcher.submit_payload(payload)
+    dispatcher.flush_payloads()
+    return RECORD_COUNT / (perf_counter() - start)
+
+
+def main():
+    logger = logging.getLogger('boto3-batch-utils')
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    print(f"{RECORD_COUNT} records submitted one at a time, records per second")
+    print("dispatcher             | INFO       | DEBUG      | DEBUG, trace_sample_rate=1")
+    for name in DISPATCHERS:
+        logger.setLevel(logging.INFO)
+        info = time_records_per_second(name)
+        logger.setLevel(logging.DEBUG)
+        debug = time_records_per_second(name)
+        trace = time_records_per_second(name, trace_sample_rate=1)
+        print(f"{name:<22} | {info:>10.0f} | {debug:>10.0f} | {trace:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
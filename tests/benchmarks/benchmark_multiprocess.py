@@ -0,0 +1,70 @@
+"""
+Benchmark the MultiprocessDispatcher against a single dispatcher, for large payloads whose encoding is CPU bound.
+
+Large payloads full of floats are submitted to a DynamoDB dispatcher (which converts every float to a Decimal) and a
+Kinesis dispatcher (which JSON encodes each payload), through stub AWS services, first in this process and then
+across worker processes. Run from the root of the repository with: `python -m tests.benchmarks.benchmark_multiprocess`
+"""
+import multiprocessing
+from time import perf_counter
+
+from boto3_batch_utils import DynamoBatchDispatcher, KinesisBatchDispatcher, MultiprocessDispatcher
+
+
+RECORD_COUNT = 5000
+
+
+class StubAWSService:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def batch_write_item(self, RequestItems):
+        return {'UnprocessedItems': {}}
+
+
+class StubKinesisBatchDispatcher(KinesisBatchDispatcher):
+
+    def _initialise_aws_client(self):
+        self._aws_service = StubAWSService()
+        self._batch_dispatch_method = self._aws_service.put_records
+
+
+class StubDynamoBatchDispatcher(DynamoBatchDispatcher):
+
+    def _initialise_aws_client(self):
+        self._aws_service = StubAWSService()
+        self._batch_dispatch_method = self._aws_service.batch_write_item
+
+
+DISPATCHERS = {
+    'KinesisBatchDispatcher': (StubKinesisBatchDispatcher, ('stream', 'id')),
+    'DynamoBatchDispatcher': (StubDynamoBatchDispatcher, ('table', 'id')),
+}
+
+
+def payloads():
+    for i in range(RECORD_COUNT):
+        yield {'id': str(i), 'readings': [{'time': n, 'value': n * 1.5, 'error': n / 7} for n in range(100)]}
+
+
+def time_records_per_second(dispatcher) -> float:
+    start = perf_counter()
+    dispatcher.submit_payloads(payloads())
+    dispatcher.flush_payloads()
+    return RECORD_COUNT / (perf_counter() - start)
+
+
+def main():
+    processes = multiprocessing.cpu_count()
+    print(f"{RECORD_COUNT} payloads of 100 readings, records per second")
+    print(f"dispatcher             | 1 process | {processes} processes | speed up")
+    for name, (dispatcher_class, args) in DISPATCHERS.items():
+        single = time_records_per_second(dispatcher_class(*args))
+        with MultiprocessDispatcher(dispatcher_class, *args, processes=processes) as dispatcher:
+            multiple = time_records_per_second(dispatcher)
+        print(f"{name:<22} | {single:>9.0f} | {multiple:>11.0f} | {multiple / single:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the JSON serialization work done for each message submitted to the SQS and Kinesis dispatchers.
+
+Reports the number of bytes JSON encoded and the mean time taken per message, from `submit_payload` through to the batch being
+handed to the (stubbed) AWS client. Run from the root of the repository with:
+`python -m tests.benchmarks.benchmark_payload_serialization`
+"""
+from json import JSONEncoder
+from time import perf_counter
+from unittest.mock import patch
+
+from boto3_batch_utils import KinesisBatchDispatcher, SQSBatchDispatcher
+
+
+class StubClient:
+
+    def get_queue_url(self, QueueName):
+        return {'QueueUrl': f'https://queue.local/{QueueName}'}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {'Successful': [{'Id': e['Id']} for e in Entries]}
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+
+def create_dispatchers() -> dict:
+    dispatchers = {
+        'SQSBatchDispatcher': SQSBatchDispatcher('benchmark_queue'),
+        'KinesisBatchDispatcher': KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id',
+                                                         max_batch_size=500)
+    }
+    for dispatcher in dispatchers.values():
+        dispatcher._aws_service = StubClient()
+        dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, dispatcher.batch_dispatch_method)
+    return dispatchers
+
+
+def create_payload(i: int) -> dict:
+    return {
+        'id': str(i),
+        'name': f'record number {i}',
+        'tags': ['alpha', 'beta', 'gamma'],
+        'attributes': {f'attribute_{n}': n * i for n in range(20)},
+        'description': 'a "quoted" description of the record ' * 10
+    }
+
+
+def benchmark(dispatcher, payloads: list) -> tuple:
+    """ Return the number of bytes JSON encoded and the mean time (in microseconds) per message """
+    encode = JSONEncoder.encode
+    encoded_bytes = []
+
+    def counting_encode(self, o):
+        encoded = encode(self, o)
+        encoded_bytes.append(len(encoded))
+        return encoded
+
+    with patch.object(JSONEncoder, 'encode', counting_encode):
+        for payload in payloads:
+            dispatcher.submit_payload(payload)
+        dispatcher.flush_payloads()
+    bytes_per_message = sum(encoded_bytes) / len(payloads)
+
+    start = perf_counter()
+    for payload in payloads:
+        dispatcher.submit_payload(payload)
+    dispatcher.flush_payloads()
+    return bytes_per_message, (perf_counter() - start) / len(payloads) * 1000000
+
+
+def main():
+    payloads = [create_payload(i) for i in range(5000)]
+    print("dispatcher             | JSON bytes encoded per message | mean time per message (us)")
+    for name, dispatcher in create_dispatchers().items():
+        encoded_bytes, duration = benchmark(dispatcher, payloads)
+        print(f"{name:<22} | {encoded_bytes:>30.0f} | {duration:>26.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark the start up cost of boto3_batch_utils, as paid by every AWS Lambda cold start.
+
+Each measurement is taken in a fresh interpreter: the time to `import boto3_batch_utils`, the time to import a
+dispatcher, and the time from the start of the import to the first `submit_payload` returning. boto3 should not be
+imported by any of these steps, the time taken to import it is shown for comparison. Run from the root of the
+repository with: `python -m tests.benchmarks.benchmark_startup`
+"""
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+
+STARTUP_SCRIPT = """
+import json
+import sys
+from time import perf_counter
+start = perf_counter()
+import boto3_batch_utils
+imported = perf_counter()
+from boto3_batch_utils import SQSBatchDispatcher
+dispatcher_imported = perf_counter()
+sqs = SQSBatchDispatcher('benchmark_queue', max_batch_size=10)
+sqs.submit_payload({'id': 1, 'body': 'abc'})
+submitted = perf_counter()
+boto3_imported_before_flush = 'boto3' in sys.modules
+import boto3
+boto3_imported = perf_counter()
+print(json.dumps({
+    'import boto3_batch_utils': imported - start,
+    'import SQSBatchDispatcher': dispatcher_imported - imported,
+    'time to first submit': submitted - start,
+    'boto3 imported before first flush': boto3_imported_before_flush,
+    'import boto3 (for comparison)': boto3_imported - submitted
+}))
+"""
+
+
+def run_in_fresh_interpreter() -> dict:
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    runs = 15
+    run_in_fresh_interpreter()  # Warm up the file system cache and compile the modules
+    results = [run_in_fresh_interpreter() for _ in range(runs)]
+    print(f"Start up in a fresh interpreter, median of {runs} runs")
+    for name in results[0]:
+        if isinstance(results[0][name], bool):
+            print(f"{name:<36} | {any(result[name] for result in results)}")
+        else:
+            print(f"{name:<36} | {median(result[name] for result in results) * 1000:>8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the cost of the statistics which every dispatcher collects.
+
+Payloads are submitted in bulk to a stub Kinesis stream, once with the statistics being collected and once with them
+replaced by a stand-in which does nothing, the throughput of the two should be within a few percent. Run from the root
+of the repository with: `python -m tests.benchmarks.benchmark_stats`
+"""
+from time import perf_counter
+
+from boto3_batch_utils import KinesisBatchDispatcher
+from boto3_batch_utils.stats import DispatcherStats
+
+
+RECORD_COUNT = 100000
+ROUNDS = 10
+
+
+class StubKinesisClient:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def put_record(self, **kwargs):
+        return {}
+
+
+class NullStats(DispatcherStats):
+
+    def record_flush(self, seconds):
+        pass
+
+    def record_batch(self, payload_count, byte_size):
+        pass
+
+    def record_request(self, seconds):
+        pass
+
+
+def create_dispatcher(collect_stats: bool) -> KinesisBatchDispatcher:
+    dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id', max_batch_size=100)
+    dispatcher._aws_service = StubKinesisClient()
+    dispatcher._batch_dispatch_method = dispatcher._aws_service.put_records
+    dispatcher._individual_dispatch_method = dispatcher._aws_service.put_record
+    if not collect_stats:
+        dispatcher._stats = NullStats()
+    return dispatcher
+
+
+def time_records_per_second(collect_stats: bool) -> float:
+    dispatcher = create_dispatcher(collect_stats)
+    payloads = ({'id': str(i), 'body': 'x' * 100} for i in range(RECORD_COUNT))
+    start = perf_counter()
+    dispatcher.submit_payloads(payloads)
+    dispatcher.flush_payloads()
+    return RECORD_COUNT / (perf_counter() - start)
+
+
+def main():
+    #  The best of several rounds, alternating, so that neither is favoured by the machine warming up
+    with_stats, without_stats = 0, 0
+    for _ in range(ROUNDS):
+        without_stats = max(without_stats, time_records_per_second(collect_stats=False))
+        with_stats = max(with_stats, time_records_per_second(collect_stats=True))
+    print(f"{RECORD_COUNT} records, best of {ROUNDS} rounds, records per second")
+    print(f"without statistics: {without_stats:.0f}")
+    print(f"with statistics:    {with_stats:.0f}")
+    print(f"overhead: {(1 - with_stats / without_stats) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark the cost of a single `submit_payload` call as the pending batch fills up.
+
+The time per submit should stay flat regardless of how many payloads are already waiting in the batch. Run from the
+root of the repository with: `python -m tests.benchmarks.benchmark_submit_payload`
+"""
+from time import perf_counter
+
+from boto3_batch_utils import KinesisBatchDispatcher
+from boto3_batch_utils.constants import KINESIS_BATCH_MAX_PAYLOADS
+
+
+class StubKinesisClient:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def put_record(self, **kwargs):
+        return {}
+
+
+def create_dispatcher(max_batch_size: int) -> KinesisBatchDispatcher:
+    dispatcher = KinesisBatchDispatcher('benchmark_stream', partition_key_identifier='id',
+                                        max_batch_size=max_batch_size)
+    dispatcher._aws_service = StubKinesisClient()
+    dispatcher._batch_dispatch_method = dispatcher._aws_service.put_records
+    dispatcher._individual_dispatch_method = dispatcher._aws_service.put_record
+    return dispatcher
+
+
+def time_submits_by_batch_position(batch_size: int, rounds: int, bucket_size: int) -> list:
+    """
+    Return the mean time (in microseconds) of a submit, grouped by the number of payloads already in the batch. The
+    final submit of each batch triggers the flush, so it is not included
+    """
+    totals = [0.0] * (batch_size // bucket_size)
+    counts = [0] * len(totals)
+    dispatcher = create_dispatcher(batch_size)
+    payload = {'id': 'abc', 'body': 'x' * 1000, 'values': list(range(20))}
+    for _ in range(rounds):
+        for position in range(batch_size - 1):
+            start = perf_counter()
+            dispatcher.submit_payload(payload)
+            totals[position // bucket_size] += perf_counter() - start
+            counts[position // bucket_size] += 1
+        dispatcher.submit_payload(payload)
+    return [total / count * 1000000 for total, count in zip(totals, counts)]
+
+
+def main():
+    batch_size = KINESIS_BATCH_MAX_PAYLOADS
+    bucket_size = 50
+    results = time_submits_by_batch_position(batch_size, rounds=20, bucket_size=bucket_size)
+    print(f"KinesisBatchDispatcher.submit_payload, max_batch_size={batch_size}")
+    print("payloads already in batch | mean submit time (us)")
+    for i, result in enumerate(results):
+        print(f"{i * bucket_size:>10} - {(i + 1) * bucket_size - 1:<12} | {result:>10.2f}")
+    print(f"ratio of last bucket to first bucket: {results[-1] / results[0]:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the throughput of `submit_payloads` (and `submit_metrics`) against calling `submit_payload` once per record.
+
+Each dispatcher is sent payloads from a generator, through stub AWS services, first a record at a time and then in
+bulk. Run from the root of the repository with: `python -m tests.benchmarks.benchmark_submit_payloads`
+"""
+from datetime import datetime
+from time import perf_counter
+from unittest.mock import Mock
+
+from boto3_batch_utils import CloudwatchBatchDispatcher, DynamoBatchDispatcher, KinesisBatchDispatcher, \
+    SQSBatchDispatcher, SQSFifoBatchDispatcher
+
+
+RECORD_COUNT = 50000
+
+
+class StubAWSService:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        return {'UnprocessedItems': {}}
+
+    def put_metric_data(self, Namespace, MetricData):
+        return {}
+
+
+def stub_aws_service(dispatcher, batch_dispatch_method: str):
+    dispatcher._aws_service = StubAWSService()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, batch_dispatch_method)
+    dispatcher._individual_dispatch_method = Mock()
+    #  Initialising the client is not being measured, and DynamoDB's table resource is not needed by the stub
+    dispatcher._initialise_aws_client = lambda: None
+    dispatcher.queue_url = 'stub_queue_url'
+    return dispatcher
+
+
+def payloads():
+    for i in range(RECORD_COUNT):
+        yield {'id': str(i), 'value': i * 1.5, 'body': 'x' * 200}
+
+
+def metrics():
+    timestamp = datetime(2020, 1, 1)
+    for i in range(RECORD_COUNT):
+        yield {'metric_name': 'benchmark', 'value': i, 'timestamp': timestamp}
+
+
+DISPATCHERS = {
+    'KinesisBatchDispatcher': (lambda: KinesisBatchDispatcher('stream', partition_key_identifier='id'), 'put_records'),
+    'SQSBatchDispatcher': (lambda: SQSBatchDispatcher('queue'), 'send_message_batch'),
+    'SQSFifoBatchDispatcher': (lambda: SQSFifoBatchDispatcher('queue.fifo'), 'send_message_batch'),
+    'DynamoBatchDispatcher': (lambda: DynamoBatchDispatcher('table', 'id'), 'batch_write_item'),
+}
+
+
+def time_records_per_second(submit) -> float:
+    start = perf_counter()
+    submit()
+    return RECORD_COUNT / (perf_counter() - start)
+
+
+def main():
+    print(f"{RECORD_COUNT} records from a generator, records per second")
+    print("dispatcher                 | per record | bulk      | speed up")
+    results = []
+    for name, (create, method) in DISPATCHERS.items():
+        each = stub_aws_service(create(), method)
+        bulk = stub_aws_service(create(), method)
+        results.append((name, time_records_per_second(lambda: [each.submit_payload(p) for p in payloads()]),
+                        time_records_per_second(lambda: bulk.submit_payloads(payloads()))))
+    each = stub_aws_service(CloudwatchBatchDispatcher('namespace'), 'put_metric_data')
+    bulk = stub_aws_service(CloudwatchBatchDispatcher('namespace'), 'put_metric_data')
+    results.append(('CloudwatchBatchDispatcher',
+                    time_records_per_second(lambda: [each.submit_metric(**metric) for metric in metrics()]),
+                    time_records_per_second(lambda: bulk.submit_metrics(metrics()))))
+    for name, each_rate, bulk_rate in results:
+        print(f"{name:<26} | {each_rate:>10.0f} | {bulk_rate:>9.0f} | {bulk_rate / each_rate:.2f}")
+
+
+if __name__ == '__main__':
+    main()
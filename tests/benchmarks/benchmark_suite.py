@@ -0,0 +1,239 @@
+"""
+Benchmark every dispatcher, and the `utils` helpers they rely on, against in-process stub AWS services.
+
+Each dispatcher is sent the same payloads, whose sizes follow a fixed (seeded) distribution of mostly small records
+with some medium and a few large ones. For each dispatcher the suite reports:
+- submit throughput, records per second from the first `submit_payload` to the end of the final `flush_payloads`
+- flush latency, the median and 99th percentile time taken by `flush_payloads` to send the pending payloads, it is
+  called after each set of FLUSH_SIZE records
+- peak memory, the most memory traced while submitting and flushing (a separate, slower, run under tracemalloc)
+
+Results can be saved as a baseline and later runs compared with it. A run in which any result (other than the noisy
+99th percentile) is more than the tolerance worse than the baseline is reported as a regression, and exits with status
+1. Throughput and latency depend on the machine, so a baseline should be saved on the machine it is compared on (e.g.
+on the base branch, in the same CI job), and with --repeat each result is the median of several runs of the suite.
+The suite only uses the dispatchers' original interface, so it can be run against older versions of the package.
+Run from the root of the repository with: `python -m tests.benchmarks.benchmark_suite [--save] [--compare]`
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime
+from json import dumps
+from statistics import median
+from time import perf_counter
+from unittest.mock import Mock
+
+from boto3_batch_utils import CloudwatchBatchDispatcher, DynamoBatchDispatcher, KinesisBatchDispatcher, \
+    SQSBatchDispatcher, SQSFifoBatchDispatcher
+from boto3_batch_utils.utils import DecimalEncoder, chunks, convert_floats_in_dict_to_decimals, \
+    get_byte_size_of_dict_or_list
+
+
+RECORD_COUNT = 10000
+ROUNDS = 5
+#  Not a multiple of any dispatcher's max_batch_size, so each flush has a part filled batch to send
+FLUSH_SIZE = 99
+SEED = 20200101
+#  (share of records, size of the body in bytes), for records of a few hundred bytes up to tens of kilobytes
+PAYLOAD_SIZES = ((0.70, 200), (0.25, 2000), (0.05, 20000))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'benchmark_suite.json')
+DEFAULT_TOLERANCE = 0.5
+#  Whether a larger result is an improvement (True) or a regression (False), None if it is not compared
+HIGHER_IS_BETTER = {'records_per_second': True, 'operations_per_second': True, 'flush_p50_ms': False,
+                    'flush_p99_ms': None, 'peak_memory_kb': False}
+
+
+class StubAWSService:
+
+    def put_records(self, StreamName, Records):
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        return {'UnprocessedItems': {}}
+
+    def put_metric_data(self, Namespace, MetricData):
+        return {}
+
+
+DISPATCHERS = {
+    'SQSBatchDispatcher': (lambda: SQSBatchDispatcher('queue'), 'send_message_batch'),
+    'SQSFifoBatchDispatcher': (lambda: SQSFifoBatchDispatcher('queue.fifo'), 'send_message_batch'),
+    'KinesisBatchDispatcher': (lambda: KinesisBatchDispatcher('stream', partition_key_identifier='id'), 'put_records'),
+    'DynamoBatchDispatcher': (lambda: DynamoBatchDispatcher('table', 'id'), 'batch_write_item'),
+    'CloudwatchBatchDispatcher': (lambda: CloudwatchBatchDispatcher('namespace'), 'put_metric_data'),
+}
+
+
+def create_dispatcher(name: str):
+    create, batch_dispatch_method = DISPATCHERS[name]
+    dispatcher = create()
+    dispatcher._aws_service = StubAWSService()
+    dispatcher._batch_dispatch_method = getattr(dispatcher._aws_service, batch_dispatch_method)
+    dispatcher._individual_dispatch_method = Mock()
+    #  Initialising the client is not being measured, and DynamoDB's table resource is not needed by the stub
+    dispatcher._initialise_aws_client = lambda: None
+    dispatcher.queue_url = 'stub_queue_url'
+    return dispatcher
+
+
+def create_payloads() -> list:
+    """ Create the payloads, with body sizes drawn from PAYLOAD_SIZES, the same for every run """
+    rng = random.Random(SEED)
+    shares, sizes = zip(*PAYLOAD_SIZES)
+    return [{
+        'id': str(i),
+        'created': '2020-01-01T00:00:00',
+        'score': rng.random() * 100,
+        'tags': {'source': 'benchmark', 'weights': [rng.random() for _ in range(5)]},
+        'body': 'x' * rng.choices(sizes, weights=shares)[0]
+    } for i in range(RECORD_COUNT)]
+
+
+def create_metrics() -> list:
+    timestamp = datetime(2020, 1, 1)
+    return [{'metric_name': 'benchmark', 'value': i, 'timestamp': timestamp, 'dimensions': {'index': i % 10}}
+            for i in range(RECORD_COUNT)]
+
+
+def submit_all(dispatcher, records: list) -> list:
+    """ Submit the records, flushing after each FLUSH_SIZE of them, and return the time taken by each flush """
+    flush_times = []
+    for i in range(0, len(records), FLUSH_SIZE):
+        if isinstance(dispatcher, CloudwatchBatchDispatcher):
+            for metric in records[i:i + FLUSH_SIZE]:
+                dispatcher.submit_metric(**metric)
+        else:
+            for payload in records[i:i + FLUSH_SIZE]:
+                #  Dynamo converts floats in the payload itself, so every dispatcher is given its own copy
+                dispatcher.submit_payload(dict(payload))
+        start = perf_counter()
+        dispatcher.flush_payloads()
+        flush_times.append(perf_counter() - start)
+    return flush_times
+
+
+def benchmark_dispatcher(name: str, records: list) -> dict:
+    """ Return the best throughput of several rounds, with the flush latency of that round, and the peak memory """
+    best = None
+    for _ in range(ROUNDS):
+        dispatcher = create_dispatcher(name)
+        start = perf_counter()
+        flush_times = sorted(submit_all(dispatcher, records))
+        records_per_second = len(records) / (perf_counter() - start)
+        if best is None or records_per_second > best['records_per_second']:
+            best = {
+                'records_per_second': records_per_second,
+                'flush_p50_ms': median(flush_times) * 1000,
+                'flush_p99_ms': flush_times[int(len(flush_times) * 0.99)] * 1000
+            }
+    dispatcher = create_dispatcher(name)
+    tracemalloc.start()
+    submit_all(dispatcher, records)
+    best['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return best
+
+
+def benchmark_utils(payloads: list) -> dict:
+    """ Return the operations per second of each of the helpers used on the submit path """
+    helpers = {
+        'convert_floats_in_dict_to_decimals': lambda p: convert_floats_in_dict_to_decimals(dict(p)),
+        'get_byte_size_of_dict_or_list': get_byte_size_of_dict_or_list,
+        'DecimalEncoder': lambda p: dumps(p, cls=DecimalEncoder),
+        'chunks': lambda p: list(chunks(p['tags']['weights'], 2))
+    }
+    results = {}
+    for name, helper in helpers.items():
+        best = 0
+        for _ in range(ROUNDS):
+            start = perf_counter()
+            for payload in payloads:
+                helper(payload)
+            best = max(best, len(payloads) / (perf_counter() - start))
+        results[name] = {'operations_per_second': best}
+    return results
+
+
+def run() -> dict:
+    payloads = create_payloads()
+    metrics = create_metrics()
+    results = {name: benchmark_dispatcher(name, metrics if name == 'CloudwatchBatchDispatcher' else payloads)
+               for name in DISPATCHERS}
+    results.update(benchmark_utils(payloads))
+    return results
+
+
+def run_repeatedly(repeat: int) -> dict:
+    """ Run the suite repeat times, returning the median of each result, which is less noisy than a single run """
+    runs = [run() for _ in range(repeat)]
+    return {name: {measurement: median(r[name][measurement] for r in runs) for measurement in measurements}
+            for name, measurements in runs[0].items()}
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Return a description of each result which is more than the tolerance (a fraction) worse than the baseline """
+    regressions = []
+    for name, measurements in results.items():
+        for measurement, value in measurements.items():
+            expected = baseline.get(name, {}).get(measurement)
+            if not expected or HIGHER_IS_BETTER[measurement] is None:
+                continue
+            change = (value - expected) / expected
+            if not HIGHER_IS_BETTER[measurement]:
+                change = -change
+            if change < -tolerance:
+                regressions.append(f"{name} {measurement}: {value:.2f} against a baseline of {expected:.2f}")
+    return regressions
+
+
+def print_results(results: dict, repeat: int = 1):
+    print(f"{RECORD_COUNT} records, best of {ROUNDS} rounds, median of {repeat} runs")
+    print("dispatcher                 | records/s | flush p50 (ms) | flush p99 (ms) | peak memory (KB)")
+    for name in DISPATCHERS:
+        r = results[name]
+        print(f"{name:<26} | {r['records_per_second']:>9.0f} | {r['flush_p50_ms']:>14.3f} | "
+              f"{r['flush_p99_ms']:>14.3f} | {r['peak_memory_kb']:>16.0f}")
+    print("utils helper                       | operations/s")
+    for name, r in results.items():
+        if name not in DISPATCHERS:
+            print(f"{name:<34} | {r['operations_per_second']:>12.0f}")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every dispatcher against stub AWS services")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Path of the baseline results file")
+    parser.add_argument('--save', action='store_true', help="Save the results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="Compare the results with the baseline")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Number of runs of the suite to take the median of (default %(default)s)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction by which a result may be worse than the baseline (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_repeatedly(args.repeat)
+    print_results(results, args.repeat)
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
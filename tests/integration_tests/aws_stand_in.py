@@ -0,0 +1,257 @@
+"""
+A local HTTP stand-in for the SQS, Kinesis, DynamoDB and Cloudwatch endpoints used by the dispatchers.
+
+Unlike an in-process stub, requests made through the stand-in go through all of botocore: serialisation, signing, HTTP
+and response parsing. It implements send_message_batch, send_message, get_queue_url, put_records, put_record,
+batch_write_item, put_item and put_metric_data, for the protocols used by current versions of botocore (JSON for SQS,
+Kinesis and DynamoDB, RPC v2 CBOR, JSON or query for Cloudwatch). Latency, throttling and partial failures can be
+injected. Signatures are not checked, so any credentials may be used.
+
+    with AWSStandIn(latency=0.005, failure_rate=0.1) as stand_in:
+        dispatcher = SQSBatchDispatcher('queue', **stand_in.aws_service_args())
+"""
+import json
+import random
+import threading
+from base64 import b64decode
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+
+#  The error code returned for a throttled request to each service, all of which the dispatchers will retry
+THROTTLING_ERROR_CODES = {
+    'sqs': 'RequestThrottled',
+    'kinesis': 'ProvisionedThroughputExceededException',
+    'dynamodb': 'ProvisionedThroughputExceededException',
+    'cloudwatch': 'Throttling'
+}
+TARGET_PREFIXES = {
+    'AmazonSQS': 'sqs',
+    'Kinesis_20131202': 'kinesis',
+    'DynamoDB_20120810': 'dynamodb',
+    'GraniteServiceVersion20100801': 'cloudwatch'
+}
+
+
+class ThrottledRequest(Exception):
+    pass
+
+
+def encode_cbor_string_map(d: dict) -> bytes:
+    """ Encode a (small) map of strings to strings as CBOR, enough for an RPC v2 CBOR error response """
+    def encode_string(s: str) -> bytes:
+        encoded = s.encode('utf-8')
+        if len(encoded) < 24:
+            return bytes([0x60 | len(encoded)]) + encoded
+        return bytes([0x79]) + len(encoded).to_bytes(2, 'big') + encoded
+    return bytes([0xa0 | len(d)]) + b''.join(encode_string(k) + encode_string(v) for k, v in d.items())
+
+
+def decode_cbor(body: bytes):
+    """ Decode a CBOR request body, using botocore's own CBOR parser """
+    from botocore.parsers import BaseCBORParser
+    if not body:
+        return {}
+    parser = BaseCBORParser()
+    return parser.parse_data_item(parser.get_peekable_stream_from_bytes(body))
+
+
+class AWSStandIn:
+    """
+    A local HTTP server standing in for the AWS services, run in a background thread. Every operation received is
+    recorded in `requests`, as a tuple of the service, the operation and the (decoded) request body
+    """
+
+    def __init__(self, latency: float = 0, throttle_rate: float = 0, failure_rate: float = 0, seed: int = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        """
+        :param latency: float - Seconds each request takes to be answered
+        :param throttle_rate: float - Fraction (between 0 and 1) of requests rejected with the service's throttling
+        error. Calls to get_queue_url, which a dispatcher makes once, are not throttled
+        :param failure_rate: float - Fraction (between 0 and 1) of the entries in each batch request which fail, as a
+        partial failure of the batch. Individual requests are not failed
+        :param seed: int - Seed for choosing the requests which are throttled and the entries which fail
+        :param host: str - Address to listen on
+        :param port: int - Port to listen on, any free port if 0
+        """
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self._thread = None
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def aws_service_args(self) -> dict:
+        """ Return the keyword arguments for a dispatcher (or boto3 client) to send its requests to the stand-in """
+        return {
+            'endpoint_url': self.endpoint_url,
+            'region_name': 'us-east-1',
+            'aws_access_key_id': 'stand-in',
+            'aws_secret_access_key': 'stand-in'
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def get_requests(self, operation: str) -> list:
+        """ Return the body of each request received for the operation, e.g. 'SendMessageBatch' """
+        with self._lock:
+            return [body for _, name, body in self.requests if name == operation]
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def handle(self, service: str, operation: str, body: dict) -> dict:
+        """ Record the request and return the response body, raising ThrottledRequest if it is to be throttled """
+        if self.latency:
+            sleep(self.latency)
+        with self._lock:
+            self.requests.append((service, operation, body))
+        if operation != 'GetQueueUrl' and self._chance(self.throttle_rate):
+            raise ThrottledRequest(THROTTLING_ERROR_CODES[service])
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"{service} operation '{operation}' is not implemented by the stand-in")
+        return handler(body)
+
+    def _GetQueueUrl(self, body: dict) -> dict:
+        return {'QueueUrl': f"{self.endpoint_url}/000000000000/{body['QueueName']}"}
+
+    def _SendMessage(self, body: dict) -> dict:
+        return {'MessageId': str(uuid4()), 'MD5OfMessageBody': md5(body['MessageBody'].encode('utf-8')).hexdigest()}
+
+    def _SendMessageBatch(self, body: dict) -> dict:
+        response = {'Successful': [], 'Failed': []}
+        for entry in body['Entries']:
+            if self._chance(self.failure_rate):
+                response['Failed'].append({'Id': entry['Id'], 'SenderFault': False, 'Code': 'InternalError',
+                                           'Message': 'Injected failure'})
+            else:
+                response['Successful'].append({'Id': entry['Id'], **self._SendMessage(entry)})
+        return response
+
+    def _PutRecord(self, body: dict) -> dict:
+        return {'ShardId': 'shardId-000000000000', 'SequenceNumber': str(uuid4().int)}
+
+    def _PutRecords(self, body: dict) -> dict:
+        records = []
+        for _ in body['Records']:
+            if self._chance(self.failure_rate):
+                records.append({'ErrorCode': 'ProvisionedThroughputExceededException',
+                                'ErrorMessage': 'Injected failure'})
+            else:
+                records.append(self._PutRecord(body))
+        return {'FailedRecordCount': sum('ErrorCode' in r for r in records), 'Records': records}
+
+    def _PutItem(self, body: dict) -> dict:
+        return {}
+
+    def _BatchWriteItem(self, body: dict) -> dict:
+        unprocessed_items = {}
+        for table, write_requests in body['RequestItems'].items():
+            failed = [request for request in write_requests if self._chance(self.failure_rate)]
+            if failed:
+                unprocessed_items[table] = failed
+        return {'UnprocessedItems': unprocessed_items}
+
+    def _PutMetricData(self, body: dict) -> dict:
+        return {}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    #  The headers and body are written separately, with Nagle's algorithm the body waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        stand_in = self.server.stand_in
+        if self.headers.get('smithy-protocol') == 'rpc-v2-cbor':
+            protocol, (service, operation, request) = 'cbor', self._parse_cbor_request(body)
+        elif self.headers.get('X-Amz-Target'):
+            protocol, (service, operation, request) = 'json', self._parse_json_request(body)
+        else:
+            protocol, (service, operation, request) = 'query', self._parse_query_request(body)
+        try:
+            response = stand_in.handle(service, operation, request)
+        except ThrottledRequest as e:
+            self._respond_with_error(protocol, str(e))
+        else:
+            self._respond(protocol, response, operation)
+
+    def _parse_cbor_request(self, body: bytes) -> tuple:
+        #  The path is /service/<service name>/operation/<operation name>
+        parts = self.path.strip('/').split('/')
+        return TARGET_PREFIXES[parts[1]], parts[3], decode_cbor(body)
+
+    def _parse_json_request(self, body: bytes) -> tuple:
+        prefix, operation = self.headers['X-Amz-Target'].split('.')
+        request = json.loads(body or b'{}')
+        for record in request.get('Records', []):
+            record['Data'] = b64decode(record['Data'])
+        return TARGET_PREFIXES[prefix], operation, request
+
+    def _parse_query_request(self, body: bytes) -> tuple:
+        request = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+        return 'cloudwatch', request.pop('Action'), request
+
+    def _respond(self, protocol: str, response: dict, operation: str):
+        if protocol == 'cbor':
+            self._send(200, encode_cbor_string_map({}), 'application/cbor', {'smithy-protocol': 'rpc-v2-cbor'})
+        elif protocol == 'json':
+            self._send(200, json.dumps(response).encode('utf-8'), 'application/x-amz-json-1.0')
+        else:
+            body = (f'<{operation}Response xmlns="http://monitoring.amazonaws.com/doc/2010-08-01/">'
+                    f'<ResponseMetadata><RequestId>{uuid4()}</RequestId></ResponseMetadata></{operation}Response>')
+            self._send(200, body.encode('utf-8'), 'text/xml')
+
+    def _respond_with_error(self, protocol: str, code: str):
+        message = 'Injected throttling'
+        if protocol == 'cbor':
+            self._send(400, encode_cbor_string_map({'__type': code, 'message': message}), 'application/cbor',
+                       {'smithy-protocol': 'rpc-v2-cbor'})
+        elif protocol == 'json':
+            self._send(400, json.dumps({'__type': code, 'message': message}).encode('utf-8'),
+                       'application/x-amz-json-1.0', {'x-amzn-query-error': f'{code};Sender'})
+        else:
+            body = (f'<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>{message}</Message>'
+                    f'</Error><RequestId>{uuid4()}</RequestId></ErrorResponse>')
+            self._send(400, body.encode('utf-8'), 'text/xml')
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
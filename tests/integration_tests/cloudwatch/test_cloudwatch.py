@@ -34,3 +34,21 @@ class TestCloudwatch(TestCase):
                 {'MetricName': 'metricky', 'Timestamp': datetime(2020, 2, 2, 1, 1, 1), 'Value': 6, 'Unit': 'Count'}
             ], 'Namespace': 'namey_name'})
         ])
+
+    def test_concurrent_flush(self):
+        cw_client = CloudwatchBatchDispatcher(namespace='namey_name', max_batch_size=5, max_concurrency=2)
+
+        mock_boto3 = Mock()
+        cw_client._aws_service = mock_boto3
+        cw_client._batch_dispatch_method = Mock()
+
+        for i in range(0, 12):
+            cw_client.submit_metric(metric_name='metricky', value=i, timestamp=datetime(2020, 2, 2, 1, 1, 1))
+
+        self.assertEqual(2, cw_client._batch_dispatch_method.call_count)
+        cw_client.flush_payloads()
+        self.assertEqual(3, cw_client._batch_dispatch_method.call_count)
+        sent_values = sorted(
+            metric['Value'] for c in cw_client._batch_dispatch_method.call_args_list for metric in c[1]['MetricData']
+        )
+        self.assertEqual(list(range(0, 12)), sent_values)
@@ -28,7 +28,7 @@ class TestSqsStandard(TestCase):
 
         mock_boto3 = Mock()
         dy_client._aws_service = mock_boto3
-        dy_client._dynamo_table = Mock()
+        dy_client._individual_dispatch_method = Mock()
 
         test_payloads = [
             {'m_id': 1, 'message': 'message contents 1'},
@@ -56,7 +56,7 @@ class TestSqsStandard(TestCase):
         dy_client._batch_dispatch_method.assert_called_once_with(
             **{'RequestItems': {'test_table': [{'PutRequest': {'Item': pl}} for pl in test_payloads]}}
         )
-        dy_client._dynamo_table.put_item.assert_has_calls([
+        dy_client._individual_dispatch_method.assert_has_calls([
             call(**{'Item': {'m_id': 1, 'message': 'message contents 1'}}),
             call(**{'Item': {'m_id': 2, 'message': 'message contents 2'}}),
             call(**{'Item': {'m_id': 3, 'message': 'message contents 3'}}),
@@ -74,8 +74,7 @@ class TestSqsStandard(TestCase):
         mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo")
         mock_boto3 = Mock()
         dy_client._aws_service = mock_boto3
-        dy_client._dynamo_table = Mock()
-        dy_client._dynamo_table.put_item = Mock(side_effect=[mock_client_error for _ in range(0, 50)])
+        dy_client._individual_dispatch_method = Mock(side_effect=[mock_client_error for _ in range(0, 50)])
 
         test_payloads = [
             {'m_id': 1, 'message': 'message contents 1'},
@@ -99,7 +98,7 @@ class TestSqsStandard(TestCase):
         dy_client._batch_dispatch_method.assert_called_once_with(
             **{'RequestItems': {'test_table': [{'PutRequest': {'Item': pl}} for pl in test_payloads]}}
         )
-        dy_client._dynamo_table.put_item.assert_has_calls([
+        dy_client._individual_dispatch_method.assert_has_calls([
             call(**{'Item': {'m_id': 1, 'message': 'message contents 1'}}),
             call(**{'Item': {'m_id': 1, 'message': 'message contents 1'}}),
             call(**{'Item': {'m_id': 1, 'message': 'message contents 1'}}),
@@ -133,8 +132,7 @@ class TestSqsStandard(TestCase):
         mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo")
         mock_boto3 = Mock()
         dy_client._aws_service = mock_boto3
-        dy_client._dynamo_table = Mock()
-        dy_client._dynamo_table.put_item = Mock()
+        dy_client._individual_dispatch_method = Mock()
 
         test_payloads = [
             {'m_id': 1, 'message': 'message contents 1'},
@@ -159,5 +157,30 @@ class TestSqsStandard(TestCase):
             call(**{'RequestItems': {'test_table': [{'PutRequest': {'Item': pl}} for pl in test_payloads]}}),
             call(**{'RequestItems': {'test_table': [{'PutRequest': {'Item': pl}} for pl in test_payloads]}})
         ])
-        dy_client._dynamo_table.put_item.assert_not_called()
+        dy_client._individual_dispatch_method.assert_not_called()
         self.assertEqual(test_payloads, response)
+
+    def test_concurrent_flush_aggregates_unprocessed_items_in_order(self):
+        mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo")
+        dy_client = DynamoBatchDispatcher(dynamo_table_name='test_table', partition_key='m_id', max_batch_size=5,
+                                          max_concurrency=4)
+
+        mock_boto3 = Mock()
+        dy_client._aws_service = mock_boto3
+        dy_client._individual_dispatch_method = Mock()
+        dy_client._individual_dispatch_method.side_effect = mock_client_error
+
+        def batch_write_item(RequestItems):
+            return {'UnprocessedItems': {'test_table': [
+                item for item in RequestItems['test_table'] if item['PutRequest']['Item']['m_id'] % 5 == 0
+            ]}}
+
+        dy_client._batch_dispatch_method = Mock(side_effect=batch_write_item)
+
+        test_payloads = [{'m_id': i} for i in range(1, 18)]
+        for test_payload in test_payloads:
+            dy_client.submit_payload(test_payload)
+        dy_client.flush_payloads()
+
+        self.assertEqual(4, dy_client._batch_dispatch_method.call_count)
+        self.assertEqual([{'m_id': 5}, {'m_id': 10}, {'m_id': 15}], dy_client.unprocessed_items)
@@ -0,0 +1,103 @@
+from json import loads
+from unittest import TestCase
+
+from botocore.config import Config
+
+from boto3_batch_utils import CloudwatchBatchDispatcher, DynamoBatchDispatcher, KinesisBatchDispatcher, \
+    SQSBatchDispatcher, SQSFifoBatchDispatcher
+from boto3_batch_utils.client_cache import clear_aws_service_cache
+from boto3_batch_utils.Cloudwatch import cloudwatch_dimension
+from boto3_batch_utils.compression import decode_payload
+from boto3_batch_utils.retry import RetryPolicy
+
+from ..aws_stand_in import AWSStandIn
+
+
+class EndToEnd(TestCase):
+
+    def setUp(self):
+        clear_aws_service_cache()
+        self.stand_in = None
+
+    def tearDown(self):
+        self.stand_in.stop()
+        clear_aws_service_cache()
+
+    def start_stand_in(self, **kwargs) -> dict:
+        """ Start the stand-in and return the dispatcher arguments which send to it, with botocore retries disabled """
+        self.stand_in = AWSStandIn(seed=1, **kwargs).start()
+        return dict(self.stand_in.aws_service_args(), config=Config(retries={'total_max_attempts': 1}),
+                    retry_policy=RetryPolicy(max_attempts=10, base_delay=0.001))
+
+    def test_sqs(self):
+        sqs = SQSBatchDispatcher('test_queue', **self.start_stand_in())
+        for i in range(15):
+            sqs.submit_payload({'id': i})
+        self.assertEqual([], sqs.flush_payloads())
+        entries = [e for r in self.stand_in.get_requests('SendMessageBatch') for e in r['Entries']]
+        self.assertEqual([{'id': i} for i in range(15)], [loads(e['MessageBody']) for e in entries])
+
+    def test_sqs_fifo_partial_failures_are_sent_individually(self):
+        sqs = SQSFifoBatchDispatcher('test_queue.fifo', **self.start_stand_in(failure_rate=0.3))
+        for i in range(20):
+            sqs.submit_payload({'id': i})
+        self.assertEqual([], sqs.flush_payloads())
+        messages = self.stand_in.get_requests('SendMessage')
+        self.assertTrue(messages)
+        self.assertTrue(all('Id' not in message for message in messages))
+        self.assertEqual(len(messages), sqs.stats()['individual_sends'])
+
+    def test_kinesis_throttled_requests_are_retried(self):
+        kinesis = KinesisBatchDispatcher('test_stream', partition_key_identifier='id',
+                                         **self.start_stand_in(throttle_rate=0.3, failure_rate=0.1))
+        for i in range(600):
+            kinesis.submit_payload({'id': str(i)})
+        self.assertEqual([], kinesis.flush_payloads())
+        self.assertGreater(kinesis.stats()['retries'], 0)
+        records = {loads(r['Data'])['id'] for request in self.stand_in.get_requests('PutRecords')
+                   for r in request['Records']}
+        self.assertEqual({str(i) for i in range(600)}, records)
+
+    def test_compressed_sqs_messages(self):
+        sqs = SQSBatchDispatcher('test_queue', compression='gzip', **self.start_stand_in())
+        for i in range(15):
+            sqs.submit_payload({'id': i, 'text': 'verbose ' * 100})
+        self.assertEqual([], sqs.flush_payloads())
+        entries = [e for r in self.stand_in.get_requests('SendMessageBatch') for e in r['Entries']]
+        self.assertEqual([{'id': i, 'text': 'verbose ' * 100} for i in range(15)],
+                         [decode_payload(e['MessageBody']) for e in entries])
+
+    def test_compressed_kinesis_records(self):
+        kinesis = KinesisBatchDispatcher('test_stream', partition_key_identifier='id', compression='zlib',
+                                         **self.start_stand_in(failure_rate=0.1))
+        for i in range(100):
+            kinesis.submit_payload({'id': str(i), 'text': 'verbose ' * 100})
+        self.assertEqual([], kinesis.flush_payloads())
+        records = {decode_payload(r['Data'])['id'] for request in self.stand_in.get_requests('PutRecords')
+                   for r in request['Records']}
+        self.assertEqual({str(i) for i in range(100)}, records)
+
+    def test_dynamo(self):
+        dynamo = DynamoBatchDispatcher('test_table', 'id', **self.start_stand_in(failure_rate=0.2))
+        for i in range(30):
+            dynamo.submit_payload({'id': str(i), 'value': 1.5})
+        self.assertEqual([], dynamo.flush_payloads())
+        items = [r['PutRequest']['Item'] for request in self.stand_in.get_requests('BatchWriteItem')
+                 for r in request['RequestItems']['test_table']]
+        self.assertEqual({'id': {'S': '0'}, 'value': {'N': '1.5'}}, items[0])
+        self.assertEqual(dynamo.stats()['individual_sends'], len(self.stand_in.get_requests('PutItem')))
+
+    def test_cloudwatch(self):
+        cloudwatch = CloudwatchBatchDispatcher('test_namespace', **self.start_stand_in(throttle_rate=0.5))
+        for i in range(25):
+            cloudwatch.submit_metric('test_metric', i, dimensions=cloudwatch_dimension('test', 'dimension'))
+        self.assertEqual([], cloudwatch.flush_payloads())
+        self.assertGreater(cloudwatch.stats()['throttled_retries'], 0)
+        metrics = [m for request in self.stand_in.get_requests('PutMetricData') for m in request['MetricData']]
+        self.assertEqual(list(range(25)), sorted({m['Value'] for m in metrics}))
+
+    def test_latency(self):
+        sqs = SQSBatchDispatcher('test_queue', **self.start_stand_in(latency=0.05))
+        sqs.submit_payload({'id': 1})
+        sqs.flush_payloads()
+        self.assertGreaterEqual(sqs.stats()['request_latency']['max'], 0.05)
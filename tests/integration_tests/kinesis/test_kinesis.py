@@ -1,9 +1,10 @@
 from unittest import TestCase
 from unittest.mock import patch, Mock, call
+from json import loads
 
 from botocore.exceptions import ClientError
 
-from boto3_batch_utils import KinesisBatchDispatcher
+from boto3_batch_utils import AdaptiveController, KinesisBatchDispatcher
 
 
 @patch('boto3_batch_utils.Base.boto3', Mock())
@@ -232,3 +233,60 @@ class TestKinesis(TestCase):
             call(Data='{"m_id": 2, "message": "message contents 2"}', PartitionKey='2', StreamName='test_stream')
         ])
         self.assertEqual(test_payloads, kinesis_client.unprocessed_items)
+
+    def test_concurrent_flush_aggregates_unprocessed_items_in_order(self):
+        mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Kinesis")
+        #  Without a partition_key_identifier records have no order to preserve, so batches may be sent concurrently
+        kinesis_client = KinesisBatchDispatcher(stream_name='test_stream', max_batch_size=10, max_concurrency=3)
+
+        mock_boto3 = Mock()
+        kinesis_client._aws_service = mock_boto3
+
+        def put_records(StreamName, Records):
+            if loads(Records[0]['Data'])['m_id'] == 11:
+                raise mock_client_error
+            return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+        kinesis_client._batch_dispatch_method = Mock(side_effect=put_records)
+
+        test_payloads = [{'m_id': i} for i in range(1, 31)]
+        for test_payload in test_payloads:
+            kinesis_client.submit_payload(test_payload)
+
+        self.assertEqual(7, kinesis_client._batch_dispatch_method.call_count)  # The failing batch is retried 4 times
+        self.assertEqual(test_payloads[10:20], kinesis_client.unprocessed_items)
+
+    @patch('boto3_batch_utils.Base.sleep')
+    def test_adaptive_batch_size_follows_failed_record_count(self, mock_sleep):
+        kinesis_client = KinesisBatchDispatcher(stream_name='test_stream', partition_key_identifier='m_id',
+                                                max_batch_size=8, adaptive_controller=AdaptiveController())
+
+        mock_boto3 = Mock()
+        kinesis_client._aws_service = mock_boto3
+        kinesis_client._individual_dispatch_method = Mock()
+        throttled = {'ErrorCode': 'ProvisionedThroughputExceededException', 'ErrorMessage': 'Rate exceeded'}
+
+        def put_records(StreamName, Records):
+            #  The first request is throttled, all of its records are rejected
+            if put_records.calls == 0:
+                put_records.calls += 1
+                return {'FailedRecordCount': len(Records), 'Records': [throttled for _ in Records]}
+            put_records.calls += 1
+            return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+        put_records.calls = 0
+        kinesis_client._batch_dispatch_method = Mock(side_effect=put_records)
+
+        for i in range(0, 8):
+            kinesis_client.submit_payload({'m_id': i})
+        #  The rejected records were re-sent after a pause, that success grew the batch size from 4 to 5
+        mock_sleep.assert_called_once_with(0.05)
+        self.assertEqual({'batch_size': 5, 'send_rate': None}, kinesis_client.effective_limits)
+
+        for i in range(8, 16):
+            kinesis_client.submit_payload({'m_id': i})
+        kinesis_client.flush_payloads()
+
+        sent_batch_sizes = [len(c[1]['Records']) for c in kinesis_client._batch_dispatch_method.call_args_list]
+        self.assertEqual([8, 8, 5, 3], sent_batch_sizes)
+        self.assertEqual({'batch_size': 7, 'send_rate': None}, kinesis_client.effective_limits)
+        self.assertEqual([], kinesis_client.unprocessed_items)
@@ -113,25 +113,25 @@ class TestSqsStandard(TestCase):
 
         sqs_client._batch_dispatch_method.assert_called_once()
         sqs_client._individual_dispatch_method.assert_has_calls([
-            call(**{'Id': 1, 'MessageBody': '{"m_id": 1, "message": "message contents 1"}',
+            call(**{'MessageBody': '{"m_id": 1, "message": "message contents 1"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 2, 'MessageBody': '{"m_id": 2, "message": "message contents 2"}',
+            call(**{'MessageBody': '{"m_id": 2, "message": "message contents 2"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 3, 'MessageBody': '{"m_id": 3, "message": "message contents 3"}',
+            call(**{'MessageBody': '{"m_id": 3, "message": "message contents 3"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 4, 'MessageBody': '{"m_id": 4, "message": "message contents 4"}',
+            call(**{'MessageBody': '{"m_id": 4, "message": "message contents 4"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 5, 'MessageBody': '{"m_id": 5, "message": "message contents 5"}',
+            call(**{'MessageBody': '{"m_id": 5, "message": "message contents 5"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 6, 'MessageBody': '{"m_id": 6, "message": "message contents 6"}',
+            call(**{'MessageBody': '{"m_id": 6, "message": "message contents 6"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 7, 'MessageBody': '{"m_id": 7, "message": "message contents 7"}',
+            call(**{'MessageBody': '{"m_id": 7, "message": "message contents 7"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 8, 'MessageBody': '{"m_id": 8, "message": "message contents 8"}',
+            call(**{'MessageBody': '{"m_id": 8, "message": "message contents 8"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 9, 'MessageBody': '{"m_id": 9, "message": "message contents 9"}',
+            call(**{'MessageBody': '{"m_id": 9, "message": "message contents 9"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'}),
-            call(**{'Id': 10, 'MessageBody': '{"m_id": 10, "message": "message contents 10"}',
+            call(**{'MessageBody': '{"m_id": 10, "message": "message contents 10"}',
                     'MessageGroupId': 'unset', 'QueueUrl': 'test_queue_url'})
         ], any_order=True)
 
@@ -219,25 +219,25 @@ class TestSqsStandard(TestCase):
             ], 'QueueUrl': 'test_queue_url'}
         )
         sqs_client._individual_dispatch_method.assert_has_calls([
-            call(Id=1, MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=1, MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=1, MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=1, MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=1, MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 1, "message": "message contents 1"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=2, MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=2, MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=2, MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=2, MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url'),
-            call(Id=2, MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
+            call(MessageBody='{"m_id": 2, "message": "message contents 2"}', MessageGroupId='unset',
                  QueueUrl='test_queue_url')
         ])
         self.assertEqual(test_payloads, sqs_client.unprocessed_items)
\ No newline at end of file
@@ -202,3 +202,28 @@ class TestSqsStandard(TestCase):
             call(MessageBody='{"m_id": 2, "message": "message contents 2"}', QueueUrl='test_queue_url')
         ])
         self.assertEqual(test_payloads, sqs_client.unprocessed_items)
+
+    def test_concurrent_flush_aggregates_unprocessed_items_in_order(self):
+        mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "SQS")
+        sqs_client = SQSBatchDispatcher(queue_name='test_standard_queue', max_concurrency=4)
+
+        mock_boto3 = Mock()
+        sqs_client._aws_service = mock_boto3
+        mock_boto3.get_queue_url.return_value = {'QueueUrl': 'test_queue_url'}
+
+        def send_message_batch(QueueUrl, Entries):
+            return {'Failed': [{'Id': e['Id'], 'SenderFault': False, 'Code': 'x', 'Message': 'badness'}
+                               for e in Entries if e['Id'] % 10 == 0]}
+
+        sqs_client._batch_dispatch_method = Mock(side_effect=send_message_batch)
+        sqs_client._individual_dispatch_method = Mock(side_effect=mock_client_error)
+
+        test_payloads = [{'m_id': i} for i in range(1, 36)]
+        for test_payload in test_payloads:
+            sqs_client.submit_payload(test_payload, message_id=test_payload['m_id'])
+        self.assertEqual(35, len(sqs_client._batch_payload))
+
+        sqs_client.flush_payloads()
+
+        self.assertEqual(4, sqs_client._batch_dispatch_method.call_count)
+        self.assertEqual([{'m_id': 10}, {'m_id': 20}, {'m_id': 30}], sqs_client.unprocessed_items)
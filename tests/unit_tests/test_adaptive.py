@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from boto3_batch_utils.adaptive import AdaptiveController
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_min_batch_size_less_than_one(self):
+        with self.assertRaises(ValueError) as context:
+            AdaptiveController(min_batch_size=0)
+        self.assertIn("min_batch_size '0' must be at least 1", str(context.exception))
+
+    def test_decrease_factor_out_of_range(self):
+        with self.assertRaises(ValueError) as context:
+            AdaptiveController(decrease_factor=1)
+        self.assertIn("decrease_factor '1' must be between 0 and 1", str(context.exception))
+
+    def test_increase_step_less_than_one(self):
+        with self.assertRaises(ValueError) as context:
+            AdaptiveController(increase_step=0)
+        self.assertIn("increase_step '0' must be at least 1", str(context.exception))
+
+    def test_base_send_delay_greater_than_max(self):
+        with self.assertRaises(ValueError) as context:
+            AdaptiveController(base_send_delay=2, max_send_delay=1)
+        self.assertIn("base_send_delay '2' must be greater than 0", str(context.exception))
+
+
+class Reset(TestCase):
+
+    def test_full_size_and_full_speed(self):
+        controller = AdaptiveController()
+        controller.reset(10)
+        controller.record_throttle()
+        controller.reset(20)
+        self.assertEqual(20, controller.batch_size)
+        self.assertEqual(0, controller.send_delay)
+
+
+class RecordThrottle(TestCase):
+
+    def test_multiplicative_decrease(self):
+        controller = AdaptiveController(base_send_delay=0.1, max_send_delay=10)
+        controller.reset(500)
+        sizes, delays = [], []
+        for _ in range(4):
+            controller.record_throttle()
+            sizes.append(controller.batch_size)
+            delays.append(controller.send_delay)
+        self.assertEqual([250, 125, 62, 31], sizes)
+        self.assertEqual([0.1, 0.2, 0.4, 0.8], delays)
+        self.assertEqual(4, controller.throttle_count)
+
+    def test_limits(self):
+        controller = AdaptiveController(min_batch_size=3, base_send_delay=0.1, max_send_delay=0.5)
+        controller.reset(10)
+        for _ in range(10):
+            controller.record_throttle()
+        self.assertEqual(3, controller.batch_size)
+        self.assertEqual(0.5, controller.send_delay)
+
+    def test_min_batch_size_greater_than_max_batch_size(self):
+        controller = AdaptiveController(min_batch_size=20)
+        controller.reset(10)
+        controller.record_throttle()
+        self.assertEqual(10, controller.batch_size)
+
+
+class RecordSuccess(TestCase):
+
+    def test_already_at_full_size_and_speed(self):
+        controller = AdaptiveController()
+        controller.reset(10)
+        controller.record_success()
+        self.assertEqual(10, controller.batch_size)
+        self.assertEqual(0, controller.send_delay)
+
+    def test_additive_increase(self):
+        controller = AdaptiveController(increase_step=2, base_send_delay=0.1)
+        controller.reset(10)
+        controller.record_throttle()
+        controller.record_throttle()
+        controller.record_throttle()
+        self.assertEqual((1, 0.4), (controller.batch_size, controller.send_delay))
+        controller.record_success()
+        self.assertEqual((3, 0.30000000000000004), (controller.batch_size, controller.send_delay))
+        for _ in range(3):
+            controller.record_success()
+        self.assertEqual((9, 0), (controller.batch_size, controller.send_delay))
+        controller.record_success()
+        controller.record_success()
+        self.assertEqual((10, 0), (controller.batch_size, controller.send_delay))
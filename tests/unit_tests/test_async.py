@@ -0,0 +1,375 @@
+import asyncio
+import threading
+from datetime import datetime
+from time import sleep
+from unittest import TestCase
+from unittest.mock import patch, Mock
+
+from botocore.exceptions import ClientError
+
+from boto3_batch_utils.deadline import Deadline
+from boto3_batch_utils.rate_limiter import RateLimiter
+from boto3_batch_utils.Async import AsyncCloudwatchBatchDispatcher, AsyncDynamoBatchDispatcher, \
+    AsyncKinesisBatchDispatcher, AsyncSQSBatchDispatcher, AsyncSQSFifoBatchDispatcher
+
+
+def mock_aws_service(dispatcher, batch_dispatch_method=None, individual_dispatch_method=None):
+    dispatcher._aws_service = Mock()
+    dispatcher._aws_service.get_queue_url.return_value = {'QueueUrl': 'test_queue_url'}
+    dispatcher._batch_dispatch_method = batch_dispatch_method or Mock(return_value={})
+    dispatcher._individual_dispatch_method = individual_dispatch_method or Mock()
+    return dispatcher
+
+
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class SubmitPayload(TestCase):
+
+    def test_batch_not_sent_until_full(self):
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=3))
+
+        async def run():
+            await sqs.submit_payload({'a': 1})
+            await sqs.submit_payload({'a': 2})
+
+        asyncio.run(run())
+        sqs._batch_dispatch_method.assert_not_called()
+        self.assertEqual(2, len(sqs._batch_payload))
+
+    def test_full_batch_sent_from_executor(self):
+        threads = []
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=2), Mock(
+            side_effect=lambda **kwargs: threads.append(threading.current_thread()) or {}))
+
+        async def run():
+            await sqs.submit_payload({'a': 1}, message_id='1')
+            await sqs.submit_payload({'a': 2}, message_id='2')
+
+        asyncio.run(run())
+        sqs._batch_dispatch_method.assert_called_once_with(
+            QueueUrl='test_queue_url', Entries=[{'Id': '1', 'MessageBody': '{"a": 1}'},
+                                                {'Id': '2', 'MessageBody': '{"a": 2}'}])
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual([], sqs._batch_payload)
+
+    def test_oversized_payload_raises_exception(self):
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=2))
+
+        with self.assertRaises(ValueError) as context:
+            asyncio.run(sqs.submit_payload({'a': 'x' * 262144}))
+        self.assertIn("exceeds the maximum payload size", str(context.exception))
+
+    def test_pending_payloads_flushed_when_the_deadline_becomes_near(self):
+        context = Mock(get_remaining_time_in_millis=Mock(return_value=2500))
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=3, deadline=Deadline(context)))
+
+        asyncio.run(sqs.submit_payload({'a': 1}, message_id='1'))
+        sqs._batch_dispatch_method.assert_called_once_with(
+            QueueUrl='test_queue_url', Entries=[{'Id': '1', 'MessageBody': '{"a": 1}'}])
+        self.assertEqual([], sqs._batch_payload)
+
+    def test_duplicate_message_id_is_skipped(self):
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=3))
+
+        async def run():
+            await sqs.submit_payload({'a': 1}, message_id='1')
+            await sqs.submit_payload({'a': 2}, message_id='1')
+
+        asyncio.run(run())
+        self.assertEqual(1, len(sqs._batch_payload))
+
+    def test_fifo_duplicate_deduplication_id_is_skipped(self):
+        sqs = mock_aws_service(AsyncSQSFifoBatchDispatcher('test_queue', max_batch_size=3))
+
+        async def run():
+            await sqs.submit_payload({'a': 1}, message_id='1', message_deduplication_id='abc')
+            await sqs.submit_payload({'a': 2}, message_id='2', message_deduplication_id='abc')
+
+        asyncio.run(run())
+        self.assertEqual(1, len(sqs._batch_payload))
+
+    def test_dynamo_duplicate_key_is_skipped(self):
+        dy = mock_aws_service(AsyncDynamoBatchDispatcher('test_table', 'p_key', max_batch_size=3))
+
+        async def run():
+            await dy.submit_payload({'p_key': 1, 'value': 1.5})
+            await dy.submit_payload({'p_key': 1, 'value': 2.5})
+
+        asyncio.run(run())
+        self.assertEqual(1, len(dy._batch_payload))
+
+    def test_cloudwatch_submit_metric(self):
+        cw = mock_aws_service(AsyncCloudwatchBatchDispatcher('test_space', max_batch_size=2))
+        timestamp = datetime(2020, 2, 2, 1, 1, 1)
+
+        async def run():
+            await cw.submit_metric('met', 1, timestamp=timestamp)
+            await cw.submit_metric('met', 2, timestamp=timestamp)
+
+        asyncio.run(run())
+        cw._batch_dispatch_method.assert_called_once_with(Namespace='test_space', MetricData=[
+            {'MetricName': 'met', 'Timestamp': timestamp, 'Value': 1, 'Unit': 'Count'},
+            {'MetricName': 'met', 'Timestamp': timestamp, 'Value': 2, 'Unit': 'Count'}
+        ])
+
+    def test_submit_payloads(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', partition_key_identifier='id',
+                                                          max_batch_size=2), Mock(return_value={'FailedRecordCount': 0}))
+
+        async def payloads():
+            return [{'id': i} for i in range(5)]
+
+        async def run():
+            await kn.submit_payloads(await payloads())
+
+        asyncio.run(run())
+        self.assertEqual(2, kn._batch_dispatch_method.call_count)
+        self.assertEqual([{'id': 4}], [payload.source for payload in kn._batch_payload])
+
+    def test_submit_payloads_waits_for_buffer_space(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=2, max_buffered_payloads=2),
+                              Mock(side_effect=lambda **kwargs: sleep(0.01) or {'FailedRecordCount': 0}))
+        asyncio.run(kn.submit_payloads({'id': i} for i in range(7)))
+        self.assertEqual(3, kn._batch_dispatch_method.call_count)
+        self.assertEqual(0, kn.dropped_payload_count)
+
+    def test_stats(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=2, max_concurrency=2),
+                              Mock(return_value={'FailedRecordCount': 0}))
+
+        async def run():
+            await kn.submit_payloads({'id': i} for i in range(5))
+            await kn.flush_payloads()
+
+        asyncio.run(run())
+        stats = kn.stats()
+        self.assertEqual(5, stats['payloads_sent'])
+        self.assertEqual(3, stats['batches_sent'])
+        #  The first two batches are sent together
+        self.assertEqual(2, stats['flushes'])
+        self.assertEqual(3, stats['request_latency']['count'])
+
+    def test_cloudwatch_submit_metrics(self):
+        cw = mock_aws_service(AsyncCloudwatchBatchDispatcher('test_space', max_batch_size=2))
+        timestamp = datetime(2020, 2, 2, 1, 1, 1)
+        asyncio.run(cw.submit_metrics({'metric_name': 'met', 'value': i, 'timestamp': timestamp} for i in range(2)))
+        cw._batch_dispatch_method.assert_called_once_with(Namespace='test_space', MetricData=[
+            {'MetricName': 'met', 'Timestamp': timestamp, 'Value': 0, 'Unit': 'Count'},
+            {'MetricName': 'met', 'Timestamp': timestamp, 'Value': 1, 'Unit': 'Count'}
+        ])
+
+
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class FlushPayloads(TestCase):
+
+    def test_empty_payload_list(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=3))
+        self.assertEqual([], asyncio.run(kn.flush_payloads()))
+        kn._batch_dispatch_method.assert_not_called()
+
+    def test_partial_batch_is_sent(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', partition_key_identifier='id',
+                                                          max_batch_size=3),
+                              Mock(return_value={'FailedRecordCount': 0, 'Records': [{}]}))
+
+        async def run():
+            await kn.submit_payload({'id': 1})
+            return await kn.flush_payloads()
+
+        self.assertEqual([], asyncio.run(run()))
+        kn._batch_dispatch_method.assert_called_once_with(StreamName='test_stream',
+                                                          Records=[{'Data': '{"id": 1}', 'PartitionKey': '1'}])
+
+    def test_context_manager_flushes_on_exit(self):
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', partition_key_identifier='id',
+                                                          max_batch_size=3),
+                              Mock(return_value={'FailedRecordCount': 0, 'Records': [{}]}))
+
+        async def run():
+            async with kn as dispatcher:
+                await dispatcher.submit_payload({'id': 1})
+            return kn._batch_dispatch_method.call_count
+
+        self.assertEqual(1, asyncio.run(run()))
+
+    def test_batches_are_sent_concurrently(self):
+        in_flight = []
+        max_in_flight = []
+        lock = threading.Lock()
+
+        def put_records(StreamName, Records):
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+            sleep(0.02)
+            with lock:
+                in_flight.pop()
+            return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=2, max_concurrency=4),
+                              Mock(side_effect=put_records))
+
+        async def run():
+            for i in range(7):
+                await kn.submit_payload({'id': i})
+            await kn.flush_payloads()
+
+        asyncio.run(run())
+        self.assertEqual(4, kn._batch_dispatch_method.call_count)
+        self.assertGreater(max(max_in_flight), 1)
+        self.assertLessEqual(max(max_in_flight), 4)
+
+    def test_fifo_batches_of_concurrent_producers_are_sent_one_at_a_time_in_order(self):
+        in_flight = []
+        max_in_flight = []
+        sent = []
+        submitted = []
+        lock = threading.Lock()
+
+        def send_message_batch(QueueUrl, Entries):
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+            sleep(0.05)
+            with lock:
+                in_flight.pop()
+            sent.extend(entry['Id'] for entry in Entries)
+            return {}
+
+        sqs = mock_aws_service(AsyncSQSFifoBatchDispatcher('test_queue', max_batch_size=2),
+                               Mock(side_effect=send_message_batch))
+
+        async def produce(producer):
+            for i in range(4):
+                submitted.append(f"{producer}-{i}")
+                await sqs.submit_payload({'id': i}, message_id=f"{producer}-{i}", message_group_id='group')
+
+        async def run():
+            await asyncio.gather(produce('a'), produce('b'))
+            await sqs.flush_payloads()
+
+        asyncio.run(run())
+        self.assertEqual(submitted, sent)
+        self.assertEqual(1, max(max_in_flight))
+
+    def test_event_loop_is_not_blocked_while_sending(self):
+        ticks = []
+        ticks_during_send = []
+
+        def slow_send(**kwargs):
+            sleep(0.1)
+            ticks_during_send.append(len(ticks))
+            return {'UnprocessedItems': {}}
+
+        dy = mock_aws_service(AsyncDynamoBatchDispatcher('test_table', 'p_key', max_batch_size=2),
+                              Mock(side_effect=slow_send))
+
+        async def tick():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await dy.submit_payload({'p_key': 1})
+            await asyncio.gather(dy.flush_payloads(), tick())
+
+        asyncio.run(run())
+        self.assertEqual([5], ticks_during_send)
+
+    def test_unprocessed_items_are_aggregated_in_batch_order(self):
+        mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "SQS")
+
+        def send_message_batch(QueueUrl, Entries):
+            sleep(0.001 * (40 - int(Entries[0]['Id'])))
+            return {'Failed': [{'Id': e['Id'], 'SenderFault': False, 'Message': 'badness'}
+                               for e in Entries if int(e['Id']) % 10 == 0]}
+
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_concurrency=4),
+                               Mock(side_effect=send_message_batch), Mock(side_effect=mock_client_error))
+
+        async def run():
+            for i in range(1, 36):
+                await sqs.submit_payload({'m_id': i}, message_id=str(i))
+            return await sqs.flush_payloads()
+
+        self.assertEqual([{'m_id': 10}, {'m_id': 20}, {'m_id': 30}], asyncio.run(run()))
+
+    def test_batch_failure_added_to_unprocessed_items(self):
+        mock_client_error = ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "SQS")
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=2),
+                               Mock(side_effect=mock_client_error))
+
+        async def run():
+            await sqs.submit_payload({'a': 1})
+            await sqs.submit_payload({'a': 2})
+            return await sqs.flush_payloads()
+
+        self.assertEqual([{'a': 1}, {'a': 2}], asyncio.run(run()))
+        self.assertEqual(5, sqs._batch_dispatch_method.call_count)  # Retries 4 times
+
+    def test_failure_callback(self):
+        failures = []
+        sqs = mock_aws_service(AsyncSQSBatchDispatcher('test_queue', max_batch_size=2, max_concurrency=2,
+                                                       failure_callback=failures.extend, retain_unprocessed_items=False),
+                               Mock(side_effect=ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "SQS")))
+
+        async def run():
+            for i in range(1, 5):
+                await sqs.submit_payload({'a': i})
+            return await sqs.flush_payloads()
+
+        self.assertEqual([], asyncio.run(run()))
+        self.assertEqual([{'a': 1}, {'a': 2}, {'a': 3}, {'a': 4}], failures)
+
+
+    def test_rate_limiter_yields_to_event_loop(self):
+        ticks = []
+        ticks_at_send = []
+
+        def put_records(StreamName, Records):
+            ticks_at_send.append(len(ticks))
+            return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=2, max_concurrency=2,
+                                                          rate_limiter=RateLimiter(records_per_second=10,
+                                                                                   burst_seconds=0.2)),
+                              Mock(side_effect=put_records))
+
+        async def tick():
+            for _ in range(10):
+                ticks.append(1)
+                await asyncio.sleep(0.02)
+
+        async def run():
+            for i in range(3):
+                await kn.submit_payload({'id': i})
+            await asyncio.gather(kn.flush_payloads(), tick())
+
+        asyncio.run(run())
+        self.assertEqual(2, kn._batch_dispatch_method.call_count)
+        #  The second batch waited ~0.1s for the rate limiter, without blocking the event loop
+        self.assertGreaterEqual(ticks_at_send[1] - ticks_at_send[0], 3)
+
+    def test_block_policy_bounds_payloads_held_by_concurrent_producers(self):
+        buffered_at_send = []
+
+        def put_records(StreamName, Records):
+            buffered_at_send.append(kn._buffered_payload_count)
+            sleep(0.01)
+            return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+        kn = mock_aws_service(AsyncKinesisBatchDispatcher('test_stream', max_batch_size=2, max_concurrency=2,
+                                                          max_buffered_payloads=4),
+                              Mock(side_effect=put_records))
+
+        async def produce(producer):
+            for i in range(10):
+                await kn.submit_payload({'id': f"{producer}-{i}"})
+
+        async def run():
+            await asyncio.gather(*(produce(producer) for producer in range(8)))
+            await kn.flush_payloads()
+
+        asyncio.run(run())
+        self.assertEqual(80, sum(len(c.kwargs['Records']) for c in kn._batch_dispatch_method.call_args_list))
+        self.assertLessEqual(max(buffered_at_send), 5)
+        self.assertEqual(0, kn._buffered_payload_count)
@@ -1,9 +1,22 @@
+import logging
+import threading
+from time import monotonic, sleep
+from tempfile import TemporaryDirectory
 from unittest import TestCase
-from unittest.mock import patch, Mock, call
+from unittest.mock import patch, Mock, MagicMock, call
 
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.adaptive import AdaptiveController
+from boto3_batch_utils.Base import BaseDispatcher, BufferFullError
+from boto3_batch_utils.circuit_breaker import CircuitBreaker
+from boto3_batch_utils.client_cache import clear_aws_service_cache
+from boto3_batch_utils.deadline import Deadline
+from boto3_batch_utils.rate_limiter import RateLimiter
+from boto3_batch_utils.retry import RetryPolicy
+from boto3_batch_utils.utils import get_byte_size_of_dict_or_list, BatchRecord
+from boto3_batch_utils.wal import WriteAheadLog
 
 
 class MockClient:
@@ -19,6 +32,15 @@ class MockClient:
         pass
 
 
+class FakeLambdaContext:
+
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
 mock_boto3_interface_type_mapper = {
     'test_subject': 'client'
 }
@@ -64,6 +86,15 @@ class TestValidateInitialisation(TestCase):
             base._validate_initialisation()
         self.assertIn("Requested max_batch_size '2' exceeds the test_subject maximum", str(context.exception))
 
+    def test_max_concurrency_of_ordered_dispatcher_raises_exception(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, max_concurrency=2)
+        base._aws_service_batch_max_payloads = 1
+        base._preserve_payload_order = True
+
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("Requested max_concurrency '2' must be 1 for", str(context.exception))
+
 
 @patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
@@ -83,6 +114,34 @@ class InitialiseAwsClient(TestCase):
         self.assertEqual('https://dummy_endpoint:54321/', base._aws_service.kwargs['endpoint_url'])
         self.assertEqual('session_token', base._aws_service.kwargs['aws_session_token'])
 
+    def test_dispatchers_share_a_client(self):
+        clear_aws_service_cache()
+        first = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, region_name='eu-west-1')
+        second = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, region_name='eu-west-1')
+        third = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, region_name='us-east-1')
+        for dispatcher in (first, second, third):
+            dispatcher._initialise_aws_client()
+        self.assertIs(first._aws_service, second._aws_service)
+        self.assertIsNot(first._aws_service, third._aws_service)
+
+    def test_dispatchers_do_not_share_a_resource(self):
+        clear_aws_service_cache()
+        first = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, region_name='eu-west-1')
+        second = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, region_name='eu-west-1')
+        with patch('boto3_batch_utils.Base._boto3_interface_type_mapper', {'test_subject': 'resource'}), \
+                patch('boto3_batch_utils.Base.boto3.resource', MockClient):
+            for dispatcher in (first, second):
+                dispatcher._initialise_aws_client()
+        self.assertEqual('test_subject_client', first._aws_service.client_name)
+        self.assertIsNot(first._aws_service, second._aws_service)
+
+    def test_caller_config(self):
+        clear_aws_service_cache()
+        config = Config(max_pool_connections=40, connect_timeout=2)
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, config=config)
+        base._initialise_aws_client()
+        self.assertIs(config, base._aws_service.kwargs['config'])
+
 
 
 @patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
@@ -427,3 +486,1317 @@ class TestValidatePayloadByteSize(TestCase):
         self.assertIn("exceeds the maximum payload size", str(context.exception))
 
         mock_get_byte_size_of_dict_or_list.assert_has_calls([call({}), call(test_pl)], any_order=True)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class BatchPayloadByteSize(TestCase):
+
+    def test_running_total_matches_encoded_batch(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=10)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        self.assertEqual(get_byte_size_of_dict_or_list([]), base._get_batch_payload_byte_size())
+        for i in range(5):
+            base.submit_payload({"a": i, "b": "x" * i})
+            self.assertEqual(get_byte_size_of_dict_or_list(base._batch_payload), base._get_batch_payload_byte_size())
+
+    def test_batch_is_not_re_encoded_on_each_submit(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=10)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        with patch('boto3_batch_utils.utils.get_byte_size_of_dict_or_list', return_value=5) as mock_get_byte_size:
+            for i in range(5):
+                base.submit_payload({"a": i})
+        self.assertEqual(5, mock_get_byte_size.call_count)
+        self.assertEqual(25, base._batch_payload_byte_size)
+
+    def test_running_total_is_reset_on_flush(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=10)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        base.submit_payload({"a": 1})
+        base.flush_payloads()
+        self.assertEqual(0, base._batch_payload_byte_size)
+        self.assertEqual(2, base._get_batch_payload_byte_size())
+
+    def test_flush_when_batch_bytes_would_be_exceeded(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=10)
+        base._aws_service_message_max_bytes = 17
+        base._aws_service_batch_max_bytes = 17
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}])
+        self.assertEqual([{"a": 2}], base._batch_payload)
+        self.assertEqual(8, base._batch_payload_byte_size)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class ConcurrentFlush(TestCase):
+
+    def test_max_concurrency_less_than_one_raises_exception(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, max_concurrency=0)
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("max_concurrency '0' must be at least 1", str(context.exception))
+
+    def test_batches_sent_in_order_without_max_concurrency(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2)
+        base._batch_send_payloads = Mock()
+        base._send_batches([[1, 2], [3, 4], [5]])
+        base._batch_send_payloads.assert_has_calls([call([1, 2]), call([3, 4]), call([5])])
+
+    def test_all_batches_sent_with_max_concurrency(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, max_concurrency=3)
+        sent = []
+        threads = set()
+
+        def send(batch):
+            sent.append(batch)
+            threads.add(threading.current_thread())
+            sleep(0.01)
+
+        base._batch_send_payloads = send
+        base._send_batches([[1, 2], [3, 4], [5, 6], [7]])
+        self.assertCountEqual([[1, 2], [3, 4], [5, 6], [7]], sent)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_unprocessed_items_are_aggregated_in_batch_order(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, max_concurrency=4)
+        base.unprocessed_items = ['earlier']
+
+        def send(batch):
+            sleep(0.001 * (10 - batch[0]))
+            base._add_unprocessed_items([f"{item}_failed" for item in batch if item % 2])
+
+        base._batch_send_payloads = send
+        base._send_batches([[1, 2], [3, 4], [5, 6], [7, 8], [9]])
+        self.assertEqual(['earlier', '1_failed', '3_failed', '5_failed', '7_failed', '9_failed'],
+                         base.unprocessed_items)
+
+    def test_batch_in_progress_is_per_thread(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, max_concurrency=4)
+        base.batch_in_progress = 'main'
+        seen = []
+
+        def send(batch):
+            base.batch_in_progress = batch
+            sleep(0.01)
+            seen.append(base.batch_in_progress == batch)
+
+        base._batch_send_payloads = send
+        base._send_batches([[1], [2], [3], [4]])
+        self.assertEqual([True, True, True, True], seen)
+        self.assertEqual('main', base.batch_in_progress)
+
+    def test_connection_pool_not_configured_without_max_concurrency(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1)
+        self.assertNotIn('config', base._get_aws_service_args())
+
+    def test_connection_pool_sized_for_max_concurrency(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, max_concurrency=25,
+                              region_name='eu-west-1')
+        base._initialise_aws_client()
+        self.assertEqual(25, base._aws_service.kwargs['config'].max_pool_connections)
+        self.assertEqual('eu-west-1', base._aws_service.kwargs['region_name'])
+
+    def test_connection_pool_merged_with_given_config(self):
+        config = Config(connect_timeout=3, max_pool_connections=5)
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, max_concurrency=25,
+                              config=config)
+        aws_service_args = base._get_aws_service_args()
+        self.assertEqual(25, aws_service_args['config'].max_pool_connections)
+        self.assertEqual(3, aws_service_args['config'].connect_timeout)
+        self.assertIs(config, base.aws_service_args['config'])
+
+    def test_larger_given_connection_pool_is_kept(self):
+        config = Config(max_pool_connections=50)
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, max_concurrency=25,
+                              config=config)
+        self.assertIs(config, base._get_aws_service_args()['config'])
+
+    def test_payload_selector_waits_for_a_batch_per_thread(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3, max_concurrency=2)
+        base._batch_payload = [1, 2, 3, 4, 5]
+        base._handle_full_batch = Mock()
+        base._flush_payload_selector()
+        base._handle_full_batch.assert_not_called()
+        base._batch_payload.append(6)
+        base._flush_payload_selector()
+        base._handle_full_batch.assert_called_once_with()
+
+    def test_batch_byte_size_is_tracked_per_batch(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, max_concurrency=3)
+        base._aws_service_message_max_bytes = 20
+        base._aws_service_batch_max_bytes = 20
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        for i in range(5):
+            base.submit_payload({"a": i})
+        base._batch_send_payloads.assert_not_called()
+        self.assertEqual(8, base._batch_payload_byte_size)
+        self.assertEqual(1, base._get_current_batch_payload_count())
+        base.submit_payload({"a": 5})
+        base._batch_send_payloads.assert_has_calls([call([{"a": 0}, {"a": 1}]), call([{"a": 2}, {"a": 3}]),
+                                                    call([{"a": 4}, {"a": 5}])], any_order=True)
+
+    def test_current_batch_payload_count(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3, max_concurrency=3)
+        for payload_count, expected in [(0, 0), (1, 1), (3, 3), (4, 1), (6, 3), (7, 1)]:
+            base._batch_payload = list(range(payload_count))
+            self.assertEqual(expected, base._get_current_batch_payload_count())
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class LingerFlush(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        return base
+
+    def test_linger_ms_not_greater_than_zero_raises_exception(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=1, linger_ms=0)
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("linger_ms '0' must be greater than 0", str(context.exception))
+
+    def test_no_linger_thread_without_linger_ms(self):
+        base = self.create_dispatcher(max_batch_size=10)
+        base.submit_payload({"a": 1})
+        self.assertIsNone(base._linger_thread)
+        self.assertIsNone(base._oldest_payload_time)
+
+    def test_partial_batch_sent_once_linger_is_reached(self):
+        base = self.create_dispatcher(max_batch_size=10, linger_ms=50)
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        base._batch_send_payloads.assert_not_called()
+        sleep(0.3)
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}, {"a": 2}])
+        self.assertEqual([], base._batch_payload)
+        self.assertIsNone(base._oldest_payload_time)
+        base.close()
+
+    def test_linger_is_measured_from_the_oldest_payload(self):
+        base = self.create_dispatcher(max_batch_size=10, linger_ms=200)
+        base.submit_payload({"a": 1})
+        sleep(0.15)
+        base.submit_payload({"a": 2})
+        sleep(0.15)
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}, {"a": 2}])
+        base.close()
+
+    def test_full_batches_are_still_sent_immediately(self):
+        base = self.create_dispatcher(max_batch_size=2, linger_ms=10000)
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}, {"a": 2}])
+        self.assertIsNone(base._oldest_payload_time)
+        base.close()
+
+    def test_close_stops_thread_and_flushes(self):
+        base = self.create_dispatcher(max_batch_size=10, linger_ms=10000)
+        base.submit_payload({"a": 1})
+        linger_thread = base._linger_thread
+        self.assertTrue(linger_thread.is_alive())
+        base.close()
+        self.assertFalse(linger_thread.is_alive())
+        self.assertIsNone(base._linger_thread)
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}])
+
+    def test_context_manager_closes(self):
+        with self.create_dispatcher(max_batch_size=10, linger_ms=10000) as base:
+            base.submit_payload({"a": 1})
+            linger_thread = base._linger_thread
+        self.assertFalse(linger_thread.is_alive())
+        base._batch_send_payloads.assert_called_once_with([{"a": 1}])
+
+    def test_linger_thread_restarts_after_close(self):
+        base = self.create_dispatcher(max_batch_size=10, linger_ms=50)
+        base.submit_payload({"a": 1})
+        base.close()
+        base.submit_payload({"a": 2})
+        sleep(0.3)
+        base._batch_send_payloads.assert_has_calls([call([{"a": 1}]), call([{"a": 2}])])
+        base.close()
+
+    def test_linger_thread_survives_send_exception(self):
+        base = self.create_dispatcher(max_batch_size=10, linger_ms=20)
+        base._batch_send_payloads.side_effect = [TypeError("broken"), None]
+        base.submit_payload({"a": 1})
+        sleep(0.2)
+        base.submit_payload({"a": 2})
+        sleep(0.2)
+        self.assertEqual(2, base._batch_send_payloads.call_count)
+        base.close()
+
+    def test_concurrent_submissions_are_all_sent_once(self):
+        base = self.create_dispatcher(max_batch_size=7, linger_ms=1)
+        sent = []
+        base._batch_send_payloads = Mock(side_effect=lambda batch: sent.extend(batch))
+
+        def submit(thread_number):
+            for i in range(200):
+                base.submit_payload({"t": thread_number, "i": i})
+
+        threads = [threading.Thread(target=submit, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        base.close()
+        self.assertEqual(800, len(sent))
+        self.assertEqual(800, len({(pl["t"], pl["i"]) for pl in sent}))
+        self.assertTrue(all(len(c[0][0]) <= 7 for c in base._batch_send_payloads.call_args_list))
+
+    def test_ordered_linger_send_is_not_overlapped_by_a_submitting_thread(self):
+        base = self.create_dispatcher(max_batch_size=2, linger_ms=20)
+        base._preserve_payload_order = True
+        sent, in_flight, max_in_flight = [], [0], [0]
+
+        def send(batch):
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            sleep(0.1)
+            sent.append(batch)
+            in_flight[0] -= 1
+
+        base._batch_send_payloads = Mock(side_effect=send)
+        base.submit_payload({"a": 1})
+        sleep(0.05)
+        base.submit_payload({"a": 2})
+        base.submit_payload({"a": 3})
+        base.close()
+        self.assertEqual([[{"a": 1}], [{"a": 2}, {"a": 3}]], sent)
+        self.assertEqual(1, max_in_flight[0])
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch('boto3_batch_utils.Base.sleep')
+class CallWithRetries(TestCase):
+
+    def test_success_is_not_retried(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3)
+        method = Mock(return_value="response")
+        self.assertEqual("response", base._call_with_retries(method, 1, a=2))
+        method.assert_called_once_with(1, a=2)
+        mock_sleep.assert_not_called()
+
+    def test_backs_off_between_attempts(self, mock_sleep):
+        policy = RetryPolicy(max_attempts=4)
+        policy.get_backoff = Mock(side_effect=[0.1, 0.2, 0.4])
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3, retry_policy=policy)
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test")
+        method = Mock(side_effect=[throttled, throttled, throttled, "response"])
+        self.assertEqual("response", base._call_with_retries(method))
+        self.assertEqual(4, method.call_count)
+        mock_sleep.assert_has_calls([call(0.1), call(0.2), call(0.4)])
+
+    def test_non_retryable_error_is_raised_immediately(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3)
+        method = Mock(side_effect=ClientError({"Error": {"Code": "ValidationException"}}, "A Test"))
+        with self.assertRaises(ClientError):
+            base._call_with_retries(method)
+        method.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_error_raised_after_max_attempts(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3,
+                              retry_policy=RetryPolicy(max_attempts=3))
+        method = Mock(side_effect=ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test"))
+        with self.assertRaises(ClientError):
+            base._call_with_retries(method)
+        self.assertEqual(3, method.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_retries_stop_at_deadline(self, mock_sleep):
+        policy = RetryPolicy(max_attempts=100, base_delay=1, max_delay=1, deadline=10)
+        policy.get_backoff = Mock(return_value=1)
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3, retry_policy=policy)
+        method = Mock(side_effect=ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test"))
+        with patch('boto3_batch_utils.Base.monotonic', side_effect=[0, 3, 6, 9.5]):
+            with self.assertRaises(ClientError):
+                base._call_with_retries(method)
+        self.assertEqual(3, method.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_retry_is_not_recursive(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3,
+                              retry_policy=RetryPolicy(max_attempts=2000))
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test")
+        base._individual_dispatch_method = Mock(side_effect=[throttled] * 1999 + [""])
+        base._send_individual_payload("abc")
+        self.assertEqual(2000, base._individual_dispatch_method.call_count)
+        self.assertEqual([], base.unprocessed_items)
+
+    def test_batch_validation_error_goes_straight_to_unprocessed_items(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3)
+        base._batch_dispatch_method = Mock(side_effect=ClientError({"Error": {"Code": "ValidationException"}}, "Test"))
+        base._unpack_failed_batch_to_unprocessed_items = Mock()
+        base._batch_send_payloads(["abc"])
+        base._batch_dispatch_method.assert_called_once_with(["abc"])
+        base._unpack_failed_batch_to_unprocessed_items.assert_called_once_with(["abc"])
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch('boto3_batch_utils.Base.sleep')
+class AdaptiveBatching(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=8,
+                              adaptive_controller=AdaptiveController(base_send_delay=0.1), **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        return base
+
+    def test_effective_limits_without_controller(self, mock_sleep):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=8)
+        self.assertEqual({'batch_size': 8, 'send_rate': None}, base.effective_limits)
+
+    def test_effective_limits_after_throttling(self, mock_sleep):
+        base = self.create_dispatcher()
+        self.assertEqual({'batch_size': 8, 'send_rate': None}, base.effective_limits)
+        base.adaptive_controller.record_throttle()
+        self.assertEqual({'batch_size': 4, 'send_rate': 10}, base.effective_limits)
+
+    def test_throttling_error_reduces_limits_and_success_restores_them(self, mock_sleep):
+        base = self.create_dispatcher(retry_policy=RetryPolicy(base_delay=0))
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test")
+        base._batch_dispatch_method = Mock(side_effect=[throttled, throttled, "response"])
+        base._batch_send_payloads([1])
+        #  Halved twice (8 -> 2) and delay doubled (0.1 -> 0.2), then one step back on success
+        self.assertEqual(3, base.adaptive_controller.batch_size)
+        self.assertAlmostEqual(0.1, base.adaptive_controller.send_delay)
+        self.assertEqual(2, base.adaptive_controller.throttle_count)
+
+    def test_other_errors_do_not_reduce_limits(self, mock_sleep):
+        base = self.create_dispatcher(retry_policy=RetryPolicy(base_delay=0))
+        error = ClientError({"Error": {"Code": "InternalFailure"}}, "A Test")
+        base._batch_dispatch_method = Mock(side_effect=[error, "response"])
+        base._batch_send_payloads([1])
+        self.assertEqual({'batch_size': 8, 'send_rate': None}, base.effective_limits)
+
+    def test_throttled_response_reduces_limits(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._batch_dispatch_method = Mock(return_value="response")
+        base._is_batch_response_throttled = Mock(return_value=True)
+        base._batch_send_payloads([1])
+        base._is_batch_response_throttled.assert_called_once_with("response")
+        self.assertEqual(4, base.adaptive_controller.batch_size)
+
+    def test_requests_are_paced_while_throttled(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._batch_dispatch_method = Mock(return_value="response")
+        base.adaptive_controller.record_throttle()
+        base.adaptive_controller.record_throttle()
+        base._batch_send_payloads([1])
+        mock_sleep.assert_called_once_with(0.2)
+        base._batch_send_payloads([1])
+        mock_sleep.assert_called_with(0.1)
+        base._batch_send_payloads([1])
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_pending_batches_are_split_to_the_effective_batch_size(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._batch_send_payloads = Mock()
+        base.adaptive_controller.record_throttle()
+        base.adaptive_controller.record_throttle()
+        for i in range(1, 11):
+            base.submit_payload({"i": i})
+        base.flush_payloads()
+        self.assertEqual([[1, 2], [3, 4], [5, 6], [7, 8], [9, 10]],
+                         [[pl["i"] for pl in c[0][0]] for c in base._batch_send_payloads.call_args_list])
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class SubmitPayloads(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', **kwargs)
+        base._aws_service_message_max_bytes = 100
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        return base
+
+    def test_same_as_submitting_each_payload(self):
+        payloads = [{"a": i, "body": "x" * (i * 7 % 60)} for i in range(40)]
+        each = self.create_dispatcher(max_batch_size=3, max_concurrency=2)
+        for payload in payloads:
+            each.submit_payload(payload)
+        bulk = self.create_dispatcher(max_batch_size=3, max_concurrency=2)
+        bulk.submit_payloads(payloads)
+        self.assertEqual(each._batch_send_payloads.call_args_list, bulk._batch_send_payloads.call_args_list)
+        self.assertEqual(each._batch_payload, bulk._batch_payload)
+
+    def test_payloads_are_consumed_a_batch_at_a_time(self):
+        base = self.create_dispatcher(max_batch_size=2)
+        consumed = []
+
+        def payloads():
+            for i in range(4):
+                consumed.append(i)
+                yield {"a": i}
+
+        consumed_at_send = []
+        base._batch_send_payloads.side_effect = lambda batch: consumed_at_send.append(len(consumed))
+        base.submit_payloads(payloads())
+        self.assertEqual([2, 4], consumed_at_send)
+
+    def test_oversized_payload_raises_exception_after_earlier_payloads_are_submitted(self):
+        base = self.create_dispatcher(max_batch_size=5)
+        with self.assertRaises(ValueError):
+            base.submit_payloads([{"a": 1}, {"a": "x" * 100}, {"a": 3}])
+        self.assertEqual([{"a": 1}], base._batch_payload)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch('boto3_batch_utils.Base.sleep')
+class Stats(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_dispatch_method = Mock(return_value={})
+        base._individual_dispatch_method = Mock()
+        base._initialise_aws_client = Mock()
+        return base
+
+    def test_counters(self, mock_sleep):
+        base = self.create_dispatcher()
+        base.submit_payloads({"a": i} for i in range(5))
+        base.flush_payloads()
+        stats = base.stats()
+        self.assertEqual(5, stats['payloads_submitted'])
+        self.assertEqual(3, stats['flushes'])
+        self.assertEqual(3, stats['batches_sent'])
+        self.assertEqual(5, stats['payloads_sent'])
+        self.assertEqual(5 * get_byte_size_of_dict_or_list({"a": 0}), stats['bytes_sent'])
+        self.assertEqual(3, stats['requests'])
+        self.assertAlmostEqual(5 / 6, stats['batch_fill_ratio'])
+        self.assertEqual(0, stats['payloads_pending'])
+        self.assertEqual(3, stats['request_latency']['count'])
+        self.assertEqual(3, stats['flush_latency']['count'])
+
+    def test_retries_individual_sends_and_failures(self, mock_sleep):
+        base = self.create_dispatcher(retry_policy=RetryPolicy(max_attempts=2))
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test")
+        base._batch_dispatch_method.side_effect = [throttled, {}]
+        base._process_batch_send_response = lambda response: base._send_individual_payload({"a": 1})
+        base._individual_dispatch_method.side_effect = throttled
+        base.submit_payloads([{"a": 1}, {"a": 2}])
+        stats = base.stats()
+        self.assertEqual(2, stats['retries'])
+        self.assertEqual(2, stats['throttled_retries'])
+        self.assertEqual(1, stats['individual_sends'])
+        self.assertEqual(1, stats['failed_payloads'])
+        self.assertEqual(4, stats['requests'])
+        self.assertEqual(1, stats['payloads_sent'])
+        self.assertEqual(get_byte_size_of_dict_or_list({"a": 1}), stats['bytes_sent'])
+
+    def test_failed_batches_are_not_counted_as_sent(self, mock_sleep):
+        base = self.create_dispatcher(retry_policy=RetryPolicy(max_attempts=1), max_concurrency=2)
+        base._batch_dispatch_method.side_effect = ClientError({"Error": {"Code": "InternalError"}}, "A Test")
+        base._unpack_failed_batch_to_unprocessed_items = base._add_unprocessed_items
+        base.submit_payloads({"a": i} for i in range(4))
+        base.flush_payloads()
+        base.max_concurrency = None
+        base.submit_payloads({"a": i} for i in range(2))
+        base.flush_payloads()
+        stats = base.stats()
+        self.assertEqual(6, stats['failed_payloads'])
+        self.assertEqual((0, 0, 0), (stats['batches_sent'], stats['payloads_sent'], stats['bytes_sent']))
+        self.assertIsNone(stats['batch_fill_ratio'])
+
+    def test_throttled_responses(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._is_batch_response_throttled = Mock(return_value=True)
+        base.submit_payloads([{"a": 1}, {"a": 2}])
+        self.assertEqual(1, base.stats()['throttled_responses'])
+
+    def test_stats_exporter_is_called_after_each_flush(self, mock_sleep):
+        exporter = Mock()
+        base = self.create_dispatcher(stats_exporter=exporter)
+        base.submit_payloads([{"a": 1}, {"a": 2}])
+        exporter.assert_not_called()
+        base.submit_payload({"a": 3})
+        base.flush_payloads()
+        exporter.assert_called_once()
+        self.assertEqual(3, exporter.call_args.args[0]['payloads_sent'])
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class DebugTracing(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_dispatch_method = Mock(return_value={})
+        base._initialise_aws_client = Mock()
+        return base
+
+    def test_invalid_trace_sample_rate(self):
+        for rate in (0, -0.5, 1.5):
+            base = self.create_dispatcher(trace_sample_rate=rate)
+            with self.assertRaises(ValueError) as context:
+                base._validate_initialisation()
+            self.assertIn(f"Requested trace_sample_rate '{rate}'", str(context.exception))
+
+    def test_payload_contents_not_logged_without_trace_sample_rate(self):
+        base = self.create_dispatcher()
+        with self.assertLogs('boto3-batch-utils', level='DEBUG') as logs:
+            base.submit_payload({"secret": "contents"})
+            base.flush_payloads()
+        self.assertFalse([line for line in logs.output if 'contents' in line])
+
+    def test_payload_contents_logged_when_traced(self):
+        base = self.create_dispatcher(trace_sample_rate=1)
+        with self.assertLogs('boto3-batch-utils', level='DEBUG') as logs:
+            base.submit_payload({"secret": "contents"})
+        self.assertTrue([line for line in logs.output if 'contents' in line])
+
+    @patch('boto3_batch_utils.Base.random', Mock(return_value=0.5))
+    def test_trace_is_sampled(self):
+        base = self.create_dispatcher(trace_sample_rate=0.25)
+        with self.assertLogs('boto3-batch-utils', level='DEBUG') as logs:
+            base._trace("Traced %s", "contents")
+            base._trace("Another %s", "message")
+            logger = logging.getLogger('boto3-batch-utils')
+            logger.debug("Untraced")
+        self.assertEqual(['DEBUG:boto3-batch-utils:Untraced'], logs.output)
+
+    def test_trace_is_not_formatted_above_debug(self):
+        base = self.create_dispatcher(trace_sample_rate=1)
+        payload = MagicMock()
+        with self.assertLogs('boto3-batch-utils', level='INFO'):
+            base._trace("Traced %s", payload)
+            logging.getLogger('boto3-batch-utils').info("Info")
+        payload.__str__.assert_not_called()
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class RateLimited(TestCase):
+
+    def create_dispatcher(self, rate_limiter, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, rate_limiter=rate_limiter,
+                              **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        return base
+
+    def test_each_batch_acquires_its_records_and_bytes(self):
+        rate_limiter = Mock()
+        base = self.create_dispatcher(rate_limiter)
+        for i in range(3):
+            base.submit_payload({"a": i})
+        base.flush_payloads()
+        rate_limiter.acquire.assert_has_calls([call(2, 16), call(1, 8)])
+        self.assertEqual(2, base._batch_send_payloads.call_count)
+
+    def test_batch_waits_for_rate_limiter(self):
+        events = []
+        rate_limiter = Mock()
+        rate_limiter.acquire.side_effect = lambda records, byte_size: events.append('acquire')
+        base = self.create_dispatcher(rate_limiter, max_concurrency=2)
+        base._batch_send_payloads.side_effect = lambda batch: events.append('send')
+        for i in range(3):
+            base.submit_payload({"a": i})
+        base.flush_payloads()
+        self.assertEqual(2, events.count('acquire'))
+        self.assertEqual('acquire', events[0])
+
+    def test_batches_are_sent_as_the_rate_limiter_allows_them(self):
+        first_batch_sent = threading.Event()
+        sent_before_acquire = []
+        rate_limiter = Mock()
+
+        def acquire(records, byte_size):
+            if rate_limiter.acquire.call_count > 1:
+                sent_before_acquire.append(first_batch_sent.wait(2))
+
+        rate_limiter.acquire.side_effect = acquire
+        base = self.create_dispatcher(rate_limiter, max_concurrency=2)
+        base._batch_send_payloads.side_effect = lambda batch: first_batch_sent.set()
+        for i in range(4):
+            base.submit_payload({"a": i})
+        base.flush_payloads()
+        self.assertEqual([True], sent_before_acquire)
+        self.assertEqual(2, base._batch_send_payloads.call_count)
+
+    def test_rate_limiter_shared_between_dispatchers(self):
+        rate_limiter = RateLimiter(records_per_second=20, burst_seconds=0.1)
+        sent = []
+        first = self.create_dispatcher(rate_limiter)
+        second = self.create_dispatcher(rate_limiter)
+        first._batch_send_payloads.side_effect = second._batch_send_payloads.side_effect = sent.extend
+
+        def submit(dispatcher):
+            for i in range(10):
+                dispatcher.submit_payload({"a": i})
+
+        start = monotonic()
+        threads = [threading.Thread(target=submit, args=(dispatcher,)) for dispatcher in (first, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        #  20 records at 20 per second, less the burst of 2 records
+        self.assertGreaterEqual(monotonic() - start, 0.85)
+        self.assertEqual(20, len(sent))
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class BufferLimits(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        return base
+
+    def hold_in_flight(self, base, count: int, byte_size: int = 0):
+        """ Make the dispatcher behave as if another thread were sending `count` payloads """
+        base._buffered_payload_count += count
+        base._buffered_byte_size += byte_size
+
+    def test_unknown_buffer_full_policy_raises_exception(self):
+        base = self.create_dispatcher(buffer_full_policy='wait')
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("buffer_full_policy 'wait' must be one of block, raise, drop_oldest", str(context.exception))
+
+    def test_max_buffered_payloads_must_hold_concurrent_batches(self):
+        base = self.create_dispatcher(max_batch_size=5, max_concurrency=2, max_buffered_payloads=9)
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("max_buffered_payloads '9' must be at least max_batch_size * max_concurrency (10)",
+                      str(context.exception))
+
+    def test_max_buffered_bytes_must_hold_concurrent_batches(self):
+        base = self.create_dispatcher(max_batch_size=5, max_concurrency=2, max_buffered_bytes=1999)
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("max_buffered_bytes '1999' must be at least", str(context.exception))
+
+    def test_buffer_not_tracked_without_limits(self):
+        base = self.create_dispatcher(max_batch_size=10)
+        base.submit_payload({"a": 1})
+        self.assertEqual(0, base._buffered_payload_count)
+
+    def test_buffer_is_released_once_batches_are_sent(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=4, max_buffered_bytes=4000)
+        base.submit_payload({"a": 1})
+        self.assertEqual(1, base._buffered_payload_count)
+        self.assertEqual(8, base._buffered_byte_size)
+        base.submit_payload({"a": 2})
+        self.assertEqual(0, base._buffered_payload_count)
+        self.assertEqual(0, base._buffered_byte_size)
+
+    def test_buffer_is_released_when_sent_concurrently(self):
+        base = self.create_dispatcher(max_batch_size=2, max_concurrency=2, max_buffered_payloads=4)
+        for i in range(4):
+            base.submit_payload({"a": i})
+        self.assertEqual(2, base._batch_send_payloads.call_count)
+        self.assertEqual(0, base._buffered_payload_count)
+
+    def test_buffer_is_released_when_send_raises(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=2)
+        base._batch_send_payloads.side_effect = TypeError()
+        base.submit_payload({"a": 1})
+        with self.assertRaises(TypeError):
+            base.submit_payload({"a": 2})
+        self.assertEqual(0, base._buffered_payload_count)
+
+    def test_raise_policy(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=3, buffer_full_policy='raise')
+        self.hold_in_flight(base, 2)
+        base.submit_payload({"a": 1})
+        with self.assertRaises(BufferFullError) as context:
+            base.submit_payload({"a": 2})
+        self.assertIn("buffer is full, holding 3 payloads", str(context.exception))
+        self.assertEqual([{"a": 1}], base._batch_payload)
+
+    def test_raise_policy_on_byte_limit(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_bytes=1000, buffer_full_policy='raise')
+        self.hold_in_flight(base, 1, 995)
+        with self.assertRaises(BufferFullError):
+            base.submit_payload({"a": 1})
+
+    def test_drop_oldest_policy_drops_oldest_pending_payload(self):
+        base = self.create_dispatcher(max_batch_size=3, max_buffered_payloads=4, buffer_full_policy='drop_oldest')
+        self.hold_in_flight(base, 2)
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        base.submit_payload({"a": 3})
+        self.assertEqual([{"a": 2}, {"a": 3}], base._batch_payload)
+        self.assertEqual(1, base.dropped_payload_count)
+        self.assertEqual(4, base._buffered_payload_count)
+        self.assertEqual(16, base._batch_payload_byte_size)
+
+    def test_drop_oldest_policy_drops_new_payload_if_none_are_pending(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=2, buffer_full_policy='drop_oldest')
+        self.hold_in_flight(base, 2)
+        base.submit_payload({"a": 1})
+        self.assertEqual([], base._batch_payload)
+        self.assertEqual(1, base.dropped_payload_count)
+        self.assertEqual(2, base._buffered_payload_count)
+
+    def test_dropping_from_several_pending_batches_keeps_batches_within_byte_limit(self):
+        base = self.create_dispatcher(max_batch_size=2, max_concurrency=2, max_buffered_payloads=5,
+                                      buffer_full_policy='drop_oldest')
+        base._aws_service_batch_max_bytes = 420
+        self.hold_in_flight(base, 2)
+        for payload in ({"a": 1}, {"a": "x" * 200}, {"a": "y" * 200}):
+            base.submit_payload(payload)
+        base.submit_payload({"a": 2})
+        self.assertEqual(1, base.dropped_payload_count)
+        base.flush_payloads()
+        self.assertEqual([call([{"a": "x" * 200}]), call([{"a": "y" * 200}]), call([{"a": 2}])],
+                         base._batch_send_payloads.call_args_list)
+
+    def test_block_policy_waits_for_batches_sent_by_other_threads(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=2)
+        in_flight = [BatchRecord({"a": 0}), BatchRecord({"a": 0})]
+        self.hold_in_flight(base, 2, 16)
+        threading.Timer(0.1, base._release_buffer_space, args=(in_flight,)).start()
+        start = monotonic()
+        base.submit_payload({"a": 1})
+        self.assertGreaterEqual(monotonic() - start, 0.09)
+        self.assertEqual([{"a": 1}], base._batch_payload)
+        self.assertEqual(1, base._buffered_payload_count)
+
+    def test_block_policy_bounds_buffer_with_linger_thread(self):
+        send_started = threading.Event()
+        release_send = threading.Event()
+        base = self.create_dispatcher(max_batch_size=3, max_buffered_payloads=3, linger_ms=10)
+        base._batch_send_payloads.side_effect = lambda batch: send_started.set() or release_send.wait(5)
+        base.submit_payload({"a": 1})
+        self.assertTrue(send_started.wait(5))
+        base.submit_payload({"a": 2})
+        base.submit_payload({"a": 3})
+        threading.Timer(0.1, release_send.set).start()
+        base.submit_payload({"a": 4})
+        self.assertTrue(release_send.is_set())
+        self.assertLessEqual(base._buffered_payload_count, 3)
+        base.close()
+        self.assertEqual(0, base._buffered_payload_count)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class WriteAheadLogging(TestCase):
+
+    def setUp(self):
+        self._directory = TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', write_ahead_log=WriteAheadLog(self.directory),
+                              **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._batch_send_payloads = Mock()
+        base._unpack_failed_batch_to_unprocessed_items = lambda batch: base._add_unprocessed_items(batch)
+        return base
+
+    def get_sent_payloads(self, base) -> list:
+        return [payload for c in base._batch_send_payloads.call_args_list for payload in c.args[0]]
+
+    def test_spill_requires_write_ahead_log(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_buffered_payloads=10,
+                              buffer_full_policy='spill')
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("'spill' requires a write_ahead_log", str(context.exception))
+
+    def test_sent_payloads_are_not_replayed(self):
+        base = self.create_dispatcher(max_batch_size=2)
+        for i in range(3):
+            base.submit_payload({"a": i})
+        base.close()
+        self.assertEqual([], list(WriteAheadLog(self.directory).replay()))
+
+    def test_unsent_payloads_are_sent_by_the_next_dispatcher(self):
+        base = self.create_dispatcher(max_batch_size=3)
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        #  The process stops without flushing
+
+        base = self.create_dispatcher(max_batch_size=3)
+        base.submit_payload({"a": 3})
+        self.assertEqual([{"a": 1}, {"a": 2}, {"a": 3}], self.get_sent_payloads(base))
+        base.close()
+        self.assertEqual([], list(WriteAheadLog(self.directory).replay()))
+
+    def test_replayed_payloads_keep_their_record(self):
+        base = self.create_dispatcher(max_batch_size=3)
+        base.submit_payload(BatchRecord({"Data": '{"a": 1}'}, source={"a": 1}, encoded_key='Data'))
+
+        base = self.create_dispatcher(max_batch_size=3)
+        base.flush_payloads()
+        payload = self.get_sent_payloads(base)[0]
+        self.assertIsInstance(payload, BatchRecord)
+        self.assertEqual({"a": 1}, payload.source)
+        self.assertEqual('Data', payload.encoded_key)
+
+    def test_unreturned_failures_are_restored(self):
+        base = self.create_dispatcher(max_batch_size=2)
+        base._batch_send_payloads.side_effect = base._unpack_failed_batch_to_unprocessed_items
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        self.assertEqual([{"a": 1}, {"a": 2}], base.unprocessed_items)
+        #  The process stops before flush_payloads returns the failures
+
+        base = self.create_dispatcher(max_batch_size=2)
+        self.assertEqual([{"a": 1}, {"a": 2}], base.unprocessed_items)
+        self.assertEqual([{"a": 1}, {"a": 2}], base.flush_payloads())
+        self.assertEqual([], self.create_dispatcher(max_batch_size=2).unprocessed_items)
+
+    def test_spilled_payloads_are_sent_in_order(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=2, buffer_full_policy='spill')
+        #  Another thread is sending a batch
+        base._buffered_payload_count = 2
+        for i in range(5):
+            base.submit_payload({"a": i})
+        self.assertEqual([], base._batch_payload)
+        base._buffered_payload_count = 0
+        base.submit_payload({"a": 5})
+        self.assertEqual([{"a": 0}, {"a": 1}], self.get_sent_payloads(base))
+        base.flush_payloads()
+        self.assertEqual([{"a": i} for i in range(6)], self.get_sent_payloads(base))
+        self.assertEqual(0, len(base._spilled_ranges))
+
+    def test_spilled_payloads_are_read_back_one_flush_at_a_time(self):
+        base = self.create_dispatcher(max_batch_size=2, max_concurrency=2, max_buffered_payloads=4,
+                                      buffer_full_policy='spill')
+        base._buffered_payload_count = 4
+        for i in range(20):
+            base.submit_payload({"a": i})
+        base._buffered_payload_count = 0
+        base._refill_from_spill()
+        self.assertEqual([{"a": 0}, {"a": 1}, {"a": 2}, {"a": 3}], self.get_sent_payloads(base))
+        self.assertEqual([], base._batch_payload)
+
+    def test_dropped_payloads_are_not_replayed(self):
+        base = self.create_dispatcher(max_batch_size=2, max_buffered_payloads=3, buffer_full_policy='drop_oldest')
+        base._buffered_payload_count = 2
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        self.assertEqual(1, base.dropped_payload_count)
+        self.assertEqual([{"a": 2}], [data[0] for _, _, data in WriteAheadLog(self.directory).replay()])
+
+    def test_drained_failures_are_not_restored(self):
+        base = self.create_dispatcher(max_batch_size=2)
+        base._batch_send_payloads.side_effect = base._unpack_failed_batch_to_unprocessed_items
+        for i in range(4):
+            base.submit_payload({"a": i})
+        for _ in base.drain_unprocessed_items():
+            break
+        self.assertEqual([{"a": 1}, {"a": 2}, {"a": 3}], base.unprocessed_items)
+
+        base = self.create_dispatcher(max_batch_size=2)
+        self.assertEqual([{"a": 1}, {"a": 2}, {"a": 3}], base.unprocessed_items)
+
+    def test_failures_given_to_the_callback_are_not_restored(self):
+        failures = []
+        base = self.create_dispatcher(max_batch_size=2, failure_callback=failures.extend)
+        base._batch_send_payloads.side_effect = base._unpack_failed_batch_to_unprocessed_items
+        base.submit_payload({"a": 1})
+        base.submit_payload({"a": 2})
+        self.assertEqual([{"a": 1}, {"a": 2}], failures)
+        self.assertEqual([], list(WriteAheadLog(self.directory).replay()))
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class FailureDelivery(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2, **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        #  Every payload with an odd value fails
+        base._batch_send_payloads = Mock(side_effect=lambda batch: base._add_unprocessed_items(
+            [payload for payload in batch if payload["a"] % 2]))
+        return base
+
+    def test_unprocessed_items_are_retained_by_default(self):
+        base = self.create_dispatcher()
+        for i in range(4):
+            base.submit_payload({"a": i})
+        self.assertEqual([{"a": 1}, {"a": 3}], base.flush_payloads())
+        self.assertEqual([{"a": 1}, {"a": 3}], base.flush_payloads())
+
+    def test_flush_returns_only_its_own_failures(self):
+        base = self.create_dispatcher(retain_unprocessed_items=False)
+        for i in range(4):
+            base.submit_payload({"a": i})
+        self.assertEqual([{"a": 1}, {"a": 3}], base.flush_payloads())
+        base.submit_payload({"a": 5})
+        self.assertEqual([{"a": 5}], base.flush_payloads())
+        self.assertEqual([], base.flush_payloads())
+        self.assertEqual([], base.unprocessed_items)
+
+    def test_failure_callback(self):
+        callback = Mock()
+        base = self.create_dispatcher(failure_callback=callback)
+        for i in range(4):
+            base.submit_payload({"a": i})
+        base.submit_payload({"a": 5})
+        callback.assert_has_calls([call([{"a": 1}]), call([{"a": 3}])])
+        base.flush_payloads()
+        callback.assert_called_with([{"a": 5}])
+        self.assertEqual([], base.unprocessed_items)
+
+    def test_failure_callback_is_called_by_the_flushing_thread(self):
+        threads = []
+        base = self.create_dispatcher(failure_callback=lambda items: threads.append(threading.current_thread()),
+                                      max_concurrency=2)
+        for i in range(4):
+            base.submit_payload({"a": i})
+        self.assertEqual([threading.current_thread()] * 2, threads)
+
+    def test_drain_unprocessed_items(self):
+        base = self.create_dispatcher()
+        for i in range(4):
+            base.submit_payload({"a": i})
+        drained = base.drain_unprocessed_items()
+        self.assertEqual({"a": 1}, next(drained))
+        self.assertEqual([], base.unprocessed_items)
+        #  Failures which occur while draining are drained too
+        base.submit_payload({"a": 5})
+        base.flush_payloads()
+        self.assertEqual([{"a": 3}, {"a": 5}], list(drained))
+        self.assertEqual([], base.unprocessed_items)
+
+    def test_items_not_drained_are_kept(self):
+        base = self.create_dispatcher()
+        for i in range(6):
+            base.submit_payload({"a": i})
+        for item in base.drain_unprocessed_items():
+            if item == {"a": 3}:
+                break
+        self.assertEqual([{"a": 5}], base.unprocessed_items)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class BatchPacking(TestCase):
+
+    def create_dispatcher(self, preserve_payload_order: bool = False, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', **{'max_batch_size': 10, **kwargs})
+        base._aws_service_message_max_bytes = 20
+        #  The payloads of a batch, with their separators, must be within 20 bytes
+        base._aws_service_batch_max_bytes = 22
+        base._preserve_payload_order = preserve_payload_order
+        base._batch_payload = []
+        base.sent = []
+        base._batch_send_payloads = lambda batch: base.sent.append([payload['id'] for payload in batch])
+        return base
+
+    @staticmethod
+    def submit(base, *sizes, start: int = 0):
+        for i, size in enumerate(sizes, start):
+            base.submit_payload(BatchRecord({'id': i}, byte_size=size))
+
+    def test_without_packing_a_batch_is_sent_when_the_next_payload_does_not_fit(self):
+        base = self.create_dispatcher(batch_packing=False)
+        self.submit(base, 12, 12, 6, 6)
+        base.flush_payloads()
+        self.assertEqual([[0], [1, 2], [3]], base.sent)
+
+    def test_largest_payloads_are_packed_first(self):
+        base = self.create_dispatcher(batch_packing=True)
+        self.submit(base, 12, 12, 6, 6)
+        self.assertEqual([[0, 2]], base.sent)
+        self.assertEqual([{'id': 1}, {'id': 3}], base._batch_payload)
+        self.assertEqual(18, base._batch_payload_byte_size)
+        base.flush_payloads()
+        self.assertEqual([[0, 2], [1, 3]], base.sent)
+
+    def test_order_is_preserved(self):
+        base = self.create_dispatcher(preserve_payload_order=True, batch_packing=True)
+        self.submit(base, 12, 12, 6, 6)
+        base.flush_payloads()
+        self.assertEqual([[0], [1, 2], [3]], base.sent)
+
+    def test_payload_list_holds_a_batch_more_than_max_concurrency(self):
+        base = self.create_dispatcher(batch_packing=True, max_batch_size=2, max_concurrency=2)
+        self.submit(base, *[1] * 5)
+        self.assertEqual([], base.sent)
+        self.submit(base, 1, start=5)
+        self.assertCountEqual([[0, 1], [2, 3], [4, 5]], base.sent)
+        self.assertEqual([], base._batch_payload)
+
+    def test_batches_are_within_the_adaptive_batch_size(self):
+        base = self.create_dispatcher(batch_packing=True, adaptive_controller=AdaptiveController())
+        base.adaptive_controller.batch_size = 2
+        self.submit(base, *[1] * 5)
+        base.flush_payloads()
+        self.assertEqual([[0, 1], [2, 3], [4]], base.sent)
+
+    def test_dropped_payload_is_removed_from_the_byte_size(self):
+        base = self.create_dispatcher(batch_packing=True, max_buffered_payloads=20, buffer_full_policy='drop_oldest')
+        self.submit(base, 4, 6)
+        base._buffered_payload_count = 20
+        self.submit(base, 3)
+        self.assertEqual([{'id': 1}, {'id': 0}], base._batch_payload)
+        self.assertEqual(9, base._batch_payload_byte_size)
+
+    def test_buffer_limits_must_hold_the_packed_batch(self):
+        base = self.create_dispatcher(batch_packing=True, max_buffered_payloads=19)
+        with self.assertRaises(ValueError) as context:
+            base._validate_initialisation()
+        self.assertIn("max_batch_size * max_concurrency (+ 1 with batch_packing) (20)", str(context.exception))
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class DeadlineAware(TestCase):
+
+    def create_dispatcher(self, remaining_ms: int, **kwargs):
+        context = FakeLambdaContext(remaining_ms)
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', **{'max_batch_size': 3, **kwargs})
+        base.set_deadline(Deadline(context, margin_ms=1000, flush_ms=2000))
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._initialise_aws_client()
+        base._batch_dispatch_method = Mock()
+        base._unpack_failed_batch_to_unprocessed_items = base._add_unprocessed_items
+        return base, context
+
+    def test_payloads_wait_for_a_full_batch_far_from_the_deadline(self):
+        base, _ = self.create_dispatcher(60000)
+        base.submit_payload({'id': 1})
+        base._batch_dispatch_method.assert_not_called()
+        self.assertEqual([{'id': 1}], base._batch_payload)
+
+    def test_pending_payloads_are_flushed_once_when_the_deadline_becomes_near(self):
+        base, context = self.create_dispatcher(60000)
+        base.submit_payload({'id': 1})
+        context.remaining_ms = 2500
+        base.submit_payload({'id': 2})
+        base._batch_dispatch_method.assert_called_once_with([{'id': 1}, {'id': 2}])
+        base.submit_payloads([{'id': 3}, {'id': 4}])
+        base._batch_dispatch_method.assert_called_once()
+        self.assertEqual([{'id': 3}, {'id': 4}], base._batch_payload)
+        base.submit_payload({'id': 5})
+        base._batch_dispatch_method.assert_called_with([{'id': 3}, {'id': 4}, {'id': 5}])
+        self.assertEqual([], base._batch_payload)
+
+    def test_pending_payloads_are_flushed_again_for_a_new_deadline(self):
+        base, context = self.create_dispatcher(2500)
+        base.submit_payload({'id': 1})
+        base.set_deadline(Deadline(FakeLambdaContext(2500), margin_ms=1000, flush_ms=2000))
+        base.submit_payload({'id': 2})
+        base._batch_dispatch_method.assert_has_calls([call([{'id': 1}]), call([{'id': 2}])])
+
+    def test_pending_batches_are_sent_while_there_is_time_to_send_them(self):
+        base, context = self.create_dispatcher(60000)
+        base._stats.record_request(10)
+        base.submit_payload({'id': 1})
+        base._batch_dispatch_method.assert_not_called()
+        context.remaining_ms = 20000
+        base.submit_payload({'id': 2})
+        base._batch_dispatch_method.assert_called_once_with([{'id': 1}, {'id': 2}])
+
+    def test_batches_are_returned_unsent_once_the_deadline_has_passed(self):
+        base, context = self.create_dispatcher(60000)
+        base.submit_payloads([{'id': 1}, {'id': 2}])
+        context.remaining_ms = 900
+        self.assertEqual([{'id': 1}, {'id': 2}], base.flush_payloads())
+        base._batch_dispatch_method.assert_not_called()
+
+    def test_individual_payload_is_returned_unsent_once_the_deadline_has_passed(self):
+        base, _ = self.create_dispatcher(900)
+        base._individual_dispatch_method = Mock()
+        base._send_individual_payload({'id': 1})
+        base._individual_dispatch_method.assert_not_called()
+        self.assertEqual([{'id': 1}], base.unprocessed_items)
+
+    @patch('boto3_batch_utils.Base.sleep')
+    def test_retry_is_not_made_after_the_deadline(self, mock_sleep):
+        policy = RetryPolicy(max_attempts=5)
+        policy.get_backoff = Mock(return_value=0.5)
+        base, context = self.create_dispatcher(1800, retry_policy=policy)
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "A Test")
+
+        def send(batch):
+            context.remaining_ms -= 200
+            raise throttled
+
+        base._batch_dispatch_method = Mock(side_effect=send)
+        base._batch_send_payloads([{'id': 1}])
+        #  0.6s remains after the first attempt, and 0.4s after the second, which is less than the backoff
+        self.assertEqual(2, base._batch_dispatch_method.call_count)
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertEqual([{'id': 1}], base.unprocessed_items)
+
+    def test_concurrency_is_raised_near_the_deadline(self):
+        base, context = self.create_dispatcher(60000)
+        self.assertEqual(1, base._get_send_concurrency(4))
+        base._stats.record_request(1)
+        context.remaining_ms = 3000
+        self.assertEqual(4, base._get_send_concurrency(4))
+        self.assertEqual(10, base._get_send_concurrency(40))
+
+    def test_concurrency_is_not_raised_for_ordered_dispatchers(self):
+        base, _ = self.create_dispatcher(2500)
+        base._preserve_payload_order = True
+        base._stats.record_request(1)
+        self.assertEqual(1, base._get_send_concurrency(40))
+
+    def test_batches_are_sent_from_threads_near_the_deadline(self):
+        base, _ = self.create_dispatcher(2500)
+        base._stats.record_request(1)
+        threads = set()
+        base._batch_send_payloads = lambda batch: threads.add(threading.current_thread())
+        base._send_batches([[1, 2, 3], [4, 5, 6], [7]])
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_connection_pool_is_sized_for_the_deadline_concurrency(self):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=3,
+                              deadline=Deadline(FakeLambdaContext(60000), max_concurrency=25))
+        self.assertEqual(25, base._get_aws_service_args()['config'].max_pool_connections)
+
+    def test_deadline_can_be_cleared(self):
+        base, _ = self.create_dispatcher(900)
+        base.set_deadline(None)
+        base.submit_payload({'id': 1})
+        base.flush_payloads()
+        base._batch_dispatch_method.assert_called_once_with([{'id': 1}])
+        self.assertEqual([], base.unprocessed_items)
+
+
+@patch('boto3_batch_utils.Base._boto3_interface_type_mapper', mock_boto3_interface_type_mapper)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch('boto3_batch_utils.Base.sleep')
+class CircuitBreaking(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        base = BaseDispatcher('test_subject', 'send_lots', 'send_one', max_batch_size=2,
+                              circuit_breaker=CircuitBreaker(failure_threshold=3, reset_timeout=10),
+                              retry_policy=RetryPolicy(max_attempts=5), **kwargs)
+        base._aws_service_message_max_bytes = 1000
+        base._aws_service_batch_max_bytes = 1000
+        base._batch_payload = []
+        base._initialise_aws_client()
+        base._batch_dispatch_method = Mock(side_effect=ClientError({"Error": {"Code": "InternalFailure"}}, "Test"))
+        base._unpack_failed_batch_to_unprocessed_items = base._add_unprocessed_items
+        return base
+
+    def test_retries_stop_when_the_breaker_opens(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._batch_send_payloads([1, 2])
+        self.assertEqual(3, base._batch_dispatch_method.call_count)
+        self.assertEqual('open', base.circuit_breaker.state)
+        self.assertEqual([1, 2], base.unprocessed_items)
+
+    def test_payloads_fail_without_a_call_while_open(self, mock_sleep):
+        base = self.create_dispatcher()
+        payloads = [{'id': i} for i in range(6)]
+        base.submit_payloads(payloads[:5])
+        self.assertEqual(payloads[:5], base.flush_payloads())
+        self.assertEqual(3, base._batch_dispatch_method.call_count)
+        base._individual_dispatch_method = Mock()
+        base._send_individual_payload(payloads[5])
+        base._individual_dispatch_method.assert_not_called()
+        self.assertEqual(payloads, base.unprocessed_items)
+        self.assertEqual(3, base.stats()['requests'])
+
+    @patch('boto3_batch_utils.circuit_breaker.monotonic')
+    def test_trial_call_after_reset_timeout(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100.0
+        base = self.create_dispatcher()
+        base._batch_send_payloads([1, 2])
+        base._batch_dispatch_method = Mock(return_value="response")
+        mock_monotonic.return_value = 110.0
+        base._batch_send_payloads([3, 4])
+        base._batch_dispatch_method.assert_called_once_with([3, 4])
+        self.assertEqual('closed', base.circuit_breaker.state)
+
+    @patch('boto3_batch_utils.circuit_breaker.monotonic')
+    def test_failed_trial_is_not_retried(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100.0
+        base = self.create_dispatcher()
+        base._batch_send_payloads([1, 2])
+        mock_monotonic.return_value = 110.0
+        base._batch_send_payloads([3, 4])
+        self.assertEqual(4, base._batch_dispatch_method.call_count)
+        self.assertEqual('open', base.circuit_breaker.state)
+        self.assertEqual([1, 2, 3, 4], base.unprocessed_items)
+
+    def test_errors_which_are_not_retried_do_not_open_the_breaker(self, mock_sleep):
+        base = self.create_dispatcher()
+        base._batch_dispatch_method.side_effect = ClientError({"Error": {"Code": "ValidationException"}}, "Test")
+        for _ in range(5):
+            base._batch_send_payloads([1])
+        self.assertEqual(5, base._batch_dispatch_method.call_count)
+        self.assertEqual('closed', base.circuit_breaker.state)
+
+    def test_state_in_stats(self, mock_sleep):
+        base = self.create_dispatcher()
+        self.assertNotIn('circuit_breaker', BaseDispatcher('test_subject', 'send_lots', max_batch_size=2).stats())
+        base._batch_send_payloads([1, 2])
+        base._batch_send_payloads([3, 4])
+        self.assertEqual({'state': 'open', 'consecutive_failures': 3, 'times_opened': 1, 'rejected_calls': 1},
+                         base.stats()['circuit_breaker'])
+
+    def test_failures_are_written_to_the_write_ahead_log(self, mock_sleep):
+        with TemporaryDirectory() as directory:
+            base = self.create_dispatcher(write_ahead_log=WriteAheadLog(directory))
+            base.submit_payloads([{'id': 1}, {'id': 2}, {'id': 3}])
+            base.write_ahead_log.close()
+            restored = self.create_dispatcher(write_ahead_log=WriteAheadLog(directory))
+            self.assertEqual([{'id': 1}, {'id': 2}], restored.unprocessed_items)
+            restored.write_ahead_log.close()
+
@@ -0,0 +1,115 @@
+from unittest import TestCase
+from unittest.mock import patch, Mock, call
+
+from boto3_batch_utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_failure_threshold_less_than_one(self):
+        with self.assertRaises(ValueError) as context:
+            CircuitBreaker(failure_threshold=0)
+        self.assertIn("failure_threshold '0' must be at least 1", str(context.exception))
+
+    def test_reset_timeout_not_greater_than_zero(self):
+        with self.assertRaises(ValueError) as context:
+            CircuitBreaker(reset_timeout=0)
+        self.assertIn("reset_timeout '0' must be greater than 0", str(context.exception))
+
+
+@patch('boto3_batch_utils.circuit_breaker.monotonic', return_value=100.0)
+class States(TestCase):
+
+    def test_opens_after_consecutive_failures(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=3)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual('closed', breaker.state)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual('open', breaker.state)
+        self.assertFalse(breaker.allow_request())
+
+    def test_success_resets_the_failure_count(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual('closed', breaker.state)
+        self.assertEqual(1, breaker.consecutive_failures)
+
+    def test_trial_call_after_reset_timeout(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        mock_monotonic.return_value = 109.0
+        self.assertFalse(breaker.allow_request())
+        mock_monotonic.return_value = 110.0
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual('half_open', breaker.state)
+        self.assertFalse(breaker.allow_request())
+
+    def test_successful_trial_closes(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        mock_monotonic.return_value = 110.0
+        breaker.allow_request()
+        breaker.record_success()
+        self.assertEqual('closed', breaker.state)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_trial_opens_again(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        mock_monotonic.return_value = 110.0
+        breaker.allow_request()
+        mock_monotonic.return_value = 111.0
+        breaker.record_failure()
+        self.assertEqual('open', breaker.state)
+        mock_monotonic.return_value = 120.0
+        self.assertFalse(breaker.allow_request())
+        mock_monotonic.return_value = 121.0
+        self.assertTrue(breaker.allow_request())
+
+    def test_another_trial_if_a_trial_does_not_finish(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        mock_monotonic.return_value = 110.0
+        self.assertTrue(breaker.allow_request())
+        mock_monotonic.return_value = 120.0
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual('half_open', breaker.state)
+
+    def test_state_changes_are_notified(self, mock_monotonic):
+        on_state_change = Mock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, on_state_change=on_state_change)
+        breaker.record_failure()
+        mock_monotonic.return_value = 110.0
+        breaker.allow_request()
+        breaker.allow_request()
+        breaker.record_success()
+        on_state_change.assert_has_calls([call('closed', 'open'), call('open', 'half_open'),
+                                          call('half_open', 'closed')])
+        self.assertEqual(3, on_state_change.call_count)
+
+    def test_state_change_callback_may_read_the_state(self, mock_monotonic):
+        states = []
+        breaker = CircuitBreaker(failure_threshold=1, on_state_change=lambda previous, state: states.append(
+            breaker.to_dict()['state']))
+        breaker.record_failure()
+        self.assertEqual(['open'], states)
+
+    def test_to_dict(self, mock_monotonic):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.allow_request()
+        self.assertEqual({'state': 'open', 'consecutive_failures': 2, 'times_opened': 1, 'rejected_calls': 1},
+                         breaker.to_dict())
+
+
+class CircuitOpen(TestCase):
+
+    def test_error_code(self):
+        error = CircuitOpenError('put_records')
+        self.assertEqual('CircuitOpen', error.response['Error']['Code'])
+        self.assertIn('put_records', str(error))
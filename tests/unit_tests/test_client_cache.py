@@ -0,0 +1,94 @@
+import multiprocessing
+import threading
+from time import sleep
+from unittest import TestCase
+from unittest.mock import Mock
+
+import boto3
+from botocore.config import Config
+
+from boto3_batch_utils import client_cache
+from boto3_batch_utils.client_cache import get_aws_service, clear_aws_service_cache
+
+
+def count_cached_aws_services(results):
+    results.put(len(client_cache._aws_service_cache))
+
+
+class GetAwsService(TestCase):
+
+    def setUp(self):
+        clear_aws_service_cache()
+        self.addCleanup(clear_aws_service_cache)
+
+    def test_same_arguments_share_a_client(self):
+        factory = Mock(side_effect=lambda *args, **kwargs: object())
+        first = get_aws_service(factory, 'sqs', region_name='eu-west-1')
+        second = get_aws_service(factory, 'sqs', region_name='eu-west-1')
+        self.assertIs(first, second)
+        factory.assert_called_once_with('sqs', region_name='eu-west-1')
+
+    def test_different_arguments_get_their_own_client(self):
+        factory = Mock(side_effect=lambda *args, **kwargs: object())
+        clients = [
+            get_aws_service(factory, 'sqs', region_name='eu-west-1'),
+            get_aws_service(factory, 'sqs', region_name='us-east-1'),
+            get_aws_service(factory, 'kinesis', region_name='eu-west-1'),
+            get_aws_service(factory, 'sqs', region_name='eu-west-1', aws_access_key_id='other'),
+            get_aws_service(Mock(), 'sqs', region_name='eu-west-1')
+        ]
+        self.assertEqual(5, len({id(client) for client in clients}))
+
+    def test_configs_are_compared_by_value(self):
+        factory = Mock(side_effect=lambda *args, **kwargs: object())
+        first = get_aws_service(factory, 'sqs', config=Config(max_pool_connections=20, retries={'max_attempts': 2}))
+        second = get_aws_service(factory, 'sqs', config=Config(max_pool_connections=20, retries={'max_attempts': 2}))
+        third = get_aws_service(factory, 'sqs', config=Config(max_pool_connections=30, retries={'max_attempts': 2}))
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+
+    def test_config_is_passed_to_the_factory(self):
+        factory = Mock()
+        config = Config(max_pool_connections=50)
+        get_aws_service(factory, 'sqs', config=config)
+        factory.assert_called_once_with('sqs', config=config)
+
+    def test_concurrent_requests_create_one_client(self):
+        def slow_factory(*args, **kwargs):
+            sleep(0.05)
+            return object()
+
+        factory = Mock(side_effect=slow_factory)
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(get_aws_service(factory, 'sqs')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        factory.assert_called_once()
+        self.assertEqual(1, len({id(client) for client in clients}))
+
+    def test_clear(self):
+        factory = Mock(side_effect=lambda *args, **kwargs: object())
+        first = get_aws_service(factory, 'sqs')
+        clear_aws_service_cache()
+        self.assertIsNot(first, get_aws_service(factory, 'sqs'))
+
+    def test_boto3_client(self):
+        first = get_aws_service(boto3.client, 'sqs', region_name='eu-west-1', aws_access_key_id='a',
+                                aws_secret_access_key='b')
+        second = get_aws_service(boto3.client, 'sqs', region_name='eu-west-1', aws_access_key_id='a',
+                                 aws_secret_access_key='b')
+        self.assertIs(first, second)
+        self.assertEqual('eu-west-1', first.meta.region_name)
+
+    def test_forked_process_does_not_share_clients(self):
+        get_aws_service(Mock(), 'sqs')
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        process = context.Process(target=count_cached_aws_services, args=(results,))
+        process.start()
+        process.join()
+        self.assertEqual(0, results.get(timeout=5))
+        self.assertEqual(1, len(client_cache._aws_service_cache))
@@ -2,8 +2,12 @@ from unittest import TestCase
 from unittest.mock import patch, Mock
 from datetime import datetime
 
+from botocore.exceptions import ClientError
+
 from boto3_batch_utils.Cloudwatch import CloudwatchBatchDispatcher, cloudwatch_dimension
 from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.circuit_breaker import CircuitBreaker
+from boto3_batch_utils.deadline import Deadline
 
 
 class MockClient:
@@ -37,6 +41,24 @@ class SubmitMetric(TestCase):
         })
 
 
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch.object(BaseDispatcher, '_batch_send_payloads')
+class SubmitMetrics(TestCase):
+
+    def test(self, mock_batch_send_payloads):
+        cw = CloudwatchBatchDispatcher('test_space', max_batch_size=2)
+        timestamp = datetime.now()
+        cw.submit_metrics({'metric_name': 'met', 'value': i, 'timestamp': timestamp,
+                           'dimensions': cloudwatch_dimension('d', i)} for i in range(3))
+        mock_batch_send_payloads.assert_called_once_with({'Namespace': 'test_space', 'MetricData': [
+            {'MetricName': 'met', 'Timestamp': timestamp, 'Value': i, 'Unit': 'Count',
+             'Dimensions': [{'Name': 'd', 'Value': str(i)}]}
+            for i in range(2)
+        ]})
+        self.assertEqual([2], [metric['Value'] for metric in cw._batch_payload])
+
+
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
 @patch.object(BaseDispatcher, 'flush_payloads')
@@ -60,6 +82,48 @@ class BatchSendPayloads(TestCase):
         mock_batch_send_payloads.assert_called_once_with({'Namespace': 'test_space', 'MetricData': test_batch})
 
 
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class FailedBatches(TestCase):
+
+    def create_dispatcher(self, **kwargs) -> CloudwatchBatchDispatcher:
+        cw = CloudwatchBatchDispatcher('test_space', max_batch_size=5, **kwargs)
+        cw._initialise_aws_client()
+        cw._batch_dispatch_method = Mock(side_effect=ClientError({'Error': {'Code': 'InvalidParameterValue'}},
+                                                                 'PutMetricData'))
+        return cw
+
+    def submit(self, cw: CloudwatchBatchDispatcher) -> list:
+        timestamp = datetime.now()
+        metrics = [{'MetricName': 'met', 'Timestamp': timestamp, 'Value': i, 'Unit': 'Count'} for i in range(3)]
+        cw.submit_metrics({'metric_name': 'met', 'value': i, 'timestamp': timestamp} for i in range(3))
+        return metrics
+
+    def test_failed_metrics_are_unprocessed_items(self):
+        cw = self.create_dispatcher()
+        metrics = self.submit(cw)
+        self.assertEqual(metrics, cw.flush_payloads())
+        cw._batch_dispatch_method.assert_called_once()
+        stats = cw.stats()
+        self.assertEqual(0, stats['payloads_sent'])
+        self.assertEqual(0, stats['batches_sent'])
+        self.assertEqual(3, stats['failed_payloads'])
+
+    def test_metrics_are_unprocessed_items_once_the_deadline_has_passed(self):
+        cw = self.create_dispatcher(deadline=Deadline(Mock(get_remaining_time_in_millis=Mock(return_value=500))))
+        metrics = self.submit(cw)
+        self.assertEqual(metrics, cw.flush_payloads())
+        cw._batch_dispatch_method.assert_not_called()
+
+    def test_metrics_are_unprocessed_items_while_the_circuit_breaker_is_open(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1)
+        circuit_breaker.record_failure()
+        cw = self.create_dispatcher(circuit_breaker=circuit_breaker)
+        metrics = self.submit(cw)
+        self.assertEqual(metrics, cw.flush_payloads())
+        cw._batch_dispatch_method.assert_not_called()
+
+
 class CloudwatchDimensionStructure(TestCase):
 
     def test(self):
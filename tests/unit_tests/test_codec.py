@@ -0,0 +1,125 @@
+from unittest import TestCase
+from unittest.mock import patch
+from datetime import date, datetime
+from decimal import Decimal
+from json import loads
+
+from boto3_batch_utils import codec
+from boto3_batch_utils.codec import get_json_codec, encode_default, StdlibJSONCodec, OrjsonCodec
+from boto3_batch_utils.SQS import SQSBatchDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+
+
+test_record = {
+    'id': 'abc',
+    'whole': Decimal('10'),
+    'fraction': Decimal('1.25'),
+    'day': date(2020, 1, 2),
+    'time': datetime(2020, 1, 2, 3, 4, 5, 6),
+    'nested': [{'value': Decimal('-3')}, 'text', 1.5, None, True]
+}
+expected_record = {
+    'id': 'abc',
+    'whole': 10,
+    'fraction': 1.25,
+    'day': '2020-01-02',
+    'time': '2020-01-02T03:04:05.000006',
+    'nested': [{'value': -3}, 'text', 1.5, None, True]
+}
+
+
+class EncodeDefault(TestCase):
+
+    def test_decimals(self):
+        self.assertEqual(10, encode_default(Decimal('10')))
+        self.assertIsInstance(encode_default(Decimal('10')), int)
+        self.assertEqual(1.25, encode_default(Decimal('1.25')))
+
+    def test_dates(self):
+        self.assertEqual('2020-01-02', encode_default(date(2020, 1, 2)))
+        self.assertEqual('2020-01-02T03:04:05', encode_default(datetime(2020, 1, 2, 3, 4, 5)))
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            encode_default(object())
+
+
+class StdlibCodec(TestCase):
+
+    def test_encode(self):
+        encoded = StdlibJSONCodec().encode(test_record)
+        self.assertEqual('{"id": "abc", "whole": 10, "fraction": 1.25, "day": "2020-01-02", '
+                         '"time": "2020-01-02T03:04:05.000006", "nested": [{"value": -3}, "text", 1.5, null, true]}',
+                         encoded)
+
+    def test_decode(self):
+        self.assertEqual(expected_record, StdlibJSONCodec().decode(StdlibJSONCodec().encode(test_record)))
+
+
+class OrjsonCodecTests(TestCase):
+
+    def test_encodes_the_same_values_as_stdlib(self):
+        self.assertEqual(expected_record, loads(OrjsonCodec().encode(test_record)))
+
+    def test_encode_returns_str(self):
+        self.assertEqual('{"a":1}', OrjsonCodec().encode({'a': Decimal('1')}))
+
+    def test_decode(self):
+        self.assertEqual(expected_record, OrjsonCodec().decode(OrjsonCodec().encode(test_record)))
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            OrjsonCodec().encode({'a': object()})
+
+
+class GetJsonCodec(TestCase):
+
+    def setUp(self):
+        codec._codecs.clear()
+
+    def tearDown(self):
+        codec._codecs.clear()
+
+    def test_default_is_stdlib(self):
+        self.assertIsInstance(get_json_codec(), StdlibJSONCodec)
+
+    def test_by_name(self):
+        self.assertIsInstance(get_json_codec('json'), StdlibJSONCodec)
+        self.assertIsInstance(get_json_codec('orjson'), OrjsonCodec)
+
+    def test_codecs_are_reused(self):
+        self.assertIs(get_json_codec('orjson'), get_json_codec('orjson'))
+
+    def test_codec_instance_is_returned(self):
+        json_codec = StdlibJSONCodec()
+        self.assertIs(json_codec, get_json_codec(json_codec))
+
+    def test_invalid_name(self):
+        with self.assertRaises(ValueError) as context:
+            get_json_codec('simplejson')
+        self.assertEqual("Requested json_codec 'simplejson' must be one of json, orjson", str(context.exception))
+
+    @patch('boto3_batch_utils.codec.import_module', side_effect=ImportError("No module named 'orjson'"))
+    def test_fall_back_to_stdlib_when_orjson_is_not_installed(self, mock_import_module):
+        with self.assertLogs('boto3-batch-utils', level='WARNING'):
+            self.assertIsInstance(get_json_codec('orjson'), StdlibJSONCodec)
+
+
+class DispatchersWithOrjson(TestCase):
+
+    def test_sqs(self):
+        sqs = SQSBatchDispatcher('test_queue', json_codec='orjson')
+        sqs.submit_payload(test_record, message_id='1')
+        self.assertEqual(expected_record, loads(sqs._batch_payload[0]['MessageBody']))
+        self.assertEqual(expected_record, sqs._unpack_individual_failed_payload(
+            {'Id': '1', 'MessageBody': sqs._batch_payload[0]['MessageBody']}))
+
+    def test_kinesis(self):
+        kn = KinesisBatchDispatcher('test_stream', partition_key_identifier='id', json_codec='orjson')
+        kn.submit_payload(test_record)
+        self.assertEqual(expected_record, loads(kn._batch_payload[0]['Data']))
+        self.assertEqual('abc', kn._batch_payload[0]['PartitionKey'])
+
+    def test_invalid_codec(self):
+        with self.assertRaises(ValueError):
+            SQSBatchDispatcher('test_queue', json_codec='simplejson')
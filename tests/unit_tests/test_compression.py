@@ -0,0 +1,181 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import patch, Mock
+from base64 import b64encode, b64decode
+from decimal import Decimal
+from importlib.util import find_spec
+import gzip
+import json
+import zlib
+
+from boto3_batch_utils import compression
+from boto3_batch_utils.codec import get_json_codec
+from boto3_batch_utils.compression import get_compressor, decompress, decode_payload, encode_payload, GzipCompressor, \
+    ZlibCompressor, ZstdCompressor
+from boto3_batch_utils.SQS import SQSBatchDispatcher, SQSFifoBatchDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+
+
+zstandard_installed = find_spec('zstandard') is not None
+test_payload = {'id': 'abc', 'text': 'a verbose JSON document ' * 100, 'value': Decimal('1.5')}
+test_document = json.dumps({'id': 'abc', 'text': 'a verbose JSON document ' * 100, 'value': 1.5}).encode('utf-8')
+
+
+class Compressors(TestCase):
+
+    def test_gzip(self):
+        compressed = GzipCompressor().compress(test_document)
+        self.assertEqual(test_document, gzip.decompress(compressed))
+        self.assertTrue(GzipCompressor.is_compressed(compressed))
+        self.assertEqual(compressed, GzipCompressor().compress(test_document))
+
+    def test_zlib(self):
+        compressed = ZlibCompressor().compress(test_document)
+        self.assertEqual(test_document, zlib.decompress(compressed))
+        self.assertTrue(ZlibCompressor.is_compressed(compressed))
+
+    @skipUnless(zstandard_installed, "zstandard is not installed")
+    def test_zstd(self):
+        compressed = ZstdCompressor().compress(test_document)
+        self.assertEqual(test_document, ZstdCompressor().decompress(compressed))
+        self.assertTrue(ZstdCompressor.is_compressed(compressed))
+
+    def test_json_is_not_recognised_as_compressed(self):
+        for compressor_class in (GzipCompressor, ZlibCompressor, ZstdCompressor):
+            self.assertFalse(compressor_class.is_compressed(test_document))
+            self.assertFalse(compressor_class.is_compressed(b'[1, 2]'))
+
+
+class GetCompressor(TestCase):
+
+    def setUp(self):
+        compression._compressors.clear()
+
+    def tearDown(self):
+        compression._compressors.clear()
+
+    def test_none(self):
+        self.assertIsNone(get_compressor())
+
+    def test_by_name(self):
+        self.assertIsInstance(get_compressor('gzip'), GzipCompressor)
+        self.assertIsInstance(get_compressor('zlib'), ZlibCompressor)
+
+    def test_compressors_are_reused(self):
+        self.assertIs(get_compressor('gzip'), get_compressor('gzip'))
+
+    def test_compressor_instance_is_returned(self):
+        compressor = ZlibCompressor(level=9)
+        self.assertIs(compressor, get_compressor(compressor))
+
+    def test_invalid_name(self):
+        with self.assertRaises(ValueError) as context:
+            get_compressor('lz4')
+        self.assertEqual("Requested compression 'lz4' must be one of gzip, zlib, zstd", str(context.exception))
+
+    @patch('boto3_batch_utils.compression.import_module', side_effect=ImportError("No module named 'zstandard'"))
+    def test_fall_back_to_gzip_when_zstandard_is_not_installed(self, mock_import_module):
+        with self.assertLogs('boto3-batch-utils', level='WARNING'):
+            self.assertIsInstance(get_compressor('zstd'), GzipCompressor)
+
+
+class EncodePayload(TestCase):
+
+    def test_json(self):
+        self.assertEqual(test_document.decode('utf-8'), encode_payload(test_payload, get_json_codec()))
+
+    def test_compressed(self):
+        encoded = encode_payload(test_payload, get_json_codec(), get_compressor('zlib'))
+        self.assertEqual(test_document, zlib.decompress(encoded))
+
+    def test_encodings_are_reused(self):
+        json_codec = Mock(encode=Mock(return_value=test_document.decode('utf-8')))
+        encodings = {}
+        gzipped = encode_payload(test_payload, json_codec, get_compressor('gzip'), encodings)
+        self.assertIs(gzipped, encode_payload(test_payload, json_codec, get_compressor('gzip'), encodings))
+        self.assertEqual(test_document.decode('utf-8'), encode_payload(test_payload, json_codec, None, encodings))
+        encode_payload(test_payload, json_codec, get_compressor('zlib'), encodings)
+        json_codec.encode.assert_called_once_with(test_payload)
+        self.assertEqual(3, len(encodings))
+
+
+class Decompress(TestCase):
+
+    def test_each_format(self):
+        names = ['gzip', 'zlib'] + (['zstd'] if zstandard_installed else [])
+        for name in names:
+            self.assertEqual(test_document, decompress(get_compressor(name).compress(test_document)), name)
+
+    def test_not_compressed(self):
+        self.assertEqual(test_document, decompress(test_document))
+
+
+class DecodePayload(TestCase):
+
+    def test_sqs_message_body(self):
+        self.assertEqual(json.loads(test_document), decode_payload(test_document.decode('utf-8')))
+
+    def test_compressed_sqs_message_body(self):
+        body = b64encode(gzip.compress(test_document)).decode('ascii')
+        self.assertEqual(json.loads(test_document), decode_payload(body))
+
+    def test_kinesis_record_data(self):
+        self.assertEqual(json.loads(test_document), decode_payload(zlib.compress(test_document)))
+        self.assertEqual(json.loads(test_document), decode_payload(test_document))
+
+    def test_lambda_event_kinesis_data(self):
+        self.assertEqual(json.loads(test_document), decode_payload(b64encode(zlib.compress(test_document)).decode()))
+        self.assertEqual(json.loads(test_document), decode_payload(b64encode(test_document).decode()))
+
+    def test_json_codec(self):
+        self.assertEqual(json.loads(test_document), decode_payload(zlib.compress(test_document), json_codec='orjson'))
+
+
+class SQSCompression(TestCase):
+
+    def test_message_body_is_compressed(self):
+        sqs = SQSBatchDispatcher('test_queue', compression='gzip')
+        sqs.submit_payload(test_payload, message_id='1')
+        body = sqs._batch_payload[0]['MessageBody']
+        self.assertEqual(test_document, gzip.decompress(b64decode(body)))
+        self.assertEqual(json.loads(test_document), decode_payload(body))
+
+    def test_byte_size_is_of_compressed_body(self):
+        sqs = SQSBatchDispatcher('test_queue', compression='gzip')
+        uncompressed = SQSBatchDispatcher('test_queue')
+        sqs.submit_payload(test_payload, message_id='1')
+        uncompressed.submit_payload(test_payload, message_id='1')
+        record = sqs._batch_payload[0]
+        self.assertEqual(len(json.dumps(dict(record))), record.byte_size)
+        self.assertLess(record.byte_size * 5, uncompressed._batch_payload[0].byte_size)
+
+    def test_fifo_message_body_is_compressed(self):
+        fifo = SQSFifoBatchDispatcher('test_queue', compression='zlib')
+        fifo.submit_payload(test_payload, message_id='1')
+        self.assertEqual(json.loads(test_document), decode_payload(fifo._batch_payload[0]['MessageBody']))
+
+    def test_unpack_failed_payload_without_source(self):
+        sqs = SQSBatchDispatcher('test_queue', compression='gzip')
+        sqs.submit_payload(test_payload, message_id='1')
+        self.assertEqual(json.loads(test_document),
+                         sqs._unpack_individual_failed_payload(dict(sqs._batch_payload[0])))
+
+
+class KinesisCompression(TestCase):
+
+    def test_data_is_compressed(self):
+        kn = KinesisBatchDispatcher('test_stream', partition_key_identifier='id', compression='zlib')
+        kn.submit_payload(test_payload)
+        self.assertEqual(test_document, zlib.decompress(kn._batch_payload[0]['Data']))
+        self.assertEqual('abc', kn._batch_payload[0]['PartitionKey'])
+
+    def test_byte_size_is_of_compressed_data(self):
+        kn = KinesisBatchDispatcher('test_stream', partition_key_identifier='id', compression='zlib')
+        kn.submit_payload(test_payload)
+        record = kn._batch_payload[0]
+        self.assertEqual(len(zlib.compress(test_document)) + len('{"Data": "", "PartitionKey": "abc"}'),
+                         record.byte_size)
+
+    def test_unpack_failed_payload_without_source(self):
+        kn = KinesisBatchDispatcher('test_stream', partition_key_identifier='id', compression='gzip')
+        kn.submit_payload(test_payload)
+        self.assertEqual(json.loads(test_document), kn._unpack_individual_failed_payload(dict(kn._batch_payload[0])))
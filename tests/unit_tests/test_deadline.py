@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from unittest import TestCase
+from unittest.mock import patch
+
+from boto3_batch_utils.deadline import Deadline, get_deadline
+
+
+class FakeLambdaContext:
+    """ Stands in for the context object passed to a Lambda function's handler """
+
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_deadline_of_unsupported_type(self):
+        for deadline in ('tomorrow', True, object()):
+            with self.assertRaises(ValueError) as context:
+                Deadline(deadline)
+            self.assertIn("must be a Lambda context, a datetime or a timestamp", str(context.exception))
+
+    def test_negative_margin(self):
+        with self.assertRaises(ValueError) as context:
+            Deadline(FakeLambdaContext(1000), margin_ms=-1)
+        self.assertIn("margin_ms '-1' and flush_ms '2000' must not be negative", str(context.exception))
+
+    def test_max_concurrency_less_than_one(self):
+        with self.assertRaises(ValueError) as context:
+            Deadline(FakeLambdaContext(1000), max_concurrency=0)
+        self.assertIn("max_concurrency '0' must be at least 1", str(context.exception))
+
+
+class Remaining(TestCase):
+
+    def test_lambda_context(self):
+        context = FakeLambdaContext(5000)
+        deadline = Deadline(context, margin_ms=1000)
+        self.assertEqual(4, deadline.remaining())
+        context.remaining_ms = 1000
+        self.assertEqual(0, deadline.remaining())
+        self.assertTrue(deadline.expired)
+
+    @patch('boto3_batch_utils.deadline.time', return_value=100.0)
+    def test_timestamp(self, mock_time):
+        deadline = Deadline(103.5, margin_ms=500)
+        self.assertEqual(3, deadline.remaining())
+        self.assertFalse(deadline.expired)
+        mock_time.return_value = 103.0
+        self.assertTrue(deadline.expired)
+
+    @patch('boto3_batch_utils.deadline.time', return_value=1700000000.0)
+    def test_datetime(self, mock_time):
+        deadline = Deadline(datetime.fromtimestamp(1700000010, tz=timezone.utc), margin_ms=0)
+        self.assertEqual(10, deadline.remaining())
+
+
+class IsNear(TestCase):
+
+    def test_within_flush_ms(self):
+        deadline = Deadline(FakeLambdaContext(3500), margin_ms=1000, flush_ms=2000)
+        self.assertFalse(deadline.is_near(1))
+        deadline.deadline.remaining_ms = 2900
+        self.assertTrue(deadline.is_near(1))
+
+    def test_pending_batches_could_take_half_the_remaining_time(self):
+        deadline = Deadline(FakeLambdaContext(11000), margin_ms=1000, flush_ms=0, max_concurrency=2)
+        self.assertFalse(deadline.is_near(8, request_seconds=1))
+        self.assertTrue(deadline.is_near(12, request_seconds=1))
+
+    def test_default_request_time(self):
+        deadline = Deadline(FakeLambdaContext(2000), margin_ms=0, flush_ms=0, max_concurrency=1)
+        self.assertFalse(deadline.is_near(10))
+        self.assertTrue(deadline.is_near(11))
+
+
+class GetConcurrency(TestCase):
+
+    def test_concurrency_is_raised_to_send_within_half_the_remaining_time(self):
+        deadline = Deadline(FakeLambdaContext(5000), margin_ms=1000, max_concurrency=10)
+        self.assertEqual(1, deadline.get_concurrency(2, request_seconds=1))
+        self.assertEqual(5, deadline.get_concurrency(10, request_seconds=1))
+        self.assertEqual(10, deadline.get_concurrency(100, request_seconds=1))
+
+    def test_concurrency_is_not_reduced(self):
+        deadline = Deadline(FakeLambdaContext(60000), max_concurrency=10)
+        self.assertEqual(20, deadline.get_concurrency(30, request_seconds=0.1, concurrency=20))
+
+    def test_maximum_once_expired(self):
+        deadline = Deadline(FakeLambdaContext(500), margin_ms=1000, max_concurrency=8)
+        self.assertEqual(8, deadline.get_concurrency(2))
+
+
+class GetDeadline(TestCase):
+
+    def test_none(self):
+        self.assertIsNone(get_deadline())
+
+    def test_deadline_instance_is_returned(self):
+        deadline = Deadline(FakeLambdaContext(1000))
+        self.assertIs(deadline, get_deadline(deadline))
+
+    def test_lambda_context(self):
+        context = FakeLambdaContext(1000)
+        deadline = get_deadline(context)
+        self.assertIs(context, deadline.deadline)
+        self.assertEqual(1000, deadline.margin_ms)
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from unittest import TestCase
 from unittest.mock import patch, Mock, call
 
@@ -5,6 +6,8 @@ from botocore.exceptions import ClientError
 
 from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
 from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.deadline import Deadline
+from boto3_batch_utils.retry import RetryPolicy
 
 
 class MockClient:
@@ -67,6 +70,26 @@ class SubmitPayload(TestCase):
         mock_submit_payload.assert_not_called()
 
 
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch.object(BaseDispatcher, '_batch_send_payloads')
+class SubmitPayloads(TestCase):
+
+    def test_duplicate_keys_are_skipped(self, mock_batch_send_payloads):
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', 's_key', max_batch_size=3)
+        dy.submit_payloads([{'p_key': 1, 's_key': 1}, {'p_key': 1, 's_key': 2}, {'p_key': 1, 's_key': 1},
+                            {'p_key': 2, 's_key': 1}, {'p_key': 3, 's_key': 1}])
+        mock_batch_send_payloads.assert_called_once_with({'RequestItems': {'test_table_name': [
+            {'PutRequest': {'Item': {'p_key': p_key, 's_key': s_key}}} for p_key, s_key in [(1, 1), (1, 2), (2, 1)]
+        ]}})
+        self.assertEqual([{'PutRequest': {'Item': {'p_key': 3, 's_key': 1}}}], dy._batch_payload)
+
+    def test_where_key_requires_mapping(self, mock_batch_send_payloads):
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', partition_key_data_type=int, max_batch_size=3)
+        dy.submit_payloads([{'id': '1', 'a': 1.5}, {'id': '1'}], partition_key_location='id')
+        self.assertEqual([{'PutRequest': {'Item': {'id': '1', 'a': Decimal('1.5'), 'p_key': 1}}}], dy._batch_payload)
+
+
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
 class TestCheckPayloadIsUnique(TestCase):
@@ -257,43 +280,66 @@ class SendIndividualPayload(TestCase):
 
     def test_happy_path(self):
         dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
-        dy._dynamo_table = Mock()
-        dy._dynamo_table.put_item = Mock()
+        dy._individual_dispatch_method = Mock()
         test_payload = {"processed_payload": False}
         dy._send_individual_payload(test_payload)
-        dy._dynamo_table.put_item.assert_called_once_with(**{'Item': test_payload})
+        dy._individual_dispatch_method.assert_called_once_with(**{'Item': test_payload})
 
     def test_client_error_retries_remaining(self):
-        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
-        dy._dynamo_table = Mock()
-        dy._dynamo_table.put_item.side_effect = [ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo"),
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1,
+                                   retry_policy=RetryPolicy(max_attempts=2, base_delay=0))
+        dy._individual_dispatch_method = Mock()
+        dy._individual_dispatch_method.side_effect = [ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo"),
                                                  None]
         test_payload = {"processed_payload": False}
-        dy._send_individual_payload(test_payload, retry=1)
-        dy._dynamo_table.put_item.assert_has_calls([call(**{'Item': test_payload}), call(**{'Item': test_payload})])
+        dy._send_individual_payload(test_payload)
+        dy._individual_dispatch_method.assert_has_calls([call(**{'Item': test_payload}), call(**{'Item': test_payload})])
 
     def test_client_error_no_retries_remaining(self):
-        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
-        dy._dynamo_table = Mock()
-        dy._dynamo_table.put_item.side_effect = [ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo")]
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1,
+                                   retry_policy=RetryPolicy(max_attempts=1))
+        dy._individual_dispatch_method = Mock()
+        dy._individual_dispatch_method.side_effect = [ClientError({'Error': {'Code': 500, 'Message': 'broken'}}, "Dynamo")]
         test_payload = {"processed_payload": False}
-        dy._send_individual_payload(test_payload, retry=0)
-        dy._dynamo_table.put_item.assert_called_once_with(**{'Item': test_payload})
+        dy._send_individual_payload(test_payload)
+        dy._individual_dispatch_method.assert_called_once_with(**{'Item': test_payload})
+        self.assertEqual([test_payload], dy.unprocessed_items)
+
+    def test_deadline_has_passed(self):
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1,
+                                   deadline=Deadline(Mock(get_remaining_time_in_millis=Mock(return_value=500))))
+        dy._individual_dispatch_method = Mock()
+        test_payload = {"processed_payload": False}
+        dy._send_individual_payload(test_payload)
+        dy._individual_dispatch_method.assert_not_called()
         self.assertEqual([test_payload], dy.unprocessed_items)
 
 
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
-@patch.object(BaseDispatcher, '_initialise_aws_client')
 class TestInitialiseAwsClient(TestCase):
 
-    def test(self, mock_initialise_aws_client):
+    def test_writes_are_made_through_the_resource_client(self):
         dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
-        dy._aws_service = Mock()
-        dy._aws_service.Table = Mock(return_value="test table")
+        resource = Mock()
+        with patch.object(BaseDispatcher, '_create_aws_service', Mock(return_value=resource)):
+            dy._initialise_aws_client()
+
+        self.assertIs(resource, dy._aws_service)
+        self.assertIs(resource.meta.client.batch_write_item, dy._batch_dispatch_method)
+        dy._individual_dispatch_method(Item={'p_key': 1})
+        resource.meta.client.put_item.assert_called_once_with(TableName='test_table_name', Item={'p_key': 1})
+        resource.Table.assert_not_called()
 
-        table_client = dy._initialise_aws_client()
 
-        mock_initialise_aws_client.assert_called_once()
-        dy._aws_service.Table.assert_called_once_with('test_table_name')
-        self.assertEqual('test table', dy._dynamo_table)
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class IsBatchResponseThrottled(TestCase):
+
+    def test_unprocessed_items(self):
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
+        self.assertTrue(dy._is_batch_response_throttled({'UnprocessedItems': {'test_table_name': [{}]}}))
+
+    def test_no_unprocessed_items(self):
+        dy = DynamoBatchDispatcher('test_table_name', 'p_key', max_batch_size=1)
+        self.assertFalse(dy._is_batch_response_throttled({'UnprocessedItems': {}}))
@@ -0,0 +1,185 @@
+from unittest import TestCase
+from unittest.mock import patch, Mock
+from base64 import b64decode
+from decimal import Decimal
+import gzip
+import json
+import threading
+
+from boto3_batch_utils.Async import AsyncSQSBatchDispatcher
+from boto3_batch_utils.Cloudwatch import CloudwatchBatchDispatcher
+from boto3_batch_utils.codec import StdlibJSONCodec
+from boto3_batch_utils.Dynamodb import DynamoBatchDispatcher
+from boto3_batch_utils.FanOut import FanOutDispatcher
+from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
+from boto3_batch_utils.SQS import SQSBatchDispatcher, SQSFifoBatchDispatcher
+
+
+test_payload = {'id': 'abc', 'text': 'an event published to several targets'}
+test_document = json.dumps(test_payload)
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_no_targets(self):
+        with self.assertRaises(ValueError) as context:
+            FanOutDispatcher({})
+        self.assertEqual("Requested targets must include at least one dispatcher", str(context.exception))
+
+    def test_duplicate_targets(self):
+        with self.assertRaises(ValueError) as context:
+            FanOutDispatcher([SQSBatchDispatcher('test_queue'), SQSBatchDispatcher('test_queue')])
+        self.assertIn("must be different dispatchers", str(context.exception))
+
+    def test_unsupported_target(self):
+        for target in (CloudwatchBatchDispatcher('test_namespace'), AsyncSQSBatchDispatcher('test_queue'), object()):
+            with self.assertRaises(ValueError) as context:
+                FanOutDispatcher({'target': target})
+            self.assertIn("Requested target 'target' must be an SQS, Kinesis or DynamoDB dispatcher",
+                          str(context.exception))
+
+    def test_list_targets_are_named(self):
+        fan_out = FanOutDispatcher([SQSBatchDispatcher('test_queue'),
+                                    KinesisBatchDispatcher('test_stream', partition_key_identifier='id')])
+        self.assertEqual(['SQSBatchDispatcher::test_queue', 'KinesisBatchDispatcher::test_stream'],
+                         list(fan_out.targets))
+
+
+class SubmitPayload(TestCase):
+
+    def test_payload_is_submitted_to_every_target(self):
+        fan_out = FanOutDispatcher({
+            'queue': SQSBatchDispatcher('test_queue'),
+            'stream': KinesisBatchDispatcher('test_stream', partition_key_identifier='id'),
+            'table': DynamoBatchDispatcher('test_table', partition_key='id')
+        })
+        fan_out.submit_payload(test_payload)
+        self.assertEqual(test_document, fan_out.targets['queue']._batch_payload[0]['MessageBody'])
+        self.assertEqual(test_document, fan_out.targets['stream']._batch_payload[0]['Data'])
+        self.assertEqual('abc', fan_out.targets['stream']._batch_payload[0]['PartitionKey'])
+        self.assertEqual(test_payload, fan_out.targets['table']._batch_payload[0]['PutRequest']['Item'])
+
+    def test_payload_is_json_encoded_once(self):
+        json_codec = StdlibJSONCodec()
+        fan_out = FanOutDispatcher([
+            SQSBatchDispatcher('test_queue', json_codec=json_codec),
+            SQSFifoBatchDispatcher('test_queue.fifo', json_codec=json_codec),
+            KinesisBatchDispatcher('test_stream', partition_key_identifier='id', json_codec=json_codec)
+        ])
+        with patch.object(json_codec, 'encode', wraps=json_codec.encode) as mock_encode:
+            fan_out.submit_payloads([test_payload, {'id': 'def'}])
+        self.assertEqual(2, mock_encode.call_count)
+        for target in fan_out.targets.values():
+            self.assertEqual(2, len(target._batch_payload))
+
+    def test_compressed_payload_is_shared(self):
+        fan_out = FanOutDispatcher({
+            'queue': SQSBatchDispatcher('test_queue', compression='gzip'),
+            'stream': KinesisBatchDispatcher('test_stream', partition_key_identifier='id', compression='gzip'),
+            'uncompressed': KinesisBatchDispatcher('other_stream', partition_key_identifier='id')
+        })
+        with patch('boto3_batch_utils.compression.GzipCompressor.compress', wraps=gzip.compress) as mock_compress:
+            fan_out.submit_payload(test_payload)
+        mock_compress.assert_called_once()
+        data = fan_out.targets['stream']._batch_payload[0]['Data']
+        self.assertEqual(data, b64decode(fan_out.targets['queue']._batch_payload[0]['MessageBody']))
+        self.assertEqual(test_document.encode('utf-8'), gzip.decompress(data))
+        self.assertEqual(test_document, fan_out.targets['uncompressed']._batch_payload[0]['Data'])
+
+    def test_dynamo_target_does_not_change_the_payload_of_other_targets(self):
+        fan_out = FanOutDispatcher({
+            'audit': DynamoBatchDispatcher('test_table', partition_key='id'),
+            'queue': SQSBatchDispatcher('test_queue'),
+            'stream': KinesisBatchDispatcher('test_stream', partition_key_identifier='ref')
+        })
+        payload = {'values': [-1.5, 2.25], 'ref': 'a'}
+        fan_out.submit_payload(payload, target_kwargs={'audit': {'partition_key_location': 'ref'}})
+        document = json.dumps({'values': [-1.5, 2.25], 'ref': 'a'})
+        self.assertEqual({'values': [-1.5, 2.25], 'ref': 'a'}, payload)
+        self.assertEqual(document, fan_out.targets['queue']._batch_payload[0]['MessageBody'])
+        self.assertEqual(document, fan_out.targets['stream']._batch_payload[0]['Data'])
+        self.assertEqual({'values': [Decimal('-1.5'), Decimal('2.25')], 'ref': 'a', 'id': 'a'},
+                         fan_out.targets['audit']._batch_payload[0]['PutRequest']['Item'])
+
+    def test_payload_too_large_for_one_target_is_submitted_to_none(self):
+        fan_out = FanOutDispatcher({
+            'stream': KinesisBatchDispatcher('test_stream', partition_key_identifier='id'),
+            'queue': SQSBatchDispatcher('test_queue')
+        })
+        with self.assertRaises(ValueError) as context:
+            fan_out.submit_payload({'id': 'abc', 'text': 'x' * 300000})
+        self.assertIn("exceeds the maximum payload size", str(context.exception))
+        for target in fan_out.targets.values():
+            self.assertEqual([], target._batch_payload)
+            self.assertEqual(0, target.stats()['payloads_submitted'])
+
+    def test_fan_out_dispatchers_sharing_targets_do_not_deadlock(self):
+        queue = SQSBatchDispatcher('test_queue')
+        stream = KinesisBatchDispatcher('test_stream', partition_key_identifier='id')
+        for target in (queue, stream):
+            target._initialise_aws_client = Mock()
+            target._batch_send_payloads = Mock()
+        fan_outs = [FanOutDispatcher({'a': queue, 'b': stream}), FanOutDispatcher({'b': stream, 'a': queue})]
+
+        def submit(fan_out):
+            for i in range(2000):
+                fan_out.submit_payload({'id': str(i)})
+
+        threads = [threading.Thread(target=submit, args=(fan_out,), daemon=True) for fan_out in fan_outs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(4000, queue.stats()['payloads_submitted'])
+        self.assertEqual(4000, stream.stats()['payloads_submitted'])
+
+    def test_target_kwargs(self):
+        fan_out = FanOutDispatcher({
+            'queue': SQSFifoBatchDispatcher('test_queue.fifo'),
+            'table': DynamoBatchDispatcher('test_table', partition_key='key')
+        })
+        fan_out.submit_payload({'id': 'abc'}, target_kwargs={'queue': {'message_group_id': 'events'},
+                                                             'table': {'partition_key_location': 'id'}})
+        self.assertEqual('events', fan_out.targets['queue']._batch_payload[0]['MessageGroupId'])
+        self.assertEqual('abc', fan_out.targets['table']._batch_payload[0]['PutRequest']['Item']['key'])
+
+
+class FlushPayloads(TestCase):
+
+    def test_unprocessed_items_are_returned_by_target(self):
+        queue = SQSBatchDispatcher('test_queue')
+        stream = KinesisBatchDispatcher('test_stream', partition_key_identifier='id')
+        queue.flush_payloads = Mock(return_value=[test_payload])
+        stream.flush_payloads = Mock(return_value=[])
+        fan_out = FanOutDispatcher({'queue': queue, 'stream': stream})
+        self.assertEqual({'queue': [test_payload], 'stream': []}, fan_out.flush_payloads())
+        queue.flush_payloads.assert_called_once_with()
+        stream.flush_payloads.assert_called_once_with()
+
+    def test_exception_is_raised_once_every_target_has_flushed(self):
+        queue = SQSBatchDispatcher('test_queue')
+        stream = KinesisBatchDispatcher('test_stream', partition_key_identifier='id')
+        queue.flush_payloads = Mock(side_effect=RuntimeError("flush failed"))
+        stream.flush_payloads = Mock(return_value=[])
+        fan_out = FanOutDispatcher({'queue': queue, 'stream': stream})
+        with self.assertRaises(RuntimeError):
+            fan_out.flush_payloads()
+        stream.flush_payloads.assert_called_once_with()
+
+    def test_context_manager_closes_every_target(self):
+        queue = SQSBatchDispatcher('test_queue')
+        queue.close = Mock(return_value=[])
+        with FanOutDispatcher({'queue': queue}):
+            pass
+        queue.close.assert_called_once_with()
+
+
+class Monitoring(TestCase):
+
+    def test_unprocessed_items_and_stats_by_target(self):
+        queue = SQSBatchDispatcher('test_queue')
+        queue.unprocessed_items.append(test_payload)
+        fan_out = FanOutDispatcher({'queue': queue})
+        self.assertEqual({'queue': [test_payload]}, fan_out.unprocessed_items)
+        self.assertEqual({'queue': queue.stats()}, fan_out.stats())
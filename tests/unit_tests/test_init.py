@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+import boto3_batch_utils
+
+
+def run_in_fresh_interpreter(code: str) -> str:
+    env = dict(os.environ, AWS_DEFAULT_REGION='eu-west-1')
+    return subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+
+
+class LazyAttributes(TestCase):
+
+    def test_all_public_attributes_can_be_imported(self):
+        for name in boto3_batch_utils.__all__:
+            self.assertTrue(hasattr(boto3_batch_utils, name), name)
+
+    def test_attribute_is_from_its_module(self):
+        from boto3_batch_utils.SQS import SQSBatchDispatcher
+        self.assertIs(SQSBatchDispatcher, boto3_batch_utils.SQSBatchDispatcher)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError) as context:
+            boto3_batch_utils.NotADispatcher
+        self.assertIn("has no attribute 'NotADispatcher'", str(context.exception))
+
+    def test_dir_lists_public_attributes(self):
+        self.assertTrue(set(boto3_batch_utils.__all__).issubset(dir(boto3_batch_utils)))
+
+
+class DeferredImports(TestCase):
+
+    def test_import_does_not_import_dispatchers_or_boto3(self):
+        output = run_in_fresh_interpreter(
+            "import sys\n"
+            "import boto3_batch_utils\n"
+            "print(sorted(m for m in sys.modules if m.startswith(('boto3', 'asyncio'))))"
+        )
+        self.assertEqual("['boto3_batch_utils']\n", output)
+
+    def test_boto3_is_not_imported_until_the_first_flush(self):
+        output = run_in_fresh_interpreter(
+            "import sys\n"
+            "from boto3_batch_utils import SQSBatchDispatcher\n"
+            "sqs = SQSBatchDispatcher('test_queue', max_batch_size=2)\n"
+            "sqs.submit_payload({'a': 1})\n"
+            "print('boto3' in sys.modules, 'asyncio' in sys.modules)\n"
+            "sqs._initialise_aws_client()\n"
+            "print('boto3' in sys.modules, type(sqs._aws_service).__name__)"
+        )
+        self.assertEqual("False False\nTrue SQS\n", output)
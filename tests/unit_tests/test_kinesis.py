@@ -2,9 +2,13 @@ from unittest import TestCase
 from unittest.mock import patch, Mock, call
 
 from json import dumps
+from decimal import Decimal
 
 from boto3_batch_utils.Kinesis import KinesisBatchDispatcher
 from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.circuit_breaker import CircuitBreaker
+from boto3_batch_utils.retry import RetryPolicy
+from boto3_batch_utils.utils import BatchRecord
 
 
 class MockClient:
@@ -19,24 +23,61 @@ class MockClient:
         pass
 
 
+class ValidateInitialisation(TestCase):
+
+    def test_max_concurrency_with_partition_key_identifier_raises_exception(self):
+        with self.assertRaises(ValueError) as context:
+            KinesisBatchDispatcher('test_stream', partition_key_identifier='id', max_concurrency=2)
+        self.assertIn("Requested max_concurrency '2' must be 1 for", str(context.exception))
+
+    def test_max_concurrency_without_partition_key_identifier(self):
+        kn = KinesisBatchDispatcher('test_stream', max_concurrency=2)
+        self.assertEqual(2, kn.max_concurrency)
+
+
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
-@patch('boto3_batch_utils.Kinesis.DecimalEncoder')
-@patch('boto3_batch_utils.Kinesis.dumps')
 @patch.object(BaseDispatcher, 'submit_payload')
 class SubmitPayload(TestCase):
 
-    def test(self, mock_submit_payload, mock_json_dumps, mock_decimal_encoder):
+    def test(self, mock_submit_payload):
         kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
+        kn.json_codec = Mock()
         test_payload = {'test_part_key': 123}
-        mock_json_dumps.return_value = "serialized_test_data"
+        kn.json_codec.encode.return_value = "serialized_test_data"
         constructed_payload = {
             'Data': "serialized_test_data",
             'PartitionKey': '123'
         }
         kn.submit_payload(test_payload)
         mock_submit_payload.assert_called_once_with(constructed_payload)
-        mock_json_dumps.asser_called_once_with(test_payload, cls=mock_decimal_encoder)
+        kn.json_codec.encode.assert_called_once_with(test_payload)
+
+    def test_orjson_codec(self, mock_submit_payload):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1,
+                                    json_codec='orjson')
+        kn.submit_payload({'test_part_key': 123, 'value': Decimal('1.5')})
+        mock_submit_payload.assert_called_once_with({'Data': '{"test_part_key":123,"value":1.5}', 'PartitionKey': '123'})
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch.object(BaseDispatcher, '_batch_send_payloads')
+class SubmitPayloads(TestCase):
+
+    def test_batches_are_sent_as_they_fill(self, mock_batch_send_payloads):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="id", max_batch_size=2)
+        submitted = []
+
+        def payloads():
+            for i in range(5):
+                submitted.append(i)
+                yield {'id': i}
+
+        kn.submit_payloads(payloads())
+        self.assertEqual(2, mock_batch_send_payloads.call_count)
+        self.assertEqual([{'Data': dumps({'id': 4}), 'PartitionKey': '4'}], kn._batch_payload)
+        self.assertEqual(list(range(5)), submitted)
 
 
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
@@ -67,20 +108,14 @@ class BatchSendPayloads(TestCase):
         kn._batch_send_payloads(test_batch)
         mock_base_batch_send_payloads.assert_called_once_with(test_batch)
 
-    def test_with_retries(self, mock_base_batch_send_payloads):
-        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
-        test_batch = {'StreamName': 'test_stream', 'Records': ['a', 'b', 'c']}
-        kn._batch_send_payloads(test_batch, retry=3)
-        mock_base_batch_send_payloads.assert_called_once_with(test_batch, 3)
 
 
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
 class ProcessFailedPayloads(TestCase):
 
-    def test_all_records_failed_in_first_batch_and_are_re_submitted(self):
+    def test_all_records_failed_in_first_batch_and_are_left_to_be_re_sent(self):
         kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
-        kn._batch_send_payloads = Mock()
         test_batch = [
             {"Id": 1}, {"Id": 2}, {"Id": 3}, {"Id": 4}, {"Id": 5},
             {"Id": 6}, {"Id": 7}, {"Id": 8}, {"Id": 9}, {"Id": 10}
@@ -122,11 +157,12 @@ class ProcessFailedPayloads(TestCase):
             ]
         }
         kn._process_failed_payloads(test_response)
-        kn._batch_send_payloads.assert_called_once_with(test_batch, retry=3)
+        failed_records, error = kn._local.failed_records
+        self.assertEqual(test_batch, failed_records)
+        self.assertEqual('ProvisionedThroughputExceededException', error.response['Error']['Code'])
 
     def test_some_records_are_rejected_some_are_successful(self):
         kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
-        kn._batch_send_payloads = Mock()
         test_batch = [
             {"Id": 1}, {"Id": 2}, {"Id": 3}, {"Id": 4}, {"Id": 5},
             {"Id": 6}, {"Id": 7}, {"Id": 8}, {"Id": 9}, {"Id": 10}
@@ -163,7 +199,7 @@ class ProcessFailedPayloads(TestCase):
             ]
         }
         kn._process_failed_payloads(test_response)
-        kn._batch_send_payloads.assert_called_once_with([{"Id": 6}, {"Id": 7}, {"Id": 8}, {"Id": 9}, {"Id": 10}], retry=3)
+        self.assertEqual([{"Id": 6}, {"Id": 7}, {"Id": 8}, {"Id": 9}, {"Id": 10}], kn._local.failed_records[0])
 
     def test_two_records_are_rejected_the_rest_are_successful(self):
         kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
@@ -287,4 +323,119 @@ class SendIndividualPayload(TestCase):
         kn._send_individual_payload(test_payload)
         _test_payload = test_payload
         _test_payload['StreamName'] = 'test_stream'
-        mock_send_individual_payload.assert_called_once_with(_test_payload, 4)
+        mock_send_individual_payload.assert_called_once_with(_test_payload)
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class UnpackFailedBatchToUnprocessedItems(TestCase):
+
+    def test_records_return_original_submissions(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
+        test_payloads = [{'test_part_key': 1}, {'test_part_key': 2}]
+        batch = {'StreamName': 'test_stream', 'Records': [
+            BatchRecord({'Data': dumps(pl), 'PartitionKey': str(pl['test_part_key'])}, source=pl)
+            for pl in test_payloads
+        ]}
+        with patch.object(kn.json_codec, 'decode') as mock_loads:
+            kn._unpack_failed_batch_to_unprocessed_items(batch)
+        mock_loads.assert_not_called()
+        self.assertEqual(test_payloads, kn.unprocessed_items)
+
+    def test_plain_dicts_are_decoded(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
+        batch = {'StreamName': 'test_stream', 'Records': [{'Data': dumps({'test_part_key': 1}), 'PartitionKey': '1'}]}
+        kn._unpack_failed_batch_to_unprocessed_items(batch)
+        self.assertEqual([{'test_part_key': 1}], kn.unprocessed_items)
+
+    def test_submitted_record_carries_its_source(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=2)
+        test_payload = {'test_part_key': 1}
+        kn.submit_payload(test_payload)
+        self.assertIs(test_payload, kn._batch_payload[0].source)
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class IsBatchResponseThrottled(TestCase):
+
+    def test_failed_records(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
+        self.assertTrue(kn._is_batch_response_throttled({'FailedRecordCount': 2, 'Records': []}))
+
+    def test_no_failed_records(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="test_part_key", max_batch_size=1)
+        self.assertFalse(kn._is_batch_response_throttled({'FailedRecordCount': 0, 'Records': []}))
+
+
+@patch('boto3_batch_utils.Kinesis.sleep')
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class ResendFailedRecords(TestCase):
+
+    def create_dispatcher(self, **kwargs):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="id", max_batch_size=5, **kwargs)
+        kn._initialise_aws_client()
+        kn._batch_dispatch_method = Mock()
+        return kn
+
+    @staticmethod
+    def throttled_response(record_count: int, failed_count: int) -> dict:
+        return {'FailedRecordCount': failed_count,
+                'Records': [{}] * (record_count - failed_count) +
+                           [{'ErrorCode': 'ProvisionedThroughputExceededException'}] * failed_count}
+
+    def test_rejected_records_are_re_sent_with_backoff(self, mock_sleep):
+        kn = self.create_dispatcher()
+        kn._batch_dispatch_method.side_effect = [self.throttled_response(5, 4), self.throttled_response(4, 3),
+                                                 self.throttled_response(3, 0)]
+        kn.submit_payloads({'id': str(i)} for i in range(5))
+        self.assertEqual([], kn.flush_payloads())
+        self.assertEqual([5, 4, 3], [len(c.kwargs['Records']) for c in kn._batch_dispatch_method.call_args_list])
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertEqual(2, kn.stats()['throttled_retries'])
+
+    def test_records_still_rejected_after_max_attempts_are_unprocessed(self, mock_sleep):
+        kn = self.create_dispatcher(retry_policy=RetryPolicy(max_attempts=4))
+        kn._batch_dispatch_method.side_effect = lambda **batch: self.throttled_response(len(batch['Records']),
+                                                                                      len(batch['Records']))
+        payloads = [{'id': str(i)} for i in range(5)]
+        kn.submit_payloads(payloads)
+        self.assertEqual(payloads, kn.flush_payloads())
+        self.assertEqual(4, kn._batch_dispatch_method.call_count)
+        self.assertEqual(3, mock_sleep.call_count)
+        self.assertEqual(5, kn.stats()['failed_payloads'])
+
+    def test_records_with_non_retryable_errors_are_not_re_sent(self, mock_sleep):
+        kn = self.create_dispatcher(retry_policy=RetryPolicy(non_retryable_error_codes={'KMSAccessDeniedException'}))
+        kn._batch_dispatch_method.return_value = {'FailedRecordCount': 3,
+                                                  'Records': [{'ErrorCode': 'KMSAccessDeniedException'}] * 3}
+        kn.submit_payloads({'id': str(i)} for i in range(3))
+        self.assertEqual(3, len(kn.flush_payloads()))
+        kn._batch_dispatch_method.assert_called_once()
+        mock_sleep.assert_not_called()
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class CircuitBreaking(TestCase):
+
+    def test_response_in_which_every_record_failed(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="id", max_batch_size=3)
+        self.assertTrue(kn._is_response_failed({'FailedRecordCount': 2, 'Records': [{}, {}]}))
+        self.assertFalse(kn._is_response_failed({'FailedRecordCount': 1, 'Records': [{}, {}]}))
+        self.assertFalse(kn._is_response_failed({'FailedRecordCount': 0, 'Records': []}))
+
+    def test_failing_stream_is_not_called_once_the_breaker_opens(self):
+        kn = KinesisBatchDispatcher("test_stream", partition_key_identifier="id", max_batch_size=5,
+                                    circuit_breaker=CircuitBreaker(failure_threshold=3))
+        kn._initialise_aws_client()
+        kn._batch_dispatch_method = Mock(return_value={
+            'FailedRecordCount': 5, 'Records': [{'ErrorCode': 'InternalFailure'}] * 5})
+        payloads = [{'id': str(i)} for i in range(5)]
+        for payload in payloads:
+            kn.submit_payload(payload)
+        self.assertEqual(payloads, kn.flush_payloads())
+        self.assertEqual(3, kn._batch_dispatch_method.call_count)
+        self.assertEqual('open', kn.stats()['circuit_breaker']['state'])
+
@@ -0,0 +1,129 @@
+from json import loads
+from time import sleep
+from unittest import TestCase
+
+from botocore.exceptions import ClientError
+
+from boto3_batch_utils import DynamoBatchDispatcher, KinesisBatchDispatcher, SQSBatchDispatcher, \
+    SQSFifoBatchDispatcher
+from boto3_batch_utils.constants import KINESIS_MESSAGE_MAX_BYTES
+from boto3_batch_utils.Multiprocess import MultiprocessDispatcher
+
+
+class StubKinesisClient:
+    """ Reject every batch containing a payload with 'fail' set, and take 1.5s to send one with 'slow' set """
+
+    def put_records(self, StreamName, Records):
+        if any(loads(r['Data']).get('slow') for r in Records):
+            sleep(1.5)
+        if any(loads(r['Data']).get('fail') for r in Records):
+            raise ClientError({'Error': {'Code': 'ValidationException'}}, 'PutRecords')
+        return {'FailedRecordCount': 0, 'Records': [{} for _ in Records]}
+
+    def put_record(self, **kwargs):
+        return {}
+
+
+class KinesisBatchDispatcherWithStub(KinesisBatchDispatcher):
+
+    def _initialise_aws_client(self):
+        self._aws_service = StubKinesisClient()
+        self._batch_dispatch_method = self._aws_service.put_records
+        self._individual_dispatch_method = self._aws_service.put_record
+
+
+class Initialisation(TestCase):
+
+    def test_processes_less_than_one_raises_exception(self):
+        with self.assertRaises(ValueError) as context:
+            MultiprocessDispatcher(KinesisBatchDispatcherWithStub, 'test_stream', processes=-1)
+        self.assertIn("processes '-1' must be at least 1", str(context.exception))
+
+    def test_chunk_size_less_than_one_raises_exception(self):
+        with self.assertRaises(ValueError) as context:
+            MultiprocessDispatcher(KinesisBatchDispatcherWithStub, 'test_stream', processes=1, chunk_size=0)
+        self.assertIn("chunk_size '0' must be at least 1", str(context.exception))
+
+
+class DefaultRoutingKey(TestCase):
+
+    def test_fifo_queue_routes_on_message_group(self):
+        routing_key = MultiprocessDispatcher._get_default_routing_key(SQSFifoBatchDispatcher, ('queue',), {})
+        self.assertEqual('group', routing_key(({'a': 1},), {'message_group_id': 'group'}))
+        self.assertEqual('unset', routing_key(({'a': 1},), {}))
+
+    def test_kinesis_routes_on_partition_key(self):
+        routing_key = MultiprocessDispatcher._get_default_routing_key(
+            KinesisBatchDispatcher, ('stream',), {'partition_key_identifier': 'key'})
+        self.assertEqual('abc', routing_key(({'key': 'abc'},), {}))
+        self.assertIsNone(MultiprocessDispatcher._get_default_routing_key(KinesisBatchDispatcher, ('stream',), {}))
+
+    def test_dynamo_routes_on_partition_key(self):
+        routing_key = MultiprocessDispatcher._get_default_routing_key(DynamoBatchDispatcher, ('table', 'id'), {})
+        self.assertEqual('abc', routing_key(({'id': 'abc'},), {}))
+        self.assertEqual('xyz', routing_key(({'id': 'abc', 'other': 'xyz'},), {'partition_key_location': 'other'}))
+
+    def test_standard_queue_is_not_routed(self):
+        self.assertIsNone(MultiprocessDispatcher._get_default_routing_key(SQSBatchDispatcher, ('queue',), {}))
+
+
+class Dispatch(TestCase):
+
+    def create_dispatcher(self, **kwargs) -> MultiprocessDispatcher:
+        dispatcher = MultiprocessDispatcher(KinesisBatchDispatcherWithStub, 'test_stream', processes=3, chunk_size=10,
+                                            start_method='fork', **kwargs)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_payloads_are_sent_by_every_worker(self):
+        dispatcher = self.create_dispatcher(max_batch_size=10)
+        dispatcher.submit_payloads({'id': str(i)} for i in range(200))
+        self.assertEqual([], dispatcher.flush_payloads())
+        stats = dispatcher.stats()
+        self.assertEqual(200, stats['payloads_submitted'])
+        self.assertEqual(200, stats['payloads_sent'])
+        self.assertEqual(20, stats['batches_sent'])
+        self.assertEqual(1.0, stats['batch_fill_ratio'])
+        self.assertEqual(20, stats['request_latency']['count'])
+
+    def test_unprocessed_items_are_merged_in_order_of_key(self):
+        dispatcher = self.create_dispatcher(partition_key_identifier='key')
+        payloads = [{'key': str(i % 7), 'index': i, 'fail': True} for i in range(100)]
+        for payload in payloads:
+            dispatcher.submit_payload(payload)
+        unprocessed_items = dispatcher.flush_payloads()
+        self.assertEqual(100, len(unprocessed_items))
+        for key in range(7):
+            self.assertEqual([p for p in payloads if p['key'] == str(key)],
+                             [p for p in unprocessed_items if p['key'] == str(key)])
+        self.assertEqual(100, dispatcher.stats()['failed_payloads'])
+
+    def test_each_unprocessed_item_is_returned_once(self):
+        dispatcher = self.create_dispatcher()
+        dispatcher.submit_payload({'id': '1', 'fail': True})
+        self.assertEqual(1, len(dispatcher.flush_payloads()))
+        dispatcher.submit_payload({'id': '2', 'fail': True})
+        self.assertEqual([{'id': '1', 'fail': True}, {'id': '2', 'fail': True}], dispatcher.flush_payloads())
+
+    def test_submission_errors_are_raised_on_flush(self):
+        dispatcher = self.create_dispatcher()
+        dispatcher.submit_payload({'id': '1', 'body': 'x' * KINESIS_MESSAGE_MAX_BYTES})
+        dispatcher.submit_payload({'id': '2'})
+        with self.assertRaises(ValueError) as context:
+            dispatcher.flush_payloads()
+        self.assertIn('exceeds the maximum payload size', str(context.exception))
+        self.assertEqual(1, dispatcher.stats()['payloads_sent'])
+
+    def test_close_stops_the_workers(self):
+        dispatcher = self.create_dispatcher()
+        dispatcher.submit_payload({'id': '1', 'fail': True})
+        self.assertEqual([{'id': '1', 'fail': True}], dispatcher.close())
+        self.assertFalse(any(worker.is_alive() for worker in dispatcher._workers))
+        with self.assertRaises(RuntimeError):
+            dispatcher.submit_payload({'id': '2'})
+
+    def test_close_waits_for_a_slow_worker_after_the_others_have_exited(self):
+        dispatcher = self.create_dispatcher(partition_key_identifier='key')
+        dispatcher.submit_payload({'key': 'a', 'slow': True})
+        self.assertEqual([], dispatcher.close())
+        self.assertEqual(1, dispatcher.stats()['payloads_sent'])
@@ -0,0 +1,130 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch
+
+from boto3_batch_utils.rate_limiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        #  Like a real sleep, slightly oversleep
+        self.now += seconds + 1e-9
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+class TestTokenBucket(TestCase):
+
+    @patch('boto3_batch_utils.rate_limiter.monotonic', return_value=0)
+    def test_starts_full(self, mock_monotonic):
+        bucket = TokenBucket(10)
+        self.assertEqual(10, bucket.tokens)
+        self.assertEqual(0, bucket.get_wait_time(10))
+
+    @patch('boto3_batch_utils.rate_limiter.monotonic', return_value=0)
+    def test_refill_is_capped(self, mock_monotonic):
+        bucket = TokenBucket(10, 20)
+        bucket.take(15)
+        bucket.refill(1)
+        self.assertEqual(15, bucket.tokens)
+        bucket.refill(10)
+        self.assertEqual(20, bucket.tokens)
+
+    @patch('boto3_batch_utils.rate_limiter.monotonic', return_value=0)
+    def test_wait_time(self, mock_monotonic):
+        bucket = TokenBucket(10)
+        bucket.take(10)
+        self.assertEqual(0.5, bucket.get_wait_time(5))
+
+    @patch('boto3_batch_utils.rate_limiter.monotonic', return_value=0)
+    def test_amount_larger_than_capacity_leaves_bucket_in_debt(self, mock_monotonic):
+        bucket = TokenBucket(10)
+        self.assertEqual(0, bucket.get_wait_time(25))
+        bucket.take(25)
+        self.assertEqual(1.6, bucket.get_wait_time(1))
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_no_limits(self):
+        with self.assertRaises(ValueError) as context:
+            RateLimiter()
+        self.assertIn("At least one of records_per_second and bytes_per_second", str(context.exception))
+
+    def test_negative_limit(self):
+        with self.assertRaises(ValueError) as context:
+            RateLimiter(records_per_second=10, bytes_per_second=-1)
+        self.assertIn("bytes_per_second '-1' must be greater than 0", str(context.exception))
+
+
+class Acquire(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patchers = [
+            patch('boto3_batch_utils.rate_limiter.monotonic', self.clock.monotonic),
+            patch('boto3_batch_utils.rate_limiter.sleep', side_effect=self.clock.sleep),
+            patch('asyncio.sleep', side_effect=self.clock.async_sleep)
+        ]
+        self.mock_sleep = patchers[1].start()
+        for patcher in patchers[::2]:
+            patcher.start()
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def test_records_limit(self):
+        limiter = RateLimiter(records_per_second=10)
+        self.assertEqual(0, limiter.try_acquire(10, 1000))
+        self.assertEqual(0.5, limiter.try_acquire(5, 1000))
+
+    def test_bytes_limit(self):
+        limiter = RateLimiter(bytes_per_second=100)
+        self.assertEqual(0, limiter.try_acquire(10, 80))
+        self.assertAlmostEqual(0.3, limiter.try_acquire(1, 50))
+
+    def test_nothing_is_taken_unless_both_limits_allow(self):
+        limiter = RateLimiter(records_per_second=10, bytes_per_second=100)
+        self.assertEqual(0, limiter.try_acquire(1, 100))
+        self.assertEqual(1, limiter.try_acquire(1, 100))
+        self.assertEqual(0, limiter.try_acquire(9, 0))
+
+    def test_burst(self):
+        limiter = RateLimiter(records_per_second=10, burst_seconds=3)
+        self.assertEqual(0, limiter.try_acquire(30, 0))
+        self.assertEqual(0.1, limiter.try_acquire(1, 0))
+
+    def test_acquire_blocks_until_allowed(self):
+        limiter = RateLimiter(records_per_second=10)
+        start = self.clock.now
+        for _ in range(5):
+            limiter.acquire(5, 0)
+        self.assertAlmostEqual(1.5, self.clock.now - start)
+        self.assertEqual(3, self.mock_sleep.call_count)
+
+    def test_average_rate_is_held(self):
+        limiter = RateLimiter(records_per_second=100, bytes_per_second=1000)
+        start = self.clock.now
+        for _ in range(200):
+            limiter.acquire(7, 30)
+        #  1400 records at 100 per second, less the initial one second burst
+        self.assertAlmostEqual(13, self.clock.now - start, places=1)
+
+    def test_acquire_async(self):
+        limiter = RateLimiter(records_per_second=10)
+        start = self.clock.now
+
+        async def run():
+            for _ in range(3):
+                await limiter.acquire_async(10, 0)
+
+        asyncio.run(run())
+        self.assertAlmostEqual(2, self.clock.now - start)
+        self.mock_sleep.assert_not_called()
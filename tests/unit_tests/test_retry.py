@@ -0,0 +1,108 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from boto3_batch_utils.retry import RetryPolicy, get_error_code
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': 'broken'}}, "A Test")
+
+
+class GetErrorCode(TestCase):
+
+    def test_error_code(self):
+        self.assertEqual('ThrottlingException', get_error_code(client_error('ThrottlingException')))
+
+    def test_numeric_error_code(self):
+        self.assertEqual('500', get_error_code(client_error(500)))
+
+    def test_no_error_code(self):
+        self.assertEqual('', get_error_code(ClientError({'Error': {'Message': 'broken'}}, "A Test")))
+
+
+class ValidateInitialisation(TestCase):
+
+    def test_max_attempts_less_than_one(self):
+        with self.assertRaises(ValueError) as context:
+            RetryPolicy(max_attempts=0)
+        self.assertIn("max_attempts '0' must be at least 1", str(context.exception))
+
+    def test_negative_delay(self):
+        with self.assertRaises(ValueError) as context:
+            RetryPolicy(base_delay=-1)
+        self.assertIn("must not be negative", str(context.exception))
+
+    def test_deadline_not_greater_than_zero(self):
+        with self.assertRaises(ValueError) as context:
+            RetryPolicy(deadline=0)
+        self.assertIn("deadline '0' must be greater than 0", str(context.exception))
+
+
+class IsRetryable(TestCase):
+
+    def test_throttling_is_retried(self):
+        self.assertTrue(RetryPolicy().is_retryable(client_error('ProvisionedThroughputExceededException')))
+
+    def test_server_error_is_retried(self):
+        self.assertTrue(RetryPolicy().is_retryable(client_error('InternalFailure')))
+
+    def test_validation_error_is_not_retried(self):
+        self.assertFalse(RetryPolicy().is_retryable(client_error('ValidationException')))
+
+    def test_retryable_error_codes_restrict_retries(self):
+        policy = RetryPolicy(retryable_error_codes={'ThrottlingException'})
+        self.assertTrue(policy.is_retryable(client_error('ThrottlingException')))
+        self.assertFalse(policy.is_retryable(client_error('InternalFailure')))
+
+    def test_non_retryable_error_codes_can_be_replaced(self):
+        policy = RetryPolicy(non_retryable_error_codes={'InternalFailure'})
+        self.assertTrue(policy.is_retryable(client_error('ValidationException')))
+        self.assertFalse(policy.is_retryable(client_error('InternalFailure')))
+
+
+class IsThrottling(TestCase):
+
+    def test_throttling(self):
+        self.assertTrue(RetryPolicy.is_throttling(client_error('ThrottlingException')))
+
+    def test_not_throttling(self):
+        self.assertFalse(RetryPolicy.is_throttling(client_error('ValidationException')))
+
+
+@patch('boto3_batch_utils.retry.random.uniform', side_effect=lambda low, high: high)
+class GetBackoff(TestCase):
+
+    def test_exponential(self, mock_uniform):
+        policy = RetryPolicy(max_attempts=10, base_delay=0.1, max_delay=100)
+        self.assertEqual([0.1, 0.2, 0.4, 0.8], [policy.get_backoff(attempt) for attempt in range(1, 5)])
+
+    def test_capped(self, mock_uniform):
+        policy = RetryPolicy(max_attempts=10, base_delay=0.1, max_delay=0.3)
+        self.assertEqual([0.1, 0.2, 0.3, 0.3], [policy.get_backoff(attempt) for attempt in range(1, 5)])
+
+    def test_full_jitter(self, mock_uniform):
+        RetryPolicy(base_delay=0.1).get_backoff(3)
+        mock_uniform.assert_called_once_with(0, 0.4)
+
+
+@patch('boto3_batch_utils.retry.random.uniform', side_effect=lambda low, high: high)
+class GetRetryDelay(TestCase):
+
+    def test_retryable_error(self, mock_uniform):
+        self.assertEqual(0.05, RetryPolicy().get_retry_delay(client_error('ThrottlingException'), 1, 0))
+
+    def test_max_attempts_reached(self, mock_uniform):
+        self.assertIsNone(RetryPolicy(max_attempts=3).get_retry_delay(client_error('ThrottlingException'), 3, 0))
+
+    def test_non_retryable_error(self, mock_uniform):
+        self.assertIsNone(RetryPolicy().get_retry_delay(client_error('ValidationException'), 1, 0))
+
+    def test_deadline_would_be_exceeded(self, mock_uniform):
+        policy = RetryPolicy(base_delay=1, deadline=2)
+        self.assertEqual(1, policy.get_retry_delay(client_error('ThrottlingException'), 1, 0.5))
+        self.assertIsNone(policy.get_retry_delay(client_error('ThrottlingException'), 1, 1.5))
+
+    def test_large_attempt_number(self, mock_uniform):
+        self.assertEqual(2.0, RetryPolicy(max_attempts=5000).get_backoff(4000))
@@ -1,10 +1,14 @@
 from unittest import TestCase
 from unittest.mock import patch, Mock, call
 
-from json import dumps
+from json import dumps, loads
+
+from botocore.exceptions import ClientError
 
 from boto3_batch_utils.SQS import SQSBatchDispatcher, SQSFifoBatchDispatcher
 from boto3_batch_utils.Base import BaseDispatcher
+from boto3_batch_utils.retry import RetryPolicy
+from boto3_batch_utils.utils import BatchRecord
 
 
 class MockClient:
@@ -38,6 +42,15 @@ class TestInit(TestCase):
         self.assertIsNone(sqs.batch_in_progress)
         self.assertTrue(sqs.fifo_queue)
 
+    def test_fifo_queue_max_concurrency_raises_exception(self):
+        with self.assertRaises(ValueError) as context:
+            SQSFifoBatchDispatcher('test_queue', max_concurrency=2)
+        self.assertIn("Requested max_concurrency '2' must be 1 for", str(context.exception))
+
+    def test_standard_queue_max_concurrency(self):
+        sqs = SQSBatchDispatcher('test_queue', max_concurrency=2)
+        self.assertEqual(2, sqs.max_concurrency)
+
 
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
@@ -89,6 +102,32 @@ class SubmitPayload(TestCase):
         mock_submit_payload.assert_not_called()
 
 
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch.object(BaseDispatcher, '_batch_send_payloads')
+class SubmitPayloads(TestCase):
+
+    def test_standard_queue(self, mock_batch_send_payloads):
+        sqs = SQSBatchDispatcher('test_queue', max_batch_size=2)
+        sqs.submit_payloads(({'a': i} for i in range(3)), delay_seconds=3)
+        mock_batch_send_payloads.assert_called_once()
+        self.assertEqual([{'a': 2}], [payload.source for payload in sqs._batch_payload])
+        self.assertEqual(3, sqs._batch_payload[0]['DelaySeconds'])
+
+    def test_standard_queue_message_id_deduplication(self, mock_batch_send_payloads):
+        sqs = SQSBatchDispatcher('test_queue', max_batch_size=10)
+        sqs.submit_payloads([{'a': 1}, {'a': 2}], message_id='abc')
+        self.assertEqual([{'a': 1}], [payload.source for payload in sqs._batch_payload])
+
+    def test_fifo_queue_message_deduplication_id_deduplication(self, mock_batch_send_payloads):
+        fifo = SQSFifoBatchDispatcher('test_queue', max_batch_size=10)
+        fifo.submit_payload({'a': 0}, message_deduplication_id='abc')
+        fifo.submit_payloads([{'a': 1}, {'a': 2}], message_group_id='group', message_deduplication_id='abc')
+        fifo.submit_payloads([{'a': 3}, {'a': 4}], message_group_id='group')
+        self.assertEqual([{'a': 0}, {'a': 3}, {'a': 4}], [payload.source for payload in fifo._batch_payload])
+        self.assertEqual('group', fifo._batch_payload[-1]['MessageGroupId'])
+
+
 @patch('boto3_batch_utils.Base.boto3.client', MockClient)
 @patch('boto3_batch_utils.Base.boto3', Mock())
 @patch.object(BaseDispatcher, 'flush_payloads')
@@ -223,7 +262,7 @@ class SendIndividualPayload(TestCase):
         sqs._send_individual_payload(test_payload)
         expected_converted_payload = {"QueueUrl": "test_url", "MessageBody": "some_sort_of_payload",
                                       "DelaySeconds": 99}
-        mock_send_individual_payload.assert_called_once_with(expected_converted_payload, 4)
+        mock_send_individual_payload.assert_called_once_with(expected_converted_payload)
 
     def test_standard_queue_without_delay_seconds(self, mock_send_individual_payload):
         sqs = SQSBatchDispatcher('test_queue', max_batch_size=1)
@@ -234,7 +273,7 @@ class SendIndividualPayload(TestCase):
             }
         sqs._send_individual_payload(test_payload)
         expected_converted_payload = {"QueueUrl": "test_url", "MessageBody": "some_sort_of_payload"}
-        mock_send_individual_payload.assert_called_once_with(expected_converted_payload, 4)
+        mock_send_individual_payload.assert_called_once_with(expected_converted_payload)
 
     def test_fifo_queue(self, mock_send_individual_payload):
         sqs = SQSFifoBatchDispatcher('test_queue', max_batch_size=1)
@@ -246,9 +285,66 @@ class SendIndividualPayload(TestCase):
             }
         sqs._send_individual_payload(test_payload)
         expected_converted_payload = {
-            'Id': 12345,
             'QueueUrl': 'test_url',
             'MessageBody': 'some_sort_of_payload',
             'MessageGroupId': 'unset'
         }
-        mock_send_individual_payload.assert_called_once_with(expected_converted_payload, 4)
+        mock_send_individual_payload.assert_called_once_with(expected_converted_payload)
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+class UnpackIndividualFailedPayload(TestCase):
+
+    def test_record_returns_original_submission(self):
+        sqs = SQSBatchDispatcher('test_queue', max_batch_size=1)
+        test_message = {'something': 'else'}
+        record = BatchRecord({'Id': '1', 'MessageBody': dumps(test_message)}, source=test_message)
+        with patch.object(sqs.json_codec, 'decode') as mock_loads:
+            self.assertIs(test_message, sqs._unpack_individual_failed_payload(record))
+        mock_loads.assert_not_called()
+
+    def test_plain_dict_is_decoded(self):
+        sqs = SQSBatchDispatcher('test_queue', max_batch_size=1)
+        test_message = {'something': 'else'}
+        self.assertEqual(test_message,
+                         sqs._unpack_individual_failed_payload({'Id': '1', 'MessageBody': dumps(test_message)}))
+
+    def test_individual_send_failure_returns_original_submission(self):
+        sqs = SQSBatchDispatcher('test_queue', max_batch_size=1, retry_policy=RetryPolicy(max_attempts=1))
+        sqs.queue_url = 'test_url'
+        sqs._individual_dispatch_method = Mock(side_effect=ClientError({"Error": {"Code": "Oops"}}, "A Test"))
+        test_message = {'something': 'else'}
+        record = BatchRecord({'Id': '1', 'MessageBody': dumps(test_message)}, source=test_message)
+        sqs._send_individual_payload(record)
+        self.assertIs(test_message, sqs.unprocessed_items[0])
+
+
+@patch('boto3_batch_utils.Base.boto3.client', MockClient)
+@patch('boto3_batch_utils.Base.boto3', Mock())
+@patch.object(BaseDispatcher, '_batch_send_payloads')
+class BatchPacking(TestCase):
+
+    def submit_and_flush(self, dispatcher):
+        #  Messages of about 150KB and 100KB, only one of each fits within the 256KB batch limit
+        for text, size in [('a', 150000), ('b', 150000), ('c', 100000), ('d', 100000)]:
+            dispatcher.submit_payload({'text': text * size})
+        dispatcher.flush_payloads()
+
+    def test_standard_queue_packs_largest_messages_first(self, mock_batch_send_payloads):
+        sqs = SQSBatchDispatcher('test_queue', batch_packing=True)
+        self.submit_and_flush(sqs)
+        self.assertEqual(2, mock_batch_send_payloads.call_count)
+
+    def test_standard_queue_without_packing(self, mock_batch_send_payloads):
+        sqs = SQSBatchDispatcher('test_queue')
+        self.submit_and_flush(sqs)
+        self.assertEqual(3, mock_batch_send_payloads.call_count)
+
+    def test_fifo_queue_keeps_message_order(self, mock_batch_send_payloads):
+        fifo = SQSFifoBatchDispatcher('test_queue', batch_packing=True)
+        self.submit_and_flush(fifo)
+        sent = [loads(payload['MessageBody'])['text'][0] for c in mock_batch_send_payloads.call_args_list
+                for payload in c[0][0]['Entries']]
+        self.assertEqual(['a', 'b', 'c', 'd'], sent)
+        self.assertEqual(3, mock_batch_send_payloads.call_count)
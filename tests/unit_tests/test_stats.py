@@ -0,0 +1,107 @@
+from unittest import TestCase
+
+from boto3_batch_utils.stats import LatencyHistogram, DispatcherStats, merge_stats
+
+
+class TestLatencyHistogram(TestCase):
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertEqual({'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'mean': None, 'p50': None, 'p90': None,
+                          'p99': None}, {k: v for k, v in histogram.to_dict().items() if k != 'buckets'})
+
+    def test_record(self):
+        histogram = LatencyHistogram((0.01, 0.1, float('inf')))
+        for seconds in (0.005, 0.01, 0.05, 0.2):
+            histogram.record(seconds)
+        result = histogram.to_dict()
+        self.assertEqual([(0.01, 2), (0.1, 1), (float('inf'), 1)], result['buckets'])
+        self.assertEqual(4, result['count'])
+        self.assertAlmostEqual(0.265, result['sum'])
+        self.assertEqual(0.005, result['min'])
+        self.assertEqual(0.2, result['max'])
+
+    def test_percentiles_are_bucket_bounds(self):
+        histogram = LatencyHistogram((0.01, 0.1, float('inf')))
+        for _ in range(90):
+            histogram.record(0.005)
+        for _ in range(10):
+            histogram.record(0.05)
+        self.assertEqual(0.01, histogram.get_percentile(50))
+        self.assertEqual(0.01, histogram.get_percentile(90))
+        self.assertEqual(0.05, histogram.get_percentile(99))
+
+
+    def test_merge(self):
+        histogram = LatencyHistogram((0.01, 0.1, float('inf')))
+        other = LatencyHistogram((0.01, 0.1, float('inf')))
+        histogram.record(0.05)
+        other.record(0.005)
+        other.record(0.2)
+        histogram.merge(LatencyHistogram.from_dict(other.to_dict()))
+        self.assertEqual([(0.01, 1), (0.1, 1), (float('inf'), 1)], histogram.to_dict()['buckets'])
+        self.assertEqual((3, 0.005, 0.2), (histogram.count, histogram.min, histogram.max))
+        self.assertAlmostEqual(0.255, histogram.total)
+
+
+class TestDispatcherStats(TestCase):
+
+    def test_derived_ratios(self):
+        stats = DispatcherStats()
+        stats.record_batch(10, 100)
+        stats.record_batch(5, 50)
+        stats.record_flush(0.1)
+        result = stats.to_dict(max_batch_size=10)
+        self.assertEqual(15, result['payloads_sent'])
+        self.assertEqual(150, result['bytes_sent'])
+        self.assertEqual(2, result['batches_per_flush'])
+        self.assertEqual(0.75, result['batch_fill_ratio'])
+
+    def test_nothing_sent(self):
+        result = DispatcherStats().to_dict(max_batch_size=10)
+        self.assertIsNone(result['batches_per_flush'])
+        self.assertIsNone(result['batch_fill_ratio'])
+
+    def test_retries(self):
+        stats = DispatcherStats()
+        stats.record_retry(throttled=True)
+        stats.record_retry(throttled=False)
+        result = stats.to_dict(max_batch_size=10)
+        self.assertEqual(2, result['retries'])
+        self.assertEqual(1, result['throttled_retries'])
+
+    def test_request_latency(self):
+        stats = DispatcherStats()
+        self.assertIsNone(stats.get_request_latency(90))
+        for seconds in (0.02, 0.02, 0.3):
+            stats.record_request(seconds)
+        self.assertEqual(0.025, stats.get_request_latency(50))
+        self.assertEqual(0.3, stats.get_request_latency(90))
+
+
+class TestMergeStats(TestCase):
+
+    def test_merge(self):
+        stats, other = DispatcherStats(), DispatcherStats()
+        stats.record_flush(0.01)
+        stats.record_batch(10, 1000)
+        stats.record_request(0.01)
+        other.record_flush(0.02)
+        other.record_batch(4, 400)
+        other.record_batch(10, 1000)
+        other.record_request(0.02)
+        other.record_request(0.03)
+        merged = merge_stats([stats.to_dict(10), other.to_dict(10)])
+        self.assertEqual(2, merged['flushes'])
+        self.assertEqual(3, merged['batches_sent'])
+        self.assertEqual(24, merged['payloads_sent'])
+        self.assertEqual(2400, merged['bytes_sent'])
+        self.assertEqual(1.5, merged['batches_per_flush'])
+        self.assertAlmostEqual(0.8, merged['batch_fill_ratio'])
+        self.assertEqual(3, merged['request_latency']['count'])
+        self.assertAlmostEqual(0.03, merged['request_latency']['max'])
+
+    def test_nothing_to_merge(self):
+        merged = merge_stats([])
+        self.assertIsNone(merged['batch_fill_ratio'])
+        self.assertEqual(0, merged['request_latency']['count'])
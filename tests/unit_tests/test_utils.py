@@ -149,3 +149,151 @@ class TestGetByteSizeOfDict(TestCase):
 
         mock_get_byte_size_of_string.assert_called_once_with('[{"dict": true, "complex": 0, "stuff": "etc"}]')
         self.assertEqual(5, response)
+
+
+class TestBatchRecord(TestCase):
+
+    def test_record_is_equal_to_constructed_payload(self):
+        record = utils.BatchRecord({'Id': '1', 'MessageBody': '{"a": 1}'}, source={'a': 1})
+        self.assertEqual({'Id': '1', 'MessageBody': '{"a": 1}'}, record)
+        self.assertEqual({'a': 1}, record.source)
+
+    @patch("boto3_batch_utils.utils.get_byte_size_of_dict_or_list", return_value=5)
+    def test_byte_size_is_only_calculated_once(self, mock_get_byte_size_of_dict_or_list):
+        record = utils.BatchRecord({'Id': '1'})
+        self.assertEqual(5, record.byte_size)
+        self.assertEqual(5, record.byte_size)
+        mock_get_byte_size_of_dict_or_list.assert_called_once_with(record)
+
+    @patch("boto3_batch_utils.utils.get_byte_size_of_dict_or_list")
+    def test_byte_size_given(self, mock_get_byte_size_of_dict_or_list):
+        record = utils.BatchRecord({'Id': '1'}, byte_size=9)
+        self.assertEqual(9, record.byte_size)
+        mock_get_byte_size_of_dict_or_list.assert_not_called()
+
+    def test_byte_size_matches_plain_dict(self):
+        payload = {'Id': '1', 'MessageBody': json.dumps({'a': "quoted \"text\""})}
+        self.assertEqual(utils.get_byte_size_of_dict_or_list(payload), utils.BatchRecord(payload).byte_size)
+
+
+class TestGetSourceOfRecord(TestCase):
+
+    def test_batch_record(self):
+        self.assertEqual({'a': 1}, utils.get_source_of_record(utils.BatchRecord({'Data': '{"a": 1}'}, source={'a': 1})))
+
+    def test_plain_dict(self):
+        self.assertIsNone(utils.get_source_of_record({'Data': '{"a": 1}'}))
+
+
+class TestGetByteSizeOfEncodedJsonValue(TestCase):
+
+    def test_ascii_document(self):
+        encoded = json.dumps({'a': 'quoted "text" and \\ backslash\n'})
+        self.assertEqual(utils.get_byte_size_of_string(json.dumps(encoded)),
+                         utils.get_byte_size_of_encoded_json_value(encoded))
+
+    def test_non_ascii_document(self):
+        encoded = json.dumps({'é': 'ü'}, ensure_ascii=False)
+        self.assertEqual(utils.get_byte_size_of_string(json.dumps(encoded)),
+                         utils.get_byte_size_of_encoded_json_value(encoded))
+
+
+class TestGetByteSizeOfDictWithEncodedJson(TestCase):
+
+    def test(self):
+        d = {'Id': 'abc', 'MessageBody': json.dumps({'a': ['"', 1.5, None]}), 'DelaySeconds': 3}
+        self.assertEqual(utils.get_byte_size_of_dict_or_list(d),
+                         utils.get_byte_size_of_dict_with_encoded_json(d, 'MessageBody'))
+        self.assertEqual('abc', d['Id'])
+
+    def test_binary_value(self):
+        d = {'Data': b'\x1f\x8b\x00\x01', 'PartitionKey': 'abc'}
+        self.assertEqual(utils.get_byte_size_of_dict_or_list({'Data': '', 'PartitionKey': 'abc'}) + 4,
+                         utils.get_byte_size_of_dict_with_encoded_json(d, 'Data'))
+
+
+def sized_records(*sizes) -> list:
+    return [utils.BatchRecord({'size': size}, byte_size=size) for size in sizes]
+
+
+class TestPackInOrder(TestCase):
+
+    def test_count_limit(self):
+        records = sized_records(1, 1, 1, 1, 1)
+        self.assertEqual([records[:2], records[2:4], records[4:]], utils.pack_in_order(records, 2, 100))
+
+    def test_byte_limit_includes_separators(self):
+        records = sized_records(4, 4, 4)
+        self.assertEqual([records[:2], records[2:]], utils.pack_in_order(records, 10, 10))
+        self.assertEqual([records], utils.pack_in_order(records, 10, 16))
+
+    def test_order_is_kept(self):
+        records = sized_records(6, 2, 6, 2)
+        self.assertEqual([[records[0], records[1]], [records[2], records[3]]], utils.pack_in_order(records, 10, 10))
+
+    def test_oversized_payload_is_a_batch_on_its_own(self):
+        records = sized_records(2, 20, 2)
+        self.assertEqual([[records[0]], [records[1]], [records[2]]], utils.pack_in_order(records, 10, 10))
+
+
+class TestPackFirstFitDecreasing(TestCase):
+
+    def test_fewer_batches_than_in_order(self):
+        records = sized_records(6, 6, 6, 2, 2, 2)
+        self.assertEqual(4, len(utils.pack_in_order(records, 10, 10)))
+        self.assertEqual([[records[0], records[3]], [records[1], records[4]], [records[2], records[5]]],
+                         utils.pack_first_fit_decreasing(records, 10, 10))
+
+    def test_count_limit(self):
+        records = sized_records(1, 1, 1, 1, 1)
+        self.assertEqual([3, 2], [len(batch) for batch in utils.pack_first_fit_decreasing(records, 3, 100)])
+
+    def test_each_batch_keeps_submission_order(self):
+        records = sized_records(1, 5, 2, 4)
+        self.assertEqual([records], utils.pack_first_fit_decreasing(records, 10, 20))
+
+    def test_every_payload_is_packed_once(self):
+        records = sized_records(*[(i * 37) % 11 + 1 for i in range(50)])
+        batch_list = utils.pack_first_fit_decreasing(records, 4, 20)
+        self.assertCountEqual(records, [record for batch in batch_list for record in batch])
+        for batch in batch_list:
+            self.assertLessEqual(len(batch), 4)
+            self.assertLessEqual(sum(record.byte_size for record in batch) + 2 * (len(batch) - 1), 20)
+
+
+class TestPackWorstFitDecreasing(TestCase):
+
+    def test_large_payloads_are_spread_across_batches(self):
+        #  First fit puts both 8s in the first batch, leaving too many small payloads for the count limit
+        records = sized_records(8, 8, 1, 1, 1, 1, 1, 1)
+        self.assertEqual(3, len(utils.pack_first_fit_decreasing(records, 4, 20)))
+        batch_list = utils.pack_worst_fit_decreasing(records, 4, 20)
+        self.assertEqual([[records[0], records[2], records[4], records[6]],
+                          [records[1], records[3], records[5], records[7]]], batch_list)
+
+    def test_batch_added_when_a_payload_fits_nowhere(self):
+        records = sized_records(10, 10, 10)
+        self.assertEqual([[records[0]], [records[1]], [records[2]]], utils.pack_worst_fit_decreasing(records, 10, 20))
+
+    def test_every_payload_is_packed_once(self):
+        records = sized_records(*[(i * 37) % 11 + 1 for i in range(50)])
+        batch_list = utils.pack_worst_fit_decreasing(records, 4, 20)
+        self.assertCountEqual(records, [record for batch in batch_list for record in batch])
+        for batch in batch_list:
+            self.assertLessEqual(len(batch), 4)
+            self.assertLessEqual(sum(record.byte_size for record in batch) + 2 * (len(batch) - 1), 20)
+
+
+class TestPackUnordered(TestCase):
+
+    def test_fewest_batches_when_count_limited(self):
+        records = sized_records(8, 8, 1, 1, 1, 1, 1, 1)
+        self.assertEqual(2, len(utils.pack_unordered(records, 4, 20)))
+
+    def test_fewest_batches_when_byte_limited(self):
+        records = sized_records(6, 6, 6, 2, 2, 2)
+        self.assertEqual(3, len(utils.pack_unordered(records, 10, 10)))
+
+    def test_fullest_batch_first(self):
+        records = sized_records(2, 9, 9)
+        self.assertEqual([[records[0], records[1]], [records[2]]], utils.pack_unordered(records, 10, 13))
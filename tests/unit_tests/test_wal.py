@@ -0,0 +1,151 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from boto3_batch_utils.wal import WriteAheadLog, PAYLOAD_RECORD, FAILED_RECORD
+
+
+class TestWriteAheadLog(TestCase):
+
+    def setUp(self):
+        self._directory = TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def get_segment_files(self) -> list:
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.wal'))
+
+    def test_segment_size_too_small_raises_exception(self):
+        with self.assertRaises(ValueError) as context:
+            WriteAheadLog(self.directory, segment_size=100)
+        self.assertIn("segment_size '100' must be at least 4096 bytes", str(context.exception))
+
+    def test_record_ids_increase(self):
+        log = WriteAheadLog(self.directory)
+        self.assertEqual([1, 2, 3], [log.append({'a': i}) for i in range(3)])
+        log.close()
+
+    def test_new_log_has_nothing_to_replay(self):
+        log = WriteAheadLog(self.directory)
+        self.assertEqual([], list(log.replay()))
+        log.close()
+
+    def test_unacknowledged_records_are_replayed_after_reopening(self):
+        log = WriteAheadLog(self.directory)
+        log.append({'a': 1})
+        log.append({'a': 2})
+        log.append({'b': 1}, FAILED_RECORD)
+        log.ack([1])
+        log.close()
+
+        log = WriteAheadLog(self.directory)
+        self.assertEqual([(2, PAYLOAD_RECORD, {'a': 2}), (3, FAILED_RECORD, {'b': 1})], list(log.replay()))
+        self.assertEqual(4, log.append({'a': 3}))
+        log.close()
+
+    def test_records_acknowledged_after_reopening_are_not_replayed(self):
+        log = WriteAheadLog(self.directory)
+        log.append({'a': 1})
+        log.append({'a': 2})
+        log.close()
+        log = WriteAheadLog(self.directory)
+        log.ack([1])
+        self.assertEqual([(2, PAYLOAD_RECORD, {'a': 2})], list(log.replay()))
+        log.close()
+        log = WriteAheadLog(self.directory)
+        self.assertEqual([(2, PAYLOAD_RECORD, {'a': 2})], list(log.replay()))
+        log.close()
+
+    def test_process_killed_without_closing(self):
+        log = WriteAheadLog(self.directory)
+        log.append({'a': 1})
+        #  The log is not closed, but the pages of the memory-mapped file are visible to a new reader
+        self.assertEqual([(1, PAYLOAD_RECORD, {'a': 1})], list(WriteAheadLog(self.directory).replay()))
+
+    def test_read_yields_payload_records_in_range(self):
+        log = WriteAheadLog(self.directory)
+        log.append({'a': 1})
+        log.append({'a': 2})
+        log.append({'b': 1}, FAILED_RECORD)
+        log.ack([1])
+        log.append({'a': 3})
+        log.append({'a': 4})
+        self.assertEqual([(2, {'a': 2}), (4, {'a': 3})], list(log.read(2, 5)))
+        self.assertEqual([(5, {'a': 4})], list(log.read(5, 6)))
+        self.assertEqual([(1, {'a': 1}), (2, {'a': 2})], list(log.read(1, 3)))
+        log.close()
+
+    def test_reading_across_segments(self):
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        for i in range(20):
+            log.append({'a': i, 'body': 'x' * 1000})
+        self.assertGreater(len(self.get_segment_files()), 1)
+        self.assertEqual(list(range(20)), [payload['a'] for _, payload in log.read(1, 21)])
+        self.assertEqual([5, 6], [payload['a'] for _, payload in log.read(6, 8)])
+        log.close()
+
+    def test_acknowledged_segments_are_deleted(self):
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        record_ids = [log.append({'body': 'x' * 1000}) for _ in range(20)]
+        segment_count = len(self.get_segment_files())
+        log.ack(record_ids)
+        self.assertLess(len(self.get_segment_files()), segment_count)
+        log.close()
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        self.assertEqual([], list(log.replay()))
+        self.assertEqual(1, len(self.get_segment_files()))
+        log.close()
+
+    def test_record_ids_are_not_reused_after_reopening_a_log_of_acknowledgements(self):
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        #  Three records fill the first segment, so their acknowledgement starts a segment of its own
+        record_ids = [log.append({'body': 'x' * 1310}) for _ in range(3)]
+        log.ack(record_ids)
+        log.close()
+        self.assertEqual(['00000000000000000004-0000000002.wal'], self.get_segment_files())
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        self.assertEqual([4, 5, 6], [log.append({'a': i}) for i in range(3)])
+        log.close()
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        self.assertEqual([{'a': 0}, {'a': 1}, {'a': 2}], [data for _, _, data in log.replay()])
+        log.close()
+
+    def test_segment_is_not_deleted_before_an_older_segment(self):
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        record_ids = [log.append({'body': 'x' * 1000}) for _ in range(12)]
+        segment_files = self.get_segment_files()
+        log.ack(record_ids[1:])
+        self.assertEqual(segment_files, self.get_segment_files()[:len(segment_files)])
+        log.close()
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        self.assertEqual([1], [record_id for record_id, _, _ in log.replay()])
+        log.close()
+
+    def test_record_larger_than_segment_size(self):
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        log.append({'body': 'x' * 10000})
+        log.append({'a': 1})
+        log.close()
+        log = WriteAheadLog(self.directory, segment_size=4096)
+        self.assertEqual([10000, 1], [len(data.get('body', 'x')) for _, _, data in log.replay()])
+        log.close()
+
+    def test_incomplete_record_is_ignored_and_overwritten(self):
+        log = WriteAheadLog(self.directory)
+        log.append({'a': 1})
+        log.append({'a': 2})
+        position = log._segments[-1].position
+        log.close()
+        path = os.path.join(self.directory, self.get_segment_files()[0])
+        with open(path, 'r+b') as segment_file:
+            segment_file.seek(position - 3)
+            segment_file.write(b'\xff\xff\xff')
+
+        with self.assertLogs('boto3-batch-utils', 'WARNING'):
+            log = WriteAheadLog(self.directory)
+        self.assertEqual([(1, PAYLOAD_RECORD, {'a': 1})], list(log.replay()))
+        self.assertEqual(2, log.append({'a': 3}))
+        log.close()
+        self.assertEqual([{'a': 1}, {'a': 3}], [data for _, _, data in WriteAheadLog(self.directory).replay()])